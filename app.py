@@ -10,11 +10,16 @@ sys.path.insert(0, '/home/user/webapp/sr_v2')
 # 添加逃顶信号系统v2.0路径
 sys.path.insert(0, '/home/user/webapp/escape_v2')
 
+# HTTP_REPLAY_MODE=record/replay 时录制或回放OKX请求（离线测试交易接口）
+import http_replay
+http_replay.install_from_env()
+
 from flask import Flask, render_template_string, render_template, request, jsonify, send_from_directory, send_file, make_response, redirect
 from flask_compress import Compress
 import sqlite3
 from datetime import datetime, timedelta, timezone
 import json
+import numpy as np
 import pytz
 import os
 from functools import wraps
@@ -88,8 +93,8 @@ class OKXTradingLogger:
             }
             
             log_file = self._get_log_file()
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+            # 追加写入并同步更新时间索引
+            append_record(log_file, log_entry, time_key='timestamp')
             
             print(f"[OKX日志] {action} - {account_id} - {result.get('status', 'unknown')}")
             
@@ -136,6 +141,35 @@ app.register_blueprint(trading_bp)
 # 导入SAR JSONL API
 from sar_api_jsonl import get_sar_current_cycle
 
+# 导入JSONL尾部读取工具（从文件末尾反向读取最近N条）
+from jsonl_tail_reader import read_last_record, read_last_records
+
+# 导入JSONL时间偏移索引（按时间窗口直接定位）
+from jsonl_time_index import append_record, read_range
+
+# 导入进程内JSONL解析缓存（文件只追加时只解析新增部分）
+from jsonl_read_cache import jsonl_cache
+
+# 导入滑动窗口线性回归（闭式解，币种×时间矩阵一次计算）
+from rolling_regression import rolling_regression
+
+# 导入SQLite连接池（WAL、只读连接、SQL耗时统计）
+from db_pool import get_connection, db_connection, release_all as release_db_connections, get_stats as get_db_stats
+from db_pool import CRYPTO_DATA_DB, FUND_MONITOR_DB, SAR_SLOPE_DB, TRADING_DECISION_DB
+
+
+@app.teardown_appcontext
+def _release_db_connections(exc):
+    """请求结束时回滚并归还本线程没有 close() 的连接（出错后没有归还的连接不再占用写锁）"""
+    release_db_connections()
+
+# 导入首页汇总表读取(触发器维护的物化计数)
+from summary_counters import read_homepage_counters
+
+# 导入10分钟涨速当日累计计数（采集器增量维护）
+from price_speed_counters import PriceSpeedCounters
+price_speed_counters = PriceSpeedCounters('/home/user/webapp/data/price_speed_10m')
+
 # 导入Extreme JSONL Manager
 from extreme_jsonl_manager import ExtremeJSONLManager
 
@@ -2038,24 +2072,32 @@ def api_homepage_summary():
             'timestamp': datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 1. 统计栏数据(本轮急涨急跌和恐慌指数)
-        cursor.execute("SELECT COUNT(*) FROM crypto_snapshots")
-        total_records = cursor.fetchone()[0]
-        
         today = datetime.now(BEIJING_TZ).date().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) FROM crypto_snapshots WHERE snapshot_date = ?", (today,))
-        today_records = cursor.fetchone()[0]
         
-        cursor.execute("""
-            SELECT snapshot_time, rush_up, rush_down
-            FROM crypto_snapshots
-            ORDER BY snapshot_date DESC, snapshot_time DESC
-            LIMIT 2
-        """)
-        latest_records = cursor.fetchall()
+        # 优先读取触发器维护的汇总表(主键查找),未安装时回退到源表查询
+        counters = read_homepage_counters(cursor, today)
+        if counters is not None:
+            total_records = counters['total_records']
+            today_records = counters['today_records']
+            latest_records = counters['latest_records']
+        else:
+            cursor.execute("SELECT COUNT(*) FROM crypto_snapshots")
+            total_records = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM crypto_snapshots WHERE snapshot_date = ?", (today,))
+            today_records = cursor.fetchone()[0]
+            
+            cursor.execute("""
+                SELECT snapshot_time, rush_up, rush_down
+                FROM crypto_snapshots
+                ORDER BY snapshot_date DESC, snapshot_time DESC
+                LIMIT 2
+            """)
+            latest_records = cursor.fetchall()
         
         last_update_time = '-'
         current_round_rush_up = 0
@@ -2074,13 +2116,16 @@ def api_homepage_summary():
                 current_round_rush_up = current_rush_up - prev_rush_up
                 current_round_rush_down = current_rush_down - prev_rush_down
         
-        cursor.execute("""
-            SELECT panic_index, hour_24_people, total_position
-            FROM panic_wash_index
-            ORDER BY record_time DESC
-            LIMIT 1
-        """)
-        panic_data = cursor.fetchone()
+        if counters is not None:
+            panic_data = counters['panic']
+        else:
+            cursor.execute("""
+                SELECT panic_index, hour_24_people, total_position
+                FROM panic_wash_index
+                ORDER BY record_time DESC
+                LIMIT 1
+            """)
+            panic_data = cursor.fetchone()
         
         panic_indicator = '-'
         panic_color = 'gray'
@@ -2112,15 +2157,24 @@ def api_homepage_summary():
         }
         
         # 2. 模块统计数据
-        cursor.execute("SELECT MIN(snapshot_date), MAX(snapshot_date) FROM crypto_snapshots")
-        date_range = cursor.fetchone()
+        if counters is not None:
+            date_range = (counters['first_date'], counters['last_date'])
+            last_snapshot = latest_records[0] if latest_records else None
+        else:
+            # MIN和MAX分开写成子查询，各自走索引端点而不是全表扫描
+            cursor.execute("""
+                SELECT (SELECT MIN(snapshot_date) FROM crypto_snapshots),
+                       (SELECT MAX(snapshot_date) FROM crypto_snapshots)
+            """)
+            date_range = cursor.fetchone()
+            cursor.execute("SELECT MAX(snapshot_time) FROM crypto_snapshots")
+            last_snapshot = cursor.fetchone()
+        
         data_days = 0
         if date_range and date_range[0] and date_range[1]:
             data_days = (datetime.strptime(date_range[1], '%Y-%m-%d') - 
                         datetime.strptime(date_range[0], '%Y-%m-%d')).days + 1
         
-        cursor.execute("SELECT MAX(snapshot_time) FROM crypto_snapshots")
-        last_snapshot = cursor.fetchone()
         last_update = last_snapshot[0] if last_snapshot else '-'
         
         result['modules_stats'] = {
@@ -2285,15 +2339,11 @@ def api_query():
             
             coins = []
             if os.path.exists(date_file):
-                # 从分区文件读取
-                import json
-                with open(date_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:
-                            record = json.loads(line)
-                            if record.get('snapshot_time') == query_time:
-                                coins.append(record)
+                # 从分区文件读取（通过时间索引直接定位到该快照）
+                coins = [
+                    record for record in read_range(date_file, query_time, query_time, time_key='snapshot_time')
+                    if record.get('snapshot_time') == query_time
+                ]
             
             # 如果分区文件中没找到,再从主文件查找
             if not coins:
@@ -3011,7 +3061,7 @@ def popup_demo():
 def api_signals_stats():
     """获取信号统计数据"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新记录
@@ -3074,7 +3124,7 @@ def api_signals_chart():
         points_per_page = minutes // 3  # 每3分钟一个数据点
         offset = page * points_per_page
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取总记录数
@@ -3123,7 +3173,7 @@ def api_signals_history():
     try:
         limit = int(request.args.get('limit', 50))
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -3803,7 +3853,7 @@ def api_fear_greed_statistics():
 def api_modules_stats():
     """获取所有模块的统计信息"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 1. 历史数据查询模块统计
@@ -3970,90 +4020,86 @@ def api_price_comparison_update():
                 'error': '缺少必要参数: coin_name 或 price'
             })
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
-        cursor = conn.cursor()
-        
-        # 获取当前币种的最高价和最低价
-        cursor.execute('''
-            SELECT highest_price, highest_count, lowest_price, lowest_count
-            FROM price_baseline
-            WHERE symbol = ?
-        ''', (coin_name,))
-        
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return jsonify({
-                'success': False,
-                'error': f'币种 {coin_name} 不存在'
-            })
-        
-        highest_price, highest_count, lowest_price, lowest_count = row
-        old_highest_price = highest_price
-        old_lowest_price = lowest_price
-        
-        # 价格比较逻辑
-        action = ''
-        if new_price > highest_price:
-            # 新价格创新高
+        with db_connection(CRYPTO_DATA_DB) as conn:
+            cursor = conn.cursor()
+            
+            # 获取当前币种的最高价和最低价
+            cursor.execute('''
+                SELECT highest_price, highest_count, lowest_price, lowest_count
+                FROM price_baseline
+                WHERE symbol = ?
+            ''', (coin_name,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return jsonify({
+                    'success': False,
+                    'error': f'币种 {coin_name} 不存在'
+                })
+            
+            highest_price, highest_count, lowest_price, lowest_count = row
             old_highest_price = highest_price
-            highest_price = new_price
-            highest_count = 0
-            action = 'new_high'
-        elif new_price < lowest_price:
-            # 新价格创新低
             old_lowest_price = lowest_price
-            lowest_price = new_price
-            lowest_count = 0
-            action = 'new_low'
-        else:
-            # 价格在区间内
-            highest_count += 1
-            lowest_count += 1
-            action = 'in_range'
-        
-        # 计算占比
-        # 最高价占比 = (当前价 / 最高价) × 100
-        highest_ratio = round((new_price / highest_price) * 100, 2) if highest_price > 0 else 0
-        # 最低价占比 = (当前价 / 最低价) × 100
-        lowest_ratio = round((new_price / lowest_price) * 100, 2) if lowest_price > 0 else 0
-        
-        # 更新数据库 - 使用北京时间
-        from datetime import datetime
-        import pytz
-        beijing_tz = pytz.timezone('Asia/Shanghai')
-        beijing_time = datetime.now(beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
-        
-        cursor.execute('''
-            UPDATE price_baseline
-            SET highest_price = ?,
-                highest_count = ?,
-                lowest_price = ?,
-                lowest_count = ?,
-                highest_ratio = ?,
-                lowest_ratio = ?,
-                last_update_time = ?
-            WHERE symbol = ?
-        ''', (highest_price, highest_count, lowest_price, lowest_count, 
-              highest_ratio, lowest_ratio, beijing_time, coin_name))
-        
-        # 如果发生创新高或创新低,记录事件
-        if action in ['new_high', 'new_low']:
-            cursor.execute('''
-                INSERT INTO price_breakthrough_events 
-                (symbol, event_type, price, event_time)
-                VALUES (?, ?, ?, ?)
-            ''', (coin_name, action, new_price, beijing_time))
             
-            # 更新统计表缓存(清除今天的缓存,下次查询时会重新计算)
-            today_date = beijing_tz.localize(datetime.now()).strftime('%Y-%m-%d')
+            # 价格比较逻辑
+            action = ''
+            if new_price > highest_price:
+                # 新价格创新高
+                old_highest_price = highest_price
+                highest_price = new_price
+                highest_count = 0
+                action = 'new_high'
+            elif new_price < lowest_price:
+                # 新价格创新低
+                old_lowest_price = lowest_price
+                lowest_price = new_price
+                lowest_count = 0
+                action = 'new_low'
+            else:
+                # 价格在区间内
+                highest_count += 1
+                lowest_count += 1
+                action = 'in_range'
+            
+            # 计算占比
+            # 最高价占比 = (当前价 / 最高价) × 100
+            highest_ratio = round((new_price / highest_price) * 100, 2) if highest_price > 0 else 0
+            # 最低价占比 = (当前价 / 最低价) × 100
+            lowest_ratio = round((new_price / lowest_price) * 100, 2) if lowest_price > 0 else 0
+            
+            # 更新数据库 - 使用北京时间
+            from datetime import datetime
+            import pytz
+            beijing_tz = pytz.timezone('Asia/Shanghai')
+            beijing_time = datetime.now(beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
+            
             cursor.execute('''
-                DELETE FROM price_comparison_stats
-                WHERE stat_date = ?
-            ''', (today_date,))
-        
-        conn.commit()
-        conn.close()
+                UPDATE price_baseline
+                SET highest_price = ?,
+                    highest_count = ?,
+                    lowest_price = ?,
+                    lowest_count = ?,
+                    highest_ratio = ?,
+                    lowest_ratio = ?,
+                    last_update_time = ?
+                WHERE symbol = ?
+            ''', (highest_price, highest_count, lowest_price, lowest_count, 
+                  highest_ratio, lowest_ratio, beijing_time, coin_name))
+            
+            # 如果发生创新高或创新低,记录事件
+            if action in ['new_high', 'new_low']:
+                cursor.execute('''
+                    INSERT INTO price_breakthrough_events 
+                    (symbol, event_type, price, event_time)
+                    VALUES (?, ?, ?, ?)
+                ''', (coin_name, action, new_price, beijing_time))
+                
+                # 更新统计表缓存(清除今天的缓存,下次查询时会重新计算)
+                today_date = beijing_tz.localize(datetime.now()).strftime('%Y-%m-%d')
+                cursor.execute('''
+                    DELETE FROM price_comparison_stats
+                    WHERE stat_date = ?
+                ''', (today_date,))
         
         return jsonify({
             'success': True,
@@ -4157,7 +4203,7 @@ def api_update_price_ratios():
     - 最低价占比 = (当前价 / 最低价) × 100%
     """
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB)
         cursor = conn.cursor()
         
         # 获取最新快照时间
@@ -4247,7 +4293,7 @@ def api_monitor_data_collection():
         from datetime import datetime, timedelta
         import pytz
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         beijing_tz = pytz.timezone('Asia/Shanghai')
@@ -4351,7 +4397,7 @@ def api_star_system_data():
         from datetime import datetime, timedelta
         import pytz
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB)
         cursor = conn.cursor()
         beijing_tz = pytz.timezone('Asia/Shanghai')
         
@@ -4583,7 +4629,7 @@ def api_star_system_data():
         
         # ========== 新增功能1: V1/V2币种统计 ==========
         try:
-            conn_v1v2 = sqlite3.connect('v1v2_data.db')
+            conn_v1v2 = get_connection('v1v2_data.db')
             cursor_v1v2 = conn_v1v2.cursor()
             
             coins_list = ['BTC', 'ETH', 'XRP', 'SOL', 'BNB', 'LTC', 'DOGE', 'SUI', 'TRX', 'TON', 
@@ -4614,7 +4660,7 @@ def api_star_system_data():
         
         # ========== 新增功能2: 1分钟涨跌速预警统计 ==========
         try:
-            conn_ps = sqlite3.connect('price_speed_data.db')
+            conn_ps = get_connection('price_speed_data.db')
             cursor_ps = conn_ps.cursor()
             
             # 获取各类型预警的币种
@@ -4713,7 +4759,7 @@ def api_star_system_history():
         date = request.args.get('date')  # 格式: YYYY-MM-DD
         limit = int(request.args.get('limit', 100))
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         if date:
@@ -5399,7 +5445,7 @@ def position_system():
 def api_position_latest():
     """获取最新位置数据"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新的记录时间
@@ -5502,7 +5548,7 @@ def api_position_latest():
 def api_position_summary():
     """获取位置统计摘要"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新的记录时间
@@ -5590,7 +5636,7 @@ def api_position_summary():
 def api_position_history(symbol):
     """获取指定币种的历史位置数据"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最近24小时的数据
@@ -5635,7 +5681,7 @@ def api_position_history(symbol):
 def api_position_stats_latest():
     """获取最新的位置统计数据(低于1%的币种数量)"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新的统计数据
@@ -5682,7 +5728,7 @@ def api_position_stats_history():
         start_time = request.args.get('start_time', default=None, type=str)
         end_time = request.args.get('end_time', default=None, type=str)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 构建查询条件
@@ -5887,9 +5933,7 @@ def api_v1v2_statistics():
         import sqlite3
         from datetime import datetime, timedelta
         
-        conn = sqlite3.connect('v1v2_data.db', timeout=30.0)
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.execute('PRAGMA busy_timeout=30000')
+        conn = get_connection('v1v2_data.db', readonly=True)
         cursor = conn.cursor()
         
         # 获取所有币种表
@@ -7230,7 +7274,7 @@ def track_trading_signal(symbol, buy_point_type, suggested_position):
     signal_key = f"{symbol}_{buy_point_type}"
     
     # 使用独立的数据库连接
-    conn_track = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+    conn_track = get_connection(CRYPTO_DATA_DB)
     conn_track.row_factory = sqlite3.Row
     cursor_track = conn_track.cursor()
     
@@ -7279,7 +7323,7 @@ def check_no_new_low_5min(symbol):
     import sqlite3
     from datetime import datetime, timedelta
     
-    conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+    conn = get_connection(CRYPTO_DATA_DB, readonly=True)
     cursor = conn.cursor()
     
     try:
@@ -7333,7 +7377,7 @@ def get_1h_rsi(symbol):
     """获取1小时RSI"""
     import sqlite3
     
-    conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+    conn = get_connection(CRYPTO_DATA_DB, readonly=True)
     cursor = conn.cursor()
     
     try:
@@ -7357,7 +7401,7 @@ def check_consecutive_oscillation_5min(symbol):
     """检查5分钟周期连续3个震荡≤0.5% 且涨跌在0%到+0.25%之间(不包括负涨跌)"""
     import sqlite3
     
-    conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+    conn = get_connection(CRYPTO_DATA_DB, readonly=True)
     cursor = conn.cursor()
     
     try:
@@ -7408,7 +7452,7 @@ def deactivate_missing_signals(active_signal_keys):
     beijing_tz = pytz.timezone('Asia/Shanghai')
     now = datetime.now(beijing_tz)
     
-    conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+    conn = get_connection(CRYPTO_DATA_DB)
     cursor = conn.cursor()
     
     try:
@@ -7441,7 +7485,7 @@ def api_trading_signals_analyze():
         from opening_logic import get_opening_suggestion
         
         # 连接crypto_data数据库(用于其他系统数据)
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -7995,7 +8039,7 @@ def api_trading_signals_history():
         from datetime import datetime, timedelta
         import pytz
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -8907,7 +8951,7 @@ def api_kline_indicators_latest():
         symbol = request.args.get('symbol')
         timeframe = request.args.get('timeframe')
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -8982,7 +9026,7 @@ def api_kline_indicators_latest():
 def api_kline_indicators_status():
     """获取采集器运行状态"""
     try:
-        conn = sqlite3.connect('crypto_data.db', timeout=10.0)
+        conn = get_connection('crypto_data.db', readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -9048,30 +9092,27 @@ def cleanup_expired_signals():
     将 is_valid 设置为 0
     """
     try:
-        conn = sqlite3.connect('crypto_data.db', timeout=5.0)
-        cursor = conn.cursor()
-        
-        from datetime import datetime, timedelta
-        cutoff_time = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 清理买点4过期信号
-        cursor.execute('''
-            UPDATE buy_point_4_signals
-            SET is_valid = 0
-            WHERE is_valid = 1 AND confirm_time < ?
-        ''', (cutoff_time,))
-        buy_point_4_cleaned = cursor.rowcount
-        
-        # 清理卖点1过期信号
-        cursor.execute('''
-            UPDATE sell_point_1_signals
-            SET is_valid = 0
-            WHERE is_valid = 1 AND mark_time < ?
-        ''', (cutoff_time,))
-        sell_point_1_cleaned = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        with db_connection('crypto_data.db') as conn:
+            cursor = conn.cursor()
+            
+            from datetime import datetime, timedelta
+            cutoff_time = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
+            
+            # 清理买点4过期信号
+            cursor.execute('''
+                UPDATE buy_point_4_signals
+                SET is_valid = 0
+                WHERE is_valid = 1 AND confirm_time < ?
+            ''', (cutoff_time,))
+            buy_point_4_cleaned = cursor.rowcount
+            
+            # 清理卖点1过期信号
+            cursor.execute('''
+                UPDATE sell_point_1_signals
+                SET is_valid = 0
+                WHERE is_valid = 1 AND mark_time < ?
+            ''', (cutoff_time,))
+            sell_point_1_cleaned = cursor.rowcount
         
         return {
             'buy_point_4_cleaned': buy_point_4_cleaned,
@@ -9089,7 +9130,7 @@ def api_kline_indicators_signals():
     - 卖点1: 从 sell_point_1_signals 表读取(RSI >= 60)
     """
     try:
-        conn = sqlite3.connect('crypto_data.db', timeout=10.0)
+        conn = get_connection('crypto_data.db', readonly=True)
         cursor = conn.cursor()
         
         from datetime import datetime, timedelta
@@ -9190,7 +9231,7 @@ def api_kline_indicators_tv_latest():
         symbol = request.args.get('symbol')
         timeframe = request.args.get('timeframe')
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -9281,7 +9322,7 @@ def api_kline_indicators_tv_latest():
 def api_kline_indicators_tv_status():
     """获取TradingView指标采集器运行状态"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -9353,7 +9394,7 @@ def api_symbol_kline(symbol):
         # 转换timeframe格式: 5m -> 5m, 1h -> 1H (数据库中使用大写H)
         db_timeframe = timeframe.upper() if timeframe == '1h' else timeframe
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 根据时间周期设置limit
@@ -9506,7 +9547,7 @@ def api_symbol_indicators(symbol):
         # 转换timeframe格式: 5m -> 5m, 1h -> 1H
         db_timeframe = timeframe.upper() if timeframe == '1h' else timeframe
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 设置limit
@@ -9573,7 +9614,7 @@ def api_signals_recent():
         from datetime import datetime, timedelta
         import json
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 计算2小时前的时间
@@ -9670,7 +9711,7 @@ def api_symbol_extremes(symbol):
         # 转换timeframe格式
         db_timeframe = timeframe.upper() if timeframe == '1h' else timeframe
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 计算时间范围(毫秒时间戳)
@@ -9937,7 +9978,7 @@ def api_gdrive_monitor_status():
         db_records = 0
         try:
             import sqlite3
-            conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+            conn = get_connection(CRYPTO_DATA_DB, readonly=True)
             cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM crypto_snapshots WHERE snapshot_date = ?", (now.strftime('%Y-%m-%d'),))
             db_records = cursor.fetchone()[0]
@@ -10358,7 +10399,7 @@ def telegram_status():
         signal_counts = {}  # 初始化为空字典
         db_path = '/home/user/webapp/databases/tg_signals.db'
         if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path, timeout=5.0)
+            conn = get_connection(db_path, readonly=True)
             cursor = conn.cursor()
             
             # 获取总发送数
@@ -10448,7 +10489,7 @@ def telegram_history():
         limit = request.args.get('limit', 50, type=int)
         signal_type = request.args.get('type', '')
         
-        conn = sqlite3.connect('tg_signals.db', timeout=5.0)
+        conn = get_connection('tg_signals.db', readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -10511,7 +10552,7 @@ def api_coins_realtime_status():
     """
     try:
         import pytz
-        conn = sqlite3.connect('crypto_data.db', timeout=10.0)
+        conn = get_connection('crypto_data.db', readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -10651,47 +10692,44 @@ def api_sell_point_1_save():
                     'error': f'缺少必需字段: {field}'
                 }), 400
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
-        cursor = conn.cursor()
-        
-        # 检查是否已存在相同的信号(避免重复插入)
-        cursor.execute('''
-            SELECT id FROM sell_point_1_signals
-            WHERE symbol = ? AND mark_time = ? AND is_valid = 1
-        ''', (data['symbol'], data['mark_time']))
-        
-        existing = cursor.fetchone()
-        if existing:
-            conn.close()
-            return jsonify({
-                'success': True,
-                'message': '信号已存在',
-                'signal_id': existing[0]
-            })
-        
-        # 插入新信号
-        now = datetime.now(pytz.timezone('Asia/Shanghai')).strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            INSERT INTO sell_point_1_signals (
-                symbol, high_price, high_time, high_index,
-                mark_price, mark_time, mark_index, mark_rsi,
-                signal_generated_at, is_valid
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        ''', (
-            data['symbol'],
-            data['high_price'],
-            data['high_time'],
-            data['high_index'],
-            data['mark_price'],
-            data['mark_time'],
-            data['mark_index'],
-            data['mark_rsi'],
-            now
-        ))
-        
-        signal_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with db_connection(CRYPTO_DATA_DB) as conn:
+            cursor = conn.cursor()
+            
+            # 检查是否已存在相同的信号(避免重复插入)
+            cursor.execute('''
+                SELECT id FROM sell_point_1_signals
+                WHERE symbol = ? AND mark_time = ? AND is_valid = 1
+            ''', (data['symbol'], data['mark_time']))
+            
+            existing = cursor.fetchone()
+            if existing:
+                return jsonify({
+                    'success': True,
+                    'message': '信号已存在',
+                    'signal_id': existing[0]
+                })
+            
+            # 插入新信号
+            now = datetime.now(pytz.timezone('Asia/Shanghai')).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute('''
+                INSERT INTO sell_point_1_signals (
+                    symbol, high_price, high_time, high_index,
+                    mark_price, mark_time, mark_index, mark_rsi,
+                    signal_generated_at, is_valid
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ''', (
+                data['symbol'],
+                data['high_price'],
+                data['high_time'],
+                data['high_index'],
+                data['mark_price'],
+                data['mark_time'],
+                data['mark_index'],
+                data['mark_rsi'],
+                now
+            ))
+            
+            signal_id = cursor.lastrowid
         
         return jsonify({
             'success': True,
@@ -10720,7 +10758,7 @@ def api_sell_point_1_latest():
         symbol = request.args.get('symbol')
         hours = int(request.args.get('hours', 24))
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -10792,7 +10830,7 @@ def api_telegram_support_resistance():
         import sqlite3
         from datetime import datetime, timedelta
         
-        conn = sqlite3.connect('telegram_signals.db')
+        conn = get_connection('telegram_signals.db', readonly=True)
         cursor = conn.cursor()
         
         # 获取2小时内的信号
@@ -10832,7 +10870,7 @@ def api_telegram_count_alerts():
         import sqlite3
         from datetime import datetime, timedelta
         
-        conn = sqlite3.connect('telegram_signals.db')
+        conn = get_connection('telegram_signals.db', readonly=True)
         cursor = conn.cursor()
         
         two_hours_ago = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
@@ -10871,7 +10909,7 @@ def api_telegram_trading():
         import sqlite3
         from datetime import datetime, timedelta
         
-        conn = sqlite3.connect('telegram_signals.db')
+        conn = get_connection('telegram_signals.db', readonly=True)
         cursor = conn.cursor()
         
         two_hours_ago = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
@@ -10911,7 +10949,7 @@ def api_telegram_stats():
         import sqlite3
         from datetime import datetime, timedelta
         
-        conn = sqlite3.connect('telegram_signals.db')
+        conn = get_connection('telegram_signals.db', readonly=True)
         cursor = conn.cursor()
         
         # 总发送数
@@ -11559,7 +11597,7 @@ def gdrive_latest_data():
         from datetime import datetime
         
         db_path = '/home/user/webapp/databases/crypto_data.db'
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新数据
@@ -12034,25 +12072,29 @@ def api_sar_slope_history(symbol):
         
         if jsonl_file.exists():
             results = []
-            with open(jsonl_file, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        try:
-                            record = json.loads(line)
-                            if record.get('timestamp', 0) >= start_time:
-                                results.append({
-                                    'timestamp': record.get('timestamp'),
-                                    'datetime': record.get('beijing_time'),
-                                    'sar_value': record.get('sar'),
-                                    'sar_position': record.get('position'),
-                                    'sar_quadrant': record.get('quadrant'),
-                                    'position_duration': record.get('duration_minutes'),
-                                    'slope_value': record.get('slope_value'),
-                                    'slope_direction': record.get('slope_direction'),
-                                    'price': record.get('close')
-                                })
-                        except:
-                            continue
+            for record in jsonl_cache.read(jsonl_file):
+                if record.get('timestamp', 0) >= start_time:
+                    results.append({
+                        'timestamp': record.get('timestamp'),
+                        'datetime': record.get('beijing_time'),
+                        'sar_value': record.get('sar'),
+                        'sar_position': record.get('position'),
+                        'sar_quadrant': record.get('quadrant'),
+                        'position_duration': record.get('duration_minutes'),
+                        'slope_value': record.get('slope_value'),
+                        'slope_direction': record.get('slope_direction'),
+                        'price': record.get('close')
+                    })
+            
+            # 可选：按记录的SAR序列计算任意窗口的回归斜率和R²（整段一次向量化计算）
+            window = request.args.get('window', type=int)
+            if window and window >= 2:
+                results.sort(key=lambda x: x['timestamp'])
+                sar_series = [r['sar_value'] if r['sar_value'] is not None else float('nan') for r in results]
+                slopes, _, r2 = rolling_regression(sar_series, window)
+                for r, slope, fit in zip(results, slopes.tolist(), r2.tolist()):
+                    r['regression_slope'] = None if slope != slope else round(slope, 6)
+                    r['regression_r2'] = None if fit != fit else round(fit, 4)
             
             # 按时间戳降序排序并限制数量
             results.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -12069,7 +12111,7 @@ def api_sar_slope_history(symbol):
         
         # 如果JSONL不存在，尝试数据库（向后兼容）
         try:
-            conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+            conn = get_connection(CRYPTO_DATA_DB, readonly=True)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -12133,6 +12175,74 @@ def api_sar_slope_history(symbol):
             'traceback': traceback.format_exc()
         }), 500
 
+@app.route('/api/sar-slope/regression-history')
+def api_sar_slope_regression_history():
+    """
+    所有币种的SAR回归斜率历史（币种×时间矩阵一次计算）
+    
+    参数:
+    - window: 回归窗口（记录数，默认5）
+    - hours: 时间范围（小时，默认24）
+    - symbols: 币种（逗号分隔，可选，默认全部）
+    """
+    try:
+        import glob
+        
+        window = max(2, request.args.get('window', 5, type=int))
+        hours = request.args.get('hours', 24, type=float)
+        symbol_filter = request.args.get('symbols', '')
+        wanted = {s.strip().upper() for s in symbol_filter.split(',') if s.strip()}
+        
+        start_time = int((datetime.now() - timedelta(hours=hours)).timestamp() * 1000)
+        sar_jsonl_dir = '/home/user/webapp/data/sar_jsonl'
+        
+        # 各币种的 {时间戳: SAR}
+        series = {}
+        for jsonl_file in sorted(glob.glob(os.path.join(sar_jsonl_dir, '*.jsonl'))):
+            symbol = os.path.basename(jsonl_file).replace('.jsonl', '')
+            if wanted and symbol not in wanted:
+                continue
+            points = {}
+            for record in jsonl_cache.read(jsonl_file):
+                ts = record.get('timestamp', 0)
+                if ts >= start_time and record.get('sar') is not None:
+                    points[ts] = record['sar']
+            if points:
+                series[symbol] = points
+        
+        if not series:
+            return jsonify({'success': False, 'error': 'No data found'})
+        
+        # 对齐到同一时间轴，缺失的时间点为 NaN（跨越缺失点的窗口结果为空）
+        timestamps = sorted({ts for points in series.values() for ts in points})
+        column = {ts: i for i, ts in enumerate(timestamps)}
+        symbols = list(series)
+        matrix = np.full((len(symbols), len(timestamps)), np.nan)
+        for row, symbol in enumerate(symbols):
+            for ts, sar in series[symbol].items():
+                matrix[row, column[ts]] = sar
+        
+        slopes, _, r2 = rolling_regression(matrix, window)
+        slopes = np.where(np.isnan(slopes), None, np.round(slopes, 6)).tolist()
+        r2 = np.where(np.isnan(r2), None, np.round(r2, 4)).tolist()
+        
+        return jsonify({
+            'success': True,
+            'window': window,
+            'hours': hours,
+            'timestamps': timestamps,
+            'data': {symbol: {'slope': slopes[row], 'r2': r2[row]} for row, symbol in enumerate(symbols)},
+            'count': len(symbols)
+        })
+    
+    except Exception as e:
+        import traceback
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
 @app.route('/api/sar-slope/position-changes/<symbol>')
 def api_sar_slope_position_changes(symbol):
     """获取指定币种的SAR位置变化历史"""
@@ -12140,7 +12250,7 @@ def api_sar_slope_position_changes(symbol):
         days = int(request.args.get('days', 7))
         start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 查找位置变化点
@@ -12205,7 +12315,7 @@ def api_sar_slope_position_changes(symbol):
 def api_sar_slope_collector_status():
     """获取SAR斜率采集器状态"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/crypto_data.db')
+        conn = get_connection(CRYPTO_DATA_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新数据时间
@@ -12352,7 +12462,7 @@ def telegram_config_api():
 def fund_monitor_latest():
     """获取最新的资金监控数据(所有币种,所有时间周期)"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取每个币种、每个时间周期的最新数据
@@ -12413,7 +12523,7 @@ def fund_monitor_history(symbol):
         interval_type = request.args.get('interval', '15min')  # 默认15分钟
         hours = int(request.args.get('hours', 24))  # 默认24小时
         
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 计算时间范围
@@ -12464,7 +12574,7 @@ def fund_monitor_history(symbol):
 def fund_monitor_abnormal():
     """获取当前所有异常数据"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取最新异常数据
@@ -12596,7 +12706,7 @@ def fund_monitor_abnormal_history():
         deviation_type = request.args.get('type')  # surge或drop
         limit = int(request.args.get('limit', 100))  # 返回记录数
         
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 构建查询条件
@@ -12693,7 +12803,7 @@ def fund_monitor_abnormal_history():
 def fund_monitor_abnormal_dates():
     """获取有异常数据的日期列表"""
     try:
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 查询所有有异常数据的日期及其统计
@@ -12745,7 +12855,7 @@ def fund_monitor_abnormal_timeline():
                 'error': '请提供date参数'
             }), 400
         
-        conn = sqlite3.connect('/home/user/webapp/databases/fund_monitor.db')
+        conn = get_connection(FUND_MONITOR_DB, readonly=True)
         cursor = conn.cursor()
         
         # 查询指定日期的所有异常数据
@@ -12862,24 +12972,12 @@ def sar_slope_status():
             symbol = os.path.basename(jsonl_file).replace('.jsonl', '')
             
             try:
-                # 先获取文件总行数
-                total_lines = 0
-                with open(jsonl_file, 'r', encoding='utf-8') as f:
-                    total_lines = sum(1 for line in f if line.strip())
+                # 文件总记录数和最新记录（进程内缓存，只解析新增部分）
+                records = jsonl_cache.read(jsonl_file)
+                total_lines = len(records)
                 
-                # 读取文件最后一行(最新记录)
-                with open(jsonl_file, 'rb') as f:
-                    # 从文件末尾读取
-                    try:
-                        f.seek(-2, os.SEEK_END)
-                        while f.read(1) != b'\n':
-                            f.seek(-2, os.SEEK_CUR)
-                    except OSError:
-                        f.seek(0)
-                    last_line = f.readline().decode('utf-8')
-                
-                if last_line.strip():
-                    record = json.loads(last_line)
+                if records:
+                    record = records[-1]
                     
                     # 从record中提取需要的字段(新采集器的字段名)
                     status_dict[symbol] = {
@@ -12962,7 +13060,7 @@ def sar_slope_symbol_data(symbol):
     try:
         limit = request.args.get('limit', 500, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         # 获取原始SAR数据
@@ -13096,7 +13194,7 @@ def sar_slope_alerts():
         limit = request.args.get('limit', 50, type=int)
         symbol = request.args.get('symbol', None)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         if symbol:
@@ -13238,7 +13336,7 @@ def sar_slope_conversions():
         limit = request.args.get('limit', 50, type=int)
         symbol = request.args.get('symbol', None)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         if symbol:
@@ -13309,7 +13407,7 @@ def sar_slope_query_symbol(symbol):
         include_conversions = request.args.get('include_conversions', 'true').lower() == 'true'
         include_averages = request.args.get('include_averages', 'true').lower() == 'true'
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         result = {
@@ -13585,7 +13683,7 @@ def sar_slope_sequence_compare(symbol):
         position_filter = request.args.get('position', None)
         sequence_filter = request.args.get('sequence', None, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         result = {
@@ -13717,7 +13815,7 @@ def sar_slope_duration_signal(symbol):
         position_filter = request.args.get('position', None)
         duration_filter = request.args.get('duration', None, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         result = {
@@ -13894,7 +13992,7 @@ def sar_slope_transition_analysis(symbol):
     try:
         position_filter = request.args.get('position', None)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/sar_slope_data.db', timeout=10.0)
+        conn = get_connection(SAR_SLOPE_DB, readonly=True)
         cursor = conn.cursor()
         
         result = {
@@ -14170,18 +14268,7 @@ def sar_slope_bias_ratios_batch():
                 # 根据采集频率(2-6分钟),24条 = 48-144分钟
                 num_records = 24
                 
-                with open(symbol_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    recent_lines = lines[-num_records:] if len(lines) > num_records else lines
-                
-                records = []
-                for line in recent_lines:
-                    if line.strip():
-                        try:
-                            data = json.loads(line)
-                            records.append(data)
-                        except json.JSONDecodeError:
-                            continue
+                records = read_last_records(symbol_file, num_records)
                 
                 if not records or len(records) < 2:
                     results[symbol_short] = {
@@ -14364,28 +14451,22 @@ def sar_slope_bias_trend():
                 continue
             
             try:
-                with open(jsonl_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
+                for record in jsonl_cache.read(jsonl_file):
+                    try:
+                        beijing_time_str = record.get('beijing_time', '')
+                        if not beijing_time_str:
                             continue
                         
-                        try:
-                            record = json.loads(line)
-                            beijing_time_str = record.get('beijing_time', '')
-                            if not beijing_time_str:
-                                continue
-                            
-                            # 解析时间
-                            record_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
-                            record_time = beijing_tz.localize(record_time)
-                            
-                            # 检查是否在目标日期范围内
-                            if start_time <= record_time <= end_time:
-                                position = record.get('position', 'unknown')
-                                time_positions[beijing_time_str][symbol] = position
-                        except Exception as e:
-                            continue
+                        # 解析时间
+                        record_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
+                        record_time = beijing_tz.localize(record_time)
+                        
+                        # 检查是否在目标日期范围内
+                        if start_time <= record_time <= end_time:
+                            position = record.get('position', 'unknown')
+                            time_positions[beijing_time_str][symbol] = position
+                    except Exception as e:
+                        continue
             except Exception as e:
                 print(f"[SAR Bias Trend] 读取 {symbol} 失败: {e}")
                 continue
@@ -14648,6 +14729,7 @@ def cache_stats():
     return jsonify({
         'success': True,
         'cache_stats': stats,
+        'jsonl_cache_stats': jsonl_cache.get_stats(),
         'message': '服务器端缓存统计信息'
     })
 
@@ -14657,6 +14739,8 @@ def cache_clear():
     try:
         key = request.json.get('key') if request.json else None
         server_cache.clear(key)
+        if not key:
+            jsonl_cache.clear()
         return jsonify({
             'success': True,
             'message': f'缓存已清除{"(键: " + key + ")" if key else "(全部)"}'
@@ -14667,6 +14751,16 @@ def cache_clear():
             'error': str(e)
         })
 
+@app.route('/api/db/stats')
+def db_stats():
+    """获取数据库连接池和SQL耗时统计"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'success': True,
+        'db_stats': get_db_stats(limit),
+        'message': '数据库连接池统计信息'
+    })
+
 # ========== 锚点系统(OKEx持仓监控) ==========
 
 @app.route('/warning-test')
@@ -14895,7 +14989,7 @@ def get_anchor_monitors():
         limit = request.args.get('limit', 100, type=int)
         db_path = '/home/user/webapp/databases/anchor_system.db'
         
-        conn = sqlite3.connect(db_path, timeout=10.0)
+        conn = get_connection(db_path, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -14946,7 +15040,7 @@ def get_anchor_alerts():
         limit = request.args.get('limit', 50, type=int)
         db_path = '/home/user/webapp/databases/anchor_system.db'
         
-        conn = sqlite3.connect(db_path, timeout=10.0)
+        conn = get_connection(db_path, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -15809,16 +15903,14 @@ def get_favorite_symbols():
                     'updated_at': datetime.utcnow().isoformat() + 'Z'
                 }, f)
         
-        # 读取最后一行
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-            if lines:
-                data = json.loads(lines[-1].strip())
-                return jsonify({
-                    'success': True,
-                    'symbols': data.get('symbols', []),
-                    'updated_at': data.get('updated_at', '')
-                })
+        # 读取最后一条配置
+        data = jsonl_cache.read_last(file_path)
+        if data:
+            return jsonify({
+                'success': True,
+                'symbols': data.get('symbols', []),
+                'updated_at': data.get('updated_at', '')
+            })
         
         return jsonify({
             'success': True,
@@ -19185,7 +19277,7 @@ def get_anchor_status():
         
         # 获取最新监控记录
         db_path = '/home/user/webapp/databases/anchor_system.db'
-        conn = sqlite3.connect(db_path, timeout=10.0)
+        conn = get_connection(db_path, readonly=True)
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM anchor_monitors')
@@ -19517,7 +19609,7 @@ def get_correction_log():
         limit = int(request.args.get('limit', 20))
         
         db_path = '/home/user/webapp/databases/anchor_system.db'
-        conn = sqlite3.connect(db_path, timeout=10.0)
+        conn = get_connection(db_path, readonly=True)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -19573,7 +19665,7 @@ def get_current_positions():
         
         # 连接数据库,获取维护后的开仓价格
         DB_PATH = '/home/user/webapp/databases/trading_decision.db'
-        conn = sqlite3.connect(DB_PATH, timeout=10.0)
+        conn = get_connection(DB_PATH, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -19833,7 +19925,7 @@ def anchor_maintenance_logs_api():
     try:
         limit = request.args.get('limit', 10, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/trading_decision.db', timeout=10.0)
+        conn = get_connection(TRADING_DECISION_DB, readonly=True)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -19904,7 +19996,7 @@ def trading_config_api():
             new_config = request.json
             
             # 更新数据库中的配置
-            conn = sqlite3.connect('/home/user/webapp/databases/trading_decision.db', timeout=10.0)
+            conn = get_connection(TRADING_DECISION_DB)
             cursor = conn.cursor()
             cursor.execute('''
             UPDATE market_config SET
@@ -19943,7 +20035,7 @@ def trading_decisions_api():
     try:
         limit = request.args.get('limit', 50, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/trading_decision.db', timeout=10.0)
+        conn = get_connection(TRADING_DECISION_DB, readonly=True)
         cursor = conn.cursor()
         cursor.execute(f'''
         SELECT id, inst_id, pos_side, action, decision_type, current_size,
@@ -19986,7 +20078,7 @@ def trading_signals_api():
     try:
         limit = request.args.get('limit', 50, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/trading_decision.db', timeout=10.0)
+        conn = get_connection(TRADING_DECISION_DB, readonly=True)
         cursor = conn.cursor()
         cursor.execute(f'''
         SELECT id, inst_id, signal_type, action, price, size,
@@ -20023,7 +20115,7 @@ def trading_maintenance_api():
     try:
         limit = request.args.get('limit', 50, type=int)
         
-        conn = sqlite3.connect('/home/user/webapp/databases/trading_decision.db', timeout=10.0)
+        conn = get_connection(TRADING_DECISION_DB, readonly=True)
         cursor = conn.cursor()
         cursor.execute(f'''
         SELECT id, inst_id, pos_side, original_size, original_price,
@@ -20102,7 +20194,7 @@ def get_anchor_warnings():
         trade_mode = request.args.get('trade_mode', 'paper')
         
         DB_PATH = '/home/user/webapp/databases/trading_decision.db'
-        conn = sqlite3.connect(DB_PATH, timeout=10.0)
+        conn = get_connection(DB_PATH, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -20301,7 +20393,7 @@ def get_trading_positions_opens():
         trade_mode = request.args.get('trade_mode', 'paper')
         
         DB_PATH = '/home/user/webapp/databases/trading_decision.db'
-        conn = sqlite3.connect(DB_PATH, timeout=10.0)
+        conn = get_connection(DB_PATH, readonly=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -20637,11 +20729,8 @@ def get_anchor_profit_history():
 def get_anchor_profit_dates():
     """获取可用的日期列表"""
     try:
-        import sys
-        sys.path.insert(0, '/home/user/webapp/source_code')
-        from anchor_daily_reader import AnchorDailyReader
-        
-        reader = AnchorDailyReader()
+        # 使用全局reader(带缓存)
+        reader = get_anchor_reader()
         dates = reader.get_available_dates()
         
         return jsonify({
@@ -20765,7 +20854,7 @@ def api_extreme_market_alerts_latest():
     """获取最新的极端市场预警记录"""
     try:
         db_path = '/home/user/webapp/databases/crypto_data.db'
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path, readonly=True)
         cursor = conn.cursor()
         
         limit = request.args.get('limit', 50, type=int)
@@ -20809,7 +20898,7 @@ def api_extreme_market_alerts_stats():
     """获取极端市场预警统计"""
     try:
         db_path = '/home/user/webapp/databases/crypto_data.db'
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path, readonly=True)
         cursor = conn.cursor()
         
         # 统计总数
@@ -21349,11 +21438,11 @@ def batch_order_from_event():
         favorite_file = 'data/favorite_symbols.jsonl'
         favorite_symbols = []
         try:
-            with open(favorite_file, 'r') as f:
-                lines = f.readlines()
-                if lines:
-                    favorite_data = json.loads(lines[-1].strip())
-                    favorite_symbols = favorite_data.get('symbols', [])
+            favorite_data = jsonl_cache.read_last(favorite_file)
+            if favorite_data is None and not os.path.exists(favorite_file):
+                raise FileNotFoundError(favorite_file)
+            if favorite_data:
+                favorite_symbols = favorite_data.get('symbols', [])
         except:
             favorite_symbols = ["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP", 
                               "BNB-USDT-SWAP", "XRP-USDT-SWAP", "DOGE-USDT-SWAP"]
@@ -22110,27 +22199,25 @@ def get_coin_change_latest():
                 'error': f'今天的数据文件不存在: {date_str}'
             })
         
-        # 读取最后一条币价记录
-        with open(data_file, 'r') as f:
-            lines = f.readlines()
-            if not lines:
-                return jsonify({
-                    'success': False,
-                    'error': '数据文件为空'
-                })
-            latest = json.loads(lines[-1].strip())
+        # 读取最后一条币价记录（复制一份，缓存中的记录不能修改）
+        latest = jsonl_cache.read_last(data_file)
+        if latest is None:
+            return jsonify({
+                'success': False,
+                'error': '数据文件为空'
+            })
+        latest = dict(latest)
         
         # 读取RSI数据
         rsi_file = data_dir / f'rsi_{date_str}.jsonl'
-        if rsi_file.exists():
-            with open(rsi_file, 'r') as f:
-                rsi_lines = f.readlines()
-                if rsi_lines:
-                    rsi_data = json.loads(rsi_lines[-1].strip())
-                    # 合并RSI数据到币价数据
-                    latest['total_rsi'] = rsi_data.get('total_rsi', 0)
-                    latest['rsi_values'] = rsi_data.get('rsi_values', {})
-                    latest['rsi_timestamp'] = rsi_data.get('beijing_time', '')
+        rsi_data = jsonl_cache.read_last(rsi_file)
+        if rsi_data:
+            # 合并RSI数据到币价数据
+            latest['total_rsi'] = rsi_data.get('total_rsi', 0)
+            latest['rsi_values'] = rsi_data.get('rsi_values', {})
+            latest['rsi_timestamp'] = rsi_data.get('beijing_time', '')
+            # RSI对应的5分钟K线（收盘后增量更新，同一根K线内数值不变）
+            latest['rsi_bar_timestamp'] = rsi_data.get('bar_timestamp')
         
         response = jsonify({
             'success': True,
@@ -22181,23 +22268,22 @@ def get_coin_change_history():
             else:
                 file_date_str = date_str
         
+        from coin_change_columnar import columnar_path, day_exists, load_day_records
+        
         # 读取数据文件
         data_file = data_dir / f'coin_change_{file_date_str}.jsonl'
         
-        if not data_file.exists():
+        if not day_exists(file_date_str, data_dir):
             return jsonify({
                 'success': False,
                 'error': f'数据文件不存在: {file_date_str}'
             })
         
-        # 读取数据
-        records = []
-        with open(data_file, 'r') as f:
-            lines = f.readlines()
-            # 取最后limit条
-            for line in lines[-limit:]:
-                if line.strip():
-                    records.append(json.loads(line.strip()))
+        # 读取数据（取最后limit条）：已结束的日期读取列式冷存储，当天读取追加中的JSONL
+        if columnar_path(file_date_str, data_dir).exists():
+            records = load_day_records(file_date_str, data_dir)[-limit:]
+        else:
+            records = jsonl_cache.read(data_file)[-limit:]
         
         response = jsonify({
             'success': True,
@@ -22386,14 +22472,8 @@ def get_rsi_history():
                 'error': f'RSI数据文件不存在: {file_date_str}'
             })
         
-        # 读取数据
-        records = []
-        with open(rsi_file, 'r') as f:
-            lines = f.readlines()
-            # 取最后limit条
-            for line in lines[-limit:]:
-                if line.strip():
-                    records.append(json.loads(line.strip()))
+        # 读取数据（取最后limit条）
+        records = jsonl_cache.read(rsi_file)[-limit:]
         
         response = jsonify({
             'success': True,
@@ -22425,6 +22505,7 @@ def get_wave_peaks():
         import sys
         sys.path.insert(0, '/home/user/webapp/source_code')
         from wave_peak_detector import WavePeakDetector
+        from coin_change_columnar import day_exists
         
         # 获取参数
         date_str = request.args.get('date')  # YYYY-MM-DD 或 YYYYMMDD
@@ -22447,19 +22528,16 @@ def get_wave_peaks():
             else:
                 file_date_str = date_str
         
-        # 读取数据并检测波峰
-        data_file = data_dir / f'coin_change_{file_date_str}.jsonl'
-        
-        if not data_file.exists():
+        # 检查数据是否存在（JSONL或列式冷存储）
+        if not day_exists(file_date_str, data_dir):
             return jsonify({
                 'success': False,
                 'error': f'数据文件不存在: {file_date_str}'
             })
         
-        # 创建检测器并分析
+        # 增量检测状态：采集器每轮写入检查点，这里只补齐检查点之后的新数据点
         detector = WavePeakDetector()
-        data_records = detector.load_data(str(data_file))
-        peaks, current_state = detector.detect_wave_peaks(data_records)
+        peaks, current_state = detector.snapshot_day(file_date_str)
         false_breakout = detector.detect_false_breakout(peaks)
         crash_warning = detector.detect_crash_warning(peaks)  # 添加暴跌预警检测
         
@@ -23331,7 +23409,7 @@ def api_signal_timeline_data():
         # 第一步：从数据库读取历史数据
         try:
             db_path = '/home/user/webapp/price_position_v2/config/data/db/price_position.db'
-            conn = sqlite3.connect(db_path)
+            conn = get_connection(db_path, readonly=True)
             cursor = conn.cursor()
             
             # 查询时间范围
@@ -24321,11 +24399,16 @@ def api_price_speed_10m_data():
                 if line:
                     data.append(json.loads(line))
         
+        # 当天累计统计直接读取采集器维护的计数
+        counters = price_speed_counters.get_day(date_file_str, data[-1]['time'] if data else None)
+        
         return jsonify({
             'success': True,
             'date': date_str,
             'count': len(data),
             'data': data,
+            'daily_total_statistics': counters['statistics'],
+            'daily_counts': counters['coins'],
             'file_path': str(file_path)
         })
         
@@ -24374,21 +24457,8 @@ def api_price_speed_10m_latest():
                 'file_path': str(file_path)
             }), 404
         
-        # 读取所有记录，计算当天累计统计
-        latest_data = None
-        daily_total_stats = { '+4%': 0, '+1%': 0, '0%': 0, '-1%': 0, '-3%': 0 }
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    data = json.loads(line)
-                    latest_data = data  # 保留最后一条作为最新数据
-                    
-                    # 累加当天所有采集的统计数据
-                    stats = data.get('statistics', {})
-                    for key in daily_total_stats:
-                        daily_total_stats[key] += stats.get(key, 0)
+        # 只读取最后一条记录，当天累计统计直接读取采集器维护的计数（不再逐行累加整天的数据）
+        latest_data = read_last_record(file_path)
         
         if not latest_data:
             return jsonify({
@@ -24396,11 +24466,13 @@ def api_price_speed_10m_latest():
                 'error': 'No data found in file'
             }), 404
         
+        counters = price_speed_counters.get_day(date_file_str, latest_data['time'])
+        
         # 返回最新数据 + 当天累计统计
         return jsonify({
             'success': True,
             **latest_data,
-            'daily_total_statistics': daily_total_stats  # 新增：当天累计统计
+            'daily_total_statistics': counters['statistics']  # 新增：当天累计统计
         })
         
     except Exception as e:
@@ -24802,17 +24874,8 @@ def get_sar_current_sequence():
             if not os.path.exists(jsonl_file):
                 continue
             
-            # 读取最后100行(足够找到转换点)
-            with open(jsonl_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                records = []
-                for line in lines[-100:]:
-                    if line.strip():
-                        try:
-                            data = json.loads(line)
-                            records.append(data)
-                        except:
-                            continue
+            # 读取最后100条(足够找到转换点)
+            records = jsonl_cache.read(jsonl_file)[-100:]
             
             if not records:
                 continue
@@ -20802,23 +20802,17 @@ def get_coin_change_history():
             else:
                 file_date_str = date_str
         
-        # 读取数据文件
-        data_file = data_dir / f'coin_change_{file_date_str}.jsonl'
+        from coin_change_columnar import day_exists, load_day_records
         
-        if not data_file.exists():
+        # 已结束的日期压缩为列式文件后不再保留JSONL，统一通过 load_day_records 读取
+        if not day_exists(file_date_str, data_dir):
             return jsonify({
                 'success': False,
                 'error': f'数据文件不存在: {file_date_str}'
             })
         
-        # 读取数据
-        records = []
-        with open(data_file, 'r') as f:
-            lines = f.readlines()
-            # 取最后limit条
-            for line in lines[-limit:]:
-                if line.strip():
-                    records.append(json.loads(line.strip()))
+        # 读取数据（取最后limit条）
+        records = load_day_records(file_date_str, data_dir)[-limit:]
         
         return jsonify({
             'success': True,
@@ -7,10 +7,14 @@ OKX趋势角度分析器 V3 - 增强版
 
 import json
 import os
+import sys
 import math
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+sys.path.insert(0, '/home/user/webapp/source_code')
+from coin_change_columnar import day_exists, load_day_records
+
 # 使用绝对路径指向 /home/user/webapp/data
 BASE_DIR = '/home/user/webapp'
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -31,27 +35,25 @@ MIN_VALLEY_TIME_GAP = 2  # C点与A点的最小时间间隔（分钟）
 def load_trend_data(date_str):
     file_path = os.path.join(COIN_TRACKER_DIR, f'coin_change_{date_str}.jsonl')
     
-    if not os.path.exists(file_path):
+    # 已结束的日期压缩为列式文件后不再保留JSONL，统一通过 load_day_records 读取
+    if not day_exists(date_str, COIN_TRACKER_DIR):
         print(f"⚠️ 文件不存在: {file_path}")
         return []
     
     data_points = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                try:
-                    item = json.loads(line)
-                    # 从beijing_time提取时间部分（HH:MM:SS）
-                    beijing_time = item.get('beijing_time', '')
-                    time_part = beijing_time.split(' ')[1] if ' ' in beijing_time else '00:00:00'
-                    
-                    data_points.append({
-                        'time': time_part,  # 使用从beijing_time提取的时间
-                        'cumulative_pct': float(item.get('total_change', 0)),
-                        'timestamp': item.get('timestamp', '')
-                    })
-                except Exception as e:
-                    continue
+    for item in load_day_records(date_str, COIN_TRACKER_DIR):
+        try:
+            # 从beijing_time提取时间部分（HH:MM:SS）
+            beijing_time = item.get('beijing_time', '')
+            time_part = beijing_time.split(' ')[1] if ' ' in beijing_time else '00:00:00'
+            
+            data_points.append({
+                'time': time_part,  # 使用从beijing_time提取的时间
+                'cumulative_pct': float(item.get('total_change', 0)),
+                'timestamp': item.get('timestamp', '')
+            })
+        except Exception as e:
+            continue
     
     data_points.sort(key=lambda x: x['time'])
     return data_points
@@ -418,8 +420,6 @@ def analyze_date(date_str):
     return output_file
 
 if __name__ == '__main__':
-    import sys
-    
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     if len(sys.argv) > 1:
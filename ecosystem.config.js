@@ -25,6 +25,37 @@ module.exports = {
       log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
     },
     
+    // Market Data Bus - K线共享发布进程（采集器订阅后不再各自请求相同的K线）
+    {
+      name: 'market-data-bus',
+      script: 'source_code/market_data_bus.py',
+      interpreter: 'python3',
+      cwd: '/home/user/webapp',
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '300M',
+      error_file: '/home/user/webapp/logs/market-data-bus-error.log',
+      out_file: '/home/user/webapp/logs/market-data-bus-out.log',
+      log_date_format: 'YYYY-MM-DD HH:mm:ss'
+    },
+    
+    // Collector Host - 单进程调度的采集器（见 source_code/collector_host.py 中的 COLLECTORS）
+    {
+      name: 'collector-host',
+      script: 'source_code/collector_host.py',
+      interpreter: 'python3',
+      cwd: '/home/user/webapp',
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '1G',
+      env: {
+        PYTHONPATH: '/home/user/webapp/source_code'
+      },
+      error_file: '/home/user/webapp/logs/collector-host-error.log',
+      out_file: '/home/user/webapp/logs/collector-host-out.log',
+      log_date_format: 'YYYY-MM-DD HH:mm:ss'
+    },
+    
     // Core Data Collectors
     {
       name: 'signal-collector',
@@ -81,17 +112,6 @@ module.exports = {
       error_file: '/home/user/webapp/logs/price-speed-error.log',
       out_file: '/home/user/webapp/logs/price-speed-out.log'
     },
-    {
-      name: 'sar-slope-collector',
-      script: 'source_code/sar_slope_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/sar-slope-error.log',
-      out_file: '/home/user/webapp/logs/sar-slope-out.log'
-    },
     {
       name: 'price-comparison-collector',
       script: 'source_code/price_comparison_collector.py',
@@ -136,39 +156,6 @@ module.exports = {
       error_file: '/home/user/webapp/logs/price-baseline-error.log',
       out_file: '/home/user/webapp/logs/price-baseline-out.log'
     },
-    {
-      name: 'sar-bias-stats-collector',
-      script: 'source_code/sar_bias_stats_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/sar-bias-stats-error.log',
-      out_file: '/home/user/webapp/logs/sar-bias-stats-out.log'
-    },
-    {
-      name: 'panic-wash-collector',
-      script: 'source_code/panic_wash_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/panic-wash-error.log',
-      out_file: '/home/user/webapp/logs/panic-wash-out.log'
-    },
-    {
-      name: 'coin-change-tracker',
-      script: 'source_code/coin_change_tracker_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/coin-change-tracker-error.log',
-      out_file: '/home/user/webapp/logs/coin-change-tracker-out.log'
-    },
     
     // Monitoring & Management
     {
@@ -243,74 +230,6 @@ module.exports = {
       error_file: '/home/user/webapp/logs/okx-tpsl-monitor-error.log',
       out_file: '/home/user/webapp/logs/okx-tpsl-monitor-out.log'
     },
-    {
-      name: 'okx-trade-history',
-      script: 'source_code/okx_trade_history_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/okx-trade-history-error.log',
-      out_file: '/home/user/webapp/logs/okx-trade-history-out.log'
-    },
-    
-    // Market Analysis Systems
-    {
-      name: 'market-sentiment-collector',
-      script: 'source_code/market_sentiment_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/market-sentiment-error.log',
-      out_file: '/home/user/webapp/logs/market-sentiment-out.log'
-    },
-    {
-      name: 'price-position-collector',
-      script: 'source_code/price_position_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/price-position-error.log',
-      out_file: '/home/user/webapp/logs/price-position-out.log'
-    },
-    {
-      name: 'rsi-takeprofit-monitor',
-      script: 'source_code/rsi_takeprofit_monitor.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/rsi-takeprofit-error.log',
-      out_file: '/home/user/webapp/logs/rsi-takeprofit-out.log'
-    },
-    {
-      name: 'new-high-low-collector',
-      script: 'source_code/new_high_low_collector.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '500M',
-      error_file: '/home/user/webapp/logs/new-high-low-error.log',
-      out_file: '/home/user/webapp/logs/new-high-low-out.log'
-    },
-    {
-      name: 'signal-stats-generator',
-      script: 'source_code/signal_stats_generator.py',
-      interpreter: 'python3',
-      cwd: '/home/user/webapp',
-      autorestart: true,
-      watch: false,
-      max_memory_restart: '300M',
-      error_file: '/home/user/webapp/logs/signal-stats-error.log',
-      out_file: '/home/user/webapp/logs/signal-stats-out.log'
-    },
     
     // Bottom Signal Long Monitor - 见底信号做多监控器
     {
@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 """
 Anchor Daily Reader - 读取每日锚点数据
+
+数据文件为 anchor_data_YYYY-MM-DD.jsonl.gz（按UTC日期分文件），经 gzip_frame_archive 转换后
+按时间窗口只解压重叠的帧，解压结果缓存在读取器的LRU帧缓存中。
+按日期查询（/api/anchor-profit/by-date、/summary）的日期与文件一致，为UTC日期。
 """
-import os
-import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import pytz
+
+from gzip_frame_archive import FrameCache, read_range
+from jsonl_time_index import to_epoch
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
 
 class AnchorDailyReader:
     """锚点每日数据读取器"""
@@ -14,7 +23,117 @@ class AnchorDailyReader:
     def __init__(self, data_dir='/home/user/webapp/data/anchor_daily'):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self._cache = {}
+        self._cache = FrameCache(max_frames=256)
+    
+    def get_range(self, start=None, end=None, symbol=None, data_type=None):
+        """
+        获取时间窗口内的锚点数据（只解压与窗口重叠的帧）
+        
+        Args:
+            start: 起始时间（'YYYY-MM-DD HH:MM:SS' 北京时间或时间戳，None表示不限）
+            end: 结束时间（同上，None表示当前）
+            symbol: 交易对符号（可选，匹配 symbol 或 inst_id）
+            data_type: 数据类型（可选，匹配 _data_type，如 monitors / alerts）
+            
+        Returns:
+            list: 按时间顺序排列的锚点数据
+        """
+        start_ts = to_epoch(start)
+        end_ts = to_epoch(end) if end is not None else datetime.now(BEIJING_TZ).timestamp()
+        # 文件按UTC日期切分：选出与窗口重叠的所有UTC日
+        start_day = datetime.fromtimestamp(start_ts, timezone.utc).date() if start_ts is not None else None
+        end_day = datetime.fromtimestamp(end_ts, timezone.utc).date()
+        
+        all_data = []
+        for day_file in sorted(self.data_dir.glob('anchor_data_*.jsonl.gz')):
+            day = datetime.strptime(day_file.name[len('anchor_data_'):-len('.jsonl.gz')], '%Y-%m-%d').date()
+            if (start_day is not None and day < start_day) or day > end_day:
+                continue
+            records = read_range(day_file, start_ts, end_ts, time_key='timestamp', cache=self._cache)
+            all_data.extend(self._filter(records, symbol, data_type))
+        
+        return all_data
+    
+    @staticmethod
+    def _filter(records, symbol=None, data_type=None):
+        for data in records:
+            if symbol is not None and symbol not in (data.get('symbol'), data.get('inst_id')):
+                continue
+            if data_type is not None and data.get('_data_type') != data_type:
+                continue
+            yield data
+    
+    def get_available_dates(self):
+        """
+        获取有数据文件的日期列表
+        
+        Returns:
+            list: 日期（YYYY-MM-DD），最新的在前
+        """
+        return sorted((f.name[len('anchor_data_'):-len('.jsonl.gz')]
+                       for f in self.data_dir.glob('anchor_data_*.jsonl.gz')), reverse=True)
+    
+    def get_date_data(self, date, data_type=None):
+        """
+        获取某天（UTC日期，与数据文件的切分一致）的锚点数据
+        
+        Args:
+            date: 日期（YYYY-MM-DD）
+            data_type: 数据类型（可选，如 profit_stats / monitors / alerts）
+            
+        Returns:
+            list: 该天数据文件中的锚点数据（文件顺序）
+        """
+        day_file = self.data_dir / f"anchor_data_{datetime.strptime(date, '%Y-%m-%d'):%Y-%m-%d}.jsonl.gz"
+        return list(self._filter(read_range(day_file, cache=self._cache), data_type=data_type))
+    
+    def get_date_statistics(self, date):
+        """
+        获取某天的数据统计
+        
+        Returns:
+            dict: {'date', 'total', 'by_type': {数据类型: 条数}, 'symbols', 'first_time', 'last_time'}
+        """
+        data = self.get_date_data(date)
+        by_type = {}
+        symbols = set()
+        for item in data:
+            data_type = item.get('_data_type', 'unknown')
+            by_type[data_type] = by_type.get(data_type, 0) + 1
+            symbol = item.get('symbol') or item.get('inst_id')
+            if symbol:
+                symbols.add(symbol)
+        
+        return {
+            'date': date,
+            'total': len(data),
+            'by_type': by_type,
+            'symbols': len(symbols),
+            'first_time': self._format_time(data[0]) if data else None,
+            'last_time': self._format_time(data[-1]) if data else None
+        }
+    
+    def get_profit_stats_summary(self, date):
+        """
+        获取某天盈利统计（_data_type 为 profit_stats）的摘要
+        
+        Returns:
+            dict: {'date', 'count', 'first_time', 'last_time', 'latest': 最新一条盈利统计}
+        """
+        data = self.get_date_data(date, data_type='profit_stats')
+        return {
+            'date': date,
+            'count': len(data),
+            'first_time': self._format_time(data[0]) if data else None,
+            'last_time': self._format_time(data[-1]) if data else None,
+            'latest': data[-1] if data else None
+        }
+    
+    @staticmethod
+    def _format_time(data):
+        """记录时间转换为北京时间字符串"""
+        ts = to_epoch(data.get('timestamp'))
+        return datetime.fromtimestamp(ts, BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S') if ts is not None else None
     
     def get_anchor_data(self, symbol=None, days=7):
         """
@@ -25,34 +144,15 @@ class AnchorDailyReader:
             days: 获取最近几天的数据
             
         Returns:
-            list: 锚点数据列表
+            list: 锚点数据列表（按时间倒序）
         """
         try:
-            all_data = []
-            
-            # 生成最近N天的日期
-            date_list = []
-            for i in range(days):
-                date = datetime.now() - timedelta(days=i)
-                date_list.append(date.strftime('%Y%m%d'))
-            
-            # 读取每天的数据文件
-            for date_str in date_list:
-                jsonl_file = self.data_dir / f'anchor_daily_{date_str}.jsonl'
-                
-                if jsonl_file.exists():
-                    with open(jsonl_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if line.strip():
-                                try:
-                                    data = json.loads(line)
-                                    if symbol is None or data.get('symbol') == symbol:
-                                        all_data.append(data)
-                                except json.JSONDecodeError:
-                                    continue
+            today = datetime.now(BEIJING_TZ)
+            start = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d 00:00:00')
+            all_data = self.get_range(start=start, symbol=symbol)
             
             # 按时间戳排序
-            all_data.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+            all_data.sort(key=lambda x: to_epoch(x.get('timestamp')) or 0, reverse=True)
             return all_data
             
         except Exception as e:
@@ -74,4 +174,4 @@ class AnchorDailyReader:
     
     def clear_cache(self):
         """清除缓存"""
-        self._cache = {}
+        self._cache.clear()
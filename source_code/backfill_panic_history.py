@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
 
+from okx_rate_governor import governor
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/panic_jsonl')
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -45,7 +47,9 @@ def get_okx_market_data(symbol):
     """获取OKX市场数据"""
     try:
         url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT-SWAP"
+        governor.acquire('/api/v5/market/ticker')
         response = requests.get(url, timeout=5)
+        governor.penalize_response('/api/v5/market/ticker', response)
         data = response.json()
         
         if data['code'] == '0' and data['data']:
@@ -138,7 +142,6 @@ def backfill_historical_data():
             data = get_okx_market_data(symbol)
             if data:
                 market_data[symbol] = data
-            time.sleep(0.1)
         
         # 计算恐慌指数
         if market_data:
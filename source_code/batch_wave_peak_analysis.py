@@ -14,6 +14,7 @@ from pathlib import Path
 # 添加源代码目录到路径
 sys.path.insert(0, '/home/user/webapp/source_code')
 from wave_peak_detector import WavePeakDetector
+from coin_change_columnar import day_exists
 
 def process_daily_wave_peaks(start_date='20260201', end_date='20260218'):
     """
@@ -57,7 +58,7 @@ def process_daily_wave_peaks(start_date='20260201', end_date='20260218'):
         
         total_days += 1
         
-        if not data_file.exists():
+        if not day_exists(date_str, data_dir):
             print(f"⚠️  {date_str}: 数据文件不存在，跳过")
             current_dt += timedelta(days=1)
             continue
@@ -28,6 +28,9 @@ from pathlib import Path
 # 项目根目录
 BASE_DIR = Path('/home/user/webapp')
 sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / 'source_code'))
+
+from jsonl_tail_reader import replace_first_line
 
 # 数据目录
 DATA_DIR = BASE_DIR / 'data' / 'okx_auto_strategy'
@@ -160,36 +163,23 @@ def set_allowed_execution(account_id, strategy_key, allowed, reason='', rsi_valu
     execution_file = get_execution_file_path(account_id, strategy_key)
     
     try:
-        # 读取现有记录（除了第一行）
-        existing_records = []
-        if execution_file.exists():
-            with open(execution_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                if len(lines) > 1:
-                    existing_records = lines[1:]  # 跳过第一行
+        header = {
+            'allowed': allowed,
+            'timestamp': datetime.now().isoformat(),
+            'reason': reason
+        }
         
-        # 写入新的文件头
-        with open(execution_file, 'w', encoding='utf-8') as f:
-            header = {
-                'allowed': allowed,
-                'timestamp': datetime.now().isoformat(),
-                'reason': reason
-            }
-            
-            if rsi_value is not None:
-                header['rsi_value'] = rsi_value
-            
-            if coins:
-                header['coins'] = coins
-            
-            if result:
-                header['result'] = result
-            
-            f.write(json.dumps(header, ensure_ascii=False) + '\n')
-            
-            # 写回其他记录
-            for line in existing_records:
-                f.write(line)
+        if rsi_value is not None:
+            header['rsi_value'] = rsi_value
+        
+        if coins:
+            header['coins'] = coins
+        
+        if result:
+            header['result'] = result
+        
+        # 替换文件头，其他记录流式拷贝（不整体读入内存）
+        replace_first_line(execution_file, json.dumps(header, ensure_ascii=False))
         
         log(f"✅ [{account_id}] 执行许可已更新: {strategy_key} = {allowed}")
         return True
@@ -318,17 +308,14 @@ def check_market_sentiment():
 
 
 def get_rsi_sum():
-    """获取RSI总和"""
+    """获取RSI总和（27币5分钟RSI之和，由币种涨跌追踪采集器每根5分钟K线收盘后更新）"""
     try:
-        # 这里应该调用实际的RSI API
-        # 暂时返回模拟值
-        # TODO: 实现真实的RSI API调用
-        response = requests.get(f"{API_BASE}/api/rsi/latest", timeout=10)
+        response = requests.get(f"{API_BASE}/api/coin-change-tracker/latest", timeout=10)
         response.raise_for_status()
         result = response.json()
         
-        if result.get('success'):
-            return result.get('rsi_sum', 0)
+        if result.get('success') and result.get('data'):
+            return result['data'].get('total_rsi', 0)
         return 0
     except Exception as e:
         log(f"⚠️ 获取RSI总和异常（使用默认值0）: {str(e)}")
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Candle Store - 本地K线存储（增量同步 + 缺口回补）
+
+每个交易对/周期一个定长记录的二进制文件（按时间升序、只追加），可直接内存映射读取：
+    data/candle_store/<instId>/<bar>.bin
+    记录: 时间戳(ms, int64) + 开/高/低/收/量 (float64)，共48字节
+
+同步时只请求最后一根已存K线之后的新K线；采集器停机造成的尾部缺口
+用 history-candles 向前翻页补齐，窗口不够长时向更早的历史回补。
+只保存已收盘的K线，正在形成的K线保存在内存中随读取一起返回。
+多个采集器进程共享同一份文件，同步时持有该文件的 flock。
+
+用法:
+    from candle_store import candle_store
+    klines = candle_store.get_klines('BTC', '1m', 100)          # [{timestamp, open, high, low, close, volume}, ...]
+    python candle_store.py BTC-USDT-SWAP --bar 5m --gaps        # 检查缺口
+"""
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from okx_market_client import okx_client
+
+STORE_DIR = Path('/home/user/webapp/data/candle_store')
+
+CANDLE_DTYPE = np.dtype([
+    ('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')
+])
+
+# 周期长度（毫秒）
+BAR_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1H': 3_600_000, '2H': 7_200_000, '4H': 14_400_000, '1D': 86_400_000,
+}
+# ccxt风格的周期名
+_BAR_ALIASES = {'1h': '1H', '2h': '2H', '4h': '4H', '1d': '1D'}
+
+# candles 接口单次最多300根，history-candles 单次最多100根
+CANDLES_LIMIT = 300
+HISTORY_LIMIT = 100
+# 每个文件保留的K线数，超过 1.25 倍时裁剪
+MAX_BARS = 20000
+
+
+def normalize_bar(bar):
+    """统一周期名（1h → 1H）"""
+    bar = _BAR_ALIASES.get(bar, bar)
+    if bar not in BAR_MS:
+        raise ValueError(f'不支持的周期: {bar}')
+    return bar
+
+
+def _parse(rows):
+    """
+    解析OKX K线数组
+    
+    Returns:
+        tuple: (已收盘K线数组（升序）, 正在形成的K线数组)
+    """
+    closed, forming = [], []
+    for row in rows:
+        item = (int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]))
+        # 第9列 confirm: '0' 未收盘，'1' 已收盘
+        (forming if len(row) > 8 and row[8] == '0' else closed).append(item)
+    closed = np.array(closed, dtype=CANDLE_DTYPE)
+    closed.sort(order='ts')
+    return closed, np.array(forming, dtype=CANDLE_DTYPE)
+
+
+def _merge(*arrays):
+    """合并K线数组，按时间排序并去重（后面的数组优先）"""
+    merged = np.concatenate([a for a in arrays if len(a)] or [np.empty(0, dtype=CANDLE_DTYPE)])
+    if not len(merged):
+        return merged
+    # 反转后 unique 取到的是最后出现的记录
+    _, index = np.unique(merged['ts'][::-1], return_index=True)
+    return merged[::-1][index]
+
+
+def with_forming(candles, forming, limit):
+    """在已收盘K线后接上正在形成的K线，保留最近 limit 根"""
+    if forming is None or not len(forming):
+        return candles
+    last_ts = candles['ts'][-1] if len(candles) else -1
+    return _merge(candles, forming[forming['ts'] > last_ts])[-limit:]
+
+
+def to_klines(candles):
+    """结构化数组 → [{timestamp, open, high, low, close, volume}, ...]"""
+    return [
+        {
+            'timestamp': int(c['ts']),
+            'open': float(c['open']),
+            'high': float(c['high']),
+            'low': float(c['low']),
+            'close': float(c['close']),
+            'volume': float(c['volume'])
+        }
+        for c in candles
+    ]
+
+
+class CandleStore:
+    """本地K线存储"""
+    
+    def __init__(self, root=STORE_DIR, client=okx_client, max_bars=MAX_BARS):
+        self.root = Path(root)
+        self.client = client
+        self.max_bars = max_bars
+        self._forming = {}
+        self._exhausted = set()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.stats = {'syncs': 0, 'requests': 0, 'bars_fetched': 0, 'bars_appended': 0, 'rewrites': 0}
+    
+    def path(self, inst_id, bar):
+        return self.root / inst_id / f'{normalize_bar(bar)}.bin'
+    
+    def _thread_lock(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(str(path), threading.Lock())
+    
+    def resolve(self, symbol, bar='1m'):
+        """币种 → instId（永续合约优先），带 '-' 的按原样返回"""
+        inst_id = self.client.resolve_inst_id(symbol)
+        if inst_id is None:
+            # 永续合约列表不可用时探测一次，结果由客户端缓存
+            self.client.get_candles(symbol, bar=bar, limit=1)
+            inst_id = self.client.resolve_inst_id(symbol)
+        if inst_id is None:
+            raise RuntimeError(f'{symbol} 无法确定交易对')
+        return inst_id
+    
+    # ---------- 读取 ----------
+    
+    def read(self, inst_id, bar, limit=None, since=None, until=None):
+        """
+        读取已收盘的K线（内存映射后复制）
+        
+        Args:
+            inst_id: 交易对
+            bar: 周期
+            limit: 最多返回最近的N根（截止到 until）
+            since: 只返回时间戳（ms）>= since 的K线
+            until: 只返回时间戳（ms）<= until 的K线
+        
+        Returns:
+            numpy结构化数组（升序）
+        """
+        path = self.path(inst_id, bar)
+        try:
+            count = path.stat().st_size // CANDLE_DTYPE.itemsize
+        except FileNotFoundError:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        if count == 0:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        
+        data = np.memmap(path, dtype=CANDLE_DTYPE, mode='r', shape=(count,))
+        start, end = 0, count
+        if since is not None:
+            start = int(np.searchsorted(data['ts'], since, side='left'))
+        if until is not None:
+            end = int(np.searchsorted(data['ts'], until, side='right'))
+        if limit is not None:
+            start = max(start, end - limit)
+        result = np.array(data[start:end])
+        del data
+        return result
+    
+    def _last_ts(self, path):
+        """最后一根已存K线的时间戳（只读文件末尾一条记录）"""
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        size -= size % CANDLE_DTYPE.itemsize
+        if size == 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(size - CANDLE_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)['ts'][0])
+    
+    def forming(self, inst_id, bar):
+        """本进程最近一次同步取到的正在形成的K线（没有时返回空数组）"""
+        return self._forming.get((inst_id, normalize_bar(bar)), np.empty(0, dtype=CANDLE_DTYPE))
+    
+    def fetch_latest(self, inst_id, bar):
+        """
+        只请求最新一根K线（不写入存储），用于刷新正在形成的K线
+        
+        Returns:
+            numpy结构化数组：最新一根（正在形成，或刚收盘还没有下一根时为已收盘的一根）
+        """
+        bar = normalize_bar(bar)
+        closed, forming = self._fetch('candles', inst_id, bar, 1)
+        if len(forming):
+            self._forming[(inst_id, bar)] = forming
+        return _merge(closed, forming)
+    
+    def find_gaps(self, inst_id, bar, since=None):
+        """
+        查找已存K线中的缺口
+        
+        Returns:
+            list: [(缺口前最后一根的时间戳, 缺口后第一根的时间戳, 缺少的根数), ...]
+        """
+        bar_ms = BAR_MS[normalize_bar(bar)]
+        data = self.read(inst_id, bar, since=since)
+        if len(data) < 2:
+            return []
+        ts = data['ts']
+        diffs = np.diff(ts)
+        return [(int(ts[i]), int(ts[i + 1]), int(diffs[i] // bar_ms) - 1) for i in np.nonzero(diffs > bar_ms)[0]]
+    
+    # ---------- 写入 ----------
+    
+    def _append(self, path, candles):
+        """追加到文件末尾（先截掉不完整的尾部记录）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'ab') as f:
+            size = f.tell()
+            if size % CANDLE_DTYPE.itemsize:
+                f.truncate(size - size % CANDLE_DTYPE.itemsize)
+            f.write(candles.tobytes())
+        self.stats['bars_appended'] += len(candles)
+    
+    def _rewrite(self, path, candles):
+        """原子重写整个文件（插入历史K线或裁剪时）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(candles.tobytes())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.stats['rewrites'] += 1
+    
+    # ---------- 同步 ----------
+    
+    def _fetch(self, path_name, inst_id, bar, limit, after=None, before=None):
+        params = {'instId': inst_id, 'bar': bar, 'limit': limit}
+        if after is not None:
+            params['after'] = after
+        if before is not None:
+            params['before'] = before
+        data = self.client.get(f'/api/v5/market/{path_name}', params)
+        self.stats['requests'] += 1
+        if data.get('code') != '0':
+            raise RuntimeError(f"{inst_id} {bar} K线获取失败: {data.get('msg', 'Unknown error')}")
+        self.stats['bars_fetched'] += len(data.get('data') or [])
+        return _parse(data.get('data') or [])
+    
+    def _fetch_before(self, inst_id, bar, oldest_ts, stop_ts, need=None):
+        """
+        从 oldest_ts 向前翻页，直到覆盖 stop_ts、取够 need 根或交易所没有更早的K线
+        
+        Returns:
+            tuple: (numpy结构化数组（升序）, 是否已取到交易所最早的K线)
+        """
+        pages = []
+        count = 0
+        while True:
+            closed, _ = self._fetch('history-candles', inst_id, bar, HISTORY_LIMIT, after=oldest_ts)
+            if not len(closed) or int(closed['ts'][0]) >= oldest_ts:
+                return _merge(*pages), True
+            pages.append(closed)
+            count += len(closed)
+            oldest_ts = int(closed['ts'][0])
+            if stop_ts is not None and oldest_ts <= stop_ts:
+                return _merge(*pages), False
+            if need is not None and count >= need:
+                return _merge(*pages), False
+    
+    def sync(self, inst_id, bar, min_bars=0):
+        """
+        同步到最新K线
+        
+        Args:
+            inst_id: 交易对
+            bar: 周期
+            min_bars: 至少需要保存的已收盘K线数（不足时向更早的历史回补）
+        
+        Returns:
+            int: 新写入的K线数
+        """
+        bar = normalize_bar(bar)
+        bar_ms = BAR_MS[bar]
+        path = self.path(inst_id, bar)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.stats['syncs'] += 1
+        
+        with self._thread_lock(path), open(path.with_name(f'.{path.name}.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                last_ts = self._last_ts(path)
+                now_ms = int(time.time() * 1000)
+                if last_ts is None:
+                    limit = CANDLES_LIMIT
+                else:
+                    limit = min(CANDLES_LIMIT, max(2, (now_ms - last_ts) // bar_ms + 2))
+                
+                closed, forming = self._fetch('candles', inst_id, bar, limit)
+                self._forming[(inst_id, bar)] = forming
+                
+                # 尾部缺口：本次取到的最早一根仍晚于已存最后一根的下一根
+                if last_ts is not None and len(closed) and closed['ts'][0] > last_ts + bar_ms:
+                    older, _ = self._fetch_before(inst_id, bar, int(closed['ts'][0]), last_ts)
+                    closed = _merge(older, closed)
+                if last_ts is not None:
+                    closed = closed[closed['ts'] > last_ts]
+                
+                stored_count = path.stat().st_size // CANDLE_DTYPE.itemsize if last_ts is not None else 0
+                if stored_count + len(closed) < min_bars and (inst_id, bar) not in self._exhausted:
+                    # 历史不够长：从最早一根向前回补
+                    stored = self.read(inst_id, bar)
+                    oldest_ts = int(stored['ts'][0]) if stored_count else (
+                        int(closed['ts'][0]) if len(closed) else now_ms)
+                    need = min_bars - stored_count - len(closed)
+                    older, exhausted = self._fetch_before(inst_id, bar, oldest_ts, None, need=need)
+                    if exhausted:
+                        # 交易所没有更早的K线（新上市），本进程内不再回补
+                        self._exhausted.add((inst_id, bar))
+                    merged = _merge(older, stored, closed)
+                    self._rewrite(path, merged[-max(self.max_bars, min_bars):])
+                    return len(merged) - stored_count
+                
+                if len(closed):
+                    self._append(path, closed)
+                    stored_count += len(closed)
+                    if stored_count > self.max_bars * 1.25:
+                        self._rewrite(path, self.read(inst_id, bar, limit=max(self.max_bars, min_bars)))
+                return len(closed)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def repair_gaps(self, inst_id, bar):
+        """
+        回补已存K线中间的缺口（每个缺口向前翻页直到补满；交易所停盘造成的缺口会保留）
+        
+        Returns:
+            int: 补回的K线数
+        """
+        bar = normalize_bar(bar)
+        path = self.path(inst_id, bar)
+        gaps = self.find_gaps(inst_id, bar)
+        if not gaps:
+            return 0
+        
+        with self._thread_lock(path), open(path.with_name(f'.{path.name}.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                filled = []
+                for start_ts, end_ts, _ in gaps:
+                    closed, _ = self._fetch_before(inst_id, bar, end_ts, start_ts)
+                    closed = closed[closed['ts'] > start_ts]
+                    if len(closed):
+                        filled.append(closed)
+                if not filled:
+                    return 0
+                stored = self.read(inst_id, bar)
+                merged = _merge(stored, *filled)
+                self._rewrite(path, merged)
+                return len(merged) - len(stored)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    # ---------- 采集器接口 ----------
+    
+    def get_klines(self, symbol, bar, limit, include_forming=True):
+        """
+        同步并返回最近的K线（采集器使用）
+        
+        Args:
+            symbol: 币种（BTC，永续合约优先）或 instId
+            bar: 周期（1m / 5m / 1H / 1h ...）
+            limit: 返回的K线数（含正在形成的一根）
+            include_forming: 是否包含正在形成的K线
+        
+        Returns:
+            list: [{timestamp, open, high, low, close, volume}, ...]（升序）
+        
+        Raises:
+            RuntimeError / requests.RequestException: 同步失败
+        """
+        bar = normalize_bar(bar)
+        inst_id = self.resolve(symbol, bar)
+        self.sync(inst_id, bar, min_bars=limit)
+        
+        candles = self.read(inst_id, bar, limit=limit)
+        if include_forming:
+            candles = with_forming(candles, self.forming(inst_id, bar), limit)
+        return to_klines(candles)
+
+
+# 进程级共享实例
+candle_store = CandleStore()
+
+
+def main():
+    """命令行：同步、检查缺口、回补缺口"""
+    import argparse
+    from datetime import datetime
+    
+    parser = argparse.ArgumentParser(description='本地K线存储')
+    parser.add_argument('symbols', nargs='+', help='币种或instId')
+    parser.add_argument('--bar', default='1m', help='周期（默认1m）')
+    parser.add_argument('--min-bars', type=int, default=0, help='至少保存的K线数')
+    parser.add_argument('--gaps', action='store_true', help='只检查缺口，不同步')
+    parser.add_argument('--repair', action='store_true', help='同步后回补中间缺口')
+    
+    args = parser.parse_args()
+    
+    for symbol in args.symbols:
+        try:
+            inst_id = candle_store.resolve(symbol, args.bar)
+            if not args.gaps:
+                added = candle_store.sync(inst_id, args.bar, min_bars=args.min_bars)
+                print(f"[同步] {inst_id} {args.bar}: 新增 {added} 根")
+                if args.repair:
+                    print(f"[回补] {inst_id} {args.bar}: 补回 {candle_store.repair_gaps(inst_id, args.bar)} 根")
+            gaps = candle_store.find_gaps(inst_id, args.bar)
+            print(f"[缺口] {inst_id} {args.bar}: {len(gaps)} 处")
+            for start_ts, end_ts, missing in gaps[:20]:
+                print(f"    {datetime.fromtimestamp(start_ts / 1000)} → {datetime.fromtimestamp(end_ts / 1000)}  缺 {missing} 根")
+        except Exception as e:
+            print(f"[错误] {symbol}: {e}")
+    
+    print(f"[统计] {candle_store.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Coin Change Columnar - 27币涨跌幅历史数据的列式冷存储
+把已结束日期的 coin_change_YYYYMMDD.jsonl 压缩为 coin_change_YYYYMMDD.npz：
+- 时间向量（微秒时间戳 + 北京时间秒级时间戳）
+- 币种×分钟的 float64 矩阵（current_price / change_pct / rsi_values）
+- 每天一行基准价（当天重置过基准价时会有多行，并记录每分钟使用的行号）
+- 每分钟的汇总列（total_change / up_ratio / up_coins / down_coins / count / total_rsi）
+- 列中放不下的字段（额外字段、格式不同的时间、缺失的键）按记录保存为补丁（JSON）
+
+列 + 补丁可以逐字段还原出与JSONL完全相同的记录（写入前校验，不一致则不压缩），
+所以压缩成功后删除原JSONL。已结束日期的读取方（历史接口、波峰检测、角度分析）
+都通过 load_day_records 读取，列式文件优先；还原结果在进程内缓存。
+
+用法:
+    python coin_change_columnar.py                  # 压缩所有已结束的日期
+    python coin_change_columnar.py --date 20260215  # 压缩指定日期
+    python coin_change_columnar.py --keep-jsonl     # 压缩后保留原JSONL文件
+
+只处理JSONL的维护脚本（fix_beijing_time.py 等）对已压缩的日期不再生效。
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytz
+
+from jsonl_time_index import index_path, to_epoch
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+DATA_DIR = Path('/home/user/webapp/data/coin_change_tracker')
+
+FORMAT_VERSION = 2
+
+# 版本1的文件用 float32 保存：可以无损保存7位有效数字，还原时按此取整
+_SIGNIFICANT_DIGITS = 7
+
+# 进程内缓存的还原结果（天数）
+MAX_CACHED_DAYS = 8
+_records_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def jsonl_path(date_str, data_dir=DATA_DIR):
+    """获取某天的JSONL文件路径"""
+    return Path(data_dir) / f'coin_change_{date_str}.jsonl'
+
+
+def columnar_path(date_str, data_dir=DATA_DIR):
+    """获取某天的列式文件路径"""
+    return Path(data_dir) / f'coin_change_{date_str}.npz'
+
+
+def day_exists(date_str, data_dir=DATA_DIR):
+    """某天是否有数据（JSONL或列式文件）"""
+    return jsonl_path(date_str, data_dir).exists() or columnar_path(date_str, data_dir).exists()
+
+
+def _restore_floats(values):
+    """把版本1的float32数组按7位有效数字还原为原始精度的float64数组"""
+    values = values.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    digits = np.where(np.isfinite(magnitude), _SIGNIFICANT_DIGITS - 1 - magnitude, 0)
+    scale = 10.0 ** digits
+    return np.round(values * scale) / scale
+
+
+def _read_jsonl(file_path):
+    """读取JSONL文件中的所有有效记录"""
+    records = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def _dump(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def _apply_patch(record, patch):
+    for key in patch.get('del', ()):
+        record.pop(key, None)
+    record.update(patch.get('set', {}))
+    return record
+
+
+def build_columns(records):
+    """
+    把JSONL记录转换为列式数组（列中还原不出来的字段记录在 patches 中）
+    
+    Args:
+        records: coin_change 记录列表（按时间顺序）
+    
+    Returns:
+        dict: 列名 → numpy数组
+    """
+    # 收集出现过的币种，保持首次出现的顺序
+    symbols = []
+    seen = set()
+    for record in records:
+        for symbol in list(record.get('changes', {})) + list(record.get('rsi_values', {}) or {}):
+            if symbol not in seen:
+                seen.add(symbol)
+                symbols.append(symbol)
+    symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+    
+    n, s = len(records), len(symbols)
+    timestamp_us = np.zeros(n, dtype=np.int64)
+    beijing_epoch = np.zeros(n, dtype=np.int64)
+    current_price = np.full((s, n), np.nan)
+    change_pct = np.full((s, n), np.nan)
+    rsi_values = np.full((s, n), np.nan)
+    total_change = np.full(n, np.nan)
+    up_ratio = np.full(n, np.nan)
+    total_rsi = np.full(n, np.nan)
+    up_coins = np.full(n, -1, dtype=np.int16)
+    down_coins = np.full(n, -1, dtype=np.int16)
+    count = np.full(n, -1, dtype=np.int16)
+    baseline_index = np.zeros(n, dtype=np.int16)
+    
+    baseline_rows = []
+    baseline_lookup = {}
+    iso_timestamps = False
+    
+    for j, record in enumerate(records):
+        ts = record.get('timestamp')
+        if isinstance(ts, str):
+            iso_timestamps = True
+        epoch = to_epoch(ts)
+        beijing = to_epoch(record.get('beijing_time'))
+        if epoch is None:
+            epoch = beijing or 0
+        timestamp_us[j] = int(round(epoch * 1000000))
+        # beijing_time 与 timestamp 不一定是同一时刻，单独保存
+        beijing_epoch[j] = int(beijing if beijing is not None else epoch)
+        
+        baseline = [np.nan] * s
+        for symbol, item in record.get('changes', {}).items():
+            i = symbol_index[symbol]
+            current_price[i, j] = item.get('current_price', np.nan)
+            change_pct[i, j] = item.get('change_pct', np.nan)
+            baseline[i] = item.get('baseline_price', np.nan)
+        
+        # 基准价每天通常只有一行，按内容去重
+        key = tuple(np.float64(b).tobytes() for b in baseline)
+        if key not in baseline_lookup:
+            baseline_lookup[key] = len(baseline_rows)
+            baseline_rows.append(baseline)
+        baseline_index[j] = baseline_lookup[key]
+        
+        for symbol, value in (record.get('rsi_values') or {}).items():
+            rsi_values[symbol_index[symbol], j] = value
+        
+        total_change[j] = record.get('total_change', record.get('cumulative_pct', np.nan))
+        if 'up_ratio' in record:
+            up_ratio[j] = record['up_ratio']
+        if record.get('total_rsi') is not None:
+            total_rsi[j] = record['total_rsi']
+        if 'up_coins' in record:
+            up_coins[j] = record['up_coins']
+        if 'down_coins' in record:
+            down_coins[j] = record['down_coins']
+        count[j] = record.get('count', record.get('valid_count', len(record.get('changes', {}))))
+    
+    columns = {
+        'format_version': np.array(FORMAT_VERSION),
+        'timestamp_format': np.array('iso' if iso_timestamps else 'ms'),
+        'timestamp_us': timestamp_us,
+        'beijing_epoch': beijing_epoch,
+        'symbols': np.array(symbols, dtype='U32'),
+        'current_price': current_price,
+        'change_pct': change_pct,
+        'baseline_rows': np.array(baseline_rows, dtype=np.float64).reshape(len(baseline_rows), s),
+        'baseline_index': baseline_index,
+        'rsi_values': rsi_values,
+        'total_change': total_change,
+        'up_ratio': up_ratio,
+        'total_rsi': total_rsi,
+        'up_coins': up_coins,
+        'down_coins': down_coins,
+        'count': count,
+    }
+    
+    # 与列还原结果逐字段比较，不同的字段记为补丁
+    patches = {}
+    for j, (original, restored) in enumerate(zip(records, columns_to_records(columns, patches=False))):
+        patch = {}
+        changed = {key: value for key, value in original.items()
+                   if key not in restored or _dump(restored[key]) != _dump(value)}
+        if changed:
+            patch['set'] = changed
+        removed = [key for key in restored if key not in original]
+        if removed:
+            patch['del'] = removed
+        if patch:
+            patches[str(j)] = patch
+    columns['patches'] = np.array(json.dumps(patches, ensure_ascii=False))
+    return columns
+
+
+def load_day_columns(date_str, data_dir=DATA_DIR):
+    """
+    读取某天的列式数据
+    
+    Args:
+        date_str: 日期（YYYYMMDD）
+        data_dir: 数据目录
+    
+    Returns:
+        dict: 列名 → numpy数组，文件不存在时返回None
+    """
+    file_path = columnar_path(date_str, data_dir)
+    if not file_path.exists():
+        return None
+    with np.load(file_path) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def columns_to_records(columns, patches=True):
+    """
+    把列式数据还原为与JSONL相同结构的记录列表
+    
+    Args:
+        columns: load_day_columns 返回的列数据
+        patches: 是否应用补丁（build_columns 内部比较时为 False）
+    
+    Returns:
+        list: 记录列表（按时间顺序）
+    """
+    symbols = [str(symbol) for symbol in columns['symbols']]
+    iso_timestamps = str(columns['timestamp_format']) == 'iso'
+    
+    # 先整体转为Python列表，逐条组装时不再访问numpy标量；版本1为float32，需要还原精度
+    restore = _restore_floats if int(columns['format_version']) < 2 else (lambda values: values)
+    current_price = restore(columns['current_price']).T.tolist()
+    change_pct = restore(columns['change_pct']).T.tolist()
+    rsi_values = restore(columns['rsi_values']).T.tolist()
+    baseline_rows = restore(columns['baseline_rows']).tolist()
+    baseline_index = columns['baseline_index'].tolist()
+    total_change = restore(columns['total_change']).tolist()
+    up_ratio = restore(columns['up_ratio']).tolist()
+    total_rsi = restore(columns['total_rsi']).tolist()
+    record_patches = json.loads(str(columns['patches'])) if patches and 'patches' in columns else {}
+    up_coins = columns['up_coins'].tolist()
+    down_coins = columns['down_coins'].tolist()
+    count = columns['count'].tolist()
+    beijing_epoch = columns['beijing_epoch'].tolist()
+    
+    records = []
+    for j, ts_us in enumerate(columns['timestamp_us'].tolist()):
+        baseline = baseline_rows[baseline_index[j]]
+        prices = current_price[j]
+        pcts = change_pct[j]
+        
+        changes = {}
+        for i, symbol in enumerate(symbols):
+            if prices[i] != prices[i]:  # NaN：该分钟没有这个币种
+                continue
+            changes[symbol] = {
+                'current_price': prices[i],
+                'baseline_price': baseline[i],
+                'change_pct': pcts[i]
+            }
+        
+        if iso_timestamps:
+            timestamp = datetime.fromtimestamp(ts_us / 1000000, BEIJING_TZ).isoformat()
+        else:
+            timestamp = ts_us // 1000
+        record = {
+            'timestamp': timestamp,
+            'beijing_time': datetime.fromtimestamp(beijing_epoch[j], BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+            'cumulative_pct': total_change[j],
+            'total_change': total_change[j],
+        }
+        if up_ratio[j] == up_ratio[j]:
+            record['up_ratio'] = up_ratio[j]
+        if up_coins[j] >= 0:
+            record['up_coins'] = up_coins[j]
+        if down_coins[j] >= 0:
+            record['down_coins'] = down_coins[j]
+        record['changes'] = changes
+        record['count'] = count[j]
+        
+        if total_rsi[j] == total_rsi[j]:
+            rsi = rsi_values[j]
+            record['rsi_values'] = {
+                symbol: rsi[i]
+                for i, symbol in enumerate(symbols)
+                if rsi[i] == rsi[i]
+            }
+            record['total_rsi'] = total_rsi[j]
+        
+        patch = record_patches.get(str(j))
+        if patch:
+            _apply_patch(record, patch)
+        records.append(record)
+    
+    return records
+
+
+def load_day_records(date_str, data_dir=DATA_DIR):
+    """
+    读取某天的全部记录（透明支持JSONL和列式文件）
+    
+    列式文件存在且不早于JSONL时读取列式文件（还原结果按文件修改时间缓存，
+    返回的记录对象在多次调用之间共享，调用方不得修改），否则读取JSONL。
+    
+    Args:
+        date_str: 日期（YYYYMMDD）
+        data_dir: 数据目录
+    
+    Returns:
+        list: 记录列表，两种文件都不存在时返回空列表
+    """
+    source = jsonl_path(date_str, data_dir)
+    target = columnar_path(date_str, data_dir)
+    try:
+        target_mtime = target.stat().st_mtime_ns
+    except FileNotFoundError:
+        target_mtime = None
+    
+    if target_mtime is None or (source.exists() and source.stat().st_mtime_ns > target_mtime):
+        return _read_jsonl(source) if source.exists() else []
+    
+    key = (str(target), target_mtime)
+    with _cache_lock:
+        records = _records_cache.get(key)
+        if records is not None:
+            _records_cache.move_to_end(key)
+            return list(records)
+    
+    records = columns_to_records(load_day_columns(date_str, data_dir))
+    with _cache_lock:
+        _records_cache[key] = records
+        while len(_records_cache) > MAX_CACHED_DAYS:
+            _records_cache.popitem(last=False)
+    return list(records)
+
+
+def _verify(records, columns):
+    """校验列式数据能逐字段还原出原始记录"""
+    restored = columns_to_records(columns)
+    return len(restored) == len(records) and all(
+        _dump(original) == _dump(copy) for original, copy in zip(records, restored))
+
+
+def compact_day(date_str, data_dir=DATA_DIR, keep_jsonl=False):
+    """
+    把某天的JSONL压缩为列式文件
+    
+    写入前校验列式文件能逐字段还原出全部记录；校验通过且 keep_jsonl=False 时
+    删除原JSONL（及其时间索引）。
+    
+    Args:
+        date_str: 日期（YYYYMMDD）
+        data_dir: 数据目录
+        keep_jsonl: 是否保留原JSONL文件
+    
+    Returns:
+        bool: 是否压缩成功
+    """
+    source = jsonl_path(date_str, data_dir)
+    target = columnar_path(date_str, data_dir)
+    if not source.exists():
+        return False
+    
+    records = _read_jsonl(source)
+    if not records:
+        print(f"[压缩] {source.name} 没有有效记录，跳过")
+        return False
+    
+    columns = build_columns(records)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=source.parent, prefix=f'.{target.name}.', suffix='.npz')
+    os.close(fd)
+    try:
+        np.savez_compressed(tmp_path, **columns)
+        with np.load(tmp_path) as npz:
+            saved = {name: npz[name] for name in npz.files}
+        if not _verify(records, saved):
+            raise ValueError('还原校验失败')
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"[错误] 压缩 {source.name} 失败: {e}")
+        return False
+    
+    source_size = source.stat().st_size
+    target_size = target.stat().st_size
+    print(f"[压缩] {source.name}: {len(records)} 条, {source_size / 1024:.1f}KB → {target_size / 1024:.1f}KB")
+    
+    if not keep_jsonl:
+        source.unlink()
+        idx_file = index_path(source)
+        if idx_file.exists():
+            idx_file.unlink()
+    
+    return True
+
+
+def compact_closed_days(data_dir=DATA_DIR, keep_jsonl=False):
+    """
+    压缩所有已结束日期（北京时间今天之前）的JSONL文件
+    
+    列式文件已存在且不早于JSONL时跳过（保留JSONL时不会每次重复压缩）。
+    
+    Args:
+        data_dir: 数据目录
+        keep_jsonl: 是否保留原JSONL文件
+    
+    Returns:
+        list: 成功压缩的日期列表
+    """
+    today = datetime.now(BEIJING_TZ).strftime('%Y%m%d')
+    compacted = []
+    
+    for file_path in sorted(Path(data_dir).glob('coin_change_*.jsonl')):
+        date_str = file_path.stem.replace('coin_change_', '')
+        if not (len(date_str) == 8 and date_str.isdigit()) or date_str >= today:
+            continue
+        target = columnar_path(date_str, data_dir)
+        if target.exists() and target.stat().st_mtime >= file_path.stat().st_mtime:
+            continue
+        if compact_day(date_str, data_dir, keep_jsonl):
+            compacted.append(date_str)
+    
+    return compacted
+
+
+def main():
+    """命令行入口"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='27币涨跌幅历史数据列式压缩')
+    parser.add_argument('--date', help='只压缩指定日期（YYYYMMDD）')
+    parser.add_argument('--data-dir', default=str(DATA_DIR), help='数据目录')
+    parser.add_argument('--keep-jsonl', action='store_true', help='压缩后保留原JSONL文件')
+    
+    args = parser.parse_args()
+    
+    if args.date:
+        compact_day(args.date.replace('-', ''), args.data_dir, args.keep_jsonl)
+    else:
+        compacted = compact_closed_days(args.data_dir, args.keep_jsonl)
+        print(f"[完成] 共压缩 {len(compacted)} 天")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,20 @@ sys.path.insert(0, '/home/user/webapp/source_code')
 
 import json
 import time
-import requests
 from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
 import numpy as np
 
+from jsonl_time_index import append_record
+from coin_change_columnar import compact_closed_days
+from concurrent_fetch import fetch_all
+from market_data_bus import market_bus
+from okx_market_client import okx_client
+from rsi_engine import RSIEngine, WARMUP_BARS as RSI_WARMUP_BARS
+from ticker_snapshot import get_snapshot
+from wave_peak_detector import WavePeakDetector
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/coin_change_tracker')
 BASELINE_DIR = DATA_DIR
@@ -31,118 +39,81 @@ SYMBOLS = [
     'CRV', 'AAVE', 'APT'
 ]
 
+# 5分钟RSI14（Wilder平滑），状态按币种持久化，每根5分钟K线收盘后增量更新
+RSI_BAR_MS = 5 * 60 * 1000
+rsi_engine = RSIEngine(DATA_DIR / '.rsi_state.json', period=14)
+
+# 波峰检测（每轮写入数据后增量推进，检查点供 /api/coin-change-tracker/wave-peaks 读取）
+wave_detector = WavePeakDetector()
+
 
-def calculate_rsi(prices, period=14):
+def get_closed_5min_candles(symbol):
     """
-    计算RSI指标
-    :param prices: 价格列表(从旧到新)
-    :param period: RSI周期，默认14
-    :return: RSI值 (0-100)
+    获取已收盘的5分钟K线（RSI预热和增量更新使用）
+    :param symbol: 币种符号
+    :return: (时间戳数组, 收盘价数组)，从旧到新
     """
-    if len(prices) < period + 1:
-        return None
-    
-    # 计算价格变化
-    deltas = np.diff(prices)
-    
-    # 分离涨跌
-    gains = np.where(deltas > 0, deltas, 0)
-    losses = np.where(deltas < 0, -deltas, 0)
-    
-    # 计算平均涨跌
-    avg_gain = np.mean(gains[-period:])
-    avg_loss = np.mean(losses[-period:])
-    
-    # 避免除零
-    if avg_loss == 0:
-        return 100.0
-    
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    
-    return round(rsi, 2)
+    # 优先使用K线共享发布进程推送的K线，未运行时由本地K线存储增量同步
+    candles = market_bus.get_klines(symbol, '5m', RSI_WARMUP_BARS, include_forming=False)
+    if not candles:
+        raise RuntimeError('5分钟K线为空')
+    return (np.array([c['timestamp'] for c in candles], dtype=np.int64),
+            np.array([c['close'] for c in candles], dtype=np.float64))
 
 
-def get_5min_candles(symbol, limit=20):
+def get_all_rsi_values():
     """
-    获取5分钟K线数据
-    :param symbol: 币种符号
-    :param limit: 获取K线数量，默认20根（足够计算RSI14）
-    :return: 收盘价列表(从旧到新)
+    用最新收盘的5分钟K线增量更新所有27个币种的RSI（Wilder平滑）
+    :return: (字典 {symbol: rsi_value}, 字典 {symbol: 最后一根已收盘K线时间戳})
     """
+    series, errors = fetch_all(SYMBOLS, get_closed_5min_candles)
+    for symbol, e in errors.items():
+        print(f"[错误] {symbol} 获取5分钟K线失败: {e}")
+    # 交易所确认收盘（confirm=1）有延迟，刚收盘时部分币种可能还没有最新一根
+    bar_ts = {symbol: int(ts[-1]) for symbol, (ts, _) in series.items() if len(ts)}
+    
+    rsi_values = rsi_engine.update('5m', series)
     try:
-        # 优先使用永续合约
-        url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT-SWAP&bar=5m&limit={limit}"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        # 如果永续合约失败，尝试现货
-        if data.get('code') != '0' or not data.get('data'):
-            url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT&bar=5m&limit={limit}"
-            response = requests.get(url, timeout=5)
-            data = response.json()
-        
-        if data.get('code') == '0' and data.get('data'):
-            # K线数据格式: [时间戳, 开盘价, 最高价, 最低价, 收盘价, ...]
-            # OKX返回的数据是从新到旧，需要反转
-            candles = data['data']
-            close_prices = [float(candle[4]) for candle in reversed(candles)]
-            return close_prices
-        else:
-            print(f"[警告] {symbol} 5分钟K线获取失败")
-            return None
-            
+        rsi_engine.save()
     except Exception as e:
-        print(f"[错误] {symbol} 获取5分钟K线失败: {e}")
-        return None
+        print(f"[错误] 保存RSI状态失败: {e}")
+    
+    for symbol, rsi in rsi_values.items():
+        print(f"[RSI] {symbol}: {rsi}")
+    return rsi_values, bar_ts
 
 
-def get_all_rsi_values():
+def _snapshot_prices(field, label):
     """
-    获取所有27个币种的RSI值
-    :return: 字典 {symbol: rsi_value}
-    """
-    rsi_values = {}
+    从全市场行情快照中读取所有币种的价格
     
-    for symbol in SYMBOLS:
-        try:
-            # 获取5分钟K线数据
-            close_prices = get_5min_candles(symbol, limit=20)
-            
-            if close_prices and len(close_prices) >= 15:  # 至少需要15根K线来计算RSI14
-                rsi = calculate_rsi(close_prices, period=14)
-                if rsi is not None:
-                    rsi_values[symbol] = rsi
-                    print(f"[RSI] {symbol}: {rsi}")
-            else:
-                print(f"[警告] {symbol} K线数据不足，无法计算RSI")
-            
-            time.sleep(0.1)  # 避免请求过快
-            
-        except Exception as e:
-            print(f"[错误] {symbol} 计算RSI失败: {e}")
-            continue
+    Args:
+        field: 快照中的价格字段
+        label: 日志标签
+    
+    Returns:
+        tuple: ({symbol: price}, 快照中缺失的币种列表)
+    """
+    try:
+        snapshot = get_snapshot()
+    except Exception as e:
+        print(f"[警告] 行情快照获取失败，逐个币种查询: {e}")
+        return {}, list(SYMBOLS)
     
-    return rsi_values
+    prices = snapshot.prices(SYMBOLS, field=field)
+    for symbol, price in prices.items():
+        print(f"[{label}] {symbol}: {price}")
+    return prices, [s for s in SYMBOLS if s not in prices]
 
 
 def get_daily_open_prices():
-    """从OKX获取今日开盘价（日线开盘价）"""
+    """从OKX获取今日开盘价（北京时间0点开盘价，与日线开盘价一致）"""
     try:
-        open_prices = {}
-        for symbol in SYMBOLS:
+        open_prices, missing = _snapshot_prices('sodUtc8', '开盘价')
+        for symbol in missing:
             try:
-                # 优先使用永续合约，如果失败则使用现货
-                # 永续合约后缀：-USDT-SWAP
-                url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT-SWAP&bar=1D&limit=1"
-                response = requests.get(url, timeout=5)
-                data = response.json()
-                
-                # 如果永续合约失败，尝试现货
-                if data.get('code') != '0' or not data.get('data'):
-                    url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT&bar=1D&limit=1"
-                    response = requests.get(url, timeout=5)
-                    data = response.json()
+                # 快照中没有的币种单独查询日线
+                data = okx_client.get_candles(symbol, bar='1D', limit=1)
                 
                 if data.get('code') == '0' and data.get('data'):
                     # 日线数据格式: [时间戳, 开盘价, 最高价, 最低价, 收盘价, ...]
@@ -152,8 +123,6 @@ def get_daily_open_prices():
                     print(f"[开盘价] {symbol}: {open_price}")
                 else:
                     print(f"[警告] {symbol} 开盘价获取失败")
-                    
-                time.sleep(0.1)  # 避免请求过快
                 
             except Exception as e:
                 print(f"[错误] {symbol} 获取开盘价失败: {e}")
@@ -167,21 +136,13 @@ def get_daily_open_prices():
 
 
 def get_current_prices():
-    """从OKX获取当前价格"""
+    """从OKX获取当前价格（同一时刻的全市场快照）"""
     try:
-        prices = {}
-        for symbol in SYMBOLS:
+        prices, missing = _snapshot_prices('last', '价格')
+        for symbol in missing:
             try:
-                # 优先使用永续合约，如果失败则使用现货
-                url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT-SWAP"
-                response = requests.get(url, timeout=5)
-                data = response.json()
-                
-                # 如果永续合约失败，尝试现货
-                if data.get('code') != '0' or not data.get('data'):
-                    url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT"
-                    response = requests.get(url, timeout=5)
-                    data = response.json()
+                # 快照中没有的币种单独查询
+                data = okx_client.get_ticker(symbol)
                 
                 if data.get('code') == '0' and data.get('data'):
                     price = float(data['data'][0]['last'])
@@ -189,8 +150,6 @@ def get_current_prices():
                     print(f"[价格] {symbol}: {price}")
                 else:
                     print(f"[警告] {symbol} 价格获取失败")
-                    
-                time.sleep(0.1)  # 避免请求过快
                 
             except Exception as e:
                 print(f"[错误] {symbol} 获取价格失败: {e}")
@@ -251,14 +210,46 @@ def calculate_changes(current_prices, baseline_prices):
     return changes
 
 
+def build_change_record(now, changes):
+    """
+    根据涨跌幅构建数据记录
+    
+    Args:
+        now: 采集时间（北京时间）
+        changes: calculate_changes 的结果
+    
+    Returns:
+        dict: 数据记录
+    """
+    # 计算总和
+    total_change = sum(item['change_pct'] for item in changes.values())
+    
+    # 计算上涨占比
+    up_coins = sum(1 for item in changes.values() if item['change_pct'] > 0)
+    total_coins = len(changes)
+    up_ratio = (up_coins / total_coins * 100) if total_coins > 0 else 0
+    
+    return {
+        'timestamp': int(time.time() * 1000),
+        'beijing_time': now.strftime('%Y-%m-%d %H:%M:%S'),
+        'cumulative_pct': round(total_change, 2),  # 使用cumulative_pct字段名
+        'total_change': round(total_change, 2),     # 保留兼容性
+        'up_ratio': round(up_ratio, 1),            # 上涨占比 (%)
+        'up_coins': up_coins,                      # 上涨币种数
+        'down_coins': total_coins - up_coins,      # 下跌币种数
+        'changes': changes,
+        'count': len(changes)
+    }
+
+
 def save_to_jsonl(data):
     """保存数据到JSONL"""
     today = datetime.now(BEIJING_TZ).strftime('%Y%m%d')
     jsonl_file = DATA_DIR / f"coin_change_{today}.jsonl"
     
     try:
-        with open(jsonl_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+        # 追加写入并同步更新时间索引
+        append_record(jsonl_file, data, time_key='timestamp')
         print(f"[保存] 数据已写入 {jsonl_file}")
     except Exception as e:
         print(f"[错误] 保存JSONL失败: {e}")
@@ -277,16 +268,18 @@ def save_rsi_to_jsonl(rsi_data):
         print(f"[错误] 保存RSI JSONL失败: {e}")
 
 
-def main():
-    """主循环"""
-    print("=" * 60)
-    print("币种涨跌变化追踪采集器启动")
-    print("=" * 60)
+# 进程内的采集状态（首次采集时初始化）
+_state = None
+
+
+def _get_state():
+    """加载或初始化基准价格"""
+    global _state
+    if _state is not None:
+        return _state
     
-    # 加载或初始化基准价格
     baseline_prices = load_baseline()
     last_baseline_date = None
-    last_rsi_collect_time = None  # 记录上次RSI采集时间
     
     # 如果没有基准价格，或者是新的一天，获取今日开盘价
     today = datetime.now(BEIJING_TZ).strftime('%Y%m%d')
@@ -300,103 +293,123 @@ def main():
     else:
         last_baseline_date = today
     
-    while True:
+    _state = {
+        'baseline_prices': baseline_prices,
+        'last_baseline_date': last_baseline_date,
+        'rsi_bar_ts': None  # RSI已更新到的5分钟K线时间戳
+    }
+    return _state
+
+
+def run_once():
+    """执行一次采集（collector_host 调度入口）"""
+    state = _get_state()
+    now = datetime.now(BEIJING_TZ)
+    current_date = now.strftime('%Y%m%d')
+    
+    # 检查是否是新的一天，如果是则重置基准价格
+    if current_date != state['last_baseline_date']:
+        print(f"\n[新的一天] {current_date} - 重置基准价格...")
+        state['baseline_prices'] = get_daily_open_prices()
+        if state['baseline_prices']:
+            save_baseline(state['baseline_prices'])
+            state['last_baseline_date'] = current_date
+        
+        # 把已结束日期的数据压缩为列式冷存储（校验可无损还原后删除原JSONL）
         try:
-            now = datetime.now(BEIJING_TZ)
-            current_date = now.strftime('%Y%m%d')
-            
-            # 检查是否是新的一天，如果是则重置基准价格
-            if current_date != last_baseline_date:
-                print(f"\n[新的一天] {current_date} - 重置基准价格...")
-                baseline_prices = get_daily_open_prices()
-                if baseline_prices:
-                    save_baseline(baseline_prices)
-                    last_baseline_date = current_date
-            
-            print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] 开始采集...")
-            
-            # 获取当前价格
-            current_prices = get_current_prices()
-            
-            # 检查是否需要采集RSI（每5分钟一次）
-            should_collect_rsi = False
-            if last_rsi_collect_time is None:
-                should_collect_rsi = True
-            else:
-                minutes_since_last = (now - last_rsi_collect_time).total_seconds() / 60
-                if minutes_since_last >= 5:
-                    should_collect_rsi = True
+            compact_closed_days(DATA_DIR)
+        except Exception as e:
+            print(f"[错误] 压缩历史数据失败: {e}")
+    
+    print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] 开始采集...")
+    
+    # 获取当前价格
+    current_prices = get_current_prices()
+    
+    # 获取RSI数据（每根5分钟K线收盘后更新一次）
+    rsi_values = {}
+    total_rsi = None
+    rsi_bar_ts = (int(time.time() * 1000) // RSI_BAR_MS - 1) * RSI_BAR_MS
+    if state['rsi_bar_ts'] != rsi_bar_ts:
+        print("[RSI] 5分钟K线已收盘，更新RSI...")
+        rsi_values, bar_ts = get_all_rsi_values()
+        # 只记录已有最新一根K线的币种；个别币种确认收盘延迟时不阻塞整体记录（仍需至少20个币种）
+        lagging = [s for s in rsi_values if bar_ts.get(s, 0) < rsi_bar_ts]
+        if lagging:
+            print(f"[RSI] 以下币种最新5分钟K线尚未确认收盘，本次不计入: {', '.join(lagging)}")
+            rsi_values = {s: v for s, v in rsi_values.items() if s not in lagging}
+    if rsi_values:
+        # 确保获取到所有币种的RSI
+        missing_symbols = [s for s in SYMBOLS if s not in rsi_values]
+        if missing_symbols:
+            print(f"[警告] 以下币种RSI获取失败: {', '.join(missing_symbols)}")
+        
+        # 只有当获取到足够多的RSI数据时才计算总和（至少20个币种）
+        if len(rsi_values) >= 20:
+            total_rsi = round(sum(rsi_values.values()), 2)
+            print(f"[RSI] 成功采集 {len(rsi_values)}/27 个币种，RSI之和: {total_rsi}")
+            state['rsi_bar_ts'] = rsi_bar_ts
             
-            # 获取RSI数据
+            # 单独保存RSI数据到独立文件（监控器通过 /api/coin-change-tracker/latest 读取）
+            rsi_record = {
+                'timestamp': int(time.time() * 1000),
+                'beijing_time': now.strftime('%Y-%m-%d %H:%M:%S'),
+                'bar_timestamp': rsi_bar_ts,
+                'rsi_values': rsi_values,
+                'total_rsi': total_rsi,
+                'count': len(rsi_values)
+            }
+            save_rsi_to_jsonl(rsi_record)
+        else:
+            # 不标记为已更新，下一轮重试
+            print(f"[警告] RSI数据不足 ({len(rsi_values)}/27)，跳过本次记录")
             rsi_values = {}
             total_rsi = None
-            if should_collect_rsi:
-                print("[RSI] 开始采集5分钟RSI数据...")
-                rsi_values = get_all_rsi_values()
-                
-                # 确保获取到所有币种的RSI
-                if rsi_values:
-                    missing_symbols = [s for s in SYMBOLS if s not in rsi_values]
-                    if missing_symbols:
-                        print(f"[警告] 以下币种RSI获取失败: {', '.join(missing_symbols)}")
-                    
-                    # 只有当获取到足够多的RSI数据时才计算总和（至少20个币种）
-                    if len(rsi_values) >= 20:
-                        total_rsi = round(sum(rsi_values.values()), 2)
-                        print(f"[RSI] 成功采集 {len(rsi_values)}/27 个币种，RSI之和: {total_rsi}")
-                        last_rsi_collect_time = now
-                        
-                        # 单独保存RSI数据到独立文件
-                        rsi_record = {
-                            'timestamp': int(time.time() * 1000),
-                            'beijing_time': now.strftime('%Y-%m-%d %H:%M:%S'),
-                            'rsi_values': rsi_values,
-                            'total_rsi': total_rsi,
-                            'count': len(rsi_values)
-                        }
-                        save_rsi_to_jsonl(rsi_record)
-                    else:
-                        print(f"[警告] RSI数据不足 ({len(rsi_values)}/27)，跳过本次记录")
-                        rsi_values = {}
-                        total_rsi = None
-            
-            if current_prices:
-                # 计算涨跌幅
-                changes = calculate_changes(current_prices, baseline_prices)
-                
-                # 计算总和
-                total_change = sum(item['change_pct'] for item in changes.values())
-                
-                # 计算上涨占比
-                up_coins = sum(1 for item in changes.values() if item['change_pct'] > 0)
-                total_coins = len(changes)
-                up_ratio = (up_coins / total_coins * 100) if total_coins > 0 else 0
-                
-                # 构建数据记录
-                record = {
-                    'timestamp': int(time.time() * 1000),
-                    'beijing_time': now.strftime('%Y-%m-%d %H:%M:%S'),
-                    'cumulative_pct': round(total_change, 2),  # 使用cumulative_pct字段名
-                    'total_change': round(total_change, 2),     # 保留兼容性
-                    'up_ratio': round(up_ratio, 1),            # 上涨占比 (%)
-                    'up_coins': up_coins,                      # 上涨币种数
-                    'down_coins': total_coins - up_coins,      # 下跌币种数
-                    'changes': changes,
-                    'count': len(changes)
-                }
-                
-                # 如果有RSI数据，添加到记录中
-                if rsi_values:
-                    record['rsi_values'] = rsi_values
-                    record['total_rsi'] = total_rsi
-                
-                # 保存到JSONL
-                save_to_jsonl(record)
-                
-                log_msg = f"[统计] 总涨跌幅: {total_change:.2f}%, 币种数: {len(changes)}, 上涨占比: {up_ratio:.1f}% ({up_coins}↑/{total_coins - up_coins}↓)"
-                if total_rsi is not None:
-                    log_msg += f", RSI之和: {total_rsi}"
-                print(log_msg)
+    
+    if current_prices:
+        # 计算涨跌幅并构建数据记录
+        changes = calculate_changes(current_prices, state['baseline_prices'])
+        record = build_change_record(now, changes)
+        
+        # 如果有RSI数据，添加到记录中
+        if rsi_values:
+            record['rsi_values'] = rsi_values
+            record['total_rsi'] = total_rsi
+        
+        # 保存到JSONL
+        save_to_jsonl(record)
+        
+        # 增量更新今天的波峰检测并写入检查点
+        try:
+            stream, events = wave_detector.sync_day(now.strftime('%Y%m%d'))
+            wave_detector.save_checkpoint(stream)
+            for event in events:
+                if event['type'] == 'peak':
+                    peak = event['peak']
+                    print(f"[波峰] B({peak['b_point']['value']:.2f}%) → A({peak['a_point']['value']:.2f}%) → "
+                          f"C({peak['c_point']['value']:.2f}%)，今日第 {len(stream.peaks)} 个")
+        except Exception as e:
+            print(f"[错误] 更新波峰检测失败: {e}")
+        
+        log_msg = (f"[统计] 总涨跌幅: {record['total_change']:.2f}%, 币种数: {record['count']}, "
+                   f"上涨占比: {record['up_ratio']:.1f}% ({record['up_coins']}↑/{record['down_coins']}↓)")
+        if total_rsi is not None:
+            log_msg += f", RSI之和: {total_rsi}"
+        print(log_msg)
+
+
+def main():
+    """主循环"""
+    print("=" * 60)
+    print("币种涨跌变化追踪采集器启动")
+    print("=" * 60)
+    
+    _get_state()
+    
+    while True:
+        try:
+            now = datetime.now(BEIJING_TZ)
+            run_once()
             
             # 每1分钟采集一次
             print(f"[等待] 下次采集时间: {(now + timedelta(minutes=1)).strftime('%H:%M:%S')}")
@@ -411,6 +424,5 @@ def main():
             traceback.print_exc()
             time.sleep(60)
 
-
 if __name__ == '__main__':
     main()
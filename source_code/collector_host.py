@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Collector Host - 在一个进程内调度多个采集器
+
+代替每个采集器一个PM2进程（各自导入 numpy/pytz/requests/ccxt，各自 while True + sleep）：
+- 采集器作为插件按需导入，模块提供 run_once()（或在 COLLECTORS 中用 job 指定函数），执行一个采集周期
+- APScheduler 线程池调度，每个采集器独立的间隔、偏移和抖动；
+  触发时间按时钟对齐（例如 300 秒的采集器在 :00 :05 :10 ... 执行），不会因为每轮耗时而漂移
+- 故障隔离：单个采集器导入失败或某轮抛异常只记录到状态中，不影响其他采集器；
+  同一采集器上一轮未结束时跳过本轮（max_instances=1），错过的多轮合并为一次（coalesce）
+- 一个状态接口：GET /status 返回所有采集器的运行次数、失败次数、最近耗时、最近错误和下次执行时间
+
+用法:
+    python collector_host.py                          # 运行全部采集器
+    python collector_host.py --only coin-change-tracker,panic-wash-collector
+    python collector_host.py --list                   # 列出可用采集器
+    python collector_host.py --run coin-change-tracker  # 只执行一次指定采集器（调试用）
+    curl http://127.0.0.1:9120/status
+"""
+import importlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytz
+
+sys.path.insert(0, '/home/user/webapp/source_code')
+
+import http_replay
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+# 可托管的采集器（名称与 ecosystem.config.js 中的进程名一致）
+# interval: 采集间隔（秒），触发时间按 interval 的整数倍对齐
+# offset: 对齐后再延后的秒数（依赖其他采集器输出的放在后面执行）
+# jitter: 每次触发额外随机延后的最大秒数，错开同一时刻的网络请求
+# job: 周期函数名（默认 run_once）
+COLLECTORS = {
+    'coin-change-tracker': {'module': 'coin_change_tracker_collector', 'interval': 60},
+    'rsi-takeprofit-monitor': {'module': 'rsi_takeprofit_monitor', 'job': 'check_rsi_takeprofit',
+                               'interval': 60, 'offset': 5},
+    'panic-wash-collector': {'module': 'panic_wash_collector', 'interval': 180, 'jitter': 5},
+    'price-position-collector': {'module': 'price_position_collector', 'job': 'collect_price_positions',
+                                 'interval': 180},
+    'new-high-low-collector': {'module': 'new_high_low_collector', 'interval': 180, 'offset': 60},
+    'signal-stats-generator': {'module': 'signal_stats_generator', 'interval': 180, 'offset': 60},
+    'sar-slope-collector': {'module': 'sar_slope_collector', 'interval': 300, 'jitter': 5},
+    'sar-bias-stats-collector': {'module': 'sar_bias_stats_collector', 'interval': 300, 'offset': 30},
+    'okx-trade-history': {'module': 'okx_trade_history_collector', 'interval': 300, 'jitter': 10},
+    'market-sentiment-collector': {'module': 'market_sentiment_collector', 'interval': 900, 'offset': 10},
+}
+
+STATUS_PORT = 9120
+DEFAULT_WORKERS = 6
+
+
+class CollectorRunner:
+    """包装一个采集器：延迟导入、执行一个周期、记录状态"""
+    
+    def __init__(self, name, spec):
+        self.name = name
+        self.module_name = spec['module']
+        self.job_name = spec.get('job', 'run_once')
+        self.interval = spec['interval']
+        self.offset = spec.get('offset', 0)
+        self.jitter = spec.get('jitter', 0)
+        self._job = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'runs': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'skipped': 0,
+            'running': False,
+            'last_start': None,
+            'last_duration': None,
+            'last_success': None,
+            'last_error': None,
+            'load_error': None,
+        }
+    
+    def load(self):
+        """导入采集器模块，失败时记录错误并返回 False"""
+        if self._job is not None:
+            return True
+        try:
+            module = importlib.import_module(self.module_name)
+            self._job = getattr(module, self.job_name)
+            self.stats['load_error'] = None
+            return True
+        except Exception as e:
+            self.stats['load_error'] = f'{type(e).__name__}: {e}'
+            print(f"[错误] 加载采集器 {self.name} ({self.module_name}.{self.job_name}) 失败: {e}")
+            return False
+    
+    def first_run_time(self, now=None):
+        """下一个对齐的触发时间（interval 的整数倍 + offset）"""
+        now = time.time() if now is None else now
+        start = (int(now - self.offset) // self.interval + 1) * self.interval + self.offset
+        return datetime.fromtimestamp(start, BEIJING_TZ)
+    
+    def run(self):
+        """执行一个周期；异常只记录，不向调度器抛出"""
+        if not self.load():
+            return
+        with self._lock:
+            self.stats['running'] = True
+            self.stats['last_start'] = time.time()
+        start = time.perf_counter()
+        try:
+            self._job()
+            self.stats['last_success'] = time.time()
+            self.stats['consecutive_failures'] = 0
+        except Exception as e:
+            self.stats['failures'] += 1
+            self.stats['consecutive_failures'] += 1
+            self.stats['last_error'] = f'{type(e).__name__}: {e}'
+            print(f"[错误] 采集器 {self.name} 本轮失败: {e}")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self.stats['runs'] += 1
+                self.stats['running'] = False
+                self.stats['last_duration'] = round(time.perf_counter() - start, 3)
+    
+    def status(self, job=None):
+        status = dict(self.stats)
+        status.update({'module': self.module_name, 'job': self.job_name,
+                       'interval': self.interval, 'offset': self.offset, 'jitter': self.jitter})
+        next_run = getattr(job, 'next_run_time', None)
+        status['next_run'] = next_run.strftime('%Y-%m-%d %H:%M:%S') if next_run else None
+        return status
+
+
+class CollectorHost:
+    """在一个进程内用 APScheduler 调度多个采集器"""
+    
+    def __init__(self, names=None, max_workers=DEFAULT_WORKERS):
+        from apscheduler.executors.pool import ThreadPoolExecutor
+        from apscheduler.schedulers.background import BackgroundScheduler
+        
+        names = names or list(COLLECTORS)
+        self.runners = {name: CollectorRunner(name, COLLECTORS[name]) for name in names}
+        self.started = time.time()
+        self.scheduler = BackgroundScheduler(
+            executors={'default': ThreadPoolExecutor(max_workers)},
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 30},
+            timezone=BEIJING_TZ
+        )
+    
+    def _on_skipped(self, event):
+        runner = self.runners.get(event.job_id)
+        if runner:
+            runner.stats['skipped'] += 1
+            print(f"[警告] 采集器 {event.job_id} 上一轮未结束或错过触发时间，跳过本轮")
+    
+    def start(self, run_now=True):
+        """
+        导入所有采集器并加入调度
+        
+        run_now 时启动后各执行一次，仍按 offset 延后，
+        依赖其他采集器输出的采集器在被依赖的采集器之后执行。
+        """
+        from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+        from apscheduler.triggers.interval import IntervalTrigger
+        
+        for name, runner in self.runners.items():
+            runner.load()
+            trigger = IntervalTrigger(seconds=runner.interval, start_date=runner.first_run_time(),
+                                      jitter=runner.jitter or None, timezone=BEIJING_TZ)
+            options = {'next_run_time': datetime.fromtimestamp(time.time() + runner.offset, BEIJING_TZ)} \
+                if run_now else {}
+            self.scheduler.add_job(runner.run, trigger, id=name, name=name, **options)
+        self.scheduler.add_listener(self._on_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+        self.scheduler.start()
+    
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+    
+    def get_status(self):
+        """
+        获取主机和所有采集器的状态
+        
+        Returns:
+            dict: {'host': {...}, 'collectors': {名称: {...}}}
+        """
+        return {
+            'host': {
+                'pid': os.getpid(),
+                'started': datetime.fromtimestamp(self.started, BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+                'uptime': int(time.time() - self.started),
+                # Linux 下 ru_maxrss 单位为KB
+                'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'threads': threading.active_count(),
+            },
+            'collectors': {name: runner.status(self.scheduler.get_job(name))
+                           for name, runner in self.runners.items()}
+        }
+
+
+def serve_status(host, bind='127.0.0.1', port=STATUS_PORT):
+    """在后台线程中提供 GET /status"""
+    
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/status':
+                self.send_error(404)
+                return
+            body = json.dumps(host.get_status(), ensure_ascii=False, indent=2).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((bind, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, name='status', daemon=True).start()
+    return server
+
+
+def main():
+    """命令行：启动采集器主机"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='采集器主机（单进程调度多个采集器）')
+    parser.add_argument('--only', help='只运行这些采集器（逗号分隔）')
+    parser.add_argument('--exclude', help='不运行这些采集器（逗号分隔）')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'调度线程池大小（默认{DEFAULT_WORKERS}）')
+    parser.add_argument('--bind', default='127.0.0.1', help='状态接口监听地址（默认127.0.0.1）')
+    parser.add_argument('--port', type=int, default=STATUS_PORT, help=f'状态接口端口（默认{STATUS_PORT}，0为不启动）')
+    parser.add_argument('--no-run-now', action='store_true',
+                        help='启动时不执行首轮（默认启动后按偏移依次执行一次），等到第一个对齐时间')
+    parser.add_argument('--list', action='store_true', help='列出可用采集器')
+    parser.add_argument('--run', metavar='NAME', help='只执行一次指定采集器后退出')
+    
+    args = parser.parse_args()
+    
+    if args.list:
+        for name, spec in COLLECTORS.items():
+            print(f"  {name:28s} {spec['module']}.{spec.get('job', 'run_once')}  "
+                  f"每{spec['interval']}秒 (偏移{spec.get('offset', 0)}秒, 抖动{spec.get('jitter', 0)}秒)")
+        return
+    
+    if args.run:
+        if args.run not in COLLECTORS:
+            parser.error(f'未知采集器: {args.run}')
+        http_replay.install_from_env()
+        runner = CollectorRunner(args.run, COLLECTORS[args.run])
+        runner.run()
+        print(json.dumps(runner.status(), ensure_ascii=False, indent=2))
+        return
+    
+    names = [n.strip() for n in args.only.split(',')] if args.only else list(COLLECTORS)
+    if args.exclude:
+        excluded = {n.strip() for n in args.exclude.split(',')}
+        names = [n for n in names if n not in excluded]
+    unknown = [n for n in names if n not in COLLECTORS]
+    if unknown:
+        parser.error(f"未知采集器: {', '.join(unknown)}")
+    
+    # HTTP_REPLAY_MODE=record/replay 时所有采集器的OKX/btc126请求都经过录制/回放
+    http_replay.install_from_env()
+    
+    print("=" * 60)
+    print(f"采集器主机启动: {len(names)} 个采集器, 线程池 {args.workers}")
+    print("=" * 60)
+    
+    host = CollectorHost(names, max_workers=args.workers)
+    host.start(run_now=not args.no_run_now)
+    if args.port:
+        serve_status(host, args.bind, args.port)
+        print(f"[状态] http://{args.bind}:{args.port}/status")
+    
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n[退出] 采集器主机已停止")
+        host.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,7 +18,8 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
-from collections import defaultdict
+
+from sliding_window_counter import SlidingWindowCounter, parse_time
 
 # 配置
 BASE_DIR = Path(__file__).parent.parent
@@ -26,6 +27,9 @@ SOURCE_DIR = BASE_DIR / 'data' / 'price_position'
 OUTPUT_DIR = BASE_DIR / 'data' / 'signal_stats'
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# 统计窗口（秒）
+WINDOWS = {'24h': 24 * 3600, '2h': 2 * 3600}
+
 def get_beijing_time():
     """获取北京时间"""
     beijing_tz = pytz.timezone('Asia/Shanghai')
@@ -80,44 +84,22 @@ def load_jsonl_data(date_str):
     
     return all_records
 
-def calculate_signal_counts_from_records(records, target_time_str, window_hours):
+def build_signal_events(records):
     """
-    从记录列表中计算指定时间点之前N小时内的信号统计
+    把记录转换为按时间排序的信号事件（时间戳只解析一次）
     
     Args:
-        records: 所有记录列表
-        target_time_str: 目标时间（字符串格式 'YYYY-MM-DD HH:MM:SS'）
-        window_hours: 窗口大小（小时）
+        records: 所有记录列表（按 snapshot_time 排序）
     
     Returns:
-        tuple: (sell_count, buy_count)
+        list: [(时间（秒）, 信号类型), ...]，只包含已触发的信号
     """
-    target_time = datetime.strptime(target_time_str, '%Y-%m-%d %H:%M:%S')
-    window_start = target_time - timedelta(hours=window_hours)
-    
-    sell_count = 0
-    buy_count = 0
-    
+    events = []
     for record in records:
-        record_time_str = record['snapshot_time']
-        record_time = datetime.strptime(record_time_str, '%Y-%m-%d %H:%M:%S')
-        
-        # 只统计窗口内的数据
-        if record_time <= window_start or record_time > target_time:
-            continue
-        
-        # 检查信号类型
         summary = record.get('summary', {})
-        signal_type = summary.get('signal_type', '')
-        signal_triggered = summary.get('signal_triggered', 0)
-        
-        if signal_triggered == 1:
-            if signal_type == '逃顶信号':
-                sell_count += 1
-            elif signal_type == '抄底信号':
-                buy_count += 1
-    
-    return sell_count, buy_count
+        if summary.get('signal_triggered', 0) == 1:
+            events.append((parse_time(record['snapshot_time']), summary.get('signal_type', '')))
+    return events
 
 def generate_daily_stats_v2(date_str):
     """
@@ -172,16 +154,21 @@ def generate_daily_stats_v2(date_str):
     
     print(f"✓ 生成 {len(time_points)} 个时间点")
     
+    # 24h和2h窗口一遍扫描计算所有时间点
+    counter = SlidingWindowCounter(build_signal_events(all_records), WINDOWS)
+    window_counts = counter.counts_at(parse_time(time_point) for time_point in time_points)
+    
     # 写入数据
     with open(sell_file, 'w', encoding='utf-8') as f_sell, \
          open(buy_file, 'w', encoding='utf-8') as f_buy:
         
-        for i, time_point in enumerate(time_points):
+        for i, (time_point, counts) in enumerate(zip(time_points, window_counts)):
             time_str = time_point.strftime('%Y-%m-%d %H:%M:%S')
             
-            # 计算24h和2h统计
-            sell_24h, buy_24h = calculate_signal_counts_from_records(all_records, time_str, 24)
-            sell_2h, buy_2h = calculate_signal_counts_from_records(all_records, time_str, 2)
+            sell_24h = counts['24h']['types'].get('逃顶信号', 0)
+            buy_24h = counts['24h']['types'].get('抄底信号', 0)
+            sell_2h = counts['2h']['types'].get('逃顶信号', 0)
+            buy_2h = counts['2h']['types'].get('抄底信号', 0)
             
             # 逃顶信号记录
             sell_entry = {
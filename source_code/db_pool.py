@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+DB Pool - SQLite连接池
+
+统一 crypto_data.db / fund_monitor.db / sar_slope_data.db 等数据库的连接方式：
+- 连接按数据库复用：同一线程内嵌套获取返回同一个连接（引用计数），
+  close() 只是归还，引用归零后放回空闲池供其他线程使用
+- 读写连接统一设置 WAL、synchronous=NORMAL、mmap_size、busy_timeout
+- 只读连接（GET接口）以 mode=ro 打开并开启 query_only，不与采集器争写锁
+- 每个连接带预编译语句缓存（cached_statements）
+- 记录每条SQL的执行次数和耗时
+
+用法:
+    from db_pool import get_connection, db_connection
+    conn = get_connection(CRYPTO_DATA_DB, readonly=True)
+    cursor = conn.cursor()
+    cursor.execute('SELECT ...')
+    conn.close()  # 归还连接
+    
+    # 写操作推荐：出错时回滚并归还，成功时提交
+    with db_connection(CRYPTO_DATA_DB) as conn:
+        conn.execute('UPDATE ...')
+    
+    # Flask：请求结束时回滚并归还本线程未归还的连接
+    app.teardown_appcontext(lambda exc: release_all())
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+DB_DIR = '/home/user/webapp/databases'
+CRYPTO_DATA_DB = os.path.join(DB_DIR, 'crypto_data.db')
+FUND_MONITOR_DB = os.path.join(DB_DIR, 'fund_monitor.db')
+SAR_SLOPE_DB = os.path.join(DB_DIR, 'sar_slope_data.db')
+TRADING_DECISION_DB = os.path.join(DB_DIR, 'trading_decision.db')
+
+# 等待写锁的时间（秒）
+BUSY_TIMEOUT = 10.0
+# 每个连接缓存的预编译语句数
+CACHED_STATEMENTS = 256
+# 内存映射大小
+MMAP_SIZE = 256 * 1024 * 1024
+# 每个数据库最多保留的空闲连接数
+MAX_IDLE_PER_DB = 8
+# 慢查询阈值（毫秒），超过时打印日志
+SLOW_QUERY_MS = 500
+
+_pool_lock = threading.Lock()
+_idle = defaultdict(list)
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_query_stats = {}
+_pool_stats = {'created': 0, 'reused': 0, 'released': 0, 'discarded': 0}
+
+
+def _record_query(sql, elapsed_ms):
+    """记录一条SQL的耗时（按SQL文本前200个字符聚合）"""
+    key = ' '.join(sql.split())[:200]
+    with _stats_lock:
+        stat = _query_stats.get(key)
+        if stat is None:
+            stat = _query_stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        stat['count'] += 1
+        stat['total_ms'] += elapsed_ms
+        stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        print(f"[DB] 慢查询 {elapsed_ms:.0f}ms: {key}")
+
+
+class TimedCursor(sqlite3.Cursor):
+    """记录执行耗时的游标"""
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, (time.perf_counter() - start) * 1000)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, (time.perf_counter() - start) * 1000)
+
+
+class PooledConnection(sqlite3.Connection):
+    """close() 时归还到连接池的连接"""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def close(self):
+        """归还连接（未提交的事务回滚，与关闭连接的语义一致）"""
+        _release(self)
+    
+    def really_close(self):
+        sqlite3.Connection.close(self)
+
+
+def _open(db_path, readonly):
+    """新建连接并设置PRAGMA"""
+    if readonly:
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=BUSY_TIMEOUT,
+                               factory=PooledConnection, cached_statements=CACHED_STATEMENTS,
+                               check_same_thread=False)
+        conn.execute('PRAGMA query_only=ON')
+    else:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT,
+                               factory=PooledConnection, cached_statements=CACHED_STATEMENTS,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn._pool_key = (db_path, readonly)
+    conn._pool_refs = 0
+    return conn
+
+
+def get_connection(db_path, readonly=False):
+    """
+    获取数据库连接
+    
+    Args:
+        db_path: 数据库路径（相对路径按当前工作目录解析）
+        readonly: 是否只读（GET接口查询使用）
+    
+    Returns:
+        PooledConnection: 用完后调用 close() 归还
+    """
+    key = (os.path.abspath(db_path), readonly)
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    
+    conn = held.get(key)
+    if conn is None:
+        with _pool_lock:
+            conn = _idle[key].pop() if _idle[key] else None
+        with _stats_lock:
+            _pool_stats['reused' if conn is not None else 'created'] += 1
+        if conn is None:
+            conn = _open(key[0], readonly)
+        held[key] = conn
+    
+    if conn._pool_refs == 0:
+        # 新借出的连接恢复默认设置（上一个使用者可能改过row_factory或遗留了事务）
+        conn.row_factory = None
+        if conn.in_transaction:
+            conn.rollback()
+    conn._pool_refs += 1
+    return conn
+
+
+def _release(conn):
+    """引用计数归零后放回空闲池"""
+    if conn._pool_refs == 0:
+        # 重复调用close()
+        return
+    conn._pool_refs -= 1
+    if conn._pool_refs > 0:
+        return
+    
+    held = getattr(_local, 'held', {})
+    if held.get(conn._pool_key) is conn:
+        del held[conn._pool_key]
+    
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.really_close()
+        return
+    
+    with _pool_lock:
+        idle = _idle[conn._pool_key]
+        if len(idle) < MAX_IDLE_PER_DB:
+            idle.append(conn)
+            conn = None
+    with _stats_lock:
+        _pool_stats['released' if conn is None else 'discarded'] += 1
+    if conn is not None:
+        conn.really_close()
+
+
+@contextmanager
+def db_connection(db_path, readonly=False):
+    """
+    获取连接的上下文管理器
+    
+    正常退出时提交未提交的事务；出错时回滚（不把写事务和写锁留在连接上），
+    无论是否出错都归还连接。
+    """
+    conn = get_connection(db_path, readonly)
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+        raise
+    finally:
+        _release(conn)
+
+
+def release_all():
+    """
+    回滚并归还当前线程仍持有的全部连接（忽略引用计数）
+    
+    调用方出错后没有 close() 时，连接会留在线程的 held 中并保持写事务（占用写锁），
+    同一线程的下一个使用者还会继承并提交这个事务；Web 请求结束时调用本函数兜底。
+    
+    Returns:
+        int: 归还的连接数
+    """
+    held = getattr(_local, 'held', None)
+    if not held:
+        return 0
+    conns = list(held.values())
+    for conn in conns:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+        conn._pool_refs = 1
+        _release(conn)
+    return len(conns)
+
+
+def close_all():
+    """关闭全部空闲连接"""
+    with _pool_lock:
+        conns = [conn for idle in _idle.values() for conn in idle]
+        _idle.clear()
+    for conn in conns:
+        conn.really_close()
+
+
+def get_stats(limit=20):
+    """
+    获取连接池和SQL耗时统计
+    
+    Args:
+        limit: 返回总耗时最高的前N条SQL
+    
+    Returns:
+        dict: 统计信息
+    """
+    with _pool_lock:
+        idle = {f"{os.path.basename(path)}{' (ro)' if ro else ''}": len(conns)
+                for (path, ro), conns in _idle.items()}
+    with _stats_lock:
+        queries = sorted(_query_stats.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:limit]
+        return {
+            'pool': dict(_pool_stats),
+            'idle_connections': idle,
+            'queries': [
+                {
+                    'sql': sql,
+                    'count': stat['count'],
+                    'total_ms': round(stat['total_ms'], 2),
+                    'avg_ms': round(stat['total_ms'] / stat['count'], 3),
+                    'max_ms': round(stat['max_ms'], 2)
+                }
+                for sql, stat in queries
+            ]
+        }
+
+
+def reset_stats():
+    """清空SQL耗时统计"""
+    with _stats_lock:
+        _query_stats.clear()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+DB Query Audit - 热点查询执行计划审计与索引迁移
+
+对首页、K线、信号统计等每次刷新都会执行的查询运行 EXPLAIN QUERY PLAN，
+报告全表扫描和临时排序；并提供幂等的索引迁移（CREATE INDEX IF NOT EXISTS），
+表或列不存在时跳过。
+
+用法:
+    python db_query_audit.py                # 审计全部数据库
+    python db_query_audit.py --apply        # 先执行索引迁移再审计
+    python db_query_audit.py --db crypto_data --json
+"""
+import json
+import os
+import sqlite3
+import sys
+
+from db_pool import CRYPTO_DATA_DB
+
+PRICE_POSITION_DB = '/home/user/webapp/price_position_v2/config/data/db/price_position.db'
+
+DATABASES = {
+    'crypto_data': CRYPTO_DATA_DB,
+    'price_position': PRICE_POSITION_DB,
+}
+
+# 热点查询注册表：名称、所在数据库、SQL、示例参数、调用位置
+QUERY_REGISTRY = [
+    {
+        'name': 'homepage_snapshot_count',
+        'db': 'crypto_data',
+        'sql': 'SELECT COUNT(*) FROM crypto_snapshots',
+        'params': (),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'homepage_snapshot_today_count',
+        'db': 'crypto_data',
+        'sql': 'SELECT COUNT(*) FROM crypto_snapshots WHERE snapshot_date = ?',
+        'params': ('2026-01-01',),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'homepage_latest_snapshots',
+        'db': 'crypto_data',
+        'sql': '''
+            SELECT snapshot_time, rush_up, rush_down
+            FROM crypto_snapshots
+            ORDER BY snapshot_date DESC, snapshot_time DESC
+            LIMIT 2
+        ''',
+        'params': (),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'homepage_snapshot_date_range',
+        'db': 'crypto_data',
+        'sql': '''
+            SELECT (SELECT MIN(snapshot_date) FROM crypto_snapshots),
+                   (SELECT MAX(snapshot_date) FROM crypto_snapshots)
+        ''',
+        'params': (),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'homepage_last_snapshot_time',
+        'db': 'crypto_data',
+        'sql': 'SELECT MAX(snapshot_time) FROM crypto_snapshots',
+        'params': (),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'homepage_latest_panic',
+        'db': 'crypto_data',
+        'sql': '''
+            SELECT panic_index, hour_24_people, total_position
+            FROM panic_wash_index
+            ORDER BY record_time DESC
+            LIMIT 1
+        ''',
+        'params': (),
+        'caller': 'app.api_homepage_summary',
+    },
+    {
+        'name': 'symbol_kline_ohlc',
+        'db': 'crypto_data',
+        'sql': '''
+            SELECT timestamp, open, high, low, close, volume
+            FROM okex_kline_ohlc
+            WHERE symbol = ? AND timeframe = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''',
+        'params': ('BTC-USDT-SWAP', '5m', 2880),
+        'caller': 'app.api_symbol_kline',
+    },
+    {
+        'name': 'symbol_kline_indicators_fallback',
+        'db': 'crypto_data',
+        'sql': '''
+            SELECT timestamp, current_price
+            FROM okex_indicators_history
+            WHERE symbol = ? AND timeframe = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''',
+        'params': ('BTC-USDT-SWAP', '5m', 2880),
+        'caller': 'app.api_symbol_kline',
+    },
+    {
+        'name': 'signal_rolling_stats_range',
+        'db': 'price_position',
+        'sql': '''
+            SELECT snapshot_time, signal_type
+            FROM signal_timeline
+            WHERE snapshot_time > ? AND snapshot_time <= ?
+            ORDER BY snapshot_time ASC
+        ''',
+        'params': ('2026-01-01 00:00:00', '2026-01-02 00:00:00'),
+        'caller': 'signal_stats_collector.calculate_rolling_stats',
+    },
+]
+
+# 索引迁移：名称、所在数据库、表、列（前面的列用于查找/排序，后面的列用于覆盖查询）
+INDEX_MIGRATIONS = [
+    {
+        'name': 'idx_crypto_snapshots_date_time',
+        'db': 'crypto_data',
+        'table': 'crypto_snapshots',
+        'columns': ['snapshot_date', 'snapshot_time', 'rush_up', 'rush_down'],
+    },
+    {
+        'name': 'idx_crypto_snapshots_time',
+        'db': 'crypto_data',
+        'table': 'crypto_snapshots',
+        'columns': ['snapshot_time'],
+    },
+    {
+        'name': 'idx_panic_wash_index_record_time',
+        'db': 'crypto_data',
+        'table': 'panic_wash_index',
+        'columns': ['record_time'],
+    },
+    {
+        'name': 'idx_okex_kline_ohlc_symbol_tf_ts',
+        'db': 'crypto_data',
+        'table': 'okex_kline_ohlc',
+        'columns': ['symbol', 'timeframe', 'timestamp', 'open', 'high', 'low', 'close', 'volume'],
+    },
+    {
+        'name': 'idx_okex_indicators_history_symbol_tf_ts',
+        'db': 'crypto_data',
+        'table': 'okex_indicators_history',
+        'columns': ['symbol', 'timeframe', 'timestamp', 'current_price'],
+    },
+    {
+        'name': 'idx_signal_timeline_time_type',
+        'db': 'price_position',
+        'table': 'signal_timeline',
+        'columns': ['snapshot_time', 'signal_type'],
+    },
+]
+
+
+def _table_columns(conn, table):
+    """获取表的列名集合，表不存在时返回空集合"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def apply_migrations(conn, db_name):
+    """
+    执行某个数据库的索引迁移（幂等）
+    
+    Args:
+        conn: 可写的数据库连接
+        db_name: DATABASES 中的数据库名
+    
+    Returns:
+        list: 每个迁移的结果 {'name', 'status'}，status 为 created / exists / skipped
+    """
+    results = []
+    created = False
+    for migration in INDEX_MIGRATIONS:
+        if migration['db'] != db_name:
+            continue
+        
+        columns = _table_columns(conn, migration['table'])
+        missing = [c for c in migration['columns'] if c not in columns]
+        if not columns or missing:
+            results.append({'name': migration['name'], 'status': 'skipped',
+                            'reason': '表不存在' if not columns else f'缺少列: {", ".join(missing)}'})
+            continue
+        
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (migration['name'],)
+        ).fetchone()
+        if exists:
+            results.append({'name': migration['name'], 'status': 'exists'})
+            continue
+        
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {migration['name']} "
+            f"ON {migration['table']} ({', '.join(migration['columns'])})"
+        )
+        created = True
+        results.append({'name': migration['name'], 'status': 'created'})
+    
+    conn.commit()
+    if created:
+        # 更新统计信息，让查询规划器使用新索引
+        conn.execute('ANALYZE')
+        conn.commit()
+    return results
+
+
+def explain(conn, sql, params=()):
+    """
+    获取查询计划
+    
+    Returns:
+        list: 查询计划每一步的描述
+    """
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def _plan_issues(plan):
+    """从查询计划中找出全表扫描和临时B树排序"""
+    issues = []
+    for step in plan:
+        if step == 'SCAN CONSTANT ROW':
+            continue
+        if step.startswith('SCAN ') and 'COVERING INDEX' not in step and 'USING INDEX' not in step:
+            issues.append(f'全表扫描: {step}')
+        elif 'USE TEMP B-TREE' in step:
+            issues.append(f'临时排序: {step}')
+    return issues
+
+
+def audit(conn, db_name):
+    """
+    审计某个数据库中注册的热点查询
+    
+    Returns:
+        list: 每条查询的结果 {'name', 'caller', 'plan', 'issues'}，表不存在时带 error
+    """
+    report = []
+    for query in QUERY_REGISTRY:
+        if query['db'] != db_name:
+            continue
+        entry = {'name': query['name'], 'caller': query['caller']}
+        try:
+            entry['plan'] = explain(conn, query['sql'], query['params'])
+            entry['issues'] = _plan_issues(entry['plan'])
+        except sqlite3.Error as e:
+            entry['error'] = str(e)
+        report.append(entry)
+    return report
+
+
+def main():
+    """命令行：审计热点查询，可选先执行索引迁移"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='热点查询执行计划审计与索引迁移')
+    parser.add_argument('--db', choices=sorted(DATABASES), action='append',
+                        help='只处理指定数据库（可重复，默认全部）')
+    parser.add_argument('--apply', action='store_true', help='审计前执行索引迁移')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+    
+    args = parser.parse_args()
+    
+    output = {}
+    has_issues = False
+    for db_name in args.db or sorted(DATABASES):
+        db_path = DATABASES[db_name]
+        if not os.path.exists(db_path):
+            output[db_name] = {'error': f'数据库不存在: {db_path}'}
+            continue
+        
+        conn = sqlite3.connect(db_path, timeout=30.0)
+        try:
+            result = {}
+            if args.apply:
+                result['migrations'] = apply_migrations(conn, db_name)
+            result['queries'] = audit(conn, db_name)
+            has_issues = has_issues or any(q.get('issues') for q in result['queries'])
+            output[db_name] = result
+        finally:
+            conn.close()
+    
+    if args.json:
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+    else:
+        for db_name, result in output.items():
+            print(f"\n=== {db_name} ===")
+            if 'error' in result:
+                print(f"[错误] {result['error']}")
+                continue
+            for migration in result.get('migrations', []):
+                print(f"[迁移] {migration['name']}: {migration['status']} {migration.get('reason', '')}")
+            for query in result['queries']:
+                if 'error' in query:
+                    print(f"[跳过] {query['name']}: {query['error']}")
+                    continue
+                flag = '⚠️' if query['issues'] else '✅'
+                print(f"{flag} {query['name']} ({query['caller']})")
+                for step in query['plan']:
+                    print(f"    {step}")
+    
+    sys.exit(1 if has_issues else 0)
+
+
+if __name__ == '__main__':
+    main()
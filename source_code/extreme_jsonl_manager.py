@@ -1,19 +1,50 @@
 #!/usr/bin/env python3
 """
 Extreme JSONL Manager - 极端信号数据管理
+
+极值记录（每个 inst_id + pos_side + record_type 一条）的存储方式：
+- extreme_{mode}.journal：只追加的操作日志，每次写入只追加一行（upsert/delete），
+  只包含最新快照之后的操作
+- extreme_{mode}.snapshot_YYYYMMDD_HHMMSS_ffffff：定期压缩的全量快照，
+  首行记录快照时间和对应的日志字节偏移
+- extreme_{mode}.journal_YYYYMMDD_HHMMSS_ffffff：写入新快照时轮转出的日志段，
+  包含同名快照之后、下一个快照之前的操作；从启用日志开始的日志段为 journal_00000000_000000_000000
+  （旧版本不轮转时的完整日志也轮转为这个日志段，旧快照头中的偏移指向其中）
+当前状态 = 最新快照 + 回放快照之后的日志；
+任意时间点的状态 = 该时间点之前最近的快照 + 回放到该时间点的日志段。
+旧快照和它们的日志段一起清理，只能还原保留的最早快照之后的时间点。
+不再需要每次写入前把整个 extreme_{mode}.jsonl 复制成 .backup_* 文件。
 """
 import json
 import os
+import tempfile
 from pathlib import Path
 from datetime import datetime
+import pytz
+
+from jsonl_time_index import to_epoch
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
 
 class ExtremeJSONLManager:
     """极端信号JSONL数据管理器"""
     
-    def __init__(self, data_dir='/home/user/webapp/data/extreme_jsonl'):
+    # 快照之后的日志超过该大小时写入新快照
+    SNAPSHOT_JOURNAL_BYTES = 256 * 1024
+    # 保留的快照数量（连同各自的日志段）
+    KEEP_SNAPSHOTS = 48
+    # 从启用日志开始的日志段的时间后缀
+    INITIAL_SEGMENT = '00000000_000000_000000'
+    
+    def __init__(self, data_dir='/home/user/webapp/data/extreme_jsonl', trade_mode='real'):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.trade_mode = trade_mode
+        self.legacy_file = self.data_dir / f'extreme_{trade_mode}.jsonl'
+        self.journal_file = self.data_dir / f'extreme_{trade_mode}.journal'
+        self.snapshot_prefix = f'extreme_{trade_mode}.snapshot_'
+        self.segment_prefix = f'extreme_{trade_mode}.journal_'
     
     def get_latest_signals(self, symbol=None, limit=100):
         """
@@ -44,7 +75,305 @@ class ExtremeJSONLManager:
             
             all_data.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
             return all_data[:limit]
-            
+        
         except Exception as e:
             print(f"[ExtremeJSONLManager] 获取数据失败: {e}")
             return []
+    
+    @staticmethod
+    def record_key(record):
+        """极值记录的唯一键"""
+        return (record.get('inst_id'), record.get('pos_side'), record.get('record_type'))
+    
+    def get_all_records(self):
+        """
+        获取当前全部极值记录
+        
+        Returns:
+            list: 极值记录列表
+        """
+        try:
+            return list(self._load_state().values())
+        except Exception as e:
+            print(f"[ExtremeJSONLManager] 读取极值记录失败: {e}")
+            return []
+    
+    def get_state_at(self, timestamp):
+        """
+        还原某个时间点的全部极值记录
+        
+        Args:
+            timestamp: 时间点（秒/毫秒时间戳或 'YYYY-MM-DD HH:MM:SS' 北京时间）
+        
+        Returns:
+            list: 该时间点的极值记录列表
+        """
+        until = to_epoch(timestamp)
+        if until is None:
+            raise ValueError(f'无法解析的时间: {timestamp}')
+        return list(self._load_state(until).values())
+    
+    def upsert_record(self, record):
+        """
+        新增或更新一条极值记录（只追加一行日志）
+        
+        Args:
+            record: 极值记录，需包含 inst_id / pos_side / record_type
+        """
+        now = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+        record = dict(record)
+        record.setdefault('created_at', now)
+        record['updated_at'] = now
+        self._append_op('upsert', record)
+        return record
+    
+    def delete_record(self, inst_id, pos_side, record_type):
+        """删除一条极值记录（只追加一行日志）"""
+        self._append_op('delete', {'inst_id': inst_id, 'pos_side': pos_side, 'record_type': record_type})
+    
+    def write_snapshot(self):
+        """
+        把当前状态写成一个压缩快照，轮转日志，并清理多余的旧快照和日志段
+        
+        先把当前日志改名为上一个快照的日志段（之后的写入进入新的日志文件），
+        再由 上一个快照 + 日志段 得到状态写入新快照；中途失败时回放日志段仍能得到完整状态。
+        
+        Returns:
+            Path: 快照文件路径
+        """
+        if self.journal_file.exists():
+            latest = self._find_snapshot()
+            # 没有快照，或最新快照头中的偏移不为0（旧版本未轮转的完整日志）时，日志从启用时开始
+            if latest and not latest[1].get('journal_offset', 0):
+                suffix = self._suffix(latest[0], self.snapshot_prefix)
+            else:
+                suffix = self.INITIAL_SEGMENT
+            segment = self.data_dir / f'{self.segment_prefix}{suffix}'
+            if not segment.exists():
+                os.replace(self.journal_file, segment)
+            self.journal_file.touch()
+        state = self._load_state()
+        return self._write_snapshot(state, 0)
+    
+    def _append_op(self, op, record):
+        """追加一条操作日志，必要时写入新快照"""
+        if not self.journal_file.exists():
+            self._bootstrap_from_legacy()
+        
+        entry = {
+            'op': op,
+            'ts': datetime.now(BEIJING_TZ).timestamp(),
+            'key': list(self.record_key(record)),
+            'record': record if op == 'upsert' else None
+        }
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        
+        latest = self._find_snapshot()
+        snapshot_offset = latest[1]['journal_offset'] if latest else 0
+        if self.journal_file.stat().st_size - snapshot_offset >= self.SNAPSHOT_JOURNAL_BYTES:
+            self.write_snapshot()
+    
+    def _bootstrap_from_legacy(self):
+        """首次启用日志时，把旧的 extreme_{mode}.jsonl 作为初始快照"""
+        state = self._read_legacy()
+        self.journal_file.touch()
+        if state:
+            self._write_snapshot(state, 0)
+    
+    def _read_legacy(self):
+        """读取旧格式的全量文件（每行一条记录，后出现的覆盖先出现的）"""
+        state = {}
+        if not self.legacy_file.exists():
+            return state
+        with open(self.legacy_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                        state[self.record_key(record)] = record
+                    except json.JSONDecodeError:
+                        continue
+        return state
+    
+    def _snapshot_files(self):
+        """全部快照文件（按时间从旧到新）"""
+        return sorted(self.data_dir.glob(f'{self.snapshot_prefix}*'))
+    
+    def _segment_files(self):
+        """全部轮转出的日志段（按时间从旧到新）"""
+        return sorted(self.data_dir.glob(f'{self.segment_prefix}*'))
+    
+    @staticmethod
+    def _suffix(path, prefix):
+        return path.name[len(prefix):]
+    
+    def _read_snapshot_header(self, snapshot_file):
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+    
+    def _find_snapshot(self, until=None):
+        """
+        找到最近的（且不晚于 until 的）快照
+        
+        Returns:
+            tuple: (快照路径, 快照头)，没有时返回None
+        """
+        for snapshot_file in reversed(self._snapshot_files()):
+            try:
+                header = self._read_snapshot_header(snapshot_file)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if until is None or header.get('snapshot_time', 0) <= until:
+                return snapshot_file, header
+        return None
+    
+    def _write_snapshot(self, state, journal_offset):
+        """原子写入快照文件"""
+        now = datetime.now(BEIJING_TZ)
+        snapshot_file = self.data_dir / f"{self.snapshot_prefix}{now.strftime('%Y%m%d_%H%M%S_%f')}"
+        header = {
+            'snapshot_time': now.timestamp(),
+            'beijing_time': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'journal_offset': journal_offset,
+            'count': len(state)
+        }
+        
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix=f'.{snapshot_file.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(header, ensure_ascii=False) + '\n')
+                for record in state.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, snapshot_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        # 清理多余的旧快照，以及保留的最早快照之前的日志段
+        snapshots = self._snapshot_files()
+        for old_file in snapshots[:-self.KEEP_SNAPSHOTS]:
+            old_file.unlink()
+        oldest = snapshots[-self.KEEP_SNAPSHOTS:][0]
+        oldest_suffix = self._suffix(oldest, self.snapshot_prefix)
+        # 保留的快照中还有旧版本的偏移时，它们的操作在初始日志段中，不能删除
+        legacy_offsets = any(self._read_snapshot_header(f).get('journal_offset', 0)
+                             for f in snapshots[-self.KEEP_SNAPSHOTS:])
+        for segment in self._segment_files():
+            segment_suffix = self._suffix(segment, self.segment_prefix)
+            if segment_suffix < oldest_suffix and not (legacy_offsets and segment_suffix == self.INITIAL_SEGMENT):
+                segment.unlink()
+        
+        return snapshot_file
+    
+    def _load_state(self, until=None):
+        """
+        从快照 + 日志回放得到状态
+        
+        Args:
+            until: 截止时间（秒级时间戳），None表示当前
+        
+        Returns:
+            dict: 记录键 → 记录
+        """
+        if not self.journal_file.exists():
+            # 尚未启用日志，直接读取旧格式文件
+            return self._read_legacy()
+        
+        state = {}
+        journal_offset = 0
+        suffix = self.INITIAL_SEGMENT
+        found = self._find_snapshot(until)
+        if found:
+            snapshot_file, header = found
+            journal_offset = header.get('journal_offset', 0)
+            suffix = self._suffix(snapshot_file, self.snapshot_prefix)
+            with open(snapshot_file, 'r', encoding='utf-8') as f:
+                f.readline()  # 跳过快照头
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        state[self.record_key(record)] = record
+        elif until is not None and self._snapshot_files() and self._segment_files() and \
+                not (self.data_dir / f'{self.segment_prefix}{self.INITIAL_SEGMENT}').exists():
+            # 更早的快照和日志段已清理
+            raise ValueError('早于保留的最早快照，无法还原')
+        
+        # 快照之后的操作依次在：该快照的日志段、之后的日志段、当前日志；
+        # 旧版本快照头中的偏移指向初始日志段（尚未轮转时为当前日志），只作用于第一个文件
+        files = [segment for segment in self._segment_files()
+                 if self._suffix(segment, self.segment_prefix) >= suffix
+                 or (journal_offset and self._suffix(segment, self.segment_prefix) == self.INITIAL_SEGMENT)]
+        files.append(self.journal_file)
+        for journal in files:
+            if self._replay(journal, journal_offset, state, until):
+                break
+            journal_offset = 0
+        
+        return state
+    
+    def _replay(self, journal, offset, state, until):
+        """
+        从 offset 开始回放一个日志文件
+        
+        Returns:
+            bool: 是否已回放到 until（之后的文件无需再读）
+        """
+        try:
+            f = open(journal, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            # 轮转过程中当前日志可能暂时不存在
+            return False
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入中途的最后一行
+                    continue
+                if until is not None and entry.get('ts', 0) > until:
+                    return True
+                key = tuple(entry.get('key', []))
+                if entry.get('op') == 'upsert':
+                    state[key] = entry['record']
+                elif entry.get('op') == 'delete':
+                    state.pop(key, None)
+        return False
+
+
+def main():
+    """命令行：写快照 / 还原时间点状态 / 清理旧的全量备份文件"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='极值记录日志与快照管理')
+    parser.add_argument('--trade-mode', default='real', help='交易模式（默认real）')
+    parser.add_argument('--snapshot', action='store_true', help='立即写入一个快照')
+    parser.add_argument('--at', help="输出某时间点的状态（'YYYY-MM-DD HH:MM:SS'）")
+    parser.add_argument('--remove-legacy-backups', action='store_true',
+                        help='删除旧的 extreme_{mode}.jsonl.backup_* 全量备份文件')
+    
+    args = parser.parse_args()
+    manager = ExtremeJSONLManager(trade_mode=args.trade_mode)
+    
+    if args.snapshot:
+        print(f"[快照] 已写入 {manager.write_snapshot()}")
+    
+    if args.at:
+        for record in manager.get_state_at(args.at):
+            print(json.dumps(record, ensure_ascii=False))
+    
+    if args.remove_legacy_backups:
+        removed = 0
+        for backup_file in manager.data_dir.glob(f'{manager.legacy_file.name}.backup_*'):
+            backup_file.unlink()
+            removed += 1
+        print(f"[清理] 已删除 {removed} 个旧备份文件")
+
+
+if __name__ == '__main__':
+    main()
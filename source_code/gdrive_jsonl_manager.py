@@ -8,6 +8,8 @@ import time
 from datetime import datetime
 from pathlib import Path
 
+from jsonl_time_index import append_record
+
 
 class GDriveJSONLManager:
     """Google Drive JSONL数据管理器"""
@@ -64,13 +66,9 @@ class GDriveJSONLManager:
             date_str = datetime.now().strftime('%Y%m%d')
             jsonl_file = self.data_dir / f'gdrive_{date_str}.jsonl'
             
-            # 追加写入
-            with open(jsonl_file, 'a', encoding='utf-8') as f:
-                if isinstance(data, list):
-                    for item in data:
-                        f.write(json.dumps(item, ensure_ascii=False) + '\n')
-                else:
-                    f.write(json.dumps(data, ensure_ascii=False) + '\n')
+            # 追加写入并同步更新时间索引
+            for item in data if isinstance(data, list) else [data]:
+                append_record(jsonl_file, item, time_key='timestamp')
             
             print(f"[GDriveJSONLManager] 数据已保存到 {jsonl_file}")
             return True
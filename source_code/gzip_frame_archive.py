@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Gzip Frame Archive - 可随机访问的分块压缩日归档
+
+把按天归档的 *.jsonl.gz 重写为多个独立的gzip成员（帧），每帧约64KB未压缩数据，
+并在旁边写一个 <文件名>.fidx 帧索引，定长条目：
+    (帧内最早时间 float64, 帧内最晚时间 float64, 帧起始字节偏移 uint64, 帧压缩长度 uint64)
+多成员gzip仍是合法的 .jsonl.gz，gzip.open / zcat 等旧的读取方式不受影响。
+按时间窗口查询时只解压与窗口重叠的帧，解压后的帧放入LRU缓存，
+图表悬浮提示等小窗口请求不再需要解压整天的文件。
+
+用法（转换已有归档）:
+    python gzip_frame_archive.py data/anchor_daily/anchor_data_*.jsonl.gz --key timestamp
+    python gzip_frame_archive.py data/escape_signal_daily/escape_signal_*.jsonl.gz --key stat_time
+"""
+import gzip
+import json
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from jsonl_time_index import to_epoch
+
+FRAME_INDEX_SUFFIX = '.fidx'
+
+# 每帧未压缩数据大小
+FRAME_SIZE = 64 * 1024
+
+# 条目格式：最早时间 + 最晚时间 + 偏移 + 压缩长度
+_ENTRY = struct.Struct('<ddQQ')
+
+
+class FrameCache:
+    """解压后的帧的LRU缓存（线程安全）"""
+    
+    def __init__(self, max_frames=256):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            records = self._frames.get(key)
+            if records is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return records
+    
+    def put(self, key, records):
+        with self._lock:
+            self._frames[key] = records
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        with self._lock:
+            return {'frames': len(self._frames), 'max_frames': self.max_frames,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+# 模块级默认缓存
+_default_cache = FrameCache()
+
+
+def frame_index_path(file_path):
+    """获取归档文件对应的帧索引路径"""
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + FRAME_INDEX_SUFFIX)
+
+
+def _iter_source_lines(file_path):
+    """逐行读取源文件（.gz 或未压缩），产出非空行（bytes，含换行符）"""
+    opener = gzip.open if str(file_path).endswith('.gz') else open
+    with opener(file_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield line if line.endswith(b'\n') else line + b'\n'
+
+
+def build_archive(src_path, time_key='timestamp', dst_path=None, frame_size=FRAME_SIZE):
+    """
+    把JSONL（或 .jsonl.gz）写成分块压缩归档并生成帧索引
+    
+    Args:
+        src_path: 源文件路径
+        time_key: 记录中的时间字段名
+        dst_path: 输出路径（默认原地替换源文件，要求源文件为 .gz）
+        frame_size: 每帧未压缩数据大小
+    
+    Returns:
+        int: 写入的帧数
+    """
+    src_path = Path(src_path)
+    dst_path = Path(dst_path) if dst_path else src_path
+    idx_file = frame_index_path(dst_path)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=dst_path.parent, prefix=f'.{dst_path.name}.')
+    idx_fd, idx_tmp_path = tempfile.mkstemp(dir=dst_path.parent, prefix=f'.{idx_file.name}.')
+    frame_count = 0
+    try:
+        with os.fdopen(fd, 'wb') as out, os.fdopen(idx_fd, 'wb') as idx_out:
+            buffer = []
+            buffer_size = 0
+            first_ts = last_ts = None
+            
+            def flush():
+                nonlocal buffer, buffer_size, first_ts, last_ts, frame_count
+                if not buffer:
+                    return
+                data = gzip.compress(b''.join(buffer), compresslevel=6, mtime=0)
+                offset = out.tell()
+                out.write(data)
+                # 没有可解析时间的帧用 ±inf 表示，任何窗口都会命中
+                idx_out.write(_ENTRY.pack(
+                    first_ts if first_ts is not None else float('-inf'),
+                    last_ts if last_ts is not None else float('inf'),
+                    offset, len(data)))
+                frame_count += 1
+                buffer = []
+                buffer_size = 0
+                first_ts = last_ts = None
+            
+            for line in _iter_source_lines(src_path):
+                try:
+                    ts = to_epoch(json.loads(line).get(time_key))
+                except (json.JSONDecodeError, AttributeError):
+                    ts = None
+                if ts is not None:
+                    first_ts = ts if first_ts is None else min(first_ts, ts)
+                    last_ts = ts if last_ts is None else max(last_ts, ts)
+                buffer.append(line)
+                buffer_size += len(line)
+                if buffer_size >= frame_size:
+                    flush()
+            flush()
+        
+        os.chmod(tmp_path, 0o644)
+        os.chmod(idx_tmp_path, 0o644)
+        os.replace(tmp_path, dst_path)
+        os.replace(idx_tmp_path, idx_file)
+    except Exception:
+        for path in (tmp_path, idx_tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    
+    return frame_count
+
+
+def read_frame_index(file_path):
+    """
+    读取帧索引
+    
+    索引缺失或与归档文件不一致（归档被重写、追加）时返回None。
+    
+    Returns:
+        list: [(最早时间, 最晚时间, 偏移, 长度), ...]
+    """
+    file_path = Path(file_path)
+    idx_file = frame_index_path(file_path)
+    if not idx_file.exists() or not file_path.exists():
+        return None
+    
+    with open(idx_file, 'rb') as f:
+        data = f.read()
+    entries = [_ENTRY.unpack_from(data, i) for i in range(0, len(data) - len(data) % _ENTRY.size, _ENTRY.size)]
+    if not entries:
+        return None
+    
+    _, _, last_offset, last_length = entries[-1]
+    if last_offset + last_length != file_path.stat().st_size:
+        return None
+    return entries
+
+
+def _read_frame(file_path, offset, length, cache):
+    """解压单个帧（优先从缓存读取）"""
+    stat = file_path.stat()
+    key = (str(file_path), stat.st_mtime_ns, offset)
+    records = cache.get(key)
+    if records is not None:
+        return records
+    
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+    
+    records = []
+    for line in data.splitlines():
+        if line.strip():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    cache.put(key, records)
+    return records
+
+
+def _read_whole(file_path):
+    """没有帧索引时整体解压（兼容尚未转换的旧归档）"""
+    records = []
+    for line in _iter_source_lines(file_path):
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records
+
+
+def read_range(file_path, t0=None, t1=None, time_key='timestamp', limit=None, cache=None):
+    """
+    读取归档中时间窗口 [t0, t1] 内的记录
+    
+    Args:
+        file_path: 归档文件路径
+        t0: 起始时间（包含，None表示不限）
+        t1: 结束时间（包含，None表示不限）
+        time_key: 记录中的时间字段名
+        limit: 最多返回的记录数（可选）
+        cache: FrameCache实例（默认使用模块级缓存）
+    
+    Returns:
+        list: 按文件顺序排列的记录（每条为副本，可安全修改）
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return []
+    
+    cache = cache if cache is not None else _default_cache
+    t0 = to_epoch(t0)
+    t1 = to_epoch(t1)
+    
+    entries = read_frame_index(file_path)
+    if entries is None:
+        frames = [_read_whole(file_path)]
+    else:
+        frames = (
+            _read_frame(file_path, offset, length, cache)
+            for first_ts, last_ts, offset, length in entries
+            if (t0 is None or last_ts >= t0) and (t1 is None or first_ts <= t1)
+        )
+    
+    records = []
+    for frame in frames:
+        for record in frame:
+            if t0 is not None or t1 is not None:
+                ts = to_epoch(record.get(time_key))
+                if ts is None:
+                    continue
+                if t0 is not None and ts < t0:
+                    continue
+                if t1 is not None and ts > t1:
+                    continue
+            records.append(dict(record))
+            if limit is not None and len(records) >= limit:
+                return records
+    
+    return records
+
+
+def main():
+    """把已有的 .jsonl.gz 日归档原地转换为分块压缩格式"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='转换为可随机访问的分块压缩归档')
+    parser.add_argument('files', nargs='+', help='.jsonl.gz 文件路径')
+    parser.add_argument('--key', default='timestamp', help='记录中的时间字段名（默认timestamp）')
+    parser.add_argument('--frame-size', type=int, default=FRAME_SIZE, help='每帧未压缩字节数（默认64KB）')
+    
+    args = parser.parse_args()
+    
+    for file_path in args.files:
+        try:
+            before = os.path.getsize(file_path)
+            frames = build_archive(file_path, args.key, frame_size=args.frame_size)
+            after = os.path.getsize(file_path)
+            print(f"[归档] {file_path}: {frames} 帧, {before / 1024:.1f}KB → {after / 1024:.1f}KB")
+        except Exception as e:
+            print(f"[错误] {file_path} 转换失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
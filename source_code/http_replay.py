@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+HTTP Replay - OKX / btc126 请求的录制与离线回放
+
+在 requests 的 HTTPAdapter.send 上拦截请求（okx_market_client、ccxt、各采集器和 Flask 交易接口
+都经过这里），由环境变量切换：
+    HTTP_REPLAY_MODE=record   正常请求，同时把响应追加到夹具文件
+    HTTP_REPLAY_MODE=replay   不访问网络，从夹具文件按录制顺序返回响应
+    HTTP_REPLAY_DIR           夹具目录（默认 data/http_fixtures/default）
+    HTTP_REPLAY_LATENCY       回放延迟（毫秒），'50' 或区间 '20-200'
+    HTTP_REPLAY_ERROR_RATE    回放时注入错误的概率（0~1）
+    HTTP_REPLAY_ERRORS        注入的错误类型，逗号分隔：timeout / connection / 429 / 503（默认全部）
+    HTTP_REPLAY_SEED          延迟和错误注入的随机种子（默认0，同一种子结果可复现）
+    HTTP_REPLAY_MISS          回放时没有录制的请求：error（默认，返回599）/ live（放行到网络）
+    HTTP_REPLAY_RECORD_PRIVATE=1  录制时也保存OKX私有接口（账户/交易/资产，默认只放行不录制）
+
+夹具是 JSONL（可 gzip 压缩为 fixtures.jsonl.gz），每行一个响应。请求键为
+方法 + 主机 + 路径 + 排序后的查询参数 + 请求体哈希（签名头和时间戳不参与）；
+同一个键录制了多次时按顺序依次返回，用完后一直返回最后一次。
+只拦截 RECORD_HOSTS 中的主机，本地接口（localhost:9002 等）照常访问。
+夹具中不保存 OK-ACCESS-* 签名头（保存的请求头/响应头中一律替换为 ***）；
+私有接口（PRIVATE_PATHS 或带 OK-ACCESS-KEY 的请求）默认不录制，响应中有账户和持仓数据。
+夹具目录 data/http_fixtures/ 不提交到仓库（.gitignore）。
+
+用法:
+    HTTP_REPLAY_MODE=record python source_code/sar_slope_collector.py
+    python source_code/http_replay.py replay --dir data/http_fixtures/0301 --latency 20-80 -- \\
+        source_code/collector_host.py --run sar-slope-collector
+    python source_code/http_replay.py info --dir data/http_fixtures/0301
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+FIXTURE_ROOT = Path('/home/user/webapp/data/http_fixtures')
+FIXTURE_FILE = 'fixtures.jsonl'
+
+# 录制/回放的主机（后缀匹配）
+RECORD_HOSTS = ('okx.com', 'btc126.com')
+# 不参与请求键的查询参数（防缓存参数等）
+VOLATILE_PARAMS = {'_', 't', 'ts', 'timestamp'}
+# 只保存这些请求头/响应头（响应体按解码后的文本保存）
+KEEP_HEADERS = ('Content-Type',)
+KEEP_REQUEST_HEADERS = ('Content-Type', 'x-simulated-trading')
+# 签名相关的请求头前缀：夹具中一律打码
+REDACT_HEADER_PREFIX = 'ok-access-'
+# OKX私有接口（默认不录制）
+PRIVATE_PATHS = ('/api/v5/account/', '/api/v5/trade/', '/api/v5/asset/', '/api/v5/users/')
+
+ERROR_KINDS = ('timeout', 'connection', '429', '503')
+
+
+def _should_intercept(url):
+    host = urlsplit(url).hostname or ''
+    return any(host == h or host.endswith('.' + h) for h in RECORD_HOSTS)
+
+
+def _is_private(request):
+    """OKX私有接口：路径在 PRIVATE_PATHS 中，或请求带签名头"""
+    path = urlsplit(request.url).path
+    return path.startswith(PRIVATE_PATHS) or 'OK-ACCESS-KEY' in request.headers
+
+
+def _saved_headers(headers, keep):
+    """要写入夹具的头：只保留 keep 中的头，OK-ACCESS-* 打码"""
+    return {k: '***' if k.lower().startswith(REDACT_HEADER_PREFIX) else headers[k]
+            for k in keep if k in headers}
+
+
+def request_key(method, url, body=None):
+    """请求键：方法 + 主机 + 路径 + 查询参数 + 请求体哈希"""
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                    if k not in VOLATILE_PARAMS)
+    query = '&'.join(f'{k}={v}' for k, v in params)
+    key = f'{method.upper()} {parts.hostname}{parts.path}'
+    if query:
+        key += f'?{query}'
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += f' #{hashlib.sha1(body).hexdigest()[:12]}'
+    return key
+
+
+def _parse_latency(value):
+    """'50' → (0.05, 0.05)；'20-200' → (0.02, 0.2)"""
+    if not value:
+        return 0.0, 0.0
+    low, _, high = str(value).partition('-')
+    low = float(low) / 1000
+    return low, (float(high) / 1000 if high else low)
+
+
+class FixtureStore:
+    """夹具文件：录制时追加（多进程用 flock），回放时按请求键分组"""
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._entries = None
+        self._cursor = defaultdict(int)
+        self._lock = threading.Lock()
+    
+    def append(self, entry):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with open(self.directory / FIXTURE_FILE, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def iter_entries(self):
+        for name in (FIXTURE_FILE + '.gz', FIXTURE_FILE):
+            path = self.directory / name
+            if not path.exists():
+                continue
+            opener = gzip.open if name.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+    
+    def _load(self):
+        if self._entries is None:
+            entries = defaultdict(list)
+            for entry in self.iter_entries():
+                entries[entry['key']].append(entry)
+            self._entries = entries
+        return self._entries
+    
+    def next(self, key):
+        """按录制顺序返回下一条响应，用完后一直返回最后一条；没有录制时返回 None"""
+        with self._lock:
+            entries = self._load().get(key)
+            if not entries:
+                return None
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            return entries[index]
+
+
+class ReplayConfig:
+    """从环境变量读取的录制/回放配置"""
+    
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        self.mode = env.get('HTTP_REPLAY_MODE', '').lower()
+        self.directory = Path(env.get('HTTP_REPLAY_DIR') or FIXTURE_ROOT / 'default')
+        self.latency = _parse_latency(env.get('HTTP_REPLAY_LATENCY'))
+        self.error_rate = float(env.get('HTTP_REPLAY_ERROR_RATE') or 0)
+        self.errors = [e.strip() for e in (env.get('HTTP_REPLAY_ERRORS') or ','.join(ERROR_KINDS)).split(',')
+                       if e.strip() in ERROR_KINDS]
+        self.seed = int(env.get('HTTP_REPLAY_SEED') or 0)
+        self.miss = env.get('HTTP_REPLAY_MISS', 'error').lower()
+        self.record_private = env.get('HTTP_REPLAY_RECORD_PRIVATE', '').lower() in ('1', 'true', 'yes')
+
+
+_original_send = HTTPAdapter.send
+_installed = None
+
+
+def _build_response(request, status, body, headers=None, elapsed=0.0):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body.encode('utf-8') if isinstance(body, str) else body
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = request.url
+    response.request = request
+    response.encoding = 'utf-8'
+    response.reason = 'Replayed'
+    response.elapsed = timedelta(seconds=elapsed)
+    return response
+
+
+class HTTPReplay:
+    """安装到 HTTPAdapter.send 上的录制/回放器"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.store = FixtureStore(config.directory)
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0, 'injected': 0, 'passthrough': 0,
+                      'private_skipped': 0}
+    
+    def _record(self, adapter, request, **kwargs):
+        if not self.config.record_private and _is_private(request):
+            # 私有接口只放行，不写入夹具
+            self.stats['private_skipped'] += 1
+            return _original_send(adapter, request, **kwargs)
+        
+        start = time.time()
+        response = _original_send(adapter, request, **kwargs)
+        # 读取内容（stream 请求也一并读取）以便保存
+        body = response.content
+        self.store.append({
+            'key': request_key(request.method, request.url, request.body),
+            'method': request.method,
+            'url': request.url,
+            'request_headers': _saved_headers(request.headers, KEEP_REQUEST_HEADERS),
+            'status': response.status_code,
+            'headers': _saved_headers(response.headers, KEEP_HEADERS),
+            'body': body.decode(response.encoding or 'utf-8', errors='replace'),
+            'elapsed': round(time.time() - start, 4),
+            't': start
+        })
+        self.stats['recorded'] += 1
+        return response
+    
+    def _draw(self):
+        """本次请求的延迟和要注入的错误（同一种子下序列固定）"""
+        with self._random_lock:
+            low, high = self.config.latency
+            delay = self._random.uniform(low, high) if high > 0 else 0.0
+            error = None
+            if self.config.errors and self._random.random() < self.config.error_rate:
+                error = self._random.choice(self.config.errors)
+        return delay, error
+    
+    def _replay(self, adapter, request, **kwargs):
+        delay, error = self._draw()
+        if delay:
+            time.sleep(delay)
+        
+        if error:
+            self.stats['injected'] += 1
+            if error == 'timeout':
+                raise requests.exceptions.ReadTimeout(f'[回放] 注入超时: {request.url}', request=request)
+            if error == 'connection':
+                raise requests.exceptions.ConnectionError(f'[回放] 注入连接错误: {request.url}', request=request)
+            return _build_response(request, int(error), json.dumps({'code': '50011', 'msg': 'injected'}),
+                                   {'Content-Type': 'application/json'}, delay)
+        
+        entry = self.store.next(request_key(request.method, request.url, request.body))
+        if entry is None:
+            self.stats['missed'] += 1
+            if self.config.miss == 'live':
+                self.stats['passthrough'] += 1
+                return _original_send(adapter, request, **kwargs)
+            print(f"[回放] 没有录制的请求: {request.method} {request.url}")
+            return _build_response(request, 599, json.dumps({'code': '599', 'msg': 'not recorded'}),
+                                   {'Content-Type': 'application/json'}, delay)
+        
+        self.stats['replayed'] += 1
+        return _build_response(request, entry['status'], entry['body'], entry.get('headers'), delay)
+    
+    def send(self, adapter, request, **kwargs):
+        if not _should_intercept(request.url):
+            return _original_send(adapter, request, **kwargs)
+        if self.config.mode == 'record':
+            return self._record(adapter, request, **kwargs)
+        return self._replay(adapter, request, **kwargs)
+
+
+def install(config):
+    """拦截 requests 的所有请求；mode 不是 record / replay 时不做任何事"""
+    global _installed
+    if config.mode not in ('record', 'replay'):
+        return None
+    replay = HTTPReplay(config)
+    HTTPAdapter.send = lambda adapter, request, **kwargs: replay.send(adapter, request, **kwargs)
+    _installed = replay
+    print(f"[回放] HTTP {config.mode} 模式: {config.directory}")
+    return replay
+
+
+def install_from_env():
+    """按环境变量安装（进程入口调用一次，重复调用无效果）"""
+    if _installed is not None:
+        return _installed
+    return install(ReplayConfig())
+
+
+def uninstall():
+    global _installed
+    HTTPAdapter.send = _original_send
+    _installed = None
+
+
+def summarize(directory):
+    """
+    统计夹具中每个接口的录制数
+    
+    Returns:
+        dict: {'方法 主机路径': {'count', 'keys', 'errors', 'avg_elapsed'}}
+    """
+    summary = {}
+    for entry in FixtureStore(directory).iter_entries():
+        parts = urlsplit(entry['url'])
+        name = f"{entry['method']} {parts.hostname}{parts.path}"
+        item = summary.setdefault(name, {'count': 0, 'keys': set(), 'errors': 0, 'elapsed': 0.0})
+        item['count'] += 1
+        item['keys'].add(entry['key'])
+        item['errors'] += entry['status'] >= 400
+        item['elapsed'] += entry.get('elapsed', 0)
+    return {name: {'count': item['count'], 'keys': len(item['keys']), 'errors': item['errors'],
+                   'avg_elapsed': round(item['elapsed'] / item['count'], 4)}
+            for name, item in sorted(summary.items())}
+
+
+def main():
+    """命令行：在录制/回放模式下运行一个脚本，或查看夹具统计"""
+    import argparse
+    import runpy
+    import sys
+    
+    parser = argparse.ArgumentParser(description='OKX / btc126 请求录制与回放',
+                                     usage='%(prog)s {record,replay,info} [选项] [--] [脚本 参数...]')
+    parser.add_argument('mode', choices=['record', 'replay', 'info'])
+    parser.add_argument('--dir', default=str(FIXTURE_ROOT / 'default'), help='夹具目录')
+    parser.add_argument('--latency', help="回放延迟毫秒，'50' 或 '20-200'")
+    parser.add_argument('--error-rate', type=float, help='回放时注入错误的概率')
+    parser.add_argument('--errors', help=f"注入的错误类型（{','.join(ERROR_KINDS)}）")
+    parser.add_argument('--seed', type=int, help='随机种子')
+    parser.add_argument('--miss', choices=['error', 'live'], help='没有录制的请求如何处理')
+    parser.add_argument('--record-private', action='store_true',
+                        help='录制时也保存OKX私有接口（账户/交易/资产）的响应')
+    
+    # 脚本及其参数原样传给脚本：从 -- 或第一个 .py 参数处分开
+    argv = sys.argv[1:]
+    if '--' in argv:
+        split = argv.index('--')
+        argv, command = argv[:split], argv[split + 1:]
+    else:
+        split = next((i for i, arg in enumerate(argv) if arg.endswith('.py')), len(argv))
+        argv, command = argv[:split], argv[split:]
+    args = parser.parse_args(argv)
+    
+    if args.mode == 'info':
+        for name, item in summarize(args.dir).items():
+            print(f"  {name:70s} {item['count']:>6d} 条  {item['keys']:>5d} 个请求键  "
+                  f"错误 {item['errors']}  平均 {item['avg_elapsed'] * 1000:.0f}ms")
+        return
+    if not command:
+        parser.error('需要指定要运行的脚本')
+    
+    os.environ['HTTP_REPLAY_MODE'] = args.mode
+    os.environ['HTTP_REPLAY_DIR'] = args.dir
+    for name, value in (('LATENCY', args.latency), ('ERROR_RATE', args.error_rate), ('ERRORS', args.errors),
+                        ('SEED', args.seed), ('MISS', args.miss)):
+        if value is not None:
+            os.environ[f'HTTP_REPLAY_{name}'] = str(value)
+    if args.record_private:
+        os.environ['HTTP_REPLAY_RECORD_PRIVATE'] = '1'
+    install_from_env()
+    
+    sys.argv = command
+    sys.path.insert(0, str(Path(command[0]).resolve().parent))
+    runpy.run_path(command[0], run_name='__main__')
+
+
+if __name__ == '__main__':
+    main()
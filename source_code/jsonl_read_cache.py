@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+JSONL Read Cache - 进程内JSONL解析缓存
+
+按 (路径, inode, 大小, mtime) 判断文件是否变化：
+- 未变化：直接返回已解析的记录
+- 只追加增长：只解析新增的字节，追加到已解析列表
+  （先校验已解析部分末尾一段字节的哈希，不一致说明文件被原地重写后又变长，整体重新解析）
+- 被重写/截断/替换：整体重新解析
+缓存按已解析字节数做LRU淘汰，统计命中/未命中/解析字节数，
+供Flask接口在被多个页面频繁轮询时复用解析结果。
+
+注意：返回的记录对象在多次调用之间共享，调用方不得修改。
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# 缓存的已解析字节数上限（解析后的对象占用约为其数倍）
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# 追加增长时校验的已解析部分末尾字节数
+CHECK_BYTES = 4096
+
+
+class JSONLReadCache:
+    """进程内JSONL解析缓存（线程安全）"""
+    
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extends = 0
+        self.rewrites = 0
+        self.evictions = 0
+        self.bytes_parsed = 0
+    
+    @staticmethod
+    def _parse(data):
+        """解析完整的行，跳过空行和损坏的行"""
+        records = []
+        for line in data.split(b'\n'):
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+    
+    @staticmethod
+    def _digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+    
+    def _load(self, file_path, entry, stat):
+        """
+        从 entry['offset'] 开始解析到文件末尾
+        
+        偏移之前最后 CHECK_BYTES 字节的哈希与上次解析时不一致时（文件被原地重写），
+        不解析并返回 False，由调用方整体重新解析。
+        最后一行没有换行符时（写入中或手工编辑的文件）只临时解析，不推进偏移，
+        下次文件增长时与后续字节一起重新解析。
+        """
+        with open(file_path, 'rb') as f:
+            check_start = max(0, entry['offset'] - CHECK_BYTES)
+            f.seek(check_start)
+            checked = f.read(entry['offset'] - check_start)
+            if self._digest(checked) != entry['check']:
+                return False
+            data = f.read(stat.st_size - entry['offset'])
+        
+        cut = data.rfind(b'\n') + 1
+        entry['records'].extend(self._parse(data[:cut]))
+        entry['offset'] += cut
+        entry['check'] = self._digest((checked + data[:cut])[-CHECK_BYTES:])
+        entry['tail'] = self._parse(data[cut:])
+        entry['size'] = stat.st_size
+        entry['mtime_ns'] = stat.st_mtime_ns
+        self.bytes_parsed += len(data)
+        return True
+    
+    def read(self, file_path):
+        """
+        读取JSONL文件的全部记录
+        
+        Args:
+            file_path: JSONL文件路径
+        
+        Returns:
+            list: 按文件顺序排列的记录（新列表，记录对象共享），文件不存在时返回空列表
+        """
+        path = os.path.abspath(str(file_path))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.clear(path)
+            return []
+        
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['inode'] == stat.st_ino:
+                if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    self.hits += 1
+                    self._entries.move_to_end(path)
+                    return entry['records'] + entry['tail']
+                if stat.st_size > entry['size']:
+                    # 只追加增长：解析新增部分
+                    self._total_bytes -= entry['offset']
+                    if self._load(path, entry, stat):
+                        self.extends += 1
+                        self._total_bytes += entry['offset']
+                        self._entries.move_to_end(path)
+                        self._evict()
+                        return entry['records'] + entry['tail']
+                    self.rewrites += 1
+                    self._entries.pop(path)
+                    entry = None
+            
+            # 首次读取或文件被重写：整体解析
+            self.misses += 1
+            if entry is not None:
+                self._total_bytes -= entry['offset']
+            entry = {'inode': stat.st_ino, 'size': 0, 'mtime_ns': 0, 'offset': 0,
+                     'check': self._digest(b''), 'records': [], 'tail': []}
+            self._load(path, entry, stat)
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            self._total_bytes += entry['offset']
+            self._evict()
+            return entry['records'] + entry['tail']
+    
+    def read_last(self, file_path):
+        """读取最后一条记录，没有时返回None"""
+        records = self.read(file_path)
+        return records[-1] if records else None
+    
+    def _evict(self):
+        """按LRU淘汰，直到总字节数不超过上限（至少保留最近使用的一个文件）"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry['offset']
+            self.evictions += 1
+    
+    def clear(self, file_path=None):
+        """清除某个文件或全部缓存"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            entry = self._entries.pop(os.path.abspath(str(file_path)), None)
+            if entry is not None:
+                self._total_bytes -= entry['offset']
+    
+    def get_stats(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            requests = self.hits + self.misses + self.extends
+            return {
+                'files': len(self._entries),
+                'cached_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'extends': self.extends,
+                'rewrites': self.rewrites,
+                'evictions': self.evictions,
+                'bytes_parsed': self.bytes_parsed,
+                'hit_rate': round(self.hits / requests, 4) if requests else 0
+            }
+
+
+# 进程级共享实例
+jsonl_cache = JSONLReadCache()
+
+
+def read_jsonl(file_path):
+    """使用进程级缓存读取JSONL文件的全部记录"""
+    return jsonl_cache.read(file_path)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+JSONL Tail Reader - 从文件末尾反向读取JSONL记录
+按块从EOF向前读取，只解析需要的最后N条（或某时间点之后的）记录，
+避免 f.readlines() 把整个按天/按币种增长的文件读入内存
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# 每次向前读取的块大小
+BLOCK_SIZE = 64 * 1024
+
+
+def iter_lines_reversed(file_path, block_size=BLOCK_SIZE):
+    """
+    从文件末尾向前逐行产出非空行
+    
+    Args:
+        file_path: JSONL文件路径
+        block_size: 每次读取的字节数
+    
+    Yields:
+        bytes: 一行内容（不含换行符），顺序为从最后一行到第一行
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            
+            lines = chunk.split(b'\n')
+            # 第一段可能是不完整的行，留到下一块拼接
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        
+        if remainder.strip():
+            yield remainder
+
+
+def read_last_records(file_path, n, block_size=BLOCK_SIZE):
+    """
+    读取文件最后N条有效JSON记录
+    
+    Args:
+        file_path: JSONL文件路径
+        n: 需要的记录数
+        block_size: 每次读取的字节数
+    
+    Returns:
+        list: 按文件顺序（旧→新）排列的记录，文件不存在时返回空列表
+    """
+    file_path = Path(file_path)
+    if n <= 0 or not file_path.exists():
+        return []
+    
+    records = []
+    for line in iter_lines_reversed(file_path, block_size):
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # 跳过损坏的行（包括写入中途的最后一行）
+            continue
+        if len(records) >= n:
+            break
+    
+    records.reverse()
+    return records
+
+
+def read_last_record(file_path):
+    """
+    读取文件最后一条有效JSON记录
+    
+    Args:
+        file_path: JSONL文件路径
+    
+    Returns:
+        dict: 最后一条记录，没有时返回None
+    """
+    records = read_last_records(file_path, 1)
+    return records[0] if records else None
+
+
+def read_records_since(file_path, since, key='timestamp', limit=None, block_size=BLOCK_SIZE):
+    """
+    读取某个时间点之后的记录（要求文件按key递增追加）
+    
+    从末尾向前读取，遇到第一条 key <= since 的记录即停止。
+    since 的类型需与记录中 key 字段一致（如时间戳int或 'YYYY-MM-DD HH:MM:SS' 字符串）。
+    
+    Args:
+        file_path: JSONL文件路径
+        since: 起始时间（不包含）
+        key: 记录中的时间字段名
+        limit: 最多返回的记录数（可选）
+        block_size: 每次读取的字节数
+    
+    Returns:
+        list: 按文件顺序（旧→新）排列的记录
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return []
+    
+    records = []
+    for line in iter_lines_reversed(file_path, block_size):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        
+        value = record.get(key)
+        if value is None:
+            continue
+        if value <= since:
+            break
+        
+        records.append(record)
+        if limit is not None and len(records) >= limit:
+            break
+    
+    records.reverse()
+    return records
+
+
+def replace_first_line(file_path, first_line):
+    """
+    替换文件的第一行（如执行许可文件头），其余内容按块流式拷贝
+    
+    先写入同目录临时文件再原子替换，不会把整个文件读入内存。
+    
+    Args:
+        file_path: 文件路径
+        first_line: 新的第一行内容（不含换行符）
+    """
+    file_path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f'.{file_path.name}.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as out:
+            out.write(first_line + '\n')
+            out.flush()
+            if file_path.exists():
+                with open(file_path, 'rb') as src:
+                    src.readline()  # 跳过旧的第一行
+                    shutil.copyfileobj(src, out.buffer)
+        if file_path.exists():
+            shutil.copymode(file_path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+JSONL Time Index - JSONL分区文件的时间→字节偏移旁路索引
+
+每个JSONL文件旁边有一个 <文件名>.tidx 索引文件，由定长条目组成：
+    (时间戳秒 float64, 行起始字节偏移 uint64)
+采集器追加记录时同步追加索引条目；索引缺失或过期时可离线重建。
+查询时在索引上二分查找，直接 seek 到时间窗口的起点，
+查询耗时不再随当天文件增长而线性增加。
+
+用法（离线重建）:
+    python jsonl_time_index.py data/sar_jsonl/BTC.jsonl --key timestamp
+"""
+import json
+import os
+import struct
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytz
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+INDEX_SUFFIX = '.tidx'
+
+# 条目格式：时间戳（秒）+ 字节偏移
+_ENTRY = struct.Struct('<dQ')
+
+
+def to_epoch(value):
+    """
+    把记录中的时间字段统一转换为秒级时间戳
+    
+    支持：秒/毫秒时间戳、ISO格式字符串、'YYYY-MM-DD HH:MM:SS'（按北京时间）
+    
+    Args:
+        value: 时间值
+    
+    Returns:
+        float: 秒级时间戳，无法解析时返回None
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    
+    if isinstance(value, (int, float)):
+        # 毫秒时间戳
+        return value / 1000.0 if value > 1e11 else float(value)
+    
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str):
+        try:
+            dt = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    else:
+        return None
+    
+    if dt.tzinfo is None:
+        dt = BEIJING_TZ.localize(dt)
+    return dt.timestamp()
+
+
+def index_path(file_path):
+    """获取JSONL文件对应的索引文件路径"""
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + INDEX_SUFFIX)
+
+
+def append_index_entry(file_path, offset, timestamp):
+    """
+    追加一条索引条目
+    
+    Args:
+        file_path: JSONL文件路径
+        offset: 记录所在行的起始字节偏移
+        timestamp: 记录时间（任意 to_epoch 支持的格式）
+    """
+    ts = to_epoch(timestamp)
+    if ts is None:
+        return
+    with open(index_path(file_path), 'ab') as f:
+        f.write(_ENTRY.pack(ts, offset))
+
+
+def append_record(file_path, record, time_key='timestamp'):
+    """
+    追加一条JSONL记录，并同步更新旁路索引
+    
+    Args:
+        file_path: JSONL文件路径
+        record: 记录（dict）
+        time_key: 记录中的时间字段名
+    """
+    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+    with open(file_path, 'ab') as f:
+        offset = f.tell()
+        f.write(line)
+    append_index_entry(file_path, offset, record.get(time_key))
+
+
+def rebuild_index(file_path, time_key='timestamp'):
+    """
+    扫描整个JSONL文件重建索引（离线使用）
+    
+    Args:
+        file_path: JSONL文件路径
+        time_key: 记录中的时间字段名
+    
+    Returns:
+        int: 写入的索引条目数
+    """
+    file_path = Path(file_path)
+    idx_file = index_path(file_path)
+    count = 0
+    
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f'.{idx_file.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as out, open(file_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    try:
+                        ts = to_epoch(json.loads(line).get(time_key))
+                    except (json.JSONDecodeError, AttributeError):
+                        ts = None
+                    if ts is not None:
+                        out.write(_ENTRY.pack(ts, offset))
+                        count += 1
+                offset += len(line)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, idx_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return count
+
+
+def _find_start_offset(file_path, t0):
+    """
+    在索引上二分查找第一条时间 >= t0 的记录偏移
+    
+    索引缺失或与数据文件不一致时返回0（退化为从头扫描）。
+    索引之后追加但未建索引的部分会从最后一个索引条目处顺序扫描。
+    """
+    idx_file = index_path(file_path)
+    if not idx_file.exists():
+        return 0
+    
+    data_size = file_path.stat().st_size
+    with open(idx_file, 'rb') as f:
+        entry_count = idx_file.stat().st_size // _ENTRY.size
+        if entry_count == 0:
+            return 0
+        
+        def entry(i):
+            f.seek(i * _ENTRY.size)
+            return _ENTRY.unpack(f.read(_ENTRY.size))
+        
+        last_ts, last_offset = entry(entry_count - 1)
+        if last_offset >= data_size:
+            # 数据文件被截断或重写，索引已失效
+            return 0
+        
+        if t0 is None:
+            return 0
+        
+        lo, hi = 0, entry_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entry(mid)[0] < t0:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        if lo == entry_count:
+            return last_offset
+        return entry(lo)[1]
+
+
+def read_range(file_path, t0=None, t1=None, time_key='timestamp', limit=None):
+    """
+    读取时间窗口 [t0, t1] 内的记录（要求文件按时间递增追加）
+    
+    Args:
+        file_path: JSONL文件路径
+        t0: 起始时间（包含，None表示不限）
+        t1: 结束时间（包含，None表示不限）
+        time_key: 记录中的时间字段名
+        limit: 最多返回的记录数（可选）
+    
+    Returns:
+        list: 按时间顺序排列的记录
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return []
+    
+    t0 = to_epoch(t0)
+    t1 = to_epoch(t1)
+    start_offset = _find_start_offset(file_path, t0)
+    
+    records = []
+    with open(file_path, 'rb') as f:
+        if start_offset:
+            # 确认偏移位于行首，否则退化为从头扫描
+            f.seek(start_offset - 1)
+            if f.read(1) != b'\n':
+                start_offset = 0
+        f.seek(start_offset)
+        
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            
+            ts = to_epoch(record.get(time_key))
+            if ts is None:
+                continue
+            if t0 is not None and ts < t0:
+                continue
+            if t1 is not None and ts > t1:
+                break
+            
+            records.append(record)
+            if limit is not None and len(records) >= limit:
+                break
+    
+    return records
+
+
+def main():
+    """离线重建索引"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='重建JSONL时间偏移索引')
+    parser.add_argument('files', nargs='+', help='JSONL文件路径')
+    parser.add_argument('--key', default='timestamp', help='记录中的时间字段名（默认timestamp）')
+    
+    args = parser.parse_args()
+    
+    for file_path in args.files:
+        try:
+            count = rebuild_index(file_path, args.key)
+            print(f"[索引] {file_path}: {count} 条")
+        except Exception as e:
+            print(f"[错误] {file_path} 重建索引失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,13 @@
 Liquidation 1H Manager - 1小时爆仓数据管理器
 从 panic_wash_index.jsonl 读取爆仓数据，提供给前端图表使用
 """
-import json
 from pathlib import Path
 from datetime import datetime
 import pytz
 
+from jsonl_tail_reader import read_last_records
+from jsonl_time_index import read_range
+
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
 
@@ -54,36 +56,18 @@ class Liquidation1HManager:
                 except:
                     pass
             
-            # 读取所有记录
-            with open(self.jsonl_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            if start_ts or end_ts:
+                # 有时间范围：通过时间索引直接定位到窗口起点
+                raw_records = read_range(self.jsonl_file, start_ts, end_ts, time_key='timestamp')
+            else:
+                # 无时间范围：从文件末尾读取最新的记录
+                raw_records = read_last_records(self.jsonl_file, limit)
             
-            # 从后往前读取，获取最新的记录
-            for line in reversed(lines):
-                if len(records) >= limit:
-                    break
-                
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    record = json.loads(line)
-                    
-                    # 检查时间范围
-                    timestamp = record.get('timestamp', 0)
-                    if start_ts and timestamp < start_ts:
-                        continue
-                    if end_ts and timestamp > end_ts:
-                        continue
-                    
-                    # 提取需要的字段并转换格式
-                    formatted_record = self._format_record(record)
-                    if formatted_record:
-                        records.insert(0, formatted_record)  # 插入到开头，保持时间顺序
-                        
-                except Exception as e:
-                    continue
+            # 取最新的limit条，提取需要的字段并转换格式
+            for record in raw_records[-limit:]:
+                formatted_record = self._format_record(record)
+                if formatted_record:
+                    records.append(formatted_record)
             
             return records
             
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Market Data Bus - K线一次获取、多采集器共享
+
+多个采集器在同一分钟内请求相同的K线（SAR的1m、涨跌追踪的5m、价格位置的5m/1H ...），
+由一个发布进程统一获取，采集器订阅后直接读取：
+- 发布进程在每根K线收盘后（+PUBLISH_DELAY秒）对每个 (instId, 周期) 同步一次 candle_store，
+  然后通过 Unix 数据报套接字把 {已收盘最后一根的时间戳, 正在形成的K线} 推送给订阅者
+- K线数据本身在 candle_store 的共享文件中（内存映射读取），消息里只有时间戳，
+  订阅者按推送的时间戳截取，所以同一周期内所有采集器用的是完全相同的K线
+- 订阅是动态的：采集器第一次请求某个 (instId, 周期) 时发送订阅，发布进程立即同步并推送一次
+- 发布进程未运行或推送超时时，MarketBus.get_klines 退回到 candle_store.get_klines 自己请求
+- 正在形成的K线也由发布进程统一获取：每 FORMING_INTERVAL 秒请求一次最新一根（limit=1）
+  并推送，订阅者只使用推送的这一根，同一时刻所有采集器看到的正在形成的K线也完全相同，
+  不再每个采集器、每个币种各自请求一次
+
+用法:
+    python market_data_bus.py                          # 启动发布进程
+    python market_data_bus.py --preload BTC,ETH --bars 1m,5m
+    python market_data_bus.py --status                 # 查看发布进程的订阅和统计
+    
+    from market_data_bus import market_bus
+    klines = market_bus.get_klines('BTC', '1m', 100)   # 与 candle_store.get_klines 相同的返回格式
+"""
+import atexit
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from candle_store import BAR_MS, CANDLE_DTYPE, candle_store, normalize_bar, to_klines, with_forming
+from concurrent_fetch import fetch_all
+
+BUS_DIR = Path('/dev/shm/market_data_bus') if os.path.isdir('/dev/shm') \
+    else Path('/home/user/webapp/data/market_data_bus')
+PRODUCER_SOCKET = BUS_DIR / 'producer.sock'
+
+# K线收盘后等待的秒数（交易所确认收盘有延迟）
+PUBLISH_DELAY = 2.0
+# 订阅者等待推送的最长秒数，超时后自己请求
+DEFAULT_WAIT = 10.0
+# 没有订阅者的行情保留时间（秒），之后停止获取
+FEED_TTL = 1800
+# 发布进程同步K线的并发数
+SYNC_WORKERS = 8
+# 同步后仍没有取到新收盘的K线（交易所确认延迟）或同步失败时，间隔多少秒再试
+RETRY_INTERVAL = 2.0
+# 正在形成的K线的刷新间隔（秒）
+FORMING_INTERVAL = 5.0
+
+_MAX_DATAGRAM = 65536
+
+
+def _expected_closed_ts(bar, now_ms=None):
+    """当前时刻最后一根已收盘K线的开盘时间戳"""
+    bar_ms = BAR_MS[bar]
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return (now_ms // bar_ms - 1) * bar_ms
+
+
+class MarketBusProducer:
+    """发布进程：按周期同步K线并推送给订阅者"""
+    
+    def __init__(self, store=candle_store, socket_path=PRODUCER_SOCKET, workers=SYNC_WORKERS,
+                 forming_interval=FORMING_INTERVAL):
+        self.store = store
+        self.socket_path = Path(socket_path)
+        self.workers = workers
+        self.forming_interval = forming_interval
+        # {(instId, 周期): {'min_bars', 'subscribers': {地址: 最近订阅时间}, 'closed_ts', 'forming',
+        #                   'forming_at', 'preload', 'next_try'}}
+        self.feeds = {}
+        self._lock = threading.Lock()
+        self._sock = None
+        self.stats = {'syncs': 0, 'sync_errors': 0, 'forming_refreshes': 0, 'forming_errors': 0,
+                      'published': 0, 'subscribes': 0, 'dropped': 0}
+    
+    def add_feed(self, inst_id, bar, min_bars=0, subscriber=None, preload=False):
+        key = (inst_id, normalize_bar(bar))
+        with self._lock:
+            feed = self.feeds.setdefault(key, {'min_bars': 0, 'subscribers': {}, 'closed_ts': None,
+                                              'forming': None, 'forming_at': 0, 'preload': False,
+                                              'next_try': 0})
+            if min_bars > feed['min_bars']:
+                # 需要更长的历史：立即重新同步
+                feed['min_bars'] = min_bars
+                feed['closed_ts'] = None
+                feed['next_try'] = 0
+            feed['preload'] = feed['preload'] or preload
+            if subscriber:
+                feed['subscribers'][subscriber] = time.time()
+        return key, feed
+    
+    def _message(self, key, feed):
+        return {'op': 'pub', 'inst_id': key[0], 'bar': key[1], 'closed_ts': feed['closed_ts'],
+                'forming': feed['forming'], 'forming_at': feed['forming_at']}
+    
+    def _send(self, address, message):
+        """发送给一个订阅者，对方已退出时返回 False"""
+        try:
+            self._sock.sendto(json.dumps(message).encode(), address)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        except OSError as e:
+            print(f"[警告] 推送到 {address} 失败: {e}")
+            return True
+    
+    def _handle(self, data, address):
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return
+        if request.get('op') == 'sub':
+            self.stats['subscribes'] += 1
+            key, feed = self.add_feed(request['inst_id'], request['bar'], int(request.get('min_bars', 0)),
+                                      subscriber=address)
+            if feed['closed_ts'] is not None and address:
+                self._send(address, self._message(key, feed))
+        elif request.get('op') == 'status' and address:
+            self._send(address, {'op': 'status', 'status': self.get_status()})
+    
+    def _listen(self):
+        while True:
+            try:
+                data, address = self._sock.recvfrom(_MAX_DATAGRAM)
+            except OSError:
+                return
+            self._handle(data, address)
+    
+    def _due(self, now):
+        """
+        需要同步的行情：上一根K线已收盘超过 PUBLISH_DELAY 秒且还没推送过
+        
+        Returns:
+            tuple: (需要同步的行情, 只需要刷新正在形成的K线的行情)
+        """
+        now_ms = int(now * 1000)
+        due = []
+        refresh = []
+        with self._lock:
+            for key, feed in list(self.feeds.items()):
+                # 清理长期没有订阅者的行情
+                feed['subscribers'] = {a: t for a, t in feed['subscribers'].items() if now - t < FEED_TTL}
+                if not feed['subscribers'] and not feed['preload']:
+                    del self.feeds[key]
+                    continue
+                expected = _expected_closed_ts(key[1], now_ms - int(PUBLISH_DELAY * 1000))
+                if now >= feed['next_try'] and (feed['closed_ts'] is None or feed['closed_ts'] < expected):
+                    feed['next_try'] = now + RETRY_INTERVAL
+                    due.append(key)
+                elif feed['closed_ts'] is not None and now - feed['forming_at'] >= self.forming_interval:
+                    feed['forming_at'] = now
+                    refresh.append(key)
+        return due, refresh
+    
+    def _sync(self, key):
+        inst_id, bar = key
+        self.store.sync(inst_id, bar, min_bars=self.feeds.get(key, {}).get('min_bars', 0))
+        closed = self.store.read(inst_id, bar, limit=1)
+        forming = self.store.forming(inst_id, bar)
+        return (int(closed['ts'][-1]) if len(closed) else None,
+                [float(x) for x in forming[-1].tolist()] if len(forming) else None)
+    
+    def _refresh_forming(self, key):
+        """只请求最新一根K线，返回正在形成的K线（最新一根已收盘时为 None）"""
+        inst_id, bar = key
+        latest = self.store.fetch_latest(inst_id, bar)
+        forming = self.store.forming(inst_id, bar)
+        feed = self.feeds.get(key)
+        if (not len(latest) or not len(forming) or forming['ts'][-1] != latest['ts'][-1]
+                or feed is None or feed['closed_ts'] is None or forming['ts'][-1] <= feed['closed_ts']):
+            return None
+        return [float(x) for x in forming[-1].tolist()]
+    
+    def publish_due(self):
+        """同步到期的行情、刷新正在形成的K线并推送，返回推送的行情数"""
+        now = time.time()
+        due, refresh = self._due(now)
+        if not due and not refresh:
+            return 0
+        results, errors = fetch_all(due, self._sync, max_workers=self.workers)
+        self.stats['syncs'] += len(due)
+        self.stats['sync_errors'] += len(errors)
+        for key, e in errors.items():
+            print(f"[错误] 同步 {key[0]} {key[1]} 失败: {e}")
+        
+        refreshed, errors = fetch_all(refresh, self._refresh_forming, max_workers=self.workers)
+        self.stats['forming_refreshes'] += len(refreshed)
+        self.stats['forming_errors'] += len(errors)
+        for key, e in errors.items():
+            print(f"[警告] {key[0]} {key[1]} 最新K线获取失败，继续推送上次的快照: {e}")
+        results.update({key: (None, forming) for key, forming in refreshed.items()})
+        
+        for key, (closed_ts, forming) in results.items():
+            feed = self.feeds.get(key)
+            if feed is None or (closed_ts is None and feed['closed_ts'] is None):
+                continue
+            if closed_ts is not None:
+                feed['closed_ts'] = closed_ts
+            feed['forming'] = forming
+            feed['forming_at'] = now
+            message = self._message(key, feed)
+            for address in list(feed['subscribers']):
+                if not self._send(address, message):
+                    feed['subscribers'].pop(address, None)
+                    self.stats['dropped'] += 1
+            self.stats['published'] += 1
+        return len(results)
+    
+    def serve(self, interval=0.5):
+        """绑定套接字并循环发布"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o666)
+        threading.Thread(target=self._listen, name='bus-listen', daemon=True).start()
+        
+        try:
+            while True:
+                self.publish_due()
+                time.sleep(interval)
+        finally:
+            self._sock.close()
+            self.socket_path.unlink(missing_ok=True)
+    
+    def get_status(self):
+        with self._lock:
+            feeds = {f'{k[0]} {k[1]}': {'subscribers': len(f['subscribers']), 'min_bars': f['min_bars'],
+                                        'closed_ts': f['closed_ts'], 'forming_at': f['forming_at']}
+                     for k, f in self.feeds.items()}
+        return {'stats': dict(self.stats), 'feeds': feeds}
+
+
+class MarketBus:
+    """订阅端：优先读取发布进程推送的K线，发布进程不可用时自己请求"""
+    
+    _ids = itertools.count()
+    
+    def __init__(self, store=candle_store, producer_path=PRODUCER_SOCKET, wait=DEFAULT_WAIT):
+        self.store = store
+        self.producer_path = str(producer_path)
+        self.wait = wait
+        self._sock = None
+        self._path = None
+        self._latest = {}
+        self._subscribed = {}
+        self._cond = threading.Condition()
+        self._init_lock = threading.Lock()
+        self.stats = {'served': 0, 'waited': 0, 'fallbacks': 0}
+    
+    def _ensure_socket(self):
+        with self._init_lock:
+            if self._sock is not None:
+                return
+            BUS_DIR.mkdir(parents=True, exist_ok=True)
+            self._path = BUS_DIR / f'c{os.getpid()}-{next(self._ids)}.sock'
+            self._path.unlink(missing_ok=True)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(str(self._path))
+            self._sock = sock
+            atexit.register(self._path.unlink, missing_ok=True)
+            threading.Thread(target=self._listen, name='bus-sub', daemon=True).start()
+    
+    def _listen(self):
+        while True:
+            try:
+                data = self._sock.recv(_MAX_DATAGRAM)
+                message = json.loads(data)
+            except OSError:
+                return
+            except ValueError:
+                continue
+            if message.get('op') == 'pub':
+                with self._cond:
+                    self._latest[(message['inst_id'], message['bar'])] = message
+                    self._cond.notify_all()
+    
+    def _subscribe(self, key, min_bars):
+        """向发布进程订阅；发布进程未运行时返回 False"""
+        now = time.time()
+        subscribed = self._subscribed.get(key)
+        # 定期续订（发布进程会清理 FEED_TTL 内没有续订的订阅者）
+        if subscribed and subscribed[0] >= min_bars and now - subscribed[1] < FEED_TTL / 3:
+            return True
+        self._ensure_socket()
+        request = {'op': 'sub', 'inst_id': key[0], 'bar': key[1], 'min_bars': min_bars}
+        try:
+            self._sock.sendto(json.dumps(request).encode(), self.producer_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        self._subscribed[key] = (max(min_bars, subscribed[0] if subscribed else 0), now)
+        return True
+    
+    def _wait_for(self, key, expected):
+        """等待推送到 expected 之后的K线，返回消息或 None（超时）"""
+        deadline = time.time() + self.wait
+        with self._cond:
+            message = self._latest.get(key)
+            if message and message['closed_ts'] >= expected:
+                return message
+            self.stats['waited'] += 1
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+                message = self._latest.get(key)
+                if message and message['closed_ts'] >= expected:
+                    return message
+    
+    @staticmethod
+    def _forming(message):
+        """推送的正在形成的K线（发布进程每 FORMING_INTERVAL 秒刷新一次）"""
+        if message.get('forming'):
+            return np.array([tuple(message['forming'])], dtype=CANDLE_DTYPE)
+        return None
+    
+    def get_klines(self, symbol, bar, limit, include_forming=True):
+        """
+        获取最近的K线（参数和返回格式与 candle_store.get_klines 相同）
+        
+        Args:
+            symbol: 币种（BTC，永续合约优先）或 instId
+            bar: 周期（1m / 5m / 1H / 1h ...）
+            limit: 返回的K线数（含正在形成的一根）
+            include_forming: 是否包含正在形成的K线
+        
+        Returns:
+            list: [{timestamp, open, high, low, close, volume}, ...]（升序）
+        """
+        bar = normalize_bar(bar)
+        inst_id = self.store.resolve(symbol, bar)
+        key = (inst_id, bar)
+        
+        message = None
+        if self._subscribe(key, limit):
+            message = self._wait_for(key, _expected_closed_ts(bar))
+        if message is None:
+            # 发布进程未运行或推送超时：下次重新订阅，本次自己请求
+            self._subscribed.pop(key, None)
+            self.stats['fallbacks'] += 1
+            return self.store.get_klines(inst_id, bar, limit, include_forming)
+        
+        candles = self.store.read(inst_id, bar, limit=limit, until=message['closed_ts'])
+        if include_forming:
+            candles = with_forming(candles, self._forming(message), limit)
+        if len(candles) < limit:
+            # 发布进程还没补齐这么长的历史
+            self.stats['fallbacks'] += 1
+            return self.store.get_klines(inst_id, bar, limit, include_forming)
+        self.stats['served'] += 1
+        return to_klines(candles)
+
+
+def query_status(producer_path=PRODUCER_SOCKET, timeout=2.0):
+    """向发布进程查询状态"""
+    BUS_DIR.mkdir(parents=True, exist_ok=True)
+    path = BUS_DIR / f'q{os.getpid()}.sock'
+    path.unlink(missing_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(str(path))
+        try:
+            sock.settimeout(timeout)
+            sock.sendto(json.dumps({'op': 'status'}).encode(), str(producer_path))
+            return json.loads(sock.recv(_MAX_DATAGRAM))['status']
+        finally:
+            path.unlink(missing_ok=True)
+
+
+# 进程级共享实例
+market_bus = MarketBus()
+
+
+def main():
+    """命令行：启动发布进程或查看状态"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='K线共享发布进程')
+    parser.add_argument('--preload', help='启动时即获取的币种（逗号分隔），不等订阅')
+    parser.add_argument('--bars', default='1m', help='预加载的周期（逗号分隔，默认1m）')
+    parser.add_argument('--min-bars', type=int, default=300, help='预加载行情至少保存的K线数')
+    parser.add_argument('--workers', type=int, default=SYNC_WORKERS, help=f'同步并发数（默认{SYNC_WORKERS}）')
+    parser.add_argument('--status', action='store_true', help='查看运行中的发布进程状态')
+    
+    args = parser.parse_args()
+    
+    if args.status:
+        try:
+            print(json.dumps(query_status(), ensure_ascii=False, indent=2))
+        except (OSError, ValueError) as e:
+            print(f"[错误] 发布进程未响应: {e}")
+        return
+    
+    producer = MarketBusProducer(workers=args.workers)
+    if args.preload:
+        for symbol in args.preload.split(','):
+            for bar in args.bars.split(','):
+                inst_id = candle_store.resolve(symbol.strip(), bar)
+                producer.add_feed(inst_id, bar, args.min_bars, preload=True)
+    
+    print("=" * 60)
+    print(f"K线共享发布进程启动: {producer.socket_path}")
+    print(f"预加载行情: {len(producer.feeds)} 个")
+    print("=" * 60)
+    try:
+        producer.serve()
+    except KeyboardInterrupt:
+        print("\n[退出] 发布进程已停止")
+
+
+if __name__ == '__main__':
+    main()
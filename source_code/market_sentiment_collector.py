@@ -14,6 +14,8 @@ from pathlib import Path
 import time
 import requests
 
+from jsonl_tail_reader import read_last_records
+
 # 项目根目录
 BASE_DIR = Path('/home/user/webapp')
 DATA_DIR = BASE_DIR / 'data' / 'market_sentiment'
@@ -38,12 +40,7 @@ def get_today_file(data_type):
 
 def read_latest_records(file_path, n=2):
     """读取最近N条记录"""
-    if not file_path.exists():
-        return []
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-        return [json.loads(line) for line in lines[-n:] if line.strip()]
+    return read_last_records(file_path, n)
 
 def send_telegram_notification(message, repeat=3):
     """
@@ -323,6 +320,25 @@ def print_sentiment_report(data):
     print(f"📝 判断依据: {data['reason']}")
     print("="*60 + "\n")
 
+def run_once():
+    """采集一次市场情绪（collector_host 调度入口）"""
+    print(f"\n{'='*60}")
+    print(f"开始采集 - {datetime.now(timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*60}")
+    
+    # 计算市场情绪
+    sentiment_data = calculate_sentiment()
+    
+    if sentiment_data:
+        # 打印报告
+        print_sentiment_report(sentiment_data)
+        
+        # 保存数据
+        save_sentiment(sentiment_data)
+    else:
+        print("⚠️  本次采集无有效数据\n")
+    return sentiment_data
+
 def main():
     """主函数"""
     print("\n🚀 市场情绪偏向采集器启动")
@@ -349,21 +365,7 @@ def main():
                 
                 time.sleep(wait_seconds)
             
-            print(f"\n{'='*60}")
-            print(f"开始采集 - {datetime.now(timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"{'='*60}")
-            
-            # 计算市场情绪
-            sentiment_data = calculate_sentiment()
-            
-            if sentiment_data:
-                # 打印报告
-                print_sentiment_report(sentiment_data)
-                
-                # 保存数据
-                save_sentiment(sentiment_data)
-            else:
-                print("⚠️  本次采集无有效数据\n")
+            run_once()
             
             first_run = False
             
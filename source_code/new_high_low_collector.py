@@ -9,10 +9,14 @@ New High/Low Statistics Collector
    - 如果 当前价格 > 历史最高价 → 创新高事件，更新最高价
    - 如果 当前价格 < 历史最低价 → 创新低事件，更新最低价
 3. 记录每次创新高/创新低事件到JSONL文件
+4. 同时维护 1h/4h/24h/48h/7d/30d 滚动窗口的最高/最低价（单调队列），
+   当前价格突破窗口内最高/最低价时记录窗口创新高/创新低事件
 
 数据文件：
 1. coin_highs_lows_state.json - 每个币种的当前最高/最低价状态
 2. new_high_low_events_YYYYMMDD.jsonl - 每日事件记录
+3. rolling_extremes_state.json - 滚动窗口高低点状态（首次运行时用价格位置历史数据预热）
+4. window_high_low_events_YYYYMMDD.jsonl - 每日滚动窗口事件记录（多一个 window 字段）
 
 状态文件格式：
 {
@@ -37,18 +41,24 @@ New High/Low Statistics Collector
 }
 """
 
+import os
 import sys
 import time
 import json
+import tempfile
 from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
 
+from jsonl_tail_reader import read_last_record
+from rolling_extremes import WINDOWS, RollingExtremes
+
 # 配置
 BASE_DIR = Path(__file__).parent.parent
 SOURCE_DATA_DIR = BASE_DIR / 'data' / 'price_position'
 OUTPUT_DATA_DIR = BASE_DIR / 'data' / 'new_high_low'
 STATE_FILE = OUTPUT_DATA_DIR / 'coin_highs_lows_state.json'
+WINDOW_STATE_FILE = OUTPUT_DATA_DIR / 'rolling_extremes_state.json'
 COLLECT_INTERVAL = 180  # 3分钟
 
 # 创建输出目录
@@ -80,27 +90,34 @@ def load_state():
 
 def save_state(state):
     """
-    保存币种最高/最低价状态
+    保存币种最高/最低价状态（原子写入，接口读取时不会读到写了一半的文件）
     
     Args:
         state: 币种状态字典
     """
     try:
-        with open(STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        fd, tmp_path = tempfile.mkstemp(dir=OUTPUT_DATA_DIR, prefix=f'.{STATE_FILE.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, STATE_FILE)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
         print(f"✅ 状态文件已保存: {STATE_FILE}")
     except Exception as e:
         print(f"❌ 保存状态文件失败: {e}")
 
-def save_event(event, date_str):
+def save_event(event, date_str, prefix='new_high_low_events'):
     """
     保存创新高/创新低事件
     
     Args:
         event: 事件字典
         date_str: 日期字符串 YYYYMMDD
+        prefix: 事件文件名前缀（滚动窗口事件为 window_high_low_events）
     """
-    file_path = OUTPUT_DATA_DIR / f'new_high_low_events_{date_str}.jsonl'
+    file_path = OUTPUT_DATA_DIR / f'{prefix}_{date_str}.jsonl'
     
     try:
         with open(file_path, 'a', encoding='utf-8') as f:
@@ -192,6 +209,82 @@ def process_snapshot(snapshot, state):
     
     return events
 
+def _snapshot_prices(snapshot):
+    """快照 → (时间（毫秒）, {币种: 价格})，时间无效时返回 (None, {})"""
+    try:
+        snapshot_dt = BEIJING_TZ.localize(datetime.strptime(snapshot.get('snapshot_time', ''), '%Y-%m-%d %H:%M:%S'))
+    except Exception:
+        return None, {}
+    prices = {}
+    for coin in snapshot.get('positions', []):
+        price = coin.get('current_price', 0)
+        if price and price > 0:
+            prices[coin.get('inst_id', '').replace('-USDT-SWAP', '')] = price
+    return int(snapshot_dt.timestamp() * 1000), prices
+
+def seed_window_extremes(engine, until_ms):
+    """
+    用价格位置历史数据（本地JSONL）预热滚动窗口高低点，不产生事件
+    
+    Args:
+        engine: RollingExtremes
+        until_ms: 只使用早于该时间的快照（毫秒）
+    
+    Returns:
+        int: 使用的快照数
+    """
+    start = datetime.fromtimestamp(until_ms / 1000, BEIJING_TZ) - timedelta(milliseconds=max(engine.windows.values()))
+    count = 0
+    day = start.date()
+    while day <= datetime.fromtimestamp(until_ms / 1000, BEIJING_TZ).date():
+        file_path = SOURCE_DATA_DIR / f'price_position_{day.strftime("%Y%m%d")}.jsonl'
+        day += timedelta(days=1)
+        if not file_path.exists():
+            continue
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ts, prices = _snapshot_prices(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if ts is None or ts >= until_ms:
+                    continue
+                for symbol, price in prices.items():
+                    engine.push(symbol, ts, price, emit=False)
+                count += 1
+    return count
+
+def process_window_events(snapshot, engine, date_str):
+    """
+    把快照价格推送到滚动窗口高低点，记录各窗口的创新高/创新低事件
+    
+    Returns:
+        int: 事件数量
+    """
+    ts, prices = _snapshot_prices(snapshot)
+    if ts is None:
+        return 0
+    
+    count = 0
+    for symbol, price in prices.items():
+        for event in engine.push(symbol, ts, price):
+            side = 'high' if event['event_type'] == 'new_high' else 'low'
+            save_event({
+                'time': snapshot['snapshot_time'],
+                'timestamp': ts / 1000,
+                'symbol': symbol,
+                'window': event['window'],
+                'event_type': event['event_type'],
+                'price': price,
+                f'previous_{side}': event['previous'],
+                'previous_time': datetime.fromtimestamp(event['previous_ts'] / 1000, BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+            }, date_str, prefix='window_high_low_events')
+            count += 1
+    return count
+
 def process_latest_data(state):
     """
     处理最新的价格位置数据
@@ -202,6 +295,7 @@ def process_latest_data(state):
     Returns:
         int: 新增事件数量
     """
+    global _last_snapshot_time
     now = get_beijing_time()
     date_str = now.strftime('%Y%m%d')
     
@@ -212,17 +306,9 @@ def process_latest_data(state):
         print(f"⚠️  数据文件不存在: {file_path}")
         return 0
     
-    # 读取文件中最后一条记录（最新数据）
-    last_record = None
+    # 读取文件中最后一条记录（最新数据，从文件末尾反向读取）
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        last_record = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
+        last_record = read_last_record(file_path)
     except Exception as e:
         print(f"❌ 读取数据文件失败: {e}")
         return 0
@@ -231,7 +317,14 @@ def process_latest_data(state):
         print(f"⚠️  没有有效的数据记录")
         return 0
     
-    print(f"📊 处理快照: {last_record.get('snapshot_time', 'unknown')}")
+    # 价格位置采集器还没有写入新快照：不重复处理
+    snapshot_time = last_record.get('snapshot_time', 'unknown')
+    if snapshot_time == _last_snapshot_time:
+        print(f"📊 快照未更新: {snapshot_time}")
+        return 0
+    _last_snapshot_time = snapshot_time
+    
+    print(f"📊 处理快照: {snapshot_time}")
     
     # 处理快照，检测创新高/创新低
     events = process_snapshot(last_record, state)
@@ -243,6 +336,13 @@ def process_latest_data(state):
     if events:
         print(f"✅ 检测到 {len(events)} 个新事件")
     
+    # 滚动窗口（1h ~ 30d）的创新高/创新低
+    engine = _get_window_engine(last_record)
+    window_events = process_window_events(last_record, engine, date_str)
+    engine.save()
+    if window_events:
+        print(f"✅ 检测到 {window_events} 个窗口创新高/创新低事件")
+    
     return len(events)
 
 def display_state_summary(state):
@@ -274,6 +374,59 @@ def display_state_summary(state):
     
     print(f"{'='*80}\n")
 
+# 进程内的币种状态和采集次数（首次采集时从状态文件加载）
+_state = None
+_iteration = 0
+_last_snapshot_time = None
+_window_engine = None
+
+def _get_window_engine(snapshot):
+    """滚动窗口高低点（没有状态时用该快照之前的价格位置历史数据预热）"""
+    global _window_engine
+    if _window_engine is None:
+        _window_engine = RollingExtremes(WINDOW_STATE_FILE, WINDOWS)
+        if not _window_engine.symbols():
+            ts, _ = _snapshot_prices(snapshot)
+            if ts is not None:
+                count = seed_window_extremes(_window_engine, ts)
+                print(f"📊 滚动窗口高低点已用 {count} 个历史快照预热")
+    return _window_engine
+
+def _get_state():
+    global _state
+    if _state is None:
+        _state = load_state()
+        print(f"📊 已加载 {len(_state)} 个币种的历史状态")
+    return _state
+
+def run_once():
+    """执行一次采集并保存状态（collector_host 调度入口）"""
+    global _iteration
+    state = _get_state()
+    _iteration += 1
+    now = get_beijing_time()
+    
+    print(f"\n{'='*80}")
+    print(f"🔄 第 {_iteration} 次采集 - {now.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*80}")
+    
+    # 处理最新数据
+    tracked = len(state)
+    new_events = process_latest_data(state)
+    
+    # 保存状态（只在有新事件或新币种时写入）
+    if new_events or len(state) != tracked:
+        save_state(state)
+    
+    # 每10次迭代显示一次状态摘要
+    if _iteration % 10 == 0:
+        display_state_summary(state)
+    
+    print(f"\n📊 本次统计:")
+    print(f"   新增事件: {new_events} 个")
+    print(f"   追踪币种: {len(state)} 个")
+    return new_events
+
 def main():
     """主函数"""
     print("="*80)
@@ -286,37 +439,15 @@ def main():
     print("="*80)
     
     # 加载状态
-    state = load_state()
-    print(f"📊 已加载 {len(state)} 个币种的历史状态")
+    state = _get_state()
     
     # 显示初始状态摘要
     if state:
         display_state_summary(state)
     
-    iteration = 0
-    
     while True:
         try:
-            iteration += 1
-            now = get_beijing_time()
-            
-            print(f"\n{'='*80}")
-            print(f"🔄 第 {iteration} 次采集 - {now.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"{'='*80}")
-            
-            # 处理最新数据
-            new_events = process_latest_data(state)
-            
-            # 保存状态
-            save_state(state)
-            
-            # 每10次迭代显示一次状态摘要
-            if iteration % 10 == 0:
-                display_state_summary(state)
-            
-            print(f"\n📊 本次统计:")
-            print(f"   新增事件: {new_events} 个")
-            print(f"   追踪币种: {len(state)} 个")
+            run_once()
             
             # 等待下一次采集
             print(f"\n⏳ 等待 {COLLECT_INTERVAL} 秒后进行下一次采集...")
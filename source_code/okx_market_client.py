@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+OKX Market Client - 共享的OKX公共行情客户端
+
+各采集器统一通过这里访问 https://www.okx.com/api/v5 的公共行情接口：
+- 进程内共享一个 requests.Session（keep-alive + 连接池），不再每次请求重新握手TLS
+- 每次请求前从跨进程限频令牌桶（okx_rate_governor）取令牌，收到限频响应时清空令牌
+- 网络错误、HTTP 429/5xx、OKX限频错误码按指数退避（带随机抖动）重试，次数可配置
+- 币种的 SWAP/现货 交易对解析结果缓存：先按永续合约列表判断，
+  列表不可用时第一次探测 SWAP→现货，之后直接使用已知的 instId，不再每次多打一次请求
+- 按接口记录请求次数、重试、错误和耗时
+
+用法:
+    from okx_market_client import okx_client
+    data = okx_client.get_candles('BTC', bar='1m', limit=100)   # 返回OKX原始响应 {'code', 'msg', 'data'}
+    data = okx_client.get_ticker('BTC-USDT')                   # 带 '-' 的按原样作为 instId
+"""
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from okx_rate_governor import governor as default_governor
+
+BASE_URL = 'https://www.okx.com'
+
+# 默认超时（秒）
+DEFAULT_TIMEOUT = 10
+# 失败后最多重试次数
+MAX_RETRIES = 3
+# 退避基数和上限（秒），实际等待为 [0, min(上限, 基数 * 2^n)] 内的随机值
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# 连接池大小
+POOL_SIZE = 16
+# SWAP/现货解析结果的有效期（秒）
+RESOLVE_TTL = 6 * 3600
+# 每个接口保留的最近耗时样本数（用于计算分位数）
+LATENCY_SAMPLES = 500
+
+# 需要重试的HTTP状态码和OKX错误码（50011: 请求过于频繁，50013: 系统繁忙）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_CODES = {'50011', '50013'}
+
+
+class OKXMarketClient:
+    """OKX公共行情客户端（线程安全）"""
+    
+    def __init__(self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, pool_size=POOL_SIZE,
+                 resolve_ttl=RESOLVE_TTL, governor=default_governor):
+        self.base_url = base_url.rstrip('/')
+        self.governor = governor
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.resolve_ttl = resolve_ttl
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+        
+        self._resolve_lock = threading.Lock()
+        self._inst_ids = {}
+        self._swap_ids = None
+        self._swap_ids_expire = 0
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+    
+    # ---------- 请求与重试 ----------
+    
+    def _sleep_backoff(self, attempt):
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+    
+    def _record(self, path, elapsed_ms, retries, error):
+        with self._stats_lock:
+            stat = self._stats.get(path)
+            if stat is None:
+                stat = self._stats[path] = {'count': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0,
+                                            'max_ms': 0.0, 'samples': deque(maxlen=LATENCY_SAMPLES)}
+            stat['count'] += 1
+            stat['retries'] += retries
+            stat['errors'] += 1 if error else 0
+            stat['total_ms'] += elapsed_ms
+            stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+            stat['samples'].append(elapsed_ms)
+    
+    def get(self, path, params=None, timeout=None):
+        """
+        请求公共接口
+        
+        Args:
+            path: 接口路径，例如 /api/v5/market/candles
+            params: 查询参数
+            timeout: 超时（秒，默认使用客户端配置）
+        
+        Returns:
+            dict: OKX原始响应 {'code', 'msg', 'data'}
+        
+        Raises:
+            requests.RequestException: 重试用尽后仍然网络失败
+            RateLimitTimeout: 等待限频令牌超时
+        """
+        url = self.base_url + path
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            if self.governor is not None:
+                self.governor.acquire(path, timeout=timeout)
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+                if response.status_code == 429 and self.governor is not None:
+                    self.governor.penalize(path)
+                if response.status_code in RETRY_STATUS and attempt < self.retries:
+                    raise requests.HTTPError(f'HTTP {response.status_code}', response=response)
+                data = response.json()
+                if data.get('code') == '50011' and self.governor is not None:
+                    self.governor.penalize(path)
+                if data.get('code') in RETRY_CODES and attempt < self.retries:
+                    raise requests.HTTPError(f"OKX {data.get('code')}: {data.get('msg')}", response=response)
+            except (requests.RequestException, ValueError) as e:
+                if attempt >= self.retries:
+                    self._record(path, (time.perf_counter() - start) * 1000, attempt, True)
+                    raise
+                print(f"[OKX] {path} 请求失败，第{attempt + 1}次重试: {e}")
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+            
+            self._record(path, (time.perf_counter() - start) * 1000, attempt, data.get('code') != '0')
+            return data
+    
+    # ---------- SWAP/现货解析 ----------
+    
+    def _load_swap_ids(self):
+        """加载永续合约列表（调用方持有 _resolve_lock），失败时一分钟后再试"""
+        now = time.time()
+        if now < self._swap_ids_expire:
+            return self._swap_ids
+        try:
+            data = self.get('/api/v5/public/instruments', {'instType': 'SWAP'})
+            if data.get('code') == '0' and data.get('data'):
+                self._swap_ids = {item['instId'] for item in data['data'] if item.get('state', 'live') == 'live'}
+                self._swap_ids_expire = now + self.resolve_ttl
+                return self._swap_ids
+        except requests.RequestException as e:
+            print(f"[OKX] 获取永续合约列表失败: {e}")
+        self._swap_ids_expire = now + 60
+        return self._swap_ids
+    
+    def resolve_inst_id(self, symbol):
+        """
+        获取币种对应的交易对
+        
+        Args:
+            symbol: 币种（BTC）或完整 instId（BTC-USDT，按原样返回）
+        
+        Returns:
+            str: 已知时返回 '{symbol}-USDT-SWAP' 或 '{symbol}-USDT'，无法判断时返回None
+        """
+        if '-' in symbol:
+            return symbol
+        with self._resolve_lock:
+            cached = self._inst_ids.get(symbol)
+            if cached and cached[1] > time.time():
+                return cached[0]
+            swap_ids = self._load_swap_ids()
+            if swap_ids is None:
+                return None
+            inst_id = f'{symbol}-USDT-SWAP' if f'{symbol}-USDT-SWAP' in swap_ids else f'{symbol}-USDT'
+            self._inst_ids[symbol] = (inst_id, time.time() + self.resolve_ttl)
+            return inst_id
+    
+    def _remember(self, symbol, inst_id):
+        with self._resolve_lock:
+            self._inst_ids[symbol] = (inst_id, time.time() + self.resolve_ttl)
+    
+    def _forget(self, symbol):
+        with self._resolve_lock:
+            self._inst_ids.pop(symbol, None)
+    
+    def _market_get(self, path, symbol, params):
+        """
+        按币种请求行情接口
+        
+        已解析的币种只请求一次；解析不到时依次尝试 SWAP 和现货并记住成功的那个。
+        已解析的交易对请求失败（例如下架）时清除缓存并重新探测一次。
+        """
+        if '-' in symbol:
+            return self.get(path, dict(params, instId=symbol))
+        
+        inst_id = self.resolve_inst_id(symbol)
+        if inst_id:
+            data = self.get(path, dict(params, instId=inst_id))
+            if data.get('code') == '0' and data.get('data'):
+                return data
+            self._forget(symbol)
+        
+        for candidate in (f'{symbol}-USDT-SWAP', f'{symbol}-USDT'):
+            if candidate == inst_id:
+                continue
+            data = self.get(path, dict(params, instId=candidate))
+            if data.get('code') == '0' and data.get('data'):
+                self._remember(symbol, candidate)
+                return data
+        return data
+    
+    # ---------- 行情接口 ----------
+    
+    def get_candles(self, symbol, bar='1m', limit=100):
+        """获取K线（OKX原始格式，从新到旧）"""
+        return self._market_get('/api/v5/market/candles', symbol, {'bar': bar, 'limit': limit})
+    
+    def get_ticker(self, symbol):
+        """获取单个交易对的行情"""
+        return self._market_get('/api/v5/market/ticker', symbol, {})
+    
+    # ---------- 统计 ----------
+    
+    def get_stats(self):
+        """获取按接口聚合的请求统计和已缓存的交易对解析结果"""
+        with self._stats_lock:
+            endpoints = {}
+            for path, stat in self._stats.items():
+                samples = sorted(stat['samples'])
+                endpoints[path] = {
+                    'count': stat['count'],
+                    'errors': stat['errors'],
+                    'retries': stat['retries'],
+                    'avg_ms': round(stat['total_ms'] / stat['count'], 2),
+                    'p50_ms': round(samples[len(samples) // 2], 2),
+                    'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                    'max_ms': round(stat['max_ms'], 2)
+                }
+        with self._resolve_lock:
+            resolved = {symbol: inst_id for symbol, (inst_id, _) in self._inst_ids.items()}
+        return {'endpoints': endpoints, 'resolved': resolved}
+    
+    def reset_stats(self):
+        """清空请求统计"""
+        with self._stats_lock:
+            self._stats.clear()
+
+
+# 进程级共享实例
+okx_client = OKXMarketClient()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+OKX Rate Governor - 跨进程的OKX限频令牌桶
+
+所有采集器和监控进程共享同一组令牌桶，代替各自的 time.sleep(0.1)：
+- 按接口类别分桶（行情K线、历史K线、ticker、下单、持仓 ...），私有接口再按API Key分桶
+  （文件名中只保存Key的哈希）
+- 每个桶是一个小文件（优先放在 /dev/shm），读写时持有 flock，
+  内容为 令牌数、更新时间 和 累计统计（获取次数、等待次数、等待总时长、拒绝次数）
+- acquire() 阻塞等待直到拿到令牌或超时（抛出 RateLimitTimeout，带 retry_after）；
+  try_acquire() 不等待，返回需要等待的秒数（0 表示已获取）
+- 收到 429 / 50011 时调用 penalize() 清空令牌，其他进程也会随之退避
+  （签名请求可直接把响应交给 penalize_response() 判断）
+
+用法:
+    from okx_rate_governor import governor
+    governor.acquire('/api/v5/market/candles')
+    governor.acquire('/api/v5/trade/order', api_key=credentials['api_key'], timeout=5)
+    response = requests.post(...)
+    governor.penalize_response('/api/v5/trade/order', response, api_key=credentials['api_key'])
+    python okx_rate_governor.py          # 查看各个桶的统计
+"""
+import fcntl
+import hashlib
+import os
+import struct
+import time
+from pathlib import Path
+
+GOVERNOR_DIR = Path('/dev/shm/okx_rate_governor') if os.path.isdir('/dev/shm') \
+    else Path('/home/user/webapp/data/okx_rate_governor')
+
+# 接口限频（次数, 秒），按OKX文档；最长前缀匹配
+ENDPOINT_LIMITS = {
+    '/api/v5/market/candles': (40, 2),
+    '/api/v5/market/history-candles': (20, 2),
+    '/api/v5/market/ticker': (20, 2),
+    '/api/v5/market/tickers': (20, 2),
+    '/api/v5/market/': (20, 2),
+    '/api/v5/public/': (20, 2),
+    '/api/v5/trade/order': (60, 2),
+    '/api/v5/trade/order-algo': (20, 2),
+    '/api/v5/trade/fills': (60, 2),
+    '/api/v5/trade/': (20, 2),
+    '/api/v5/account/positions': (10, 2),
+    '/api/v5/account/': (10, 2),
+    '': (10, 2),
+}
+# 只使用限额的一部分，给时钟误差和未接入的调用留余量
+SAFETY = 0.8
+# acquire 默认最长等待（秒）
+DEFAULT_TIMEOUT = 10.0
+
+# 令牌数, 更新时间, 获取次数, 等待次数, 拒绝次数, 等待总时长
+_STATE = struct.Struct('<ddQQQd')
+
+
+class RateLimitTimeout(Exception):
+    """在超时时间内没有拿到令牌"""
+    
+    def __init__(self, bucket, retry_after):
+        super().__init__(f'{bucket} 限频，{retry_after:.2f}秒后重试')
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+class RateGovernor:
+    """跨进程令牌桶"""
+    
+    def __init__(self, root=GOVERNOR_DIR, limits=ENDPOINT_LIMITS, safety=SAFETY):
+        self.root = Path(root)
+        self.limits = limits
+        self.safety = safety
+        self._prefixes = sorted(limits, key=len, reverse=True)
+    
+    def bucket_for(self, path, api_key=None):
+        """
+        获取接口对应的桶
+        
+        Returns:
+            tuple: (桶名, 容量, 每秒补充的令牌数)
+        """
+        path = path.split('?', 1)[0]
+        prefix = next(p for p in self._prefixes if path.startswith(p))
+        count, seconds = self.limits[prefix]
+        capacity = max(1.0, count * self.safety)
+        name = prefix.strip('/').replace('api/v5/', '').replace('/', '_') or 'default'
+        owner = hashlib.sha1(api_key.encode()).hexdigest()[:12] if api_key else 'ip'
+        return f'{name}@{owner}', capacity, capacity / seconds
+    
+    def _update(self, bucket, capacity, rate, fn):
+        """在文件锁内读取桶状态，调用 fn(state) 修改后写回，返回 fn 的结果"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.root / f'{bucket}.bkt', os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = os.pread(fd, _STATE.size, 0)
+            now = time.time()
+            if len(data) == _STATE.size:
+                tokens, updated, acquired, waited, rejected, wait_total = _STATE.unpack(data)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            else:
+                tokens, acquired, waited, rejected, wait_total = capacity, 0, 0, 0, 0.0
+            state = {'tokens': tokens, 'acquired': acquired, 'waited': waited,
+                     'rejected': rejected, 'wait_total': wait_total}
+            result = fn(state)
+            os.pwrite(fd, _STATE.pack(state['tokens'], now, state['acquired'], state['waited'],
+                                      state['rejected'], state['wait_total']), 0)
+            return result
+        finally:
+            os.close(fd)
+    
+    def _take(self, path, api_key, tokens, waited_for=None, reject=False):
+        """尝试取令牌；返回0表示成功，否则返回需要等待的秒数"""
+        bucket, capacity, rate = self.bucket_for(path, api_key)
+        
+        def take(state):
+            if state['tokens'] >= tokens:
+                state['tokens'] -= tokens
+                state['acquired'] += 1
+                if waited_for:
+                    state['waited'] += 1
+                    state['wait_total'] += waited_for
+                return 0.0
+            if reject:
+                state['rejected'] += 1
+            return (tokens - state['tokens']) / rate
+        
+        return self._update(bucket, capacity, rate, take)
+    
+    def try_acquire(self, path, api_key=None, tokens=1):
+        """
+        不等待地获取令牌
+        
+        Returns:
+            float: 0 表示已获取，否则为建议的重试等待秒数（retry-after）
+        """
+        return self._take(path, api_key, tokens, reject=True)
+    
+    def acquire(self, path, api_key=None, timeout=DEFAULT_TIMEOUT, tokens=1):
+        """
+        阻塞直到获取令牌
+        
+        Args:
+            path: 接口路径（可带查询参数）
+            api_key: 私有接口的API Key（公共接口为None，按IP计）
+            timeout: 最长等待秒数
+            tokens: 消耗的令牌数
+        
+        Returns:
+            float: 实际等待的秒数
+        
+        Raises:
+            RateLimitTimeout: 超时仍未获取
+        """
+        start = time.time()
+        while True:
+            waited = time.time() - start
+            retry_after = self._take(path, api_key, tokens, waited_for=waited)
+            if retry_after == 0:
+                return waited
+            if waited + retry_after > timeout:
+                self._reject(path, api_key)
+                raise RateLimitTimeout(self.bucket_for(path, api_key)[0], retry_after)
+            # 加一点抖动，避免多个进程同时醒来
+            time.sleep(retry_after * (1 + 0.1 * (os.getpid() % 7) / 7))
+    
+    def _reject(self, path, api_key):
+        bucket, capacity, rate = self.bucket_for(path, api_key)
+        
+        def reject(state):
+            state['rejected'] += 1
+        
+        self._update(bucket, capacity, rate, reject)
+    
+    def penalize(self, path, api_key=None, seconds=2.0):
+        """交易所返回限频时清空令牌（并预支 seconds 秒），让所有进程一起退避"""
+        bucket, capacity, rate = self.bucket_for(path, api_key)
+        
+        def drain(state):
+            state['tokens'] = min(state['tokens'], 0.0) - rate * seconds
+        
+        self._update(bucket, capacity, rate, drain)
+    
+    def penalize_response(self, path, response, api_key=None):
+        """
+        响应为限频（HTTP 429 或 OKX code 50011）时调用 penalize()
+        
+        Args:
+            path: 接口路径
+            response: requests 的响应对象
+            api_key: 私有接口的API Key
+        
+        Returns:
+            bool: 是否被限频
+        """
+        limited = response.status_code == 429
+        if not limited:
+            try:
+                limited = response.json().get('code') == '50011'
+            except (ValueError, AttributeError):
+                pass
+        if limited:
+            self.penalize(path, api_key=api_key)
+        return limited
+    
+    def get_stats(self):
+        """
+        获取所有桶的统计
+        
+        Returns:
+            dict: {桶名: {tokens, acquired, waited, rejected, avg_wait_ms}}
+        """
+        stats = {}
+        if not self.root.exists():
+            return stats
+        for file_path in sorted(self.root.glob('*.bkt')):
+            with open(file_path, 'rb') as f:
+                data = f.read(_STATE.size)
+            if len(data) != _STATE.size:
+                continue
+            tokens, updated, acquired, waited, rejected, wait_total = _STATE.unpack(data)
+            stats[file_path.stem] = {
+                'tokens': round(tokens, 2),
+                'updated': updated,
+                'acquired': acquired,
+                'waited': waited,
+                'rejected': rejected,
+                'avg_wait_ms': round(wait_total / waited * 1000, 1) if waited else 0
+            }
+        return stats
+
+
+# 进程级共享实例（状态在文件中，各进程共用）
+governor = RateGovernor()
+
+
+def main():
+    """命令行：查看各个桶的统计"""
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description='OKX限频令牌桶统计')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+    args = parser.parse_args()
+    
+    stats = governor.get_stats()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    print(f"[目录] {governor.root}")
+    for bucket, stat in stats.items():
+        print(f"  {bucket:40s} 令牌 {stat['tokens']:>6.2f}  获取 {stat['acquired']:>8d}  "
+              f"等待 {stat['waited']:>6d} (平均 {stat['avg_wait_ms']}ms)  拒绝 {stat['rejected']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,9 @@ import requests
 from datetime import datetime, timezone
 from pathlib import Path
 
+from jsonl_tail_reader import read_last_record
+from okx_rate_governor import governor
+
 # 配置
 WEBAPP_DIR = Path(__file__).resolve().parent.parent
 SETTINGS_DIR = WEBAPP_DIR / 'data' / 'okx_tpsl_settings'
@@ -55,11 +58,7 @@ def get_latest_market_sentiment():
             return None
         
         # 读取最后一条记录
-        with open(sentiment_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            if lines:
-                last_record = json.loads(lines[-1].strip())
-                return last_record
+        return read_last_record(sentiment_file)
     except Exception as e:
         print(f"⚠️  获取市场情绪失败: {e}")
     return None
@@ -191,7 +190,9 @@ class TPSLMonitor:
                 'Content-Type': 'application/json'
             }
             
+            governor.acquire(path, api_key=credentials['api_key'])
             response = requests.get(OKX_BASE_URL + path, headers=headers, timeout=10)
+            governor.penalize_response(path, response, api_key=credentials['api_key'])
             result = response.json()
             
             if result.get('code') == '0':
@@ -245,7 +246,9 @@ class TPSLMonitor:
                 'Content-Type': 'application/json'
             }
             
+            governor.acquire(path, api_key=credentials['api_key'])
             response = requests.post(OKX_BASE_URL + path, headers=headers, data=body, timeout=10)
+            governor.penalize_response(path, response, api_key=credentials['api_key'])
             result = response.json()
             
             if result.get('code') == '0':
@@ -376,7 +379,9 @@ class TPSLMonitor:
                 'Content-Type': 'application/json'
             }
             
+            governor.acquire(path, api_key=credentials['api_key'])
             response = requests.post(OKX_BASE_URL + path, headers=headers, data=body, timeout=10)
+            governor.penalize_response(path, response, api_key=credentials['api_key'])
             result = response.json()
             
             if result.get('code') == '0':
@@ -16,6 +16,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
 
+from okx_rate_governor import governor
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/okx_trading_history')
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -59,7 +61,9 @@ def get_okx_fills(inst_type='SWAP', limit=100):
         }
         
         url = API_BASE + request_path
+        governor.acquire(request_path, api_key=API_KEY)
         response = requests.get(url, headers=headers, timeout=10)
+        governor.penalize_response(request_path, response, api_key=API_KEY)
         data = response.json()
         
         if data.get('code') == '0' and data.get('data'):
@@ -133,6 +137,27 @@ def save_trades_to_jsonl(trades):
     return total_saved
 
 
+def run_once():
+    """采集一次交易历史（collector_host 调度入口）"""
+    now = datetime.now(BEIJING_TZ)
+    print(f'[{now.strftime("%Y-%m-%d %H:%M:%S")}] 开始采集交易历史...')
+    
+    # 获取永续合约的成交记录
+    fills_swap = get_okx_fills(inst_type='SWAP', limit=100)
+    print(f'[SWAP] 获取到 {len(fills_swap)} 笔成交')
+    
+    # 获取现货的成交记录
+    fills_spot = get_okx_fills(inst_type='SPOT', limit=100)
+    print(f'[SPOT] 获取到 {len(fills_spot)} 笔成交')
+    
+    # 合并并保存
+    all_fills = fills_swap + fills_spot
+    saved_count = save_trades_to_jsonl(all_fills)
+    
+    print(f'[完成] 共保存 {saved_count} 笔新交易')
+    return saved_count
+
+
 def main():
     """主循环"""
     print('=' * 60)
@@ -144,22 +169,7 @@ def main():
     
     while True:
         try:
-            now = datetime.now(BEIJING_TZ)
-            print(f'[{now.strftime("%Y-%m-%d %H:%M:%S")}] 开始采集交易历史...')
-            
-            # 获取永续合约的成交记录
-            fills_swap = get_okx_fills(inst_type='SWAP', limit=100)
-            print(f'[SWAP] 获取到 {len(fills_swap)} 笔成交')
-            
-            # 获取现货的成交记录
-            fills_spot = get_okx_fills(inst_type='SPOT', limit=100)
-            print(f'[SPOT] 获取到 {len(fills_spot)} 笔成交')
-            
-            # 合并并保存
-            all_fills = fills_swap + fills_spot
-            saved_count = save_trades_to_jsonl(all_fills)
-            
-            print(f'[完成] 共保存 {saved_count} 笔新交易')
+            run_once()
             print(f'[等待] 下次采集: {COLLECT_INTERVAL}秒后')
             print()
             
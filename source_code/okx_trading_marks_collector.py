@@ -8,11 +8,12 @@ sys.path.insert(0, '/home/user/webapp/source_code')
 
 import json
 import time
-import requests
 from datetime import datetime
 from pathlib import Path
 import pytz
 
+from okx_market_client import okx_client
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/okx_trading_jsonl')
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -37,9 +38,8 @@ def get_okx_day_change():
     try:
         for symbol in SYMBOLS:
             try:
-                url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT"
-                response = requests.get(url, timeout=5)
-                data = response.json()
+                # 共享客户端按跨进程限频令牌桶控制请求速度
+                data = okx_client.get_ticker(f'{symbol}-USDT')
                 
                 if data.get('code') == '0' and data.get('data'):
                     ticker = data['data'][0]
@@ -69,8 +69,6 @@ def get_okx_day_change():
                 else:
                     print(f"[警告] {symbol} 数据获取失败")
                 
-                time.sleep(0.1)  # 避免请求过快
-                
             except Exception as e:
                 print(f"[错误] {symbol} 处理失败: {e}")
                 continue
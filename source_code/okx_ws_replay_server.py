@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+OKX WS Replay Server - 本地WebSocket回放服务
+
+回放 okx_ws_stream.py --record 录制的原始帧，用于离线测试流式采集：
+- 提供与OKX相同的 /ws/v5/public 和 /ws/v5/business 路径
+- 客户端发送 subscribe 后回复订阅确认，然后按录制时的时间间隔（可加速）
+  推送该路径下、属于已订阅频道的帧
+- 'ping' 回复 'pong'
+
+用法:
+    python okx_ws_replay_server.py data/ws_frames/20260301.jsonl --port 8765 --speed 10
+    python okx_ws_stream.py --sar --ws-base ws://127.0.0.1:8765 --no-seed
+"""
+import asyncio
+import json
+
+from aiohttp import WSMsgType, web
+
+PATHS = ('/ws/v5/public', '/ws/v5/business')
+
+
+def load_frames(file_path):
+    """
+    读取录制文件
+    
+    Returns:
+        dict: {路径: [(接收时间, 原始文本, (频道, instId)), ...]}
+    """
+    frames = {path: [] for path in PATHS}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                arg = json.loads(entry['msg']).get('arg') or {}
+            except (json.JSONDecodeError, KeyError):
+                continue
+            path = entry.get('path', PATHS[0])
+            if path in frames:
+                frames[path].append((entry['t'], entry['msg'], (arg.get('channel'), arg.get('instId'))))
+    return frames
+
+
+async def _play(ws, frames, subscribed, speed, loop_forever):
+    """按录制的时间间隔推送已订阅频道的帧"""
+    while True:
+        previous = None
+        for t, message, key in frames:
+            if previous is not None and speed > 0:
+                await asyncio.sleep(max(0.0, (t - previous) / speed))
+            previous = t
+            if ws.closed:
+                return
+            if key in subscribed:
+                await ws.send_str(message)
+        if not loop_forever:
+            return
+
+
+def create_app(frames, speed=1.0, loop_forever=False):
+    """创建回放服务的 aiohttp 应用"""
+    
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscribed = set()
+        player = None
+        print(f"[回放] 客户端已连接: {request.path}")
+        
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                if msg.type == WSMsgType.ERROR:
+                    break
+                continue
+            if msg.data == 'ping':
+                await ws.send_str('pong')
+                continue
+            try:
+                request_msg = json.loads(msg.data)
+            except json.JSONDecodeError:
+                continue
+            if request_msg.get('op') != 'subscribe':
+                continue
+            for arg in request_msg.get('args') or []:
+                subscribed.add((arg.get('channel'), arg.get('instId')))
+                await ws.send_str(json.dumps({'event': 'subscribe', 'arg': arg}))
+            if player is None:
+                player = asyncio.ensure_future(
+                    _play(ws, frames.get(request.path, []), subscribed, speed, loop_forever))
+        
+        if player is not None:
+            player.cancel()
+        print(f"[回放] 客户端已断开: {request.path}")
+        return ws
+    
+    app = web.Application()
+    for path in PATHS:
+        app.router.add_get(path, handler)
+    return app
+
+
+def main():
+    """命令行：启动回放服务"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='OKX WebSocket 本地回放服务')
+    parser.add_argument('file', help='okx_ws_stream.py --record 录制的JSONL文件')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口（默认8765）')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速（0为不等待，默认1）')
+    parser.add_argument('--loop', action='store_true', help='播放完后从头循环')
+    
+    args = parser.parse_args()
+    
+    frames = load_frames(args.file)
+    print("[回放] 已加载 " + ', '.join(f'{path}: {len(items)} 帧' for path, items in frames.items()))
+    web.run_app(create_app(frames, args.speed, args.loop), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+OKX WS Stream - WebSocket行情推送采集（可选的流式模式）
+
+订阅OKX公共 tickers（/ws/v5/public）和 candle1m（/ws/v5/business）频道，
+在内存中维护最新行情和1分钟K线；K线收盘时调用现有采集器的处理函数：
+- SAR：sar_jsonl_collector.process_symbol（每根1分钟K线收盘时计算）
+- 币种涨跌：coin_change_tracker_collector.calculate_changes（每分钟，使用推送的最新价）
+- 10分钟涨速：price_speed_10m_collector.collect_speed_data（每3分钟，使用推送的K线）
+
+流式模式用来代替对应的REST轮询采集器，不要同时运行。
+启动时从本地K线存储（candle_store）补齐历史K线，断线后按退避时间重连。
+
+--record 把收到的原始帧写入JSONL，可用 okx_ws_replay_server.py 离线回放：
+    python okx_ws_stream.py --sar --coin-change --record data/ws_frames/20260301.jsonl
+    python okx_ws_replay_server.py data/ws_frames/20260301.jsonl --port 8765
+    python okx_ws_stream.py --sar --ws-base ws://127.0.0.1:8765
+"""
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import websocket
+
+WS_BASE = 'wss://ws.okx.com:8443'
+PUBLIC_PATH = '/ws/v5/public'
+BUSINESS_PATH = '/ws/v5/business'
+
+# 无消息超过该秒数时发送 'ping'（OKX 30秒无消息会断开连接）
+PING_INTERVAL = 25
+# 重连退避上限（秒）
+RECONNECT_MAX = 30
+# 每个交易对在内存中保留的已收盘K线数
+MAX_BARS_IN_MEMORY = 500
+
+
+class LiveMarket:
+    """推送行情的内存状态（线程安全）"""
+    
+    def __init__(self, max_bars=MAX_BARS_IN_MEMORY):
+        self.tickers = {}
+        self._bars = defaultdict(lambda: deque(maxlen=max_bars))
+        self._forming = {}
+        self._lock = threading.Lock()
+        self._bar_handlers = []
+        self._tick_handlers = []
+    
+    def on_bar_closed(self, handler):
+        """注册K线收盘回调 handler(inst_id, bar, candle)"""
+        self._bar_handlers.append(handler)
+    
+    def on_tick(self, handler):
+        """注册行情回调 handler(inst_id, ticker)"""
+        self._tick_handlers.append(handler)
+    
+    def seed(self, inst_id, bar, klines):
+        """用REST获取的已收盘K线初始化或补齐缺口（按时间戳合并，推送的K线优先）"""
+        with self._lock:
+            bars = self._bars[(inst_id, bar)]
+            merged = {c['timestamp']: c for c in klines}
+            merged.update((c['timestamp'], c) for c in bars)
+            bars.clear()
+            bars.extend(merged[ts] for ts in sorted(merged))
+    
+    def handle_message(self, msg):
+        """处理一条推送消息（tickers 或 candle 频道）"""
+        arg = msg.get('arg') or {}
+        channel = arg.get('channel', '')
+        inst_id = arg.get('instId')
+        if channel == 'tickers':
+            for item in msg.get('data') or []:
+                self._handle_ticker(item)
+        elif channel.startswith('candle') and inst_id:
+            bar = channel[len('candle'):]
+            for row in msg.get('data') or []:
+                self._handle_candle(inst_id, bar, row)
+    
+    def _handle_ticker(self, item):
+        ticker = {'ts': int(item.get('ts') or 0)}
+        for field in ('last', 'open24h', 'high24h', 'low24h', 'vol24h', 'sodUtc0', 'sodUtc8'):
+            try:
+                ticker[field] = float(item.get(field) or 0)
+            except (TypeError, ValueError):
+                ticker[field] = 0.0
+        inst_id = item.get('instId')
+        with self._lock:
+            self.tickers[inst_id] = ticker
+        for handler in self._tick_handlers:
+            handler(inst_id, ticker)
+    
+    def _handle_candle(self, inst_id, bar, row):
+        candle = {
+            'timestamp': int(row[0]),
+            'open': float(row[1]),
+            'high': float(row[2]),
+            'low': float(row[3]),
+            'close': float(row[4]),
+            'volume': float(row[5])
+        }
+        confirmed = len(row) > 8 and row[8] == '1'
+        key = (inst_id, bar)
+        
+        closed = []
+        with self._lock:
+            forming = self._forming.get(key)
+            # 新K线开始而上一根没有收到收盘推送时，上一根按最后一次推送收盘
+            if forming is not None and candle['timestamp'] > forming['timestamp']:
+                closed.append(forming)
+                del self._forming[key]
+            if confirmed:
+                self._forming.pop(key, None)
+                closed.append(candle)
+            else:
+                self._forming[key] = candle
+            
+            bars = self._bars[key]
+            closed = [c for c in closed if not bars or c['timestamp'] > bars[-1]['timestamp']]
+            bars.extend(closed)
+        
+        for c in closed:
+            for handler in self._bar_handlers:
+                handler(inst_id, bar, c)
+    
+    def klines(self, inst_id, bar, limit, include_forming=False):
+        """最近的K线（升序 [{timestamp, open, high, low, close, volume}]）"""
+        with self._lock:
+            result = list(self._bars[(inst_id, bar)])
+            forming = self._forming.get((inst_id, bar))
+        if include_forming and forming is not None:
+            result.append(forming)
+        return result[-limit:]
+    
+    def ohlcv(self, inst_id, bar, limit):
+        """ccxt格式的最近K线（含正在形成的一根）[[时间戳, 开, 高, 低, 收, 量], ...]"""
+        return [[c['timestamp'], c['open'], c['high'], c['low'], c['close'], c['volume']]
+                for c in self.klines(inst_id, bar, limit, include_forming=True)]
+    
+    def prices(self, symbols, field='last'):
+        """币种 → 价格（永续合约优先，没有时用现货；sodUtc8 为北京时间0点开盘价）"""
+        result = {}
+        with self._lock:
+            for symbol in symbols:
+                ticker = self.tickers.get(f'{symbol}-USDT-SWAP') or self.tickers.get(f'{symbol}-USDT')
+                if ticker and ticker.get(field):
+                    result[symbol] = ticker[field]
+        return result
+
+
+class OKXStream:
+    """单个WebSocket连接：订阅、心跳、断线重连、原始帧录制"""
+    
+    def __init__(self, url, args, market, recorder=None, on_reconnect=None):
+        self.url = url
+        self.args = args
+        self.market = market
+        self.recorder = recorder
+        # 重连成功后调用（用于补齐断线期间漏掉的K线）
+        self.on_reconnect = on_reconnect
+        self.messages = 0
+        self.reconnects = 0
+        self._ws = None
+        self._stop = threading.Event()
+        self._last_message = 0.0
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'ws-{self.url.rsplit("/", 1)[-1]}', daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self):
+        self._stop.set()
+        if self._ws is not None:
+            self._ws.close()
+    
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, e: print(f"[WS] {self.url} 错误: {e}"),
+                on_close=lambda ws, code, reason: print(f"[WS] {self.url} 连接关闭: {code} {reason}"),
+            )
+            started = time.time()
+            self._ws.run_forever()
+            if self._stop.is_set():
+                break
+            # 连接维持过一段时间的重新从1秒开始退避
+            if time.time() - started > 60:
+                backoff = 1
+            delay = random.uniform(0, backoff)
+            print(f"[WS] {self.url} {delay:.1f}秒后重连")
+            self._stop.wait(delay)
+            backoff = min(RECONNECT_MAX, backoff * 2)
+            self.reconnects += 1
+    
+    def _on_open(self, ws):
+        print(f"[WS] {self.url} 已连接，订阅 {len(self.args)} 个频道")
+        self._last_message = time.time()
+        ws.send(json.dumps({'op': 'subscribe', 'args': self.args}))
+        threading.Thread(target=self._keepalive, args=(ws,), daemon=True).start()
+        if self.reconnects and self.on_reconnect is not None:
+            threading.Thread(target=self.on_reconnect, daemon=True).start()
+    
+    def _keepalive(self, ws):
+        """一段时间没有消息时发送 'ping'，连接关闭后退出"""
+        while not self._stop.is_set() and ws.sock and ws.sock.connected:
+            time.sleep(5)
+            if time.time() - self._last_message > PING_INTERVAL:
+                try:
+                    ws.send('ping')
+                except websocket.WebSocketException:
+                    return
+                self._last_message = time.time()
+    
+    def _on_message(self, ws, message):
+        self._last_message = time.time()
+        if message == 'pong':
+            return
+        if self.recorder is not None:
+            self.recorder.write(self.url, message)
+        try:
+            msg = json.loads(message)
+        except json.JSONDecodeError:
+            return
+        if 'event' in msg:
+            if msg['event'] == 'error':
+                print(f"[WS] {self.url} 订阅错误: {msg.get('code')} {msg.get('msg')}")
+            return
+        self.messages += 1
+        try:
+            self.market.handle_message(msg)
+        except Exception as e:
+            print(f"[错误] 处理推送失败: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+class FrameRecorder:
+    """把原始帧追加写入JSONL：{"t": 接收时间, "path": 接口路径, "msg": 原始文本}"""
+    
+    def __init__(self, file_path):
+        self._file = open(file_path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def write(self, url, message):
+        path = BUSINESS_PATH if url.endswith(BUSINESS_PATH) else PUBLIC_PATH
+        line = json.dumps({'t': time.time(), 'path': path, 'msg': message}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ---------- 采集器接入 ----------
+
+def attach_sar(market, inst_ids):
+    """每根1分钟K线收盘时为对应币种执行SAR计算并写入"""
+    import sar_jsonl_collector
+    
+    symbols = {inst_id: symbol for symbol, inst_id in inst_ids.items()}
+    
+    def handler(inst_id, bar, candle):
+        symbol = symbols.get(inst_id)
+        if bar != '1m' or symbol is None:
+            return
+        klines = market.klines(inst_id, '1m', 100)
+        if len(klines) >= 10:
+            sar_jsonl_collector.process_symbol(symbol, klines)
+            sar_jsonl_collector.sar_engine.save()
+    
+    market.on_bar_closed(handler)
+
+
+class _MinuteTrigger:
+    """同一分钟内多个交易对收盘只触发一次"""
+    
+    def __init__(self, every_minutes=1):
+        self.every = every_minutes * 60_000
+        self.last = None
+        self._lock = threading.Lock()
+    
+    def fire(self, bar, candle):
+        if bar != '1m':
+            return False
+        slot = candle['timestamp'] // self.every
+        with self._lock:
+            if self.last is not None and slot <= self.last:
+                return False
+            self.last = slot
+            return True
+
+
+def attach_coin_change(market):
+    """每分钟用推送的最新价计算27币涨跌幅并写入"""
+    from datetime import datetime
+    import coin_change_tracker_collector as tracker
+    
+    trigger = _MinuteTrigger()
+    
+    def handler(inst_id, bar, candle):
+        if not trigger.fire(bar, candle):
+            return
+        prices = market.prices(tracker.SYMBOLS)
+        baseline = tracker.load_baseline()
+        if not baseline:
+            # 没有基准文件时使用推送的北京时间0点开盘价；全部币种都收到后才保存，
+            # 否则缺少的币种当天都没有基准价（未保存时下一分钟重新取）
+            baseline = market.prices(tracker.SYMBOLS, field='sodUtc8')
+            missing = [symbol for symbol in tracker.SYMBOLS if symbol not in baseline]
+            if missing:
+                print(f"[警告] 尚未收到 {len(missing)} 个币种的0点开盘价（{', '.join(missing[:5])}），暂不保存基准价")
+            else:
+                tracker.save_baseline(baseline)
+        changes = tracker.calculate_changes(prices, baseline)
+        if changes:
+            record = tracker.build_change_record(datetime.now(tracker.BEIJING_TZ), changes)
+            tracker.save_to_jsonl(record)
+    
+    market.on_bar_closed(handler)
+
+
+def attach_speed(market):
+    """每3分钟用推送的1分钟K线计算10分钟涨速"""
+    import price_speed_10m_collector as speed
+    
+    trigger = _MinuteTrigger(every_minutes=speed.COLLECT_INTERVAL // 60)
+    
+    def handler(inst_id, bar, candle):
+        if trigger.fire(bar, candle):
+            speed.collect_speed_data(live=market)
+    
+    market.on_bar_closed(handler)
+
+
+def main():
+    """命令行：启动流式采集"""
+    import argparse
+    from candle_store import candle_store
+    
+    parser = argparse.ArgumentParser(description='OKX WebSocket 流式行情采集')
+    parser.add_argument('--sar', action='store_true', help='接入SAR采集（代替 sar_jsonl_collector）')
+    parser.add_argument('--coin-change', action='store_true', help='接入27币涨跌（代替 coin_change_tracker_collector 的价格部分）')
+    parser.add_argument('--speed', action='store_true', help='接入10分钟涨速（代替 price_speed_10m_collector）')
+    parser.add_argument('--ws-base', default=WS_BASE, help=f'WebSocket地址（默认{WS_BASE}，回放时用 ws://127.0.0.1:8765）')
+    parser.add_argument('--record', help='把收到的原始帧写入该JSONL文件')
+    parser.add_argument('--no-seed', action='store_true', help='不从本地K线存储补齐历史（回放时使用）')
+    
+    args = parser.parse_args()
+    
+    market = LiveMarket()
+    candle_inst_ids = set()
+    ticker_inst_ids = set()
+    
+    if args.sar:
+        import sar_jsonl_collector
+        inst_ids = {}
+        for symbol in sar_jsonl_collector.loop.symbols:
+            try:
+                inst_ids[symbol] = symbol + '-USDT-SWAP' if args.no_seed else candle_store.resolve(symbol)
+            except Exception as e:
+                print(f"[错误] {symbol} 无法确定交易对: {e}")
+        attach_sar(market, inst_ids)
+        candle_inst_ids.update(inst_ids.values())
+    if args.coin_change:
+        import coin_change_tracker_collector as tracker
+        attach_coin_change(market)
+        for symbol in tracker.SYMBOLS:
+            ticker_inst_ids.update({f'{symbol}-USDT-SWAP', f'{symbol}-USDT'})
+        candle_inst_ids.add('BTC-USDT-SWAP')
+    if args.speed:
+        import price_speed_10m_collector as speed
+        attach_speed(market)
+        candle_inst_ids.update(speed.SYMBOLS)
+        ticker_inst_ids.update(speed.SYMBOLS)
+    
+    if not candle_inst_ids:
+        parser.error('至少需要 --sar / --coin-change / --speed 之一')
+    
+    def seed_history():
+        for inst_id in sorted(candle_inst_ids):
+            try:
+                market.seed(inst_id, '1m', candle_store.get_klines(inst_id, '1m', 100, include_forming=False))
+            except Exception as e:
+                print(f"[警告] {inst_id} 历史K线补齐失败: {e}")
+    
+    if not args.no_seed:
+        seed_history()
+    
+    recorder = FrameRecorder(args.record) if args.record else None
+    base = args.ws_base.rstrip('/')
+    streams = [OKXStream(base + BUSINESS_PATH,
+                         [{'channel': 'candle1m', 'instId': i} for i in sorted(candle_inst_ids)],
+                         market, recorder, on_reconnect=None if args.no_seed else seed_history)]
+    if ticker_inst_ids:
+        streams.append(OKXStream(base + PUBLIC_PATH,
+                                 [{'channel': 'tickers', 'instId': i} for i in sorted(ticker_inst_ids)],
+                                 market, recorder))
+    
+    for stream in streams:
+        stream.start()
+    
+    try:
+        while True:
+            time.sleep(60)
+            print(f"[WS] 消息: {sum(s.messages for s in streams)}, 重连: {sum(s.reconnects for s in streams)}, "
+                  f"行情: {len(market.tickers)}")
+    except KeyboardInterrupt:
+        print("\n[退出] 流式采集已停止")
+    finally:
+        for stream in streams:
+            stream.stop()
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,8 @@ from pathlib import Path
 from datetime import datetime
 import pytz
 
+from jsonl_time_index import read_range
+
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
 
@@ -65,26 +67,8 @@ class PanicDailyManager:
             if not self.jsonl_file.exists():
                 return []
             
-            records = []
-            with open(self.jsonl_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        record = json.loads(line)
-                        timestamp = record.get('timestamp', 0)
-                        
-                        if start_time <= timestamp <= end_time:
-                            records.append(record)
-                            
-                            if len(records) >= limit:
-                                break
-                    except:
-                        continue
-            
-            return records[-limit:] if len(records) > limit else records
+            # 通过时间索引直接定位到窗口起点
+            return read_range(self.jsonl_file, start_time, end_time, time_key='timestamp', limit=limit)
             
         except Exception as e:
             print(f"[错误] 读取时间范围记录失败: {e}")
@@ -6,13 +6,16 @@ Panic Wash Index Collector - 恐慌洗盘指数采集器
 import sys
 sys.path.insert(0, '/home/user/webapp/source_code')
 
-import json
 import time
 import requests
 from datetime import datetime
 from pathlib import Path
 import pytz
 
+from jsonl_time_index import append_record
+from okx_market_client import okx_client
+from ticker_snapshot import get_snapshot
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/panic_jsonl')
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -105,37 +108,42 @@ def get_btc126_open_interest():
 
 
 def get_market_data():
-    """获取市场数据"""
+    """获取市场数据（现货行情，来自全市场快照）"""
     market_data = {}
     
     try:
+        try:
+            snapshot = get_snapshot()
+        except Exception as e:
+            print(f"[警告] 行情快照获取失败，逐个币种查询: {e}")
+            snapshot = None
+        
         for symbol in SYMBOLS:
             try:
-                url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT"
-                response = requests.get(url, timeout=5)
-                data = response.json()
-                
-                if data.get('code') == '0' and data.get('data'):
+                ticker = snapshot.get(f'{symbol}-USDT') if snapshot else None
+                if ticker is None:
+                    # 快照中没有时单独查询
+                    data = okx_client.get_ticker(f'{symbol}-USDT')
+                    if data.get('code') != '0' or not data.get('data'):
+                        continue
                     ticker = data['data'][0]
-                    
-                    market_data[symbol] = {
-                        'last': float(ticker.get('last', 0)),
-                        'open24h': float(ticker.get('open24h', 0)),
-                        'high24h': float(ticker.get('high24h', 0)),
-                        'low24h': float(ticker.get('low24h', 0)),
-                        'vol24h': float(ticker.get('vol24h', 0)),
-                        'change_pct': 0
-                    }
-                    
-                    # 计算涨跌幅
-                    if market_data[symbol]['open24h'] > 0:
-                        change = ((market_data[symbol]['last'] - market_data[symbol]['open24h']) 
-                                 / market_data[symbol]['open24h']) * 100
-                        market_data[symbol]['change_pct'] = round(change, 2)
-                    
-                    print(f"[价格] {symbol}: {market_data[symbol]['last']} ({market_data[symbol]['change_pct']}%)")
-                    
-                time.sleep(0.1)
+                
+                market_data[symbol] = {
+                    'last': float(ticker.get('last', 0)),
+                    'open24h': float(ticker.get('open24h', 0)),
+                    'high24h': float(ticker.get('high24h', 0)),
+                    'low24h': float(ticker.get('low24h', 0)),
+                    'vol24h': float(ticker.get('vol24h', 0)),
+                    'change_pct': 0
+                }
+                
+                # 计算涨跌幅
+                if market_data[symbol]['open24h'] > 0:
+                    change = ((market_data[symbol]['last'] - market_data[symbol]['open24h']) 
+                             / market_data[symbol]['open24h']) * 100
+                    market_data[symbol]['change_pct'] = round(change, 2)
+                
+                print(f"[价格] {symbol}: {market_data[symbol]['last']} ({market_data[symbol]['change_pct']}%)")
                 
             except Exception as e:
                 print(f"[错误] {symbol} 获取失败: {e}")
@@ -261,9 +269,8 @@ def save_to_jsonl(fear_greed_index, market_data, liquidation_data):
             'data_source': 'btc126.com'
         }
         
-        # 追加写入
-        with open(jsonl_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # 追加写入并同步更新时间索引
+        append_record(jsonl_file, record, time_key='timestamp')
         
         print(f"[保存] 恐惧贪婪指数: {fear_greed_index} (级别: {record['level']})")
         print(f"[爆仓] 1h: {liquidation_data['liquidation_1h']}万$ | 24h: {liquidation_data['liquidation_24h']}万$")
@@ -275,6 +282,40 @@ def save_to_jsonl(fear_greed_index, market_data, liquidation_data):
         print(f"[错误] 保存JSONL失败: {e}")
 
 
+def run_once():
+    """采集一次恐慌指数并保存（collector_host 调度入口）"""
+    now = datetime.now(BEIJING_TZ)
+    print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] 开始采集恐慌指数...")
+    
+    # 获取市场数据（用于计算恐慌指数）
+    market_data = get_market_data()
+    
+    # 获取真实的爆仓数据
+    liquidation_data = get_btc126_liquidation_data()
+    
+    # 获取全网持仓量
+    open_interest = get_btc126_open_interest()
+    
+    if market_data and liquidation_data:
+        # 添加持仓量到爆仓数据
+        liquidation_data['open_interest'] = open_interest
+        
+        # 计算恐惧贪婪指数
+        # 公式: 恐惧贪婪指数 = 24H爆仓人数(万人) / 全网总计(亿$)
+        liquidation_count_24h = liquidation_data.get('liquidation_count_24h', 0)
+        if open_interest > 0 and liquidation_count_24h > 0:
+            fear_greed_index = round(liquidation_count_24h / open_interest, 2)
+        else:
+            fear_greed_index = 0
+        
+        print(f"[计算] 恐惧贪婪指数 = {liquidation_count_24h}万人 / {open_interest}亿$ = {fear_greed_index}")
+        
+        # 保存到JSONL
+        save_to_jsonl(fear_greed_index, market_data, liquidation_data)
+    else:
+        print("[警告] 数据获取不完整，跳过本次采集")
+
+
 def main():
     """主循环"""
     print("=" * 60)
@@ -284,36 +325,7 @@ def main():
     
     while True:
         try:
-            now = datetime.now(BEIJING_TZ)
-            print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] 开始采集恐慌指数...")
-            
-            # 获取市场数据（用于计算恐慌指数）
-            market_data = get_market_data()
-            
-            # 获取真实的爆仓数据
-            liquidation_data = get_btc126_liquidation_data()
-            
-            # 获取全网持仓量
-            open_interest = get_btc126_open_interest()
-            
-            if market_data and liquidation_data:
-                # 添加持仓量到爆仓数据
-                liquidation_data['open_interest'] = open_interest
-                
-                # 计算恐惧贪婪指数
-                # 公式: 恐惧贪婪指数 = 24H爆仓人数(万人) / 全网总计(亿$)
-                liquidation_count_24h = liquidation_data.get('liquidation_count_24h', 0)
-                if open_interest > 0 and liquidation_count_24h > 0:
-                    fear_greed_index = round(liquidation_count_24h / open_interest, 2)
-                else:
-                    fear_greed_index = 0
-                
-                print(f"[计算] 恐惧贪婪指数 = {liquidation_count_24h}万人 / {open_interest}亿$ = {fear_greed_index}")
-                
-                # 保存到JSONL
-                save_to_jsonl(fear_greed_index, market_data, liquidation_data)
-            else:
-                print("[警告] 数据获取不完整，跳过本次采集")
+            run_once()
             
             # 每3分钟采集一次
             print(f"[等待] 下次采集: 3分钟后")
@@ -5,7 +5,7 @@ Price Position Data Collector
 
 功能：
 1. 从OKX获取27种币的实时价格
-2. 计算48小时和7天的高低点
+2. 计算48小时和7天的高低点（滚动高低点单调队列增量维护，同时维护1h~30d多个窗口）
 3. 计算价格位置（在高低区间的百分比）
 4. 检测支撑位和压力位突破信号
 5. 写入JSONL文件（按日期保存）
@@ -26,6 +26,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 import ccxt
 
+from market_data_bus import market_bus
+from rolling_extremes import HOUR_MS, RollingExtremes
+from ticker_snapshot import get_snapshot
+
 # 配置
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / 'data' / 'price_position'
@@ -34,6 +38,14 @@ COLLECT_INTERVAL = 180  # 3分钟
 # 确保数据目录存在
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# 各窗口（1h/4h/24h/48h/7d/30d）的滚动最高/最低价，每轮只推送新收盘的1分钟K线和最新价
+extremes = RollingExtremes(DATA_DIR / '.rolling_extremes.json')
+
+# 距上次更新超过这个时间用5分钟K线补齐，超过48小时重新预热
+MINUTE_MS = 60 * 1000
+CATCHUP_MS = 10 * MINUTE_MS
+RESEED_MS = 48 * HOUR_MS
+
 # 27种监控币种
 SYMBOLS = [
     'BTC-USDT-SWAP', 'ETH-USDT-SWAP', 'SOL-USDT-SWAP', 'BNB-USDT-SWAP',
@@ -53,7 +65,13 @@ def get_okx_exchange():
     })
 
 def get_historical_klines(exchange, symbol, timeframe, limit):
-    """获取历史K线数据"""
+    """获取历史K线数据 [[时间戳, 开, 高, 低, 收, 量], ...]（优先使用共享K线/本地K线存储）"""
+    try:
+        klines = market_bus.get_klines(symbol, timeframe, limit)
+        return [[k['timestamp'], k['open'], k['high'], k['low'], k['close'], k['volume']] for k in klines]
+    except Exception as e:
+        print(f"[警告] {symbol} 本地K线同步失败，直接请求交易所: {e}")
+    
     try:
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
         return ohlcv
@@ -61,15 +79,36 @@ def get_historical_klines(exchange, symbol, timeframe, limit):
         print(f"获取 {symbol} K线失败: {e}")
         return []
 
-def calculate_high_low(klines):
-    """计算K线的最高价和最低价"""
-    if not klines:
-        return None, None
+def _closed_bars(klines, bar_ms, now_ms):
+    """[[时间戳, 开, 高, 低, 收, 量], ...] → 已收盘K线的 [(时间戳, 高, 低), ...]"""
+    return [(k[0], k[2], k[3]) for k in klines if k[0] + bar_ms <= now_ms]
+
+def update_extremes(exchange, symbol, current_price, now_ms):
+    """
+    把新收盘的K线和最新价推送到滚动高低点
     
-    highs = [k[2] for k in klines]  # high
-    lows = [k[3] for k in klines]   # low
+    首次运行（或停止超过48小时）时用1小时K线（30天）和5分钟K线（48小时）预热一次，
+    停止超过10分钟时用5分钟K线补齐，其余情况只读取最近几根1分钟K线（与其他采集器共用）。
+    """
+    last_ts = extremes.last_ts(symbol)
+    if last_ts is None or now_ms - last_ts > RESEED_MS:
+        extremes.reset(symbol)
+        bars_1h = _closed_bars(get_historical_klines(exchange, symbol, '1h', 720), HOUR_MS, now_ms)
+        bars_5m = _closed_bars(get_historical_klines(exchange, symbol, '5m', 576), 5 * MINUTE_MS, now_ms)
+        if not bars_1h or not bars_5m:
+            # 没有历史K线时不能只用当前价格作为高低点
+            print(f"[警告] {symbol} 历史K线获取失败，无法预热高低点")
+            return {}
+        first_5m = bars_5m[0][0]
+        extremes.push_bars(symbol, [b for b in bars_1h if b[0] < first_5m] + bars_5m)
+    elif now_ms - last_ts > CATCHUP_MS:
+        limit = min(576, (now_ms - last_ts) // (5 * MINUTE_MS) + 2)
+        extremes.push_bars(symbol, _closed_bars(get_historical_klines(exchange, symbol, '5m', limit),
+                                                5 * MINUTE_MS, now_ms))
     
-    return max(highs), min(lows)
+    extremes.push_bars(symbol, _closed_bars(get_historical_klines(exchange, symbol, '1m', 11), MINUTE_MS, now_ms))
+    extremes.push(symbol, now_ms, current_price, emit=False)
+    return extremes.extremes(symbol)
 
 def calculate_position(current_price, high, low):
     """计算价格位置（百分比）"""
@@ -97,6 +136,13 @@ def collect_price_positions():
     
     exchange = get_okx_exchange()
     
+    # 全部币种使用同一时刻的行情快照
+    try:
+        snapshot = get_snapshot()
+    except Exception as e:
+        print(f"[警告] 行情快照获取失败，逐个币种查询: {e}")
+        snapshot = None
+    
     # 使用北京时间
     beijing_tz = pytz.timezone('Asia/Shanghai')
     snapshot_time = datetime.now(beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
@@ -109,17 +155,16 @@ def collect_price_positions():
     
     for symbol in SYMBOLS:
         try:
-            # 获取当前价格
-            ticker = exchange.fetch_ticker(symbol)
+            # 获取当前价格（快照中没有时单独查询）
+            ticker = snapshot.get(symbol) if snapshot else None
+            if ticker is None:
+                ticker = exchange.fetch_ticker(symbol)
             current_price = ticker['last']
             
-            # 获取48小时K线（5分钟级别，48h = 576根K线）
-            klines_48h = get_historical_klines(exchange, symbol, '5m', 576)
-            high_48h, low_48h = calculate_high_low(klines_48h)
-            
-            # 获取7天K线（1小时级别，7d = 168根K线）
-            klines_7d = get_historical_klines(exchange, symbol, '1h', 168)
-            high_7d, low_7d = calculate_high_low(klines_7d)
+            # 48小时和7天的高低点（滚动高低点增量维护，不再每轮读取576根5分钟K线和168根1小时K线）
+            window_extremes = update_extremes(exchange, symbol, current_price, int(time.time() * 1000))
+            high_48h, low_48h = window_extremes.get('48h', (None, None))
+            high_7d, low_7d = window_extremes.get('7d', (None, None))
             
             if high_48h and low_48h and high_7d and low_7d:
                 # 计算价格位置
@@ -145,6 +190,9 @@ def collect_price_positions():
                     'alert_48h_high': alert_48h_high,
                     'alert_7d_low': alert_7d_low,
                     'alert_7d_high': alert_7d_high,
+                    # 各窗口（1h/4h/24h/48h/7d/30d）的价格位置
+                    'position_windows': {name: calculate_position(current_price, high, low)
+                                         for name, (high, low) in window_extremes.items()},
                 })
                 
                 # 收集支撑压力线数据
@@ -158,13 +206,16 @@ def collect_price_positions():
                       f"48h位置: {position_48h:5.1f}% | 7d位置: {position_7d:5.1f}% | "
                       f"预警: {'🔴低' if alert_48h_low else '  '} {'🔴高' if alert_48h_high else '  '}")
             
-            time.sleep(0.1)  # 避免频率限制
-            
         except Exception as e:
             print(f"✗ {symbol} 采集失败: {e}")
     
     print(f"\n采集完成: {len(positions_data)}/{len(SYMBOLS)} 个币种")
     
+    try:
+        extremes.save()
+    except Exception as e:
+        print(f"[警告] 滚动高低点状态保存失败: {e}")
+    
     # 写入数据库
     if positions_data:
         save_to_jsonl(positions_data, snapshot_time, 
@@ -25,6 +25,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 import ccxt
 
+from market_data_bus import market_bus
+from jsonl_tail_reader import read_last_record
+from price_speed_counters import PriceSpeedCounters
+
 # 配置
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / 'data' / 'price_speed_10m'
@@ -44,6 +48,9 @@ SYMBOLS = [
     'TON-USDT-SWAP', 'TAO-USDT-SWAP', 'SUI-USDT-SWAP', 'XLM-USDT-SWAP'
 ]
 
+# 每个币种各涨速区间的当日累计次数（持久化在数据目录下，接口直接读取）
+speed_counters = PriceSpeedCounters(DATA_DIR, coins=[s.replace('-USDT-SWAP', '') for s in SYMBOLS])
+
 def get_okx_exchange():
     """创建OKX交易所实例"""
     return ccxt.okx({
@@ -56,10 +63,12 @@ def get_beijing_time():
     beijing_tz = pytz.timezone('Asia/Shanghai')
     return datetime.now(beijing_tz)
 
-def calculate_10m_speed(exchange, symbol):
+def calculate_10m_speed(exchange, symbol, ticker=None, klines=None):
     """
     计算10分钟涨速
     
+    ticker / klines 由行情推送提供时直接使用，否则 ticker 通过 exchange 请求、klines 从K线共享总线获取
+    
     返回：
     {
         'symbol': 'BTC',
@@ -71,11 +80,14 @@ def calculate_10m_speed(exchange, symbol):
     """
     try:
         # 获取当前价格
-        ticker = exchange.fetch_ticker(symbol)
+        if ticker is None:
+            ticker = exchange.fetch_ticker(symbol)
         current_price = ticker['last']
         
-        # 获取10分钟K线（1分钟级别，10根）
-        klines = exchange.fetch_ohlcv(symbol, '1m', limit=11)
+        # 获取10分钟K线（1分钟级别，10根），与其他采集器共用同一批1分钟K线
+        if klines is None:
+            klines = [[k['timestamp'], k['open'], k['high'], k['low'], k['close'], k['volume']]
+                      for k in market_bus.get_klines(symbol, '1m', 11)]
         if len(klines) < 11:
             return None
         
@@ -119,69 +131,13 @@ def calculate_10m_speed(exchange, symbol):
         print(f"  ✗ {symbol} 计算涨速失败: {e}")
         return None
 
-def calculate_daily_counts(existing_data, new_results):
+def collect_speed_data(live=None):
     """
-    计算每个币种当天在各涨速区间出现的次数
+    采集所有币种的10分钟涨速
     
-    参数：
-    - existing_data: 今天已有的历史数据（不包含当前这次采集）
-    - new_results: 当前这次采集的数据
-    
-    返回：
-    {
-        'BTC': {'+4%': 0, '+1%': 5, '-1%': 2, '-3%': 0},
-        'ETH': {'+4%': 1, '+1%': 3, '-1%': 4, '-3%': 0},
-        ...
-    }
+    Args:
+        live: 行情推送的 LiveMarket（可选），提供时使用推送的最新价和1分钟K线，不请求交易所
     """
-    daily_counts = {}
-    
-    # 初始化所有币种的计数器
-    for symbol in SYMBOLS:
-        coin_name = symbol.replace('-USDT-SWAP', '')
-        daily_counts[coin_name] = {
-            '+4%': 0,
-            '+1%': 0,
-            '-1%': 0,
-            '-3%': 0
-        }
-    
-    # 统计历史数据中的涨速区间次数（不包含当前这次）
-    for entry in existing_data:
-        for coin_data in entry.get('coins', []):
-            symbol = coin_data.get('symbol')
-            category = coin_data.get('category', '0%')
-            
-            if symbol in daily_counts:
-                # 根据category累加对应区间的计数
-                if category == '+4%':
-                    daily_counts[symbol]['+4%'] += 1
-                elif category == '+1%':
-                    daily_counts[symbol]['+1%'] += 1
-                elif category == '-1%':
-                    daily_counts[symbol]['-1%'] += 1
-                elif category == '-3%':
-                    daily_counts[symbol]['-3%'] += 1
-    
-    # 累加当前采集的数据
-    for coin_data in new_results:
-        symbol = coin_data.get('symbol')
-        category = coin_data.get('category', '0%')
-        
-        if symbol in daily_counts:
-            if category == '+4%':
-                daily_counts[symbol]['+4%'] += 1
-            elif category == '+1%':
-                daily_counts[symbol]['+1%'] += 1
-            elif category == '-1%':
-                daily_counts[symbol]['-1%'] += 1
-            elif category == '-3%':
-                daily_counts[symbol]['-3%'] += 1
-    
-    return daily_counts
-
-def collect_speed_data():
-    """采集所有币种的10分钟涨速"""
     beijing_time = get_beijing_time()
     time_str = beijing_time.strftime('%Y-%m-%d %H:%M:%S')
     date_str = beijing_time.strftime('%Y%m%d')
@@ -190,7 +146,7 @@ def collect_speed_data():
     print(f"开始采集10分钟涨速 - {time_str}")
     print(f"{'='*60}")
     
-    exchange = get_okx_exchange()
+    exchange = get_okx_exchange() if live is None else None
     
     results = []
     categories_count = {
@@ -202,7 +158,12 @@ def collect_speed_data():
     }
     
     for symbol in SYMBOLS:
-        speed_data = calculate_10m_speed(exchange, symbol)
+        if live is not None:
+            ticker = live.tickers.get(symbol)
+            klines = live.ohlcv(symbol, '1m', 11)
+            speed_data = calculate_10m_speed(exchange, symbol, ticker, klines) if ticker else None
+        else:
+            speed_data = calculate_10m_speed(exchange, symbol)
         if speed_data:
             results.append(speed_data)
             categories_count[speed_data['category']] += 1
@@ -225,8 +186,6 @@ def collect_speed_data():
                   f"10分钟前: ${speed_data['price_10m_ago']:>10.6f} | "
                   f"涨速: {speed:>6.2f}% | "
                   f"分类: {speed_data['category']}")
-        
-        time.sleep(0.1)  # 避免频率限制
     
     print(f"\n📊 涨速分布统计:")
     print(f"  🔴 +4%及以上: {categories_count['+4%']} 个")
@@ -235,45 +194,52 @@ def collect_speed_data():
     print(f"  🟡 -1%~-3%:   {categories_count['-1%']} 个")
     print(f"  🔵 -3%及以下: {categories_count['-3%']} 个")
     
-    # 读取今天已有的数据以计算累计统计
-    file_path = DATA_DIR / f'price_speed_10m_{date_str}.jsonl'
-    existing_data = []
-    if file_path.exists():
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    existing_data.append(json.loads(line))
-    
-    # 计算每个币种的当日累计次数
-    daily_counts = calculate_daily_counts(existing_data, results)
-    
     # 保存数据
     entry = {
         'time': time_str,
         'coins': results,
         'statistics': categories_count,
         'total_coins': len(results),
-        'daily_counts': daily_counts  # 新增：每个币种的当日统计
     }
     
-    save_to_jsonl(entry, date_str)
+    # 每个币种的当日累计次数：在持久化的计数上累加本次采集，不再重新统计当天的全部记录
+    entry['daily_counts'] = speed_counters.record(date_str, entry)
+    
+    if save_to_jsonl(entry, date_str):
+        speed_counters.save()
+    else:
+        # JSONL没有写入，丢弃本次累加，下次从JSONL重建当天的计数
+        speed_counters.invalidate(date_str)
     
     return entry
 
 def save_to_jsonl(entry, date_str):
-    """保存数据到JSONL文件"""
+    """
+    保存数据到JSONL文件
+    
+    采集时间晚于文件最后一条记录时直接追加；否则（同一时间重复采集、补采更早的时间）
+    去重、排序后整体重写（保留每条记录自己的daily_counts，不要修改历史记录）
+    
+    Returns:
+        bool: 是否保存成功
+    """
     file_path = DATA_DIR / f'price_speed_10m_{date_str}.jsonl'
     
     try:
+        last = read_last_record(file_path) if file_path.exists() else None
+        if last is None or last['time'] < entry['time']:
+            with open(file_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            print(f"\n✅ 数据已保存: {file_path}")
+            return True
+        
         # 读取今天已有的数据
         existing_data = []
-        if file_path.exists():
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        existing_data.append(json.loads(line))
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    existing_data.append(json.loads(line))
         
         # 检查是否已有相同时间的数据（去重）
         entry_time = entry['time']
@@ -292,16 +258,13 @@ def save_to_jsonl(entry, date_str):
         
         print(f"\n✅ 数据已保存: {file_path}")
         print(f"   总计: {len(existing_data)} 条记录")
+        return True
         
     except Exception as e:
         print(f"\n✗ 保存数据失败: {e}")
         import traceback
         traceback.print_exc()
-        
-    except Exception as e:
-        print(f"\n✗ 保存数据失败: {e}")
-        import traceback
-        traceback.print_exc()
+        return False
 
 def backfill_today():
     """回填今天的历史数据（一次性运行）"""
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Price Speed Counters - 10分钟涨速的当日累计计数
+
+按 (日期, 币种, 涨速区间) 保存当天的累计次数，以及当天所有采集的区间分布总和：
+- 采集器每轮只把本次结果累加到计数上（不再读取并重新统计当天的全部记录）
+- 计数原子写入数据目录下的状态文件，接口直接读取，不再每次请求重新累加整天的数据
+- 状态文件缺失、损坏或与JSONL不一致时，从当天的JSONL文件重建
+
+状态文件格式（data/price_speed_10m/.daily_counts.json）:
+    {"days": {"20260215": {"samples": 235, "last_time": "2026-02-15 13:53:41",
+                           "coins": {"BTC": {"+4%": 0, "+1%": 5, "-1%": 2, "-3%": 0}, ...},
+                           "statistics": {"+4%": 0, "+1%": 12, "0%": 6500, "-1%": 20, "-3%": 1}}}}
+
+用法:
+    from price_speed_counters import PriceSpeedCounters
+    counters = PriceSpeedCounters(DATA_DIR, coins=['BTC', 'ETH', ...])
+    daily_counts = counters.record('20260215', entry)   # 累加本次采集，返回每个币的当日计数
+    counters.save()
+    python price_speed_counters.py --rebuild 20260215   # 从JSONL重建某天的计数
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# 涨速区间（statistics 统计全部区间，每个币的当日计数不统计 0%）
+CATEGORIES = ('+4%', '+1%', '0%', '-1%', '-3%')
+COIN_CATEGORIES = ('+4%', '+1%', '-1%', '-3%')
+
+STATE_FILE = '.daily_counts.json'
+
+# 状态文件中保留的天数
+MAX_DAYS = 7
+
+
+def day_file(data_dir, date_str):
+    """某天的JSONL文件路径（date_str: YYYYMMDD）"""
+    return Path(data_dir) / f'price_speed_10m_{date_str}.jsonl'
+
+
+class PriceSpeedCounters:
+    """按天保存每个币种各涨速区间的累计次数"""
+    
+    def __init__(self, data_dir, coins=None, max_days=MAX_DAYS):
+        """
+        Args:
+            data_dir: 涨速数据目录（JSONL文件和状态文件所在目录）
+            coins: 固定统计的币种（即使当天没有数据也返回0计数），其余币种不计数；
+                   为 None 时统计记录中出现的所有币种
+            max_days: 状态文件中保留的天数
+        """
+        self.data_dir = Path(data_dir)
+        self.state_file = self.data_dir / STATE_FILE
+        self.coins = list(coins) if coins is not None else None
+        self._coin_set = set(self.coins) if coins is not None else None
+        self.max_days = max_days
+        self._days = None
+        self._mtime = None
+        self._lock = threading.Lock()
+    
+    def _empty_day(self):
+        return {
+            'samples': 0,
+            'last_time': None,
+            'coins': {coin: dict.fromkeys(COIN_CATEGORIES, 0) for coin in self.coins or []},
+            'statistics': dict.fromkeys(CATEGORIES, 0),
+        }
+    
+    def _add(self, day, entry):
+        """把一条采集记录累加到某天的计数上"""
+        coins = day['coins']
+        for coin_data in entry.get('coins', []):
+            symbol = coin_data.get('symbol')
+            category = coin_data.get('category', '0%')
+            if self.coins is not None and symbol not in self._coin_set:
+                continue
+            if symbol not in coins:
+                coins[symbol] = dict.fromkeys(COIN_CATEGORIES, 0)
+            if category in COIN_CATEGORIES:
+                coins[symbol][category] += 1
+        
+        statistics = day['statistics']
+        for category, count in entry.get('statistics', {}).items():
+            if category in statistics:
+                statistics[category] += count
+        
+        day['samples'] += 1
+        if day['last_time'] is None or entry['time'] > day['last_time']:
+            day['last_time'] = entry['time']
+    
+    def _load(self):
+        """读取状态文件（文件被其他进程更新后重新读取）"""
+        try:
+            mtime = self.state_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._days is not None and mtime == self._mtime:
+            return self._days
+        
+        days = {}
+        if mtime is not None:
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    days = json.load(f).get('days', {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[警告] 涨速计数状态文件读取失败，将从JSONL重建: {e}")
+        self._days = days
+        self._mtime = mtime
+        return days
+    
+    def rebuild_day(self, date_str, exclude_time=None):
+        """
+        从当天的JSONL文件重新统计计数
+        
+        Args:
+            date_str: 日期（YYYYMMDD）
+            exclude_time: 跳过该时间的记录（即将被同一时间的新采集替换）
+        
+        Returns:
+            dict: 当天的计数
+        """
+        day = self._empty_day()
+        file_path = day_file(self.data_dir, date_str)
+        if file_path.exists():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get('time') != exclude_time:
+                        self._add(day, entry)
+        return day
+    
+    def record(self, date_str, entry):
+        """
+        累加一次采集的结果
+        
+        当天没有计数（首次运行、状态文件丢失）或采集时间不晚于上一次
+        （同一时间重复采集会替换JSONL中的旧记录）时，先从JSONL重建当天的计数。
+        
+        Args:
+            date_str: 日期（YYYYMMDD）
+            entry: 采集记录（time / coins / statistics）
+        
+        Returns:
+            dict: 每个币种当日各区间的累计次数（包含本次采集）
+        """
+        with self._lock:
+            days = self._load()
+            day = days.get(date_str)
+            if day is None or (day['last_time'] is not None and entry['time'] <= day['last_time']):
+                day = self.rebuild_day(date_str, exclude_time=entry['time'])
+                days[date_str] = day
+            self._add(day, entry)
+            
+            # 只保留最近几天
+            for old in sorted(days)[:-self.max_days]:
+                del days[old]
+            return copy.deepcopy(day['coins'])
+    
+    def invalidate(self, date_str):
+        """丢弃某天的计数（下次 record 时从JSONL重建）"""
+        with self._lock:
+            if self._days is not None:
+                self._days.pop(date_str, None)
+    
+    def get_day(self, date_str, last_time=None):
+        """
+        读取某天的计数
+        
+        状态文件中没有该天，或计数的最后时间与 last_time（JSONL的最后一条记录）不一致时，
+        从JSONL重建（只在内存中，不写入状态文件）。
+        
+        Returns:
+            dict: {'samples', 'last_time', 'coins', 'statistics'}
+        """
+        with self._lock:
+            day = self._load().get(date_str)
+            if day is None or (last_time is not None and day['last_time'] != last_time):
+                day = self.rebuild_day(date_str)
+            return copy.deepcopy(day)
+    
+    def save(self):
+        """原子写入状态文件"""
+        with self._lock:
+            if self._days is None:
+                return
+            data = json.dumps({'days': self._days}, ensure_ascii=False)
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix=f'{STATE_FILE}.')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.state_file)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self._mtime = self.state_file.stat().st_mtime_ns
+    
+    def rebuild(self, dates):
+        """从JSONL重建指定日期的计数并写入状态文件"""
+        with self._lock:
+            days = self._load()
+            for date_str in dates:
+                days[date_str] = self.rebuild_day(date_str)
+            for old in sorted(days)[:-self.max_days]:
+                del days[old]
+        self.save()
+        return {date_str: self._days.get(date_str) for date_str in dates}
+
+
+def main():
+    """命令行：查看或重建涨速计数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='10分钟涨速当日累计计数')
+    parser.add_argument('dates', nargs='*', help='日期（YYYYMMDD），默认状态文件中的所有日期')
+    parser.add_argument('--data-dir', default=str(Path(__file__).parent.parent / 'data' / 'price_speed_10m'),
+                        help='涨速数据目录')
+    parser.add_argument('--rebuild', action='store_true', help='从JSONL文件重建计数并写入状态文件')
+    
+    args = parser.parse_args()
+    
+    from price_speed_10m_collector import SYMBOLS
+    
+    counters = PriceSpeedCounters(args.data_dir, coins=[s.replace('-USDT-SWAP', '') for s in SYMBOLS])
+    if args.rebuild:
+        dates = args.dates or sorted(p.stem.rsplit('_', 1)[-1]
+                                     for p in Path(args.data_dir).glob('price_speed_10m_*.jsonl'))[-MAX_DAYS:]
+        counters.rebuild(dates)
+        print(f"[重建] 已从JSONL重建 {len(dates)} 天的计数: {counters.state_file}")
+    else:
+        dates = args.dates or sorted(counters._load())
+    
+    for date_str in dates:
+        day = counters.get_day(date_str)
+        statistics = ' '.join(f"{k}:{v}" for k, v in day['statistics'].items())
+        print(f"\n{date_str}  采集 {day['samples']} 次，最后 {day['last_time']}  [{statistics}]")
+        for coin, counts in day['coins'].items():
+            print(f"  {coin:6s} " + ' '.join(f"{k}:{v:<4d}" for k, v in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
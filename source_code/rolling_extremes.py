@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Rolling Extremes - 多窗口滚动最高/最低价（单调队列，增量更新）
+
+每个 (币种, 窗口) 维护两个单调队列：
+- 最高价队列：价格单调递减，队首为窗口内最高价
+- 最低价队列：价格单调递增，队首为窗口内最低价
+新数据点加入时从队尾弹出被它支配的点，过期的点从队首移出，每个数据点均摊 O(1)；
+1h/4h/24h/48h/7d/30d 等多个窗口同时更新，价格位置和各窗口的创新高/创新低
+都由一次推送得到，不再每轮重新下载几百根K线求 max(high)/min(low)。
+状态（队列、最早/最新时间）原子写入文件，跨周期、跨重启连续；
+窗口配置变化或状态缺失时由调用方用历史K线重新预热。
+
+用法:
+    from rolling_extremes import RollingExtremes
+    engine = RollingExtremes(DATA_DIR / '.rolling_extremes.json')
+    engine.push_bars('BTC', [(ts, high, low), ...])   # K线（只推送比上次更新的K线）
+    events = engine.push('BTC', now_ms, price)         # 实时价格，返回各窗口的创新高/创新低
+    high, low = engine.extremes('BTC')['48h']
+    engine.save()
+    python rolling_extremes.py --state-file data/price_position/.rolling_extremes.json BTC ETH
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+# 默认窗口（毫秒）
+WINDOWS = {
+    '1h': HOUR_MS,
+    '4h': 4 * HOUR_MS,
+    '24h': DAY_MS,
+    '48h': 2 * DAY_MS,
+    '7d': 7 * DAY_MS,
+    '30d': 30 * DAY_MS,
+}
+
+
+def position_in_range(price, high, low):
+    """价格在 [low, high] 区间中的位置（百分比，保留两位小数；high == low 时为 50）"""
+    if high == low:
+        return 50.0
+    return round((price - low) / (high - low) * 100, 2)
+
+
+class RollingExtremes:
+    """按币种、按窗口维护滚动最高/最低价的单调队列"""
+    
+    def __init__(self, state_file=None, windows=None):
+        """
+        Args:
+            state_file: 状态文件路径（为 None 时只保存在内存中）
+            windows: {窗口名称: 窗口长度（毫秒）}，默认 WINDOWS
+        """
+        self.state_file = Path(state_file) if state_file else None
+        self.windows = dict(windows or WINDOWS)
+        self._symbols = None
+        self._lock = threading.Lock()
+        self.stats = {'pushes': 0, 'events': 0}
+    
+    def _new_symbol(self):
+        return {
+            'first_ts': None,
+            'last_ts': None,
+            'bar_ts': None,
+            'max': {name: deque() for name in self.windows},
+            'min': {name: deque() for name in self.windows},
+        }
+    
+    def _load(self):
+        if self._symbols is not None:
+            return self._symbols
+        self._symbols = {}
+        if self.state_file and self.state_file.exists():
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 窗口配置不同的状态不能继续使用
+                if data.get('windows') == self.windows:
+                    for symbol, saved in data.get('symbols', {}).items():
+                        entry = self._new_symbol()
+                        entry['first_ts'] = saved['first_ts']
+                        entry['last_ts'] = saved['last_ts']
+                        entry['bar_ts'] = saved.get('bar_ts')
+                        for side in ('max', 'min'):
+                            for name in self.windows:
+                                entry[side][name].extend(tuple(p) for p in saved[side][name])
+                        self._symbols[symbol] = entry
+            except (OSError, json.JSONDecodeError, KeyError) as e:
+                print(f"[警告] 滚动高低点状态文件读取失败，将重新预热: {e}")
+                self._symbols = {}
+        return self._symbols
+    
+    def save(self):
+        """原子写入状态文件"""
+        if not self.state_file or self._symbols is None:
+            return
+        with self._lock:
+            data = json.dumps({
+                'windows': self.windows,
+                'symbols': {
+                    symbol: {
+                        'first_ts': entry['first_ts'],
+                        'last_ts': entry['last_ts'],
+                        'bar_ts': entry['bar_ts'],
+                        'max': {name: list(q) for name, q in entry['max'].items()},
+                        'min': {name: list(q) for name, q in entry['min'].items()},
+                    }
+                    for symbol, entry in self._symbols.items()
+                },
+            }, separators=(',', ':'))
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix=f'.{self.state_file.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    def _push(self, entry, ts, high, low, events):
+        """加入一个数据点（调用方持有锁）；events 不为 None 时记录各窗口的创新高/创新低"""
+        # 时间不倒退：K线开盘时间早于上次的实时价格时按上次时间计入（窗口边界最多延后一根K线）
+        if entry['last_ts'] is not None and ts < entry['last_ts']:
+            ts = entry['last_ts']
+        if entry['first_ts'] is None:
+            entry['first_ts'] = ts
+        entry['last_ts'] = ts
+        
+        for name, span in self.windows.items():
+            start = ts - span
+            highs = entry['max'][name]
+            lows = entry['min'][name]
+            while highs and highs[0][0] <= start:
+                highs.popleft()
+            while lows and lows[0][0] <= start:
+                lows.popleft()
+            
+            # 只有数据覆盖整个窗口时才算创新高/创新低
+            if events is not None and entry['first_ts'] <= start:
+                if highs and high > highs[0][1]:
+                    events.append({'window': name, 'event_type': 'new_high', 'price': high,
+                                   'previous': highs[0][1], 'previous_ts': highs[0][0]})
+                if lows and low < lows[0][1]:
+                    events.append({'window': name, 'event_type': 'new_low', 'price': low,
+                                   'previous': lows[0][1], 'previous_ts': lows[0][0]})
+            
+            while highs and highs[-1][1] <= high:
+                highs.pop()
+            highs.append((ts, high))
+            while lows and lows[-1][1] >= low:
+                lows.pop()
+            lows.append((ts, low))
+        self.stats['pushes'] += 1
+    
+    def push(self, symbol, ts, high, low=None, emit=True):
+        """
+        加入一个数据点（实时价格时 low 省略）
+        
+        Args:
+            symbol: 币种
+            ts: 时间（毫秒）
+            high: 最高价（实时价格）
+            low: 最低价，默认与 high 相同
+            emit: 是否返回创新高/创新低事件
+        
+        Returns:
+            list: [{'window', 'event_type', 'price', 'previous', 'previous_ts'}, ...]
+        """
+        low = high if low is None else low
+        events = [] if emit else None
+        with self._lock:
+            entry = self._load().setdefault(symbol, self._new_symbol())
+            self._push(entry, int(ts), float(high), float(low), events)
+        if events:
+            self.stats['events'] += len(events)
+        return events or []
+    
+    def push_bars(self, symbol, bars, emit=False):
+        """
+        加入K线（只加入开盘时间晚于上次推送的K线）
+        
+        Args:
+            symbol: 币种
+            bars: [(开盘时间（毫秒）, 最高价, 最低价), ...]，升序，只包含已收盘的K线
+            emit: 是否返回创新高/创新低事件（预热时不需要）
+        
+        Returns:
+            list: 创新高/创新低事件
+        """
+        events = [] if emit else None
+        with self._lock:
+            entry = self._load().setdefault(symbol, self._new_symbol())
+            for ts, high, low in bars:
+                ts = int(ts)
+                if entry['bar_ts'] is not None and ts <= entry['bar_ts']:
+                    continue
+                self._push(entry, ts, float(high), float(low), events)
+                entry['bar_ts'] = ts
+        if events:
+            self.stats['events'] += len(events)
+        return events or []
+    
+    def extremes(self, symbol):
+        """
+        各窗口当前的最高/最低价（窗口截止到最后一个数据点）
+        
+        Returns:
+            dict: {窗口名称: (最高价, 最低价)}，没有数据的币种返回 {}
+        """
+        with self._lock:
+            entry = self._load().get(symbol)
+            if entry is None or entry['last_ts'] is None:
+                return {}
+            return {name: (entry['max'][name][0][1], entry['min'][name][0][1]) for name in self.windows}
+    
+    def positions(self, symbol, price):
+        """价格在各窗口高低区间中的位置（百分比）"""
+        return {name: position_in_range(price, high, low)
+                for name, (high, low) in self.extremes(symbol).items()}
+    
+    def covered(self, symbol, window):
+        """数据是否已覆盖整个窗口"""
+        with self._lock:
+            entry = self._load().get(symbol)
+            return (entry is not None and entry['last_ts'] is not None
+                    and entry['first_ts'] <= entry['last_ts'] - self.windows[window])
+    
+    def last_ts(self, symbol):
+        """最后一个数据点的时间（毫秒），没有数据时返回 None"""
+        with self._lock:
+            entry = self._load().get(symbol)
+            return entry['last_ts'] if entry else None
+    
+    def reset(self, symbol):
+        """丢弃某个币种的状态（重新预热前调用）"""
+        with self._lock:
+            self._load().pop(symbol, None)
+    
+    def symbols(self):
+        with self._lock:
+            return list(self._load())
+
+
+def main():
+    """命令行：查看状态文件中各币种、各窗口的最高/最低价"""
+    import argparse
+    from datetime import datetime
+    
+    parser = argparse.ArgumentParser(description='滚动最高/最低价状态')
+    parser.add_argument('symbols', nargs='*', help='币种（默认全部）')
+    parser.add_argument('--state-file', required=True, help='状态文件路径')
+    
+    args = parser.parse_args()
+    
+    engine = RollingExtremes(args.state_file)
+    if not engine.symbols():
+        # 状态文件的窗口配置可能不是默认值
+        with open(args.state_file, 'r', encoding='utf-8') as f:
+            engine = RollingExtremes(args.state_file, windows=json.load(f).get('windows'))
+    
+    for symbol in args.symbols or engine.symbols():
+        extremes = engine.extremes(symbol)
+        if not extremes:
+            print(f"[警告] {symbol}: 没有状态")
+            continue
+        last_ts = engine.last_ts(symbol)
+        print(f"\n{symbol}  最后更新 {datetime.fromtimestamp(last_ts / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
+        for name, (high, low) in extremes.items():
+            flag = '' if engine.covered(symbol, name) else '  (数据未覆盖整个窗口)'
+            print(f"  {name:>4s}  最高 {high:<14g} 最低 {low:<14g}{flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Rolling Regression - 滑动窗口线性回归（闭式解）
+
+代替每次调用 np.polyfit（每次都要构造范德蒙矩阵并做一次最小二乘求解）：
+- linear_regression: 单个窗口的斜率、截距、R²（闭式解）
+- RollingRegression: 维护 Σy、Σxy、Σy² 的滑动累加和，每个新数据点 O(1) 更新
+  （preview 给出再加入几个点之后的结果而不改变状态，用于正在形成的K线）
+- rolling_regression: 币种×时间矩阵上所有窗口一次向量化计算（逐窗口中心化求和），用于历史接口
+
+x 取窗口内的位置 0..N-1，与 np.polyfit(np.arange(N), y, 1) 的结果一致。
+
+用法:
+    from rolling_regression import linear_regression, rolling_regression
+    slope, intercept, r2 = linear_regression(sar_values[-5:])
+    slopes, intercepts, r2 = rolling_regression(matrix, window=5)   # matrix: (币种数, 时间点数)
+    reg = RollingRegression(5); reg.push(sar); slope, intercept, r2 = reg.preview([forming_sar])
+"""
+import copy
+from collections import deque
+
+import numpy as np
+
+# 滑动累加和每推进这么多个点按窗口重新求和一次，避免浮点误差累积
+RESUM_INTERVAL = 1000
+
+
+def _window_constants(n):
+    """x = 0..n-1 时的 Σx 和 n·Σx² - (Σx)²"""
+    sum_x = n * (n - 1) / 2.0
+    denom = n * (n - 1) * (2 * n - 1) / 6.0 * n - sum_x * sum_x
+    return sum_x, denom
+
+
+def _solve(n, sum_y, sum_xy, sum_yy):
+    """由累加和计算斜率、截距、R²（支持 numpy 数组）"""
+    sum_x, denom = _window_constants(n)
+    slope = (n * sum_xy - sum_x * sum_y) / denom
+    intercept = (sum_y - slope * sum_x) / n
+    # R² = 回归平方和 / 总平方和；y 为常数时定义为 1
+    ss_tot = sum_yy - sum_y * sum_y / n
+    ss_reg = slope * slope * denom / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot > 0, ss_reg / ss_tot, 1.0)
+    return slope, intercept, np.clip(r2, 0.0, 1.0)
+
+
+def linear_regression(values):
+    """
+    单个窗口的线性回归
+    
+    Args:
+        values: y 值序列（x 为 0..N-1）
+    
+    Returns:
+        tuple: (斜率, 截距, R²)；少于2个点时返回 (0.0, 最后一个值或0.0, 0.0)
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if n < 2:
+        return 0.0, float(y[-1]) if n else 0.0, 0.0
+    # 减去首个值再求和，价格量级较大时也不损失精度（斜率不变，截距加回）
+    base = y[0]
+    y = y - base
+    slope, intercept, r2 = _solve(n, y.sum(), np.dot(np.arange(n), y), np.dot(y, y))
+    return float(slope), float(intercept + base), float(r2)
+
+
+class RollingRegression:
+    """单个序列的滑动窗口线性回归，每个新数据点 O(1) 更新"""
+    
+    def __init__(self, window):
+        if window < 2:
+            raise ValueError('window 至少为2')
+        self.window = window
+        self._values = deque(maxlen=window)
+        # 累加和基于首个数据点的差值，价格量级较大时 R² 也不损失精度
+        self._base = None
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        self._sum_yy = 0.0
+        self._pushes = 0
+    
+    def _resum(self):
+        y = np.fromiter(self._values, dtype=np.float64)
+        self._sum_y = float(y.sum())
+        self._sum_xy = float(np.dot(np.arange(len(y)), y))
+        self._sum_yy = float(np.dot(y, y))
+    
+    def push(self, value):
+        """加入一个新数据点（窗口已满时移出最旧的点）"""
+        if self._base is None:
+            self._base = float(value)
+        value = float(value) - self._base
+        n = len(self._values)
+        if n == self.window:
+            # 移出 y0 后其余点的 x 各减1：Σxy' = Σxy - (Σy - y0) + (N-1)·y_new
+            oldest = self._values[0]
+            self._sum_xy += (n - 1) * value - (self._sum_y - oldest)
+            self._sum_y += value - oldest
+            self._sum_yy += value * value - oldest * oldest
+        else:
+            self._sum_xy += n * value
+            self._sum_y += value
+            self._sum_yy += value * value
+        self._values.append(value)
+        
+        self._pushes += 1
+        if self._pushes % RESUM_INTERVAL == 0:
+            self._resum()
+    
+    def __len__(self):
+        return len(self._values)
+    
+    @property
+    def ready(self):
+        return len(self._values) == self.window
+    
+    def result(self):
+        """
+        当前窗口的回归结果
+        
+        Returns:
+            tuple: (斜率, 截距, R²)；窗口内少于2个点时返回 None
+        """
+        n = len(self._values)
+        if n < 2:
+            return None
+        slope, intercept, r2 = _solve(n, self._sum_y, self._sum_xy, self._sum_yy)
+        return float(slope), float(intercept + self._base), float(r2)
+    
+    def preview(self, values):
+        """
+        加入 values 之后的回归结果（不改变当前窗口）
+        
+        Returns:
+            tuple: (斜率, 截距, R²)；窗口内少于2个点时返回 None
+        """
+        clone = copy.copy(self)
+        clone._values = deque(self._values, maxlen=self.window)
+        for value in values:
+            clone.push(value)
+        return clone.result()
+
+
+def rolling_regression(matrix, window):
+    """
+    币种×时间矩阵上的滑动窗口线性回归（一次向量化计算）
+    
+    窗口内任一点为 NaN 时该位置结果为 NaN。
+    
+    Args:
+        matrix: 二维数组 (币种数, 时间点数)，一维数组按单个币种处理
+        window: 窗口大小（>=2）
+    
+    Returns:
+        tuple: (斜率, 截距, R²)，形状与输入相同，位置 t 对应以 t 结尾的窗口，前 window-1 个为 NaN
+    """
+    if window < 2:
+        raise ValueError('window 至少为2')
+    y = np.asarray(matrix, dtype=np.float64)
+    squeeze = y.ndim == 1
+    y = np.atleast_2d(y)
+    rows, length = y.shape
+    slope = np.full((rows, length), np.nan)
+    intercept = np.full((rows, length), np.nan)
+    r2 = np.full((rows, length), np.nan)
+    if length < window:
+        return (slope[0], intercept[0], r2[0]) if squeeze else (slope, intercept, r2)
+    
+    # 每个窗口单独求和：y 减去窗口均值、x 取以窗口中心为原点的位置，
+    # 全局前缀和相减会在价格量级较大时损失精度
+    windows = np.lib.stride_tricks.sliding_window_view(y, window, axis=1)
+    mean = windows.mean(axis=2)
+    dy = windows - mean[:, :, None]
+    x = np.arange(window, dtype=np.float64) - (window - 1) / 2.0
+    sum_xx = float(np.dot(x, x))
+    
+    s = dy @ x / sum_xx
+    ss_tot = np.einsum('ijk,ijk->ij', dy, dy)
+    ss_reg = s * s * sum_xx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(np.where(ss_tot > 0, ss_reg / ss_tot, 1.0), 0.0, 1.0)
+    # 窗口内有 NaN 时均值为 NaN，结果也置为 NaN
+    complete = ~np.isnan(mean)
+    slope[:, window - 1:] = np.where(complete, s, np.nan)
+    intercept[:, window - 1:] = np.where(complete, mean - s * (window - 1) / 2.0, np.nan)
+    r2[:, window - 1:] = np.where(complete, r, np.nan)
+    return (slope[0], intercept[0], r2[0]) if squeeze else (slope, intercept, r2)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+RSI Engine - Wilder 平滑 RSI（增量、多币种向量化）
+
+按周期、按币种保存 Wilder 平滑后的平均涨幅/平均跌幅和上一根收盘价，
+每根新收盘的K线只需一次向量化运算即可更新所有币种（不再每轮下载20根K线重新计算）：
+    avg_gain = (avg_gain * (N - 1) + gain) / N
+    avg_loss = (avg_loss * (N - 1) + loss) / N
+    RSI = 100 - 100 / (1 + avg_gain / avg_loss)
+状态持久化到文件，RSI 跨周期、跨重启连续；状态缺失或K线中断时用传入的历史K线重新预热
+（前 N 个变化取简单平均作为初始值，之后按 Wilder 平滑推进）。
+
+用法:
+    from rsi_engine import RSIEngine
+    engine = RSIEngine(DATA_DIR / '.rsi_state.json')
+    rsi_values = engine.update('5m', {'BTC': (ts_array, close_array), ...})   # {symbol: rsi}
+    engine.save()
+    python rsi_engine.py BTC ETH SOL --bar 5m       # 用本地K线存储计算当前RSI
+"""
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from candle_store import BAR_MS, normalize_bar
+
+RSI_PERIOD = 14  # RSI周期
+
+# 预热使用的K线数（Wilder 平滑需要足够长的历史才能收敛）
+WARMUP_BARS = 100
+
+
+def wilder_rsi(closes, period=RSI_PERIOD):
+    """
+    整段收盘价序列计算 Wilder RSI 的最终平滑值
+    
+    Args:
+        closes: 收盘价（从旧到新）
+        period: RSI周期
+    
+    Returns:
+        tuple: (avg_gain, avg_loss)，K线不足 period+1 根时返回 None
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) < period + 1:
+        return None
+    
+    deltas = np.diff(closes)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    
+    # 前 period 个变化取简单平均作为初始值
+    avg_gain = gains[:period].mean()
+    avg_loss = losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return float(avg_gain), float(avg_loss)
+
+
+def rsi_value(avg_gain, avg_loss):
+    """由平均涨跌计算 RSI (0-100)，支持 numpy 数组"""
+    avg_gain = np.asarray(avg_gain, dtype=np.float64)
+    avg_loss = np.asarray(avg_loss, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # 没有下跌时 RSI 为 100（与原先的计算一致）
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+class RSIEngine:
+    """按周期和币种保存 Wilder RSI 状态，新收盘的K线向量化增量更新"""
+    
+    def __init__(self, state_file=None, period=RSI_PERIOD):
+        self.state_file = Path(state_file) if state_file else None
+        self.period = period
+        self._states = None
+        self._lock = threading.Lock()
+        self.stats = {'updates': 0, 'bars': 0, 'warmups': 0}
+    
+    def _load(self):
+        if self._states is not None:
+            return self._states
+        self._states = {}
+        if self.state_file and self.state_file.exists():
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 周期不同的状态不能继续使用
+                if data.get('period') == self.period:
+                    self._states = data.get('bars', {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[警告] RSI状态文件读取失败，将重新预热: {e}")
+        return self._states
+    
+    def save(self):
+        """原子写入状态文件"""
+        if not self.state_file or self._states is None:
+            return
+        with self._lock:
+            data = json.dumps({'period': self.period, 'bars': self._states}, ensure_ascii=False)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix=f'.{self.state_file.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    def update(self, bar, series):
+        """
+        用已收盘的K线更新所有币种并返回当前RSI
+        
+        每个币种只计算状态之后的新K线；所有币种按相同的步数一起向量化推进
+        （通常每根K线收盘时各推进1根）。状态缺失或与K线之间有缺口时，用传入的K线重新预热。
+        
+        Args:
+            bar: 周期（5m / 1H ...）
+            series: {symbol: (时间戳数组, 收盘价数组)}，只包含已收盘的K线，升序
+        
+        Returns:
+            dict: {symbol: RSI}（保留两位小数；K线不足无法预热的币种不在结果中）
+        """
+        bar = normalize_bar(bar)
+        bar_ms = BAR_MS[bar]
+        period = self.period
+        
+        with self._lock:
+            states = self._load().setdefault(bar, {})
+            pending = []
+            for symbol, (ts, closes) in series.items():
+                ts = np.asarray(ts, dtype=np.int64)
+                closes = np.asarray(closes, dtype=np.float64)
+                if len(ts) == 0:
+                    continue
+                entry = states.get(symbol)
+                if entry is None or entry['ts'] + bar_ms < ts[0] or entry['ts'] > ts[-1]:
+                    # 没有状态、中间缺K线或K线早于状态（例如交易对变化）：从头预热
+                    warm = wilder_rsi(closes[-WARMUP_BARS:], period)
+                    if warm is None:
+                        states.pop(symbol, None)
+                        continue
+                    states[symbol] = {'ts': int(ts[-1]), 'close': float(closes[-1]),
+                                      'avg_gain': warm[0], 'avg_loss': warm[1]}
+                    self.stats['warmups'] += 1
+                    continue
+                new = closes[ts > entry['ts']]
+                if len(new):
+                    pending.append((symbol, int(ts[-1]), new))
+            
+            if pending:
+                steps = max(len(new) for _, _, new in pending)
+                matrix = np.full((len(pending), steps), np.nan)
+                for i, (_, _, new) in enumerate(pending):
+                    matrix[i, :len(new)] = new
+                prev = np.array([states[s]['close'] for s, _, _ in pending])
+                avg_gain = np.array([states[s]['avg_gain'] for s, _, _ in pending])
+                avg_loss = np.array([states[s]['avg_loss'] for s, _, _ in pending])
+                
+                for k in range(steps):
+                    close = matrix[:, k]
+                    valid = ~np.isnan(close)
+                    delta = np.where(valid, close - prev, 0.0)
+                    avg_gain = np.where(valid, (avg_gain * (period - 1) + np.maximum(delta, 0.0)) / period, avg_gain)
+                    avg_loss = np.where(valid, (avg_loss * (period - 1) + np.maximum(-delta, 0.0)) / period, avg_loss)
+                    prev = np.where(valid, close, prev)
+                
+                for i, (symbol, last_ts, new) in enumerate(pending):
+                    states[symbol] = {'ts': last_ts, 'close': float(prev[i]),
+                                      'avg_gain': float(avg_gain[i]), 'avg_loss': float(avg_loss[i])}
+                    self.stats['bars'] += len(new)
+            self.stats['updates'] += 1
+            
+            symbols = [s for s in series if s in states]
+            rsi = rsi_value([states[s]['avg_gain'] for s in symbols], [states[s]['avg_loss'] for s in symbols])
+        return {symbol: round(float(value), 2) for symbol, value in zip(symbols, rsi)}
+
+
+def main():
+    """命令行：用本地K线存储计算当前RSI"""
+    import argparse
+    
+    from candle_store import candle_store
+    
+    parser = argparse.ArgumentParser(description='计算 Wilder RSI（本地K线存储）')
+    parser.add_argument('symbols', nargs='+', help='币种或instId')
+    parser.add_argument('--bar', default='5m', help='周期（默认5m）')
+    parser.add_argument('--period', type=int, default=RSI_PERIOD, help=f'RSI周期（默认{RSI_PERIOD}）')
+    parser.add_argument('--state-file', help='把计算结果写入该状态文件，增量计算从这里继续')
+    
+    args = parser.parse_args()
+    
+    bar = normalize_bar(args.bar)
+    series = {}
+    for symbol in args.symbols:
+        try:
+            inst_id = candle_store.resolve(symbol, bar)
+            candle_store.sync(inst_id, bar, min_bars=WARMUP_BARS)
+            candles = candle_store.read(inst_id, bar, limit=WARMUP_BARS)
+            series[symbol] = (candles['ts'], candles['close'])
+        except Exception as e:
+            print(f"[错误] {symbol}: {e}")
+    
+    engine = RSIEngine(args.state_file, period=args.period)
+    rsi_values = engine.update(bar, series)
+    for symbol, rsi in rsi_values.items():
+        print(f"  {symbol:8s} RSI{args.period} {rsi:.2f}")
+    print(f"[RSI] {len(rsi_values)} 个币种，RSI之和: {round(sum(rsi_values.values()), 2)}")
+    if args.state_file:
+        engine.save()
+        print(f"[状态] 已写入 {args.state_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,12 @@
 """
 SAR API JSONL - SAR指标数据API
 """
-import json
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from jsonl_tail_reader import read_last_records
+
 # 交易对列表
 SYMBOLS = [
     'BTC-USDT', 'ETH-USDT', 'BNB-USDT', 'XRP-USDT', 'ADA-USDT',
@@ -57,16 +58,8 @@ def get_sar_current_cycle(symbol='BTC-USDT', limit=500, include_history=False):
         # 读取所有数据（至少最近1000条，确保能找到完整周期）
         all_records = []
         try:
-            with open(symbol_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 读取最后1000条（应该足够包含最长的周期）
-                for line in lines[-1000:]:
-                    if line.strip():
-                        try:
-                            data = json.loads(line)
-                            all_records.append(data)
-                        except json.JSONDecodeError:
-                            continue
+            # 读取最后1000条（应该足够包含最长的周期）
+            all_records = read_last_records(symbol_file, 1000)
         except Exception as e:
             print(f"[SAR API] 读取{symbol_file}失败: {e}")
             return {
@@ -572,24 +565,20 @@ def get_sar_sequence_statistics(hours=24):
             # 读取数据
             records = []
             try:
-                with open(symbol_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    # 读取最近的数据（估算：5分钟一条，24小时约288条）
-                    for line in lines[-(hours * 15):]:  # 多读一些确保覆盖
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                # 解析时间
-                                beijing_time_str = data.get('beijing_time', '')
-                                if beijing_time_str:
-                                    data_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
-                                    data_time = tz.localize(data_time)
-                                    
-                                    # 只保留时间范围内的数据
-                                    if data_time >= start_time:
-                                        records.append(data)
-                            except (json.JSONDecodeError, ValueError):
-                                continue
+                # 读取最近的数据（估算：5分钟一条，24小时约288条）
+                for data in read_last_records(symbol_file, hours * 15):  # 多读一些确保覆盖
+                    try:
+                        # 解析时间
+                        beijing_time_str = data.get('beijing_time', '')
+                        if beijing_time_str:
+                            data_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
+                            data_time = tz.localize(data_time)
+                            
+                            # 只保留时间范围内的数据
+                            if data_time >= start_time:
+                                records.append(data)
+                    except ValueError:
+                        continue
             except Exception as e:
                 print(f"[SAR Stats] 读取{symbol_short}失败: {e}")
                 continue
@@ -769,24 +758,20 @@ def get_sar_bias_ratio_2h():
             # 读取最近2小时的数据
             records_2h = []
             try:
-                with open(symbol_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    # 读取最近的数据（2小时约24条，读30条确保覆盖）
-                    for line in lines[-30:]:
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                # 解析时间
-                                beijing_time_str = data.get('beijing_time', '')
-                                if beijing_time_str:
-                                    data_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
-                                    data_time = tz.localize(data_time)
-                                    
-                                    # 只保留最近2小时的数据
-                                    if data_time >= start_time_2h:
-                                        records_2h.append(data)
-                            except (json.JSONDecodeError, ValueError):
-                                continue
+                # 读取最近的数据（2小时约24条，读30条确保覆盖）
+                for data in read_last_records(symbol_file, 30):
+                    try:
+                        # 解析时间
+                        beijing_time_str = data.get('beijing_time', '')
+                        if beijing_time_str:
+                            data_time = datetime.strptime(beijing_time_str, '%Y-%m-%d %H:%M:%S')
+                            data_time = tz.localize(data_time)
+                            
+                            # 只保留最近2小时的数据
+                            if data_time >= start_time_2h:
+                                records_2h.append(data)
+                    except ValueError:
+                        continue
             except Exception as e:
                 print(f"[2H Bias] 读取{symbol_short}失败: {e}")
                 continue
@@ -798,16 +783,8 @@ def get_sar_bias_ratio_2h():
             # 需要扫描更多历史数据来识别周期和序号
             all_records = []
             try:
-                with open(symbol_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    # 读取最近100条（确保能识别完整周期）
-                    for line in lines[-100:]:
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                all_records.append(data)
-                            except json.JSONDecodeError:
-                                continue
+                # 读取最近100条（确保能识别完整周期）
+                all_records = read_last_records(symbol_file, 100)
             except Exception as e:
                 print(f"[2H Bias] 读取{symbol_short}历史数据失败: {e}")
                 continue
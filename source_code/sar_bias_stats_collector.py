@@ -82,6 +82,40 @@ def save_record(record):
         print(f'❌ 保存失败: {e}')
         return False
 
+# 累计采集轮数
+_cycle = 0
+
+def run_once():
+    """执行一轮采集并保存（collector_host 调度入口）"""
+    global _cycle
+    _cycle += 1
+    beijing_now = datetime.now(BEIJING_TZ)
+    print(f'\n【第 {_cycle} 轮采集】 {beijing_now.strftime("%Y-%m-%d %H:%M:%S")}')
+    print('-' * 60)
+    
+    # 采集数据
+    record = collect_bias_stats()
+    
+    if record:
+        # 保存记录
+        if save_record(record):
+            print(f'✅ 采集成功')
+            print(f'   偏多 >80%: {record["bullish_count"]}个')
+            if record['bullish_symbols']:
+                symbols_str = ', '.join([f'{s["symbol"]}({s["ratio"]}%)' for s in record['bullish_symbols']])
+                print(f'   币种: {symbols_str}')
+            print(f'   偏空 >80%: {record["bearish_count"]}个')
+            if record['bearish_symbols']:
+                symbols_str = ', '.join([f'{s["symbol"]}({s["ratio"]}%)' for s in record['bearish_symbols']])
+                print(f'   币种: {symbols_str}')
+            print(f'   总监控: {record["total_monitored"]}个')
+            print(f'   文件: {get_jsonl_file().name}')
+        else:
+            print('❌ 保存失败')
+    else:
+        print('❌ 采集失败')
+    return record
+
 def main():
     """主循环"""
     print('='*60)
@@ -92,36 +126,10 @@ def main():
     print('='*60)
     print()
     
-    cycle = 0
-    
     while True:
         try:
-            cycle += 1
             beijing_now = datetime.now(BEIJING_TZ)
-            print(f'\n【第 {cycle} 轮采集】 {beijing_now.strftime("%Y-%m-%d %H:%M:%S")}')
-            print('-' * 60)
-            
-            # 采集数据
-            record = collect_bias_stats()
-            
-            if record:
-                # 保存记录
-                if save_record(record):
-                    print(f'✅ 采集成功')
-                    print(f'   偏多 >80%: {record["bullish_count"]}个')
-                    if record['bullish_symbols']:
-                        symbols_str = ', '.join([f'{s["symbol"]}({s["ratio"]}%)' for s in record['bullish_symbols']])
-                        print(f'   币种: {symbols_str}')
-                    print(f'   偏空 >80%: {record["bearish_count"]}个')
-                    if record['bearish_symbols']:
-                        symbols_str = ', '.join([f'{s["symbol"]}({s["ratio"]}%)' for s in record['bearish_symbols']])
-                        print(f'   币种: {symbols_str}')
-                    print(f'   总监控: {record["total_monitored"]}个')
-                    print(f'   文件: {get_jsonl_file().name}')
-                else:
-                    print('❌ 保存失败')
-            else:
-                print('❌ 采集失败')
+            run_once()
             
             # 等待5分钟
             next_time = beijing_now.replace(second=0, microsecond=0)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+SAR Collector Loop - SAR采集器共用的采集流程
+
+sar_jsonl_collector 和 sar_slope_collector 只在SAR状态文件和斜率算法上不同，
+K线获取、记录构建、逐币种处理、并发采集、统计和主循环都在这里实现：
+    loop = SARCollectorLoop('SAR JSONL 数据采集器', sar_engine, build_record)
+    loop.run_once()       # collector_host 调度入口
+    loop.main()           # 独立运行的主循环
+"""
+import json
+import time
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+from concurrent_fetch import DEFAULT_WORKERS, CycleTimer, fetch_all
+from jsonl_time_index import append_record
+from market_data_bus import market_bus
+
+# 配置
+DATA_DIR = Path('/home/user/webapp/data/sar_jsonl')
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+# 交易对列表 (29个币种)
+# 注: 已移除MATIC（更名为POL，交易所不支持），添加OKB
+SYMBOLS = [
+    'AAVE', 'APT', 'BCH', 'BNB', 'BTC', 'CFX', 'CRO', 'CRV',
+    'DOGE', 'DOT', 'ETC', 'ETH', 'FIL', 'HBAR', 'LDO', 'LINK',
+    'LTC', 'NEAR', 'OKB', 'SOL', 'STX', 'SUI', 'TAO', 'TON',
+    'TRX', 'UNI', 'XLM', 'XRP', 'ADA'
+]
+
+# SAR参数
+SAR_AF_START = 0.02  # 加速因子起始值
+SAR_AF_INCREMENT = 0.02  # 加速因子增量
+SAR_AF_MAX = 0.2  # 加速因子最大值
+
+# 每次获取的1分钟K线数
+KLINE_LIMIT = 100
+
+
+def get_quadrant(price, sar, trend):
+    """
+    确定象限
+    
+    Args:
+        price: 当前价格
+        sar: SAR值
+        trend: 趋势 (1=bullish, -1=bearish)
+    
+    Returns:
+        str: 象限 (Q1, Q2, Q3, Q4)
+    """
+    if trend == 1:  # bullish
+        if price > sar:
+            return "Q1"  # 价格在SAR上方，上升趋势
+        else:
+            return "Q2"  # 价格在SAR下方，但趋势上升（即将反转）
+    else:  # bearish
+        if price < sar:
+            return "Q3"  # 价格在SAR下方，下降趋势
+        else:
+            return "Q4"  # 价格在SAR上方，但趋势下降（即将反转）
+
+
+def get_klines(symbol, limit=KLINE_LIMIT):
+    """
+    从OKX获取K线数据
+    
+    Args:
+        symbol: 交易对符号
+        limit: 获取的K线数量
+    
+    Returns:
+        dict: K线数据 {timestamp, open, high, low, close, volume}
+    """
+    try:
+        # 优先使用K线共享发布进程推送的K线，未运行时由本地K线存储增量同步（永续合约优先，不支持时使用现货）
+        klines = market_bus.get_klines(symbol, '1m', limit)
+        if not klines:
+            print(f"[警告] {symbol} K线数据获取失败")
+        return klines
+    
+    except Exception as e:
+        print(f"[错误] {symbol} 获取K线失败: {e}")
+        return []
+
+
+def load_last_position(symbol):
+    """
+    加载上一次的持仓状态
+    
+    Args:
+        symbol: 交易对符号
+    
+    Returns:
+        dict: 上一次的状态 {position, duration_minutes}
+    """
+    jsonl_file = DATA_DIR / f"{symbol}.jsonl"
+    
+    if jsonl_file.exists():
+        try:
+            with open(jsonl_file, 'rb') as f:
+                # 从文件末尾读取最后一行
+                try:
+                    f.seek(-2, 2)  # 跳过最后的换行符
+                    while f.read(1) != b'\n':
+                        f.seek(-2, 1)
+                except OSError:
+                    f.seek(0)
+                
+                last_line = f.readline().decode('utf-8')
+                
+                if last_line.strip():
+                    last_record = json.loads(last_line)
+                    return {
+                        'position': last_record.get('position', 'unknown'),
+                        'duration_minutes': last_record.get('duration_minutes', 0)
+                    }
+        except Exception as e:
+            print(f"[错误] {symbol} 加载上次状态失败: {e}")
+    
+    return {'position': 'unknown', 'duration_minutes': 0}
+
+
+def save_to_jsonl(symbol, data):
+    """
+    保存数据到JSONL
+    
+    Args:
+        symbol: 交易对符号
+        data: 数据记录
+    """
+    jsonl_file = DATA_DIR / f"{symbol}.jsonl"
+    
+    try:
+        # 追加写入并同步更新时间索引
+        append_record(jsonl_file, data, time_key='timestamp')
+    except Exception as e:
+        print(f"[错误] {symbol} 保存JSONL失败: {e}")
+
+
+def make_record(symbol, klines, result, slope_value):
+    """
+    由SAR计算结果和斜率构建数据记录
+    
+    Args:
+        symbol: 交易对符号
+        klines: K线数据（升序）
+        result: SAREngine.update 的返回值
+        slope_value: SAR斜率
+    
+    Returns:
+        dict: 数据记录
+    """
+    # 获取最新值
+    current_sar = result['sar']
+    current_price = float(klines[-1]['close'])
+    current_trend = result['trend']
+    timestamp = klines[-1]['timestamp']
+    
+    # 确定持仓方向
+    position = 'bullish' if current_trend == 1 else 'bearish'
+    slope_direction = 'up' if slope_value > 0 else 'down'
+    
+    # 确定象限
+    quadrant = get_quadrant(current_price, current_sar, current_trend)
+    
+    # 加载上次状态以计算持续时间
+    last_state = load_last_position(symbol)
+    
+    if last_state['position'] == position:
+        duration_minutes = last_state['duration_minutes'] + 1
+    else:
+        duration_minutes = 1  # 新周期开始
+    
+    # 转换时间戳为北京时间
+    beijing_time = datetime.fromtimestamp(timestamp / 1000, BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    
+    # 计算 SAR 差值（绝对值和百分比）
+    sar_diff_abs = abs(current_price - current_sar)
+    sar_diff_pct = (sar_diff_abs / current_price) * 100 if current_price > 0 else 0
+    
+    # 构建数据记录
+    return {
+        'symbol': symbol,
+        'timestamp': timestamp,
+        'beijing_time': beijing_time,
+        'close': round(current_price, 8),
+        'sar': round(current_sar, 8),
+        'position': position,
+        'quadrant': quadrant,
+        'duration_minutes': duration_minutes,
+        'slope_value': round(slope_value, 4),
+        'slope_direction': slope_direction,
+        'sar_diff_abs': round(sar_diff_abs, 8),
+        'sar_diff_pct': round(sar_diff_pct, 4)
+    }
+
+
+class SARCollectorLoop:
+    """SAR采集器的逐币种处理、并发采集和主循环"""
+    
+    def __init__(self, title, sar_engine, build_record, symbols=SYMBOLS):
+        """
+        Args:
+            title: 启动时打印的采集器名称
+            sar_engine: 本采集器的 SAREngine（每个周期结束时保存状态）
+            build_record: build_record(symbol, klines) → 数据记录
+            symbols: 采集的币种列表
+        """
+        self.title = title
+        self.sar_engine = sar_engine
+        self.build_record = build_record
+        self.symbols = symbols
+        # 累计采集次数
+        self.cycle_count = 0
+    
+    def process_symbol(self, symbol, klines=None, timer=None):
+        """
+        处理单个交易对
+        
+        Args:
+            symbol: 交易对符号
+            klines: 已获取的K线（并发获取时传入，为None时在这里获取）
+            timer: CycleTimer，记录计算和写入耗时（可选）
+        
+        Returns:
+            dict: 写入的记录，失败时返回None
+        """
+        timer = timer or CycleTimer()
+        try:
+            # 获取K线数据
+            if klines is None:
+                with timer.phase('fetch'):
+                    klines = get_klines(symbol)
+            
+            if not klines or len(klines) < 10:
+                print(f"[警告] {symbol} K线数据不足")
+                return None
+            
+            with timer.phase('compute'):
+                record = self.build_record(symbol, klines)
+            
+            # 保存到JSONL
+            with timer.phase('write'):
+                save_to_jsonl(symbol, record)
+            
+            print(f"[成功] {symbol}: {record['position']} {record['quadrant']} "
+                  f"持续{record['duration_minutes']}分钟 斜率{record['slope_value']:.4f}")
+            
+            return record
+        
+        except Exception as e:
+            print(f"[错误] {symbol} 处理失败: {e}")
+            traceback.print_exc()
+            return None
+    
+    def run_cycle(self, max_workers=DEFAULT_WORKERS):
+        """
+        执行一次采集：并发获取全部K线，再依次计算和写入
+        
+        Args:
+            max_workers: 并发获取K线的线程数（1为串行）
+        
+        Returns:
+            tuple: (成功写入的记录列表, CycleTimer)
+        """
+        timer = CycleTimer()
+        
+        # 全部币种的K线在同一时刻附近取回，快照之间可以直接比较
+        with timer.phase('fetch'):
+            klines_map, errors = fetch_all(self.symbols, get_klines, max_workers)
+        for symbol, error in errors.items():
+            print(f"[错误] {symbol} 获取K线失败: {error}")
+        
+        records = []
+        for symbol in self.symbols:
+            if symbol not in klines_map:
+                continue
+            record = self.process_symbol(symbol, klines_map[symbol], timer)
+            if record:
+                records.append(record)
+        
+        # 保存SAR增量状态
+        with timer.phase('write'):
+            try:
+                self.sar_engine.save()
+            except Exception as e:
+                print(f"[错误] 保存SAR状态失败: {e}")
+        
+        return records, timer
+    
+    def run_once(self, max_workers=DEFAULT_WORKERS):
+        """执行一个采集周期并打印统计（collector_host 调度入口）"""
+        self.cycle_count += 1
+        now = datetime.now(BEIJING_TZ)
+        print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] 开始第 {self.cycle_count} 次采集...")
+        
+        # 处理所有交易对
+        records, timer = self.run_cycle(max_workers)
+        
+        # 统计多空
+        bullish_count = sum(1 for r in records if r['position'] == 'bullish')
+        bearish_count = sum(1 for r in records if r['position'] == 'bearish')
+        
+        print(f"\n[统计] 成功: {len(records)}/{len(self.symbols)}")
+        print(f"[多空] 多头: {bullish_count}, 空头: {bearish_count}")
+        print(f"[耗时] {timer.summary()}")
+        print(f"[已采集] {self.cycle_count} 次")
+        return records
+    
+    def main(self):
+        """主循环"""
+        import argparse
+        
+        parser = argparse.ArgumentParser(description=self.title)
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help=f'并发获取K线的线程数（默认{DEFAULT_WORKERS}，1为串行）')
+        args = parser.parse_args()
+        
+        print("=" * 60)
+        print(f"{self.title}启动")
+        print(f"追踪币种: {len(self.symbols)}个, 并发数: {args.workers}")
+        print("=" * 60)
+        
+        while True:
+            try:
+                now = datetime.now(BEIJING_TZ)
+                self.run_once(args.workers)
+                
+                # 每5分钟采集一次
+                next_time = now + timedelta(minutes=5)
+                print(f"\n[等待] 下次采集时间: {next_time.strftime('%H:%M:%S')} (300秒后)")
+                time.sleep(300)
+            
+            except KeyboardInterrupt:
+                print("\n[退出] 采集器已停止")
+                break
+            except Exception as e:
+                print(f"[错误] 采集循环失败: {e}")
+                traceback.print_exc()
+                time.sleep(60)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+SAR Engine - 抛物线转向指标（增量 + 批量）
+
+SAR 采集器共用的唯一一份 SAR 实现：
+- calculate_sar: 整段序列计算（与原先各采集器中的 calculate_sar 结果相同）
+- SAREngine: 按币种保存状态（sar, ep, af, 趋势, 前两根的最高/最低价, 最近几根SAR），
+  每根新收盘的K线 O(1) 更新，状态持久化到文件，SAR 跨周期、跨重启连续，
+  不再每轮用100根K线从默认的上升趋势重新预热；状态缺失或K线中断时自动重新预热
+- calculate_sar_batch: 多个币种的完整历史一次性计算（numba 并行编译），用于回补
+
+核心循环用 numba 编译；numba 不可用时以普通 Python 运行，结果相同。
+
+用法:
+    from sar_engine import SAREngine
+    engine = SAREngine(DATA_DIR / '.sar_state.json')
+    result = engine.update('BTC', klines)          # {'sar', 'trend', 'sar_values'}
+    engine.save()
+    python sar_engine.py BTC ETH SOL --days 90      # 回补并计算多个币种的完整SAR历史
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    prange = range
+    
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+AF_START = 0.02  # 加速因子起始值
+AF_INCREMENT = 0.02  # 加速因子增量
+AF_MAX = 0.2  # 加速因子最大值
+
+# 保存的最近SAR个数（斜率窗口）
+SAR_HISTORY = 5
+
+# 状态数组下标
+_SAR, _EP, _AF, _TREND, _LOW1, _LOW2, _HIGH1, _HIGH2 = range(8)
+
+
+def _empty_state():
+    return np.full(8, np.nan)
+
+
+@njit(cache=True)
+def _sar_run(high, low, af_start, af_increment, af_max, state, out_sar, out_trend, out_ep, out_af):
+    """
+    从 state 开始逐根计算SAR，结果写入 out_*，结束时 state 更新为最后一根之后的状态
+    
+    state 为 NaN 时用第一根K线初始化（SAR=最低价，上升趋势）
+    """
+    n = len(high)
+    if n == 0:
+        return
+    sar = state[0]
+    ep = state[1]
+    af = state[2]
+    trend = state[3]
+    low1 = state[4]
+    low2 = state[5]
+    high1 = state[6]
+    high2 = state[7]
+    start = 0
+    if np.isnan(sar):
+        sar = low[0]
+        trend = 1.0  # 假设初始为上升趋势
+        ep = high[0]
+        af = af_start
+        out_sar[0] = sar
+        out_trend[0] = trend
+        out_ep[0] = ep
+        out_af[0] = af
+        low1 = low[0]
+        high1 = high[0]
+        start = 1
+    
+    for i in range(start, n):
+        # 计算当前SAR
+        value = sar + af * (ep - sar)
+        if trend == 1.0:  # 上升趋势
+            if low[i] < value:
+                # 反转为下降趋势，SAR设为前期最高点
+                trend = -1.0
+                value = ep
+                ep = low[i]
+                af = af_start
+            else:
+                if high[i] > ep:
+                    ep = high[i]
+                    af = min(af + af_increment, af_max)
+                # SAR不能高于前两期的最低价
+                value = min(value, low1)
+                if not np.isnan(low2):
+                    value = min(value, low2)
+        else:  # 下降趋势
+            if high[i] > value:
+                # 反转为上升趋势，SAR设为前期最低点
+                trend = 1.0
+                value = ep
+                ep = high[i]
+                af = af_start
+            else:
+                if low[i] < ep:
+                    ep = low[i]
+                    af = min(af + af_increment, af_max)
+                # SAR不能低于前两期的最高价
+                value = max(value, high1)
+                if not np.isnan(high2):
+                    value = max(value, high2)
+        
+        sar = value
+        out_sar[i] = sar
+        out_trend[i] = trend
+        out_ep[i] = ep
+        out_af[i] = af
+        low2 = low1
+        high2 = high1
+        low1 = low[i]
+        high1 = high[i]
+    
+    state[0] = sar
+    state[1] = ep
+    state[2] = af
+    state[3] = trend
+    state[4] = low1
+    state[5] = low2
+    state[6] = high1
+    state[7] = high2
+
+
+def _run(high, low, state, af_start, af_increment, af_max):
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    n = len(high)
+    out = [np.zeros(n) for _ in range(4)]
+    _sar_run(high, low, af_start, af_increment, af_max, state, *out)
+    return out
+
+
+def calculate_sar(high, low, close=None, af_start=AF_START, af_increment=AF_INCREMENT, af_max=AF_MAX):
+    """
+    计算抛物线转向指标 (SAR)
+    
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组（不参与计算，保留参数以兼容原接口）
+        af_start: 加速因子起始值
+        af_increment: 加速因子增量
+        af_max: 加速因子最大值
+    
+    Returns:
+        tuple: (sar值数组, 趋势数组（1=bullish, -1=bearish）, ep数组, af数组)
+    """
+    sar, trend, ep, af = _run(high, low, _empty_state(), af_start, af_increment, af_max)
+    return sar, trend, ep, af
+
+
+@njit(parallel=True, cache=True)
+def _sar_batch(high, low, offsets, af_start, af_increment, af_max, out_sar, out_trend, states):
+    for k in prange(len(offsets) - 1):
+        start = offsets[k]
+        end = offsets[k + 1]
+        ep = np.zeros(end - start)
+        af = np.zeros(end - start)
+        _sar_run(high[start:end], low[start:end], af_start, af_increment, af_max, states[k],
+                 out_sar[start:end], out_trend[start:end], ep, af)
+
+
+def calculate_sar_batch(series, af_start=AF_START, af_increment=AF_INCREMENT, af_max=AF_MAX):
+    """
+    批量计算多个币种的完整SAR历史（各币种并行）
+    
+    Args:
+        series: {币种: (最高价数组, 最低价数组)}
+    
+    Returns:
+        dict: {币种: (sar值数组, 趋势数组, 最后的状态数组)}
+    """
+    names = list(series)
+    lengths = [len(series[name][0]) for name in names]
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    high = np.concatenate([np.asarray(series[name][0], dtype=np.float64) for name in names] or [np.zeros(0)])
+    low = np.concatenate([np.asarray(series[name][1], dtype=np.float64) for name in names] or [np.zeros(0)])
+    out_sar = np.zeros(len(high))
+    out_trend = np.zeros(len(high))
+    states = np.full((len(names), 8), np.nan)
+    
+    _sar_batch(high, low, offsets, af_start, af_increment, af_max, out_sar, out_trend, states)
+    
+    return {
+        name: (out_sar[offsets[k]:offsets[k + 1]], out_trend[offsets[k]:offsets[k + 1]], states[k])
+        for k, name in enumerate(names)
+    }
+
+
+class SAREngine:
+    """按币种保存SAR状态，新收盘的K线增量更新"""
+    
+    def __init__(self, state_file=None, bar_ms=60_000, af_start=AF_START, af_increment=AF_INCREMENT,
+                 af_max=AF_MAX, history=SAR_HISTORY):
+        self.state_file = Path(state_file) if state_file else None
+        self.bar_ms = bar_ms
+        self.params = (af_start, af_increment, af_max)
+        self.history = history
+        self._states = None
+        self._lock = threading.Lock()
+        self.stats = {'updates': 0, 'bars': 0, 'warmups': 0}
+    
+    def _load(self):
+        if self._states is not None:
+            return self._states
+        self._states = {}
+        if self.state_file and self.state_file.exists():
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self._states = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[警告] SAR状态文件读取失败，将重新预热: {e}")
+        return self._states
+    
+    def save(self):
+        """原子写入状态文件"""
+        if not self.state_file or self._states is None:
+            return
+        with self._lock:
+            data = json.dumps(self._states, ensure_ascii=False)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix=f'.{self.state_file.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    def set_state(self, symbol, state, ts, sar_values):
+        """设置币种状态（回补后写入，使增量计算从回补结果继续）"""
+        with self._lock:
+            self._load()[symbol] = {
+                'ts': int(ts),
+                'state': [None if np.isnan(v) else float(v) for v in state],
+                'recent': [float(v) for v in sar_values[-(self.history - 1):]] if self.history > 1 else []
+            }
+    
+    def update(self, symbol, klines, now_ms=None):
+        """
+        用最新K线更新状态并返回当前SAR
+        
+        已收盘的K线推进持久状态（只计算上次之后的新K线）；正在形成的K线只用于本次结果，
+        不写入状态。状态缺失或与K线之间有缺口时，用传入的K线重新预热。
+        
+        Args:
+            symbol: 币种
+            klines: K线（升序，[{timestamp, high, low, ...}]，最后一根可以是正在形成的）
+            now_ms: 当前时间（毫秒），用于判断K线是否已收盘
+        
+        Returns:
+            dict: {'sar': 当前SAR, 'trend': 1/-1, 'sar_values': 最近 history 个SAR（含当前）,
+                   'new_sar_values': 本次新收盘K线的SAR, 'forming_sar_values': 正在形成的K线的SAR,
+                   'warmup': 本次是否从头预热}
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        closed = [k for k in klines if k['timestamp'] + self.bar_ms <= now_ms]
+        forming = klines[len(closed):]
+        
+        warmup = False
+        new_values = []
+        with self._lock:
+            entry = self._load().get(symbol)
+            first_ts = closed[0]['timestamp'] if closed else None
+            if entry is None or (first_ts is not None and entry['ts'] + self.bar_ms < first_ts):
+                # 没有状态或中间缺K线：从头预热
+                entry = {'ts': -1, 'state': [None] * 8, 'recent': []}
+                warmup = True
+                self.stats['warmups'] += 1
+            
+            state = np.array([np.nan if v is None else v for v in entry['state']], dtype=np.float64)
+            new = [k for k in closed if k['timestamp'] > entry['ts']]
+            recent = list(entry['recent'])
+            if new:
+                sar, _, _, _ = _run([k['high'] for k in new], [k['low'] for k in new], state, *self.params)
+                new_values = sar.tolist()
+                recent = (recent + new_values)[-(self.history - 1):] if self.history > 1 else []
+                entry = {'ts': new[-1]['timestamp'], 'state': [None if np.isnan(v) else float(v) for v in state],
+                         'recent': recent}
+                self._states[symbol] = entry
+                self.stats['bars'] += len(new)
+            self.stats['updates'] += 1
+        
+        current_sar = state[_SAR]
+        current_trend = state[_TREND]
+        values = list(recent)
+        forming_values = []
+        if forming:
+            # 正在形成的K线在状态副本上计算
+            preview = state.copy()
+            sar, trend, _, _ = _run([k['high'] for k in forming], [k['low'] for k in forming], preview, *self.params)
+            current_sar, current_trend = float(sar[-1]), float(trend[-1])
+            forming_values = sar.tolist()
+            values = (values + forming_values)[-self.history:]
+        else:
+            values = values[-self.history:]
+        
+        return {'sar': float(current_sar), 'trend': int(current_trend), 'sar_values': values,
+                'new_sar_values': new_values, 'forming_sar_values': forming_values, 'warmup': warmup}
+
+
+def main():
+    """命令行：回补并批量计算SAR历史"""
+    import argparse
+    
+    from candle_store import BAR_MS, candle_store, normalize_bar
+    
+    parser = argparse.ArgumentParser(description='批量计算SAR历史（回补）')
+    parser.add_argument('symbols', nargs='+', help='币种或instId')
+    parser.add_argument('--bar', default='1m', help='周期（默认1m）')
+    parser.add_argument('--days', type=float, default=30, help='回补天数（默认30）')
+    parser.add_argument('--state-file', help='把计算结束时的状态写入该文件，增量计算从这里继续')
+    
+    args = parser.parse_args()
+    
+    bar = normalize_bar(args.bar)
+    min_bars = int(args.days * 86_400_000 // BAR_MS[bar])
+    
+    start = time.perf_counter()
+    series, last_ts = {}, {}
+    for symbol in args.symbols:
+        try:
+            inst_id = candle_store.resolve(symbol, bar)
+            candle_store.sync(inst_id, bar, min_bars=min_bars)
+            candles = candle_store.read(inst_id, bar, limit=min_bars)
+            series[symbol] = (candles['high'], candles['low'])
+            last_ts[symbol] = int(candles['ts'][-1]) if len(candles) else None
+            print(f"[K线] {symbol} {inst_id}: {len(candles)} 根")
+        except Exception as e:
+            print(f"[错误] {symbol}: {e}")
+    fetched = time.perf_counter()
+    
+    results = calculate_sar_batch(series)
+    computed = time.perf_counter()
+    total_bars = sum(len(h) for h, _ in series.values())
+    print(f"[计算] {len(results)} 个币种 {total_bars} 根K线: 获取 {fetched - start:.2f}s, 计算 {computed - fetched:.3f}s")
+    
+    engine = SAREngine(args.state_file, bar_ms=BAR_MS[bar]) if args.state_file else None
+    for symbol, (sar, trend, state) in results.items():
+        if len(sar):
+            print(f"  {symbol:8s} SAR {sar[-1]:.6g}  {'多' if trend[-1] == 1 else '空'}  "
+                  f"反转 {int(np.count_nonzero(np.diff(trend)))} 次")
+            if engine:
+                engine.set_state(symbol, state, last_ts[symbol], sar)
+    if engine:
+        engine.save()
+        print(f"[状态] 已写入 {args.state_file}")
+
+
+if __name__ == '__main__':
+    main()
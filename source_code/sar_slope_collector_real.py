@@ -14,6 +14,10 @@ from pathlib import Path
 import pytz
 import numpy as np
 
+from okx_rate_governor import governor
+from rolling_regression import linear_regression
+from sar_engine import calculate_sar
+
 # 配置
 DATA_DIR = Path('/home/user/webapp/data/sar_jsonl')
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -35,88 +39,6 @@ SAR_AF_INCREMENT = 0.02  # 加速因子增量
 SAR_AF_MAX = 0.2  # 加速因子最大值
 
 
-def calculate_sar(high, low, close, af_start=0.02, af_increment=0.02, af_max=0.2):
-    """
-    计算抛物线转向指标 (SAR)
-    
-    Args:
-        high: 最高价数组
-        low: 最低价数组
-        close: 收盘价数组
-        af_start: 加速因子起始值
-        af_increment: 加速因子增量
-        af_max: 加速因子最大值
-    
-    Returns:
-        tuple: (sar值数组, 趋势数组, ep数组, af数组)
-    """
-    length = len(high)
-    sar = np.zeros(length)
-    trend = np.zeros(length)  # 1 = bullish, -1 = bearish
-    ep = np.zeros(length)  # extreme point
-    af = np.zeros(length)  # acceleration factor
-    
-    # 初始化
-    sar[0] = low[0]
-    trend[0] = 1  # 假设初始为上升趋势
-    ep[0] = high[0]
-    af[0] = af_start
-    
-    for i in range(1, length):
-        # 计算当前SAR
-        sar[i] = sar[i-1] + af[i-1] * (ep[i-1] - sar[i-1])
-        
-        # 判断趋势是否反转
-        if trend[i-1] == 1:  # 上升趋势
-            # 检查是否需要反转
-            if low[i] < sar[i]:
-                # 反转为下降趋势
-                trend[i] = -1
-                sar[i] = ep[i-1]  # SAR设为前期最高点
-                ep[i] = low[i]
-                af[i] = af_start
-            else:
-                # 继续上升趋势
-                trend[i] = 1
-                # 更新EP
-                if high[i] > ep[i-1]:
-                    ep[i] = high[i]
-                    af[i] = min(af[i-1] + af_increment, af_max)
-                else:
-                    ep[i] = ep[i-1]
-                    af[i] = af[i-1]
-                
-                # SAR不能高于前两期的最低价
-                sar[i] = min(sar[i], low[i-1])
-                if i > 1:
-                    sar[i] = min(sar[i], low[i-2])
-        else:  # 下降趋势
-            # 检查是否需要反转
-            if high[i] > sar[i]:
-                # 反转为上升趋势
-                trend[i] = 1
-                sar[i] = ep[i-1]  # SAR设为前期最低点
-                ep[i] = high[i]
-                af[i] = af_start
-            else:
-                # 继续下降趋势
-                trend[i] = -1
-                # 更新EP
-                if low[i] < ep[i-1]:
-                    ep[i] = low[i]
-                    af[i] = min(af[i-1] + af_increment, af_max)
-                else:
-                    ep[i] = ep[i-1]
-                    af[i] = af[i-1]
-                
-                # SAR不能低于前两期的最高价
-                sar[i] = max(sar[i], high[i-1])
-                if i > 1:
-                    sar[i] = max(sar[i], high[i-2])
-    
-    return sar, trend, ep, af
-
-
 def calculate_slope(sar_values, window=5):
     """
     计算SAR斜率
@@ -131,14 +53,9 @@ def calculate_slope(sar_values, window=5):
     if len(sar_values) < window:
         return 0.0
     
-    recent_sar = sar_values[-window:]
-    x = np.arange(len(recent_sar))
-    
-    # 线性拟合
-    coefficients = np.polyfit(x, recent_sar, 1)
-    slope = coefficients[0]
-    
-    return float(slope)
+    # 线性拟合（闭式解）
+    slope, _, _ = linear_regression(sar_values[-window:])
+    return slope
 
 
 def get_quadrant(price, sar, trend):
@@ -179,13 +96,17 @@ def get_klines(symbol, limit=100):
     try:
         # 优先使用永续合约
         url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT-SWAP&bar=1m&limit={limit}"
+        governor.acquire('/api/v5/market/candles')
         response = requests.get(url, timeout=10)
+        governor.penalize_response('/api/v5/market/candles', response)
         data = response.json()
         
         # 如果永续合约失败，尝试现货
         if data.get('code') != '0' or not data.get('data'):
             url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}-USDT&bar=1m&limit={limit}"
+            governor.acquire('/api/v5/market/candles')
             response = requests.get(url, timeout=10)
+            governor.penalize_response('/api/v5/market/candles', response)
             data = response.json()
         
         if data.get('code') == '0' and data.get('data'):
@@ -383,8 +304,6 @@ def main():
                         bullish_count += 1
                     elif last_state['position'] == 'bearish':
                         bearish_count += 1
-                
-                time.sleep(0.1)  # 避免请求过快
             
             print(f"\n[统计] 成功: {success_count}/{len(SYMBOLS)}")
             print(f"[多空] 多头: {bullish_count}, 空头: {bearish_count}")
@@ -23,6 +23,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
 
+from sliding_window_counter import SlidingWindowCounter, parse_time
+
 # 配置
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / 'price_position_v2' / 'config' / 'data' / 'db' / 'price_position.db'
@@ -37,62 +39,51 @@ def get_beijing_time():
     beijing_tz = pytz.timezone('Asia/Shanghai')
     return datetime.now(beijing_tz)
 
-def calculate_rolling_stats(conn, target_time_str, window_hours):
+def calculate_rolling_stats(conn, target_times, windows=(24, 2)):
     """
-    计算指定时间点的滚动窗口统计
+    计算一组时间点的滚动窗口统计（一次范围查询 + 滑动窗口计数）
     
     Args:
         conn: 数据库连接
-        target_time_str: 目标时间（字符串格式）
-        window_hours: 窗口大小（小时）
+        target_times: 目标时间列表（字符串格式，升序）
+        windows: 窗口大小（小时）
     
     Returns:
-        dict: {
+        list: 每个目标时间一项 {窗口小时数: {
             'sell_count': 逃顶信号次数,
             'buy_count': 抄底信号次数,
             'data_points': 数据点数量
-        }
+        }}
     """
-    cursor = conn.cursor()
+    if not target_times:
+        return []
     
-    # 计算窗口开始时间
-    target_time = datetime.strptime(target_time_str, '%Y-%m-%d %H:%M:%S')
-    window_start = target_time - timedelta(hours=window_hours)
-    window_start_str = window_start.strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
     
-    # 查询窗口内的数据
+    # 查询所有窗口覆盖的数据（最早的目标时间往前推最大窗口）
+    first_target = datetime.strptime(target_times[0], '%Y-%m-%d %H:%M:%S')
+    range_start = first_target - timedelta(hours=max(windows))
     cursor.execute('''
-        SELECT signal_type, COUNT(*) as count
+        SELECT snapshot_time, signal_type
         FROM signal_timeline
         WHERE snapshot_time > ? AND snapshot_time <= ?
-        GROUP BY signal_type
-    ''', (window_start_str, target_time_str))
-    
-    results = cursor.fetchall()
-    
-    # 统计结果
-    sell_count = 0
-    buy_count = 0
-    
-    for signal_type, count in results:
-        if signal_type == '逃顶信号':
-            sell_count = count
-        elif signal_type == '抄底信号':
-            buy_count = count
-    
-    # 获取总数据点数
-    cursor.execute('''
-        SELECT COUNT(*) FROM signal_timeline
-        WHERE snapshot_time > ? AND snapshot_time <= ?
-    ''', (window_start_str, target_time_str))
+        ORDER BY snapshot_time ASC
+    ''', (range_start.strftime('%Y-%m-%d %H:%M:%S'), target_times[-1]))
     
-    data_points = cursor.fetchone()[0]
+    events = [(parse_time(snapshot_time), signal_type) for snapshot_time, signal_type in cursor.fetchall()]
+    counter = SlidingWindowCounter(events, {hours: hours * 3600 for hours in windows})
     
-    return {
-        'sell_count': sell_count,
-        'buy_count': buy_count,
-        'data_points': data_points
-    }
+    results = []
+    for counts in counter.counts_at(parse_time(t) for t in target_times):
+        results.append({
+            hours: {
+                'sell_count': window['types'].get('逃顶信号', 0),
+                'buy_count': window['types'].get('抄底信号', 0),
+                'data_points': window['count']
+            }
+            for hours, window in counts.items()
+        })
+    return results
 
 def collect_today_stats():
     """采集今天的统计数据"""
@@ -135,13 +126,16 @@ def collect_today_stats():
     sell_file = DATA_DIR / f'signal_stats_sell_{today_str}.jsonl'
     buy_file = DATA_DIR / f'signal_stats_buy_{today_str}.jsonl'
     
+    # 计算所有数据点的 24h 和 2h 滚动统计
+    rolling_stats = calculate_rolling_stats(conn, [row[0] for row in rows])
+    
     # 打开文件（覆盖模式）
     with open(sell_file, 'w', encoding='utf-8') as f_sell, \
          open(buy_file, 'w', encoding='utf-8') as f_buy:
         
         processed_count = 0
         
-        for row in rows:
+        for row, stats in zip(rows, rolling_stats):
             snapshot_time_str = row[0]
             support_48h = row[1]
             support_7d = row[2]
@@ -151,9 +145,8 @@ def collect_today_stats():
             signal_triggered = row[6]
             trigger_reason = row[7] or ''
             
-            # 计算 24h 和 2h 滚动统计
-            stats_24h = calculate_rolling_stats(conn, snapshot_time_str, 24)
-            stats_2h = calculate_rolling_stats(conn, snapshot_time_str, 2)
+            stats_24h = stats[24]
+            stats_2h = stats[2]
             
             # 准备逃顶信号统计数据
             sell_entry = {
@@ -250,10 +243,13 @@ def backfill_historical_data():
         sell_file = DATA_DIR / f'signal_stats_sell_{date_file_str}.jsonl'
         buy_file = DATA_DIR / f'signal_stats_buy_{date_file_str}.jsonl'
         
+        # 计算该日期所有数据点的滚动统计
+        rolling_stats = calculate_rolling_stats(conn, [row[0] for row in rows])
+        
         with open(sell_file, 'w', encoding='utf-8') as f_sell, \
              open(buy_file, 'w', encoding='utf-8') as f_buy:
             
-            for row in rows:
+            for row, stats in zip(rows, rolling_stats):
                 snapshot_time_str = row[0]
                 support_48h = row[1]
                 support_7d = row[2]
@@ -263,9 +259,8 @@ def backfill_historical_data():
                 signal_triggered = row[6]
                 trigger_reason = row[7] or ''
                 
-                # 计算滚动统计
-                stats_24h = calculate_rolling_stats(conn, snapshot_time_str, 24)
-                stats_2h = calculate_rolling_stats(conn, snapshot_time_str, 2)
+                stats_24h = stats[24]
+                stats_2h = stats[2]
                 
                 # 逃顶统计
                 sell_entry = {
@@ -106,6 +106,18 @@ def generate_stats_for_date(date_str):
     
     return True
 
+def run_once():
+    """生成今天的统计数据（collector_host 调度入口）"""
+    # 获取今天的日期
+    beijing_time = get_beijing_time()
+    today_str = beijing_time.strftime('%Y%m%d')
+    
+    print(f"\n⏰ {beijing_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # 生成今天的统计数据
+    generate_stats_for_date(today_str)
+    return beijing_time
+
 def main():
     """主循环"""
     print("Signal Stats Generator 启动")
@@ -116,14 +128,7 @@ def main():
     
     while True:
         try:
-            # 获取今天的日期
-            beijing_time = get_beijing_time()
-            today_str = beijing_time.strftime('%Y%m%d')
-            
-            print(f"\n⏰ {beijing_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # 生成今天的统计数据
-            generate_stats_for_date(today_str)
+            beijing_time = run_once()
             
             # 等待下次采集
             next_time = beijing_time.replace(second=0, microsecond=0)
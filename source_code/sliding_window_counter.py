@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Sliding Window Counter - 按时间排序的事件的滑动窗口计数
+
+为一组递增的目标时间计算 (目标时间 - 窗口, 目标时间] 内各类型事件的数量：
+每个窗口两个指针（窗口右端加入、左端移出），所有目标时间一遍扫描完成，
+总耗时 O(事件数 + 目标时间数)，多个窗口（例如 2h 和 24h）同时计算；
+时间戳预先解析为秒，不再对每个目标时间重新扫描全部记录并逐条 strptime。
+
+用法:
+    from sliding_window_counter import SlidingWindowCounter, parse_time
+    events = [(parse_time(r['snapshot_time']), r['summary']['signal_type']) for r in records]
+    counter = SlidingWindowCounter(events, {'24h': 24 * 3600, '2h': 2 * 3600})
+    for target, counts in zip(targets, counter.counts_at(parse_time(t) for t in targets)):
+        sell_24h = counts['24h']['types'].get('逃顶信号', 0)
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+def parse_time(value):
+    """
+    'YYYY-MM-DD HH:MM:SS'（或 ISO 格式、datetime）→ 秒
+    
+    不带时区的时间按 UTC 换算，只用于同一时区内的时间比较和窗口计算。
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class SlidingWindowCounter:
+    """按时间排序的事件上的多窗口滑动计数（目标时间必须递增）"""
+    
+    def __init__(self, events, windows):
+        """
+        Args:
+            events: [(时间（秒）, 类型), ...]，按时间升序
+            windows: {窗口名称: 窗口长度（秒）}
+        """
+        self.times = [event[0] for event in events]
+        self.types = [event[1] for event in events]
+        self.windows = dict(windows)
+        # 每个窗口：[左指针, 右指针, 各类型计数]
+        self._state = {name: [0, 0, defaultdict(int)] for name in self.windows}
+        self._last_target = None
+    
+    def advance(self, target):
+        """
+        移动到下一个目标时间
+        
+        Args:
+            target: 目标时间（秒），不能小于上一个目标时间
+        
+        Returns:
+            dict: {窗口名称: {'count': 窗口内事件数, 'types': {类型: 数量}}}
+        """
+        if self._last_target is not None and target < self._last_target:
+            raise ValueError('目标时间必须递增')
+        self._last_target = target
+        
+        times, types = self.times, self.types
+        total = len(times)
+        result = {}
+        for name, seconds in self.windows.items():
+            state = self._state[name]
+            lo, hi, counts = state
+            # 右端：加入时间 <= 目标时间的事件
+            while hi < total and times[hi] <= target:
+                counts[types[hi]] += 1
+                hi += 1
+            # 左端：移出时间 <= 窗口起点的事件（窗口不含起点）
+            start = target - seconds
+            while lo < hi and times[lo] <= start:
+                counts[types[lo]] -= 1
+                if counts[types[lo]] == 0:
+                    del counts[types[lo]]
+                lo += 1
+            state[0], state[1] = lo, hi
+            result[name] = {'count': hi - lo, 'types': dict(counts)}
+        return result
+    
+    def counts_at(self, targets):
+        """依次计算每个目标时间（递增）的窗口计数"""
+        for target in targets:
+            yield self.advance(target)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Summary Counters - 首页汇总数据的物化计数表
+
+在 crypto_data.db 中用触发器维护以下汇总表，首页不再对 crypto_snapshots 做 COUNT(*)：
+- summary_counters：全局计数（crypto_snapshots 总行数）
+- crypto_snapshot_daily_counts：每天的快照行数（snapshot_date 为主键）
+- crypto_snapshot_latest：最新两条快照（rank 1 = 最新，rank 2 = 上一条）
+- panic_wash_latest：最新一条恐慌清洗指数
+写入方（采集器）无需改动，INSERT/UPDATE/DELETE 时由触发器同步更新。
+
+用法（安装触发器并回填汇总表，可重复执行）:
+    python summary_counters.py --install
+    python summary_counters.py --verify
+"""
+import sqlite3
+import sys
+
+from db_pool import CRYPTO_DATA_DB
+
+TOTAL_SNAPSHOTS = 'crypto_snapshots_total'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS summary_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS crypto_snapshot_daily_counts (
+    snapshot_date TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS crypto_snapshot_latest (
+    rank INTEGER PRIMARY KEY,
+    snapshot_date TEXT,
+    snapshot_time TEXT,
+    rush_up INTEGER,
+    rush_down INTEGER
+);
+CREATE TABLE IF NOT EXISTS panic_wash_latest (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    record_time TEXT,
+    panic_index REAL,
+    hour_24_people REAL,
+    total_position REAL
+);
+'''
+
+# 从源表重建“最新两条快照”（删除/修改时使用，依赖 idx_crypto_snapshots_date_time）
+_REBUILD_SNAPSHOT_LATEST = '''
+    DELETE FROM crypto_snapshot_latest;
+    INSERT INTO crypto_snapshot_latest (rank, snapshot_date, snapshot_time, rush_up, rush_down)
+        SELECT 1, snapshot_date, snapshot_time, rush_up, rush_down FROM crypto_snapshots
+        ORDER BY snapshot_date DESC, snapshot_time DESC LIMIT 1;
+    INSERT INTO crypto_snapshot_latest (rank, snapshot_date, snapshot_time, rush_up, rush_down)
+        SELECT 2, snapshot_date, snapshot_time, rush_up, rush_down FROM crypto_snapshots
+        ORDER BY snapshot_date DESC, snapshot_time DESC LIMIT 1 OFFSET 1;
+'''
+
+_REBUILD_PANIC_LATEST = '''
+    DELETE FROM panic_wash_latest;
+    INSERT INTO panic_wash_latest (id, record_time, panic_index, hour_24_people, total_position)
+        SELECT 1, record_time, panic_index, hour_24_people, total_position FROM panic_wash_index
+        ORDER BY record_time DESC LIMIT 1;
+'''
+
+_SNAPSHOT_TRIGGERS = f'''
+CREATE TRIGGER IF NOT EXISTS trg_crypto_snapshots_summary_ai AFTER INSERT ON crypto_snapshots
+BEGIN
+    INSERT INTO crypto_snapshot_daily_counts (snapshot_date, row_count) VALUES (NEW.snapshot_date, 1)
+        ON CONFLICT(snapshot_date) DO UPDATE SET row_count = row_count + 1;
+    UPDATE summary_counters SET value = value + 1 WHERE name = '{TOTAL_SNAPSHOTS}';
+    
+    -- 新行介于最新和上一条之间（乱序写入）：替换上一条
+    INSERT OR REPLACE INTO crypto_snapshot_latest (rank, snapshot_date, snapshot_time, rush_up, rush_down)
+        SELECT 2, NEW.snapshot_date, NEW.snapshot_time, NEW.rush_up, NEW.rush_down
+        WHERE EXISTS (SELECT 1 FROM crypto_snapshot_latest WHERE rank = 1
+                      AND (snapshot_date, snapshot_time) > (NEW.snapshot_date, NEW.snapshot_time))
+          AND NOT EXISTS (SELECT 1 FROM crypto_snapshot_latest WHERE rank = 2
+                          AND (snapshot_date, snapshot_time) > (NEW.snapshot_date, NEW.snapshot_time));
+    -- 新行最新：原最新降为上一条，新行成为最新
+    INSERT OR REPLACE INTO crypto_snapshot_latest (rank, snapshot_date, snapshot_time, rush_up, rush_down)
+        SELECT 2, snapshot_date, snapshot_time, rush_up, rush_down FROM crypto_snapshot_latest
+        WHERE rank = 1 AND (NEW.snapshot_date, NEW.snapshot_time) >= (snapshot_date, snapshot_time);
+    INSERT OR REPLACE INTO crypto_snapshot_latest (rank, snapshot_date, snapshot_time, rush_up, rush_down)
+        SELECT 1, NEW.snapshot_date, NEW.snapshot_time, NEW.rush_up, NEW.rush_down
+        WHERE NOT EXISTS (SELECT 1 FROM crypto_snapshot_latest WHERE rank = 1
+                          AND (snapshot_date, snapshot_time) > (NEW.snapshot_date, NEW.snapshot_time));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_crypto_snapshots_summary_ad AFTER DELETE ON crypto_snapshots
+BEGIN
+    UPDATE crypto_snapshot_daily_counts SET row_count = row_count - 1 WHERE snapshot_date = OLD.snapshot_date;
+    DELETE FROM crypto_snapshot_daily_counts WHERE snapshot_date = OLD.snapshot_date AND row_count <= 0;
+    UPDATE summary_counters SET value = value - 1 WHERE name = '{TOTAL_SNAPSHOTS}';
+    {_REBUILD_SNAPSHOT_LATEST}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_crypto_snapshots_summary_au
+AFTER UPDATE OF snapshot_date, snapshot_time, rush_up, rush_down ON crypto_snapshots
+BEGIN
+    UPDATE crypto_snapshot_daily_counts SET row_count = row_count - 1
+        WHERE snapshot_date = OLD.snapshot_date AND OLD.snapshot_date IS NOT NEW.snapshot_date;
+    DELETE FROM crypto_snapshot_daily_counts WHERE snapshot_date = OLD.snapshot_date AND row_count <= 0;
+    INSERT INTO crypto_snapshot_daily_counts (snapshot_date, row_count)
+        SELECT NEW.snapshot_date, 1 WHERE OLD.snapshot_date IS NOT NEW.snapshot_date
+        ON CONFLICT(snapshot_date) DO UPDATE SET row_count = row_count + 1;
+    {_REBUILD_SNAPSHOT_LATEST}
+END;
+'''
+
+_PANIC_TRIGGERS = f'''
+CREATE TRIGGER IF NOT EXISTS trg_panic_wash_index_summary_ai AFTER INSERT ON panic_wash_index
+BEGIN
+    INSERT OR REPLACE INTO panic_wash_latest (id, record_time, panic_index, hour_24_people, total_position)
+        SELECT 1, NEW.record_time, NEW.panic_index, NEW.hour_24_people, NEW.total_position
+        WHERE NOT EXISTS (SELECT 1 FROM panic_wash_latest WHERE record_time > NEW.record_time);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_panic_wash_index_summary_ad AFTER DELETE ON panic_wash_index
+BEGIN
+    {_REBUILD_PANIC_LATEST}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_panic_wash_index_summary_au
+AFTER UPDATE OF record_time, panic_index, hour_24_people, total_position ON panic_wash_index
+BEGIN
+    {_REBUILD_PANIC_LATEST}
+END;
+'''
+
+
+def _has_table(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def install(conn):
+    """
+    创建汇总表和触发器，并从源表回填（幂等，可重复执行）
+    
+    回填在同一个事务中完成，期间写入方会等待，不会漏计。
+    
+    Args:
+        conn: crypto_data.db 的可写连接
+    """
+    from db_query_audit import apply_migrations
+    
+    # 重建“最新两条快照”依赖 (snapshot_date, snapshot_time) 索引
+    apply_migrations(conn, 'crypto_data')
+    
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for statement in _SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        
+        if _has_table(conn, 'crypto_snapshots'):
+            conn.execute('DELETE FROM crypto_snapshot_daily_counts')
+            conn.execute('''
+                INSERT INTO crypto_snapshot_daily_counts (snapshot_date, row_count)
+                SELECT snapshot_date, COUNT(*) FROM crypto_snapshots GROUP BY snapshot_date
+            ''')
+            conn.execute('''
+                INSERT OR REPLACE INTO summary_counters (name, value)
+                SELECT ?, COUNT(*) FROM crypto_snapshots
+            ''', (TOTAL_SNAPSHOTS,))
+            _run_block(conn, _REBUILD_SNAPSHOT_LATEST)
+            _create_triggers(conn, _SNAPSHOT_TRIGGERS)
+        
+        if _has_table(conn, 'panic_wash_index'):
+            _run_block(conn, _REBUILD_PANIC_LATEST)
+            _create_triggers(conn, _PANIC_TRIGGERS)
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _run_block(conn, block):
+    """逐条执行以分号分隔的语句（不使用executescript，避免其隐式提交）"""
+    for statement in block.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _create_triggers(conn, block):
+    """逐个创建触发器（触发器体内包含分号，按 END; 切分）"""
+    for trigger in block.split('END;'):
+        if trigger.strip():
+            conn.execute(trigger + 'END;')
+
+
+def read_homepage_counters(cursor, today):
+    """
+    读取首页需要的汇总数据（全部为主键查找）
+    
+    Args:
+        cursor: crypto_data.db 的游标（只读即可）
+        today: 今天的日期 'YYYY-MM-DD'
+    
+    Returns:
+        dict: total_records / today_records / first_date / last_date /
+              latest_records（[(snapshot_time, rush_up, rush_down), ...] 最新在前）/ panic（行或None）；
+              汇总表未安装时返回None
+    """
+    try:
+        cursor.execute('SELECT value FROM summary_counters WHERE name = ?', (TOTAL_SNAPSHOTS,))
+        total = cursor.fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if total is None:
+        return None
+    
+    cursor.execute('SELECT row_count FROM crypto_snapshot_daily_counts WHERE snapshot_date = ?', (today,))
+    today_row = cursor.fetchone()
+    
+    cursor.execute('''
+        SELECT (SELECT MIN(snapshot_date) FROM crypto_snapshot_daily_counts),
+               (SELECT MAX(snapshot_date) FROM crypto_snapshot_daily_counts)
+    ''')
+    first_date, last_date = cursor.fetchone()
+    
+    cursor.execute('''
+        SELECT snapshot_time, rush_up, rush_down FROM crypto_snapshot_latest
+        WHERE rank IN (1, 2) ORDER BY rank
+    ''')
+    latest_records = cursor.fetchall()
+    
+    panic = None
+    try:
+        cursor.execute('''
+            SELECT panic_index, hour_24_people, total_position FROM panic_wash_latest WHERE id = 1
+        ''')
+        panic = cursor.fetchone()
+    except sqlite3.OperationalError:
+        pass
+    
+    return {
+        'total_records': total[0],
+        'today_records': today_row[0] if today_row else 0,
+        'first_date': first_date,
+        'last_date': last_date,
+        'latest_records': latest_records,
+        'panic': panic
+    }
+
+
+def verify(conn):
+    """
+    对比汇总表与源表（全表扫描，仅用于离线校验）
+    
+    Returns:
+        list: 不一致项的描述，一致时为空列表
+    """
+    problems = []
+    cursor = conn.cursor()
+    counters = read_homepage_counters(cursor, '')
+    if counters is None:
+        return ['汇总表未安装']
+    
+    cursor.execute('SELECT COUNT(*) FROM crypto_snapshots')
+    actual_total = cursor.fetchone()[0]
+    if actual_total != counters['total_records']:
+        problems.append(f"总行数不一致: 汇总 {counters['total_records']} / 实际 {actual_total}")
+    
+    cursor.execute('''
+        SELECT s.snapshot_date, s.cnt, d.row_count
+        FROM (SELECT snapshot_date, COUNT(*) AS cnt FROM crypto_snapshots GROUP BY snapshot_date) s
+        LEFT JOIN crypto_snapshot_daily_counts d ON d.snapshot_date = s.snapshot_date
+        WHERE d.row_count IS NOT s.cnt
+    ''')
+    for snapshot_date, actual, counted in cursor.fetchall():
+        problems.append(f"{snapshot_date} 行数不一致: 汇总 {counted} / 实际 {actual}")
+    
+    cursor.execute('''
+        SELECT snapshot_time, rush_up, rush_down FROM crypto_snapshots
+        ORDER BY snapshot_date DESC, snapshot_time DESC LIMIT 2
+    ''')
+    if cursor.fetchall() != counters['latest_records']:
+        problems.append('最新快照不一致')
+    
+    if _has_table(conn, 'panic_wash_index'):
+        cursor.execute('''
+            SELECT panic_index, hour_24_people, total_position FROM panic_wash_index
+            ORDER BY record_time DESC LIMIT 1
+        ''')
+        if cursor.fetchone() != counters['panic']:
+            problems.append('最新恐慌清洗指数不一致')
+    
+    return problems
+
+
+def main():
+    """命令行：安装触发器并回填 / 校验汇总表"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='首页汇总数据物化计数表')
+    parser.add_argument('--db', default=CRYPTO_DATA_DB, help='数据库路径')
+    parser.add_argument('--install', action='store_true', help='创建汇总表和触发器并回填')
+    parser.add_argument('--verify', action='store_true', help='对比汇总表与源表')
+    
+    args = parser.parse_args()
+    
+    conn = sqlite3.connect(args.db, timeout=30.0, isolation_level=None)
+    try:
+        if args.install:
+            install(conn)
+            print(f"[汇总表] 已安装: {args.db}")
+        if args.verify:
+            problems = verify(conn)
+            for problem in problems:
+                print(f"[不一致] {problem}")
+            print('[校验] 通过' if not problems else f"[校验] {len(problems)} 项不一致")
+            if problems:
+                sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Ticker Snapshot - 全市场行情快照
+
+用 /api/v5/market/tickers?instType=SWAP（以及SPOT）一次取回全部交易对的行情，
+整理为带时间戳的快照，代替各采集器逐个币种调用 ticker 接口并 sleep 的循环。
+
+快照在进程内缓存，同时原子写入共享文件；同一时间窗口内运行的其他采集器进程
+直接读取该文件，多个每分钟采集器使用的是同一时刻的一组价格。
+
+用法:
+    from ticker_snapshot import get_snapshot
+    snapshot = get_snapshot()
+    prices = snapshot.prices(['BTC', 'ETH'])          # 永续合约优先，没有时用现货
+    ticker = snapshot.get('BTC-USDT')                 # 按完整 instId 查询
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from okx_market_client import okx_client
+
+SNAPSHOT_DIR = Path('/home/user/webapp/data/ticker_snapshot')
+SNAPSHOT_FILE = SNAPSHOT_DIR / 'latest.json'
+LOCK_FILE = SNAPSHOT_DIR / '.latest.lock'
+
+# 快照的默认有效期（秒）
+SNAPSHOT_MAX_AGE = 5
+# 默认拉取的产品类型
+INST_TYPES = ('SWAP', 'SPOT')
+
+# 保留的字段（数值字段转为float）
+_FLOAT_FIELDS = ('last', 'open24h', 'high24h', 'low24h', 'vol24h', 'volCcy24h', 'sodUtc0', 'sodUtc8',
+                 'bidPx', 'askPx')
+
+
+def _normalize(item):
+    """把OKX的行情条目整理为数值字典"""
+    ticker = {'ts': int(item.get('ts') or 0)}
+    for field in _FLOAT_FIELDS:
+        try:
+            ticker[field] = float(item.get(field) or 0)
+        except (TypeError, ValueError):
+            ticker[field] = 0.0
+    return ticker
+
+
+class TickerSnapshot:
+    """某一时刻的全市场行情"""
+    
+    def __init__(self, ts, tickers):
+        self.ts = ts
+        self.tickers = tickers
+    
+    @property
+    def age(self):
+        """快照距今的秒数"""
+        return time.time() - self.ts
+    
+    def get(self, symbol):
+        """
+        获取单个交易对的行情
+        
+        Args:
+            symbol: 完整 instId（BTC-USDT-SWAP / BTC-USDT）或币种（BTC，永续合约优先）
+        
+        Returns:
+            dict: 行情（last、open24h、sodUtc8 等），不存在时返回None
+        """
+        if '-' in symbol:
+            return self.tickers.get(symbol)
+        return self.tickers.get(f'{symbol}-USDT-SWAP') or self.tickers.get(f'{symbol}-USDT')
+    
+    def prices(self, symbols, field='last'):
+        """
+        获取多个币种的价格
+        
+        Args:
+            symbols: 币种或 instId 列表
+            field: 价格字段（last 最新价，sodUtc8 北京时间0点开盘价）
+        
+        Returns:
+            dict: {symbol: price}，快照中不存在或价格为0的币种不包含在内
+        """
+        result = {}
+        for symbol in symbols:
+            ticker = self.get(symbol)
+            if ticker and ticker.get(field):
+                result[symbol] = ticker[field]
+        return result
+    
+    def to_dict(self):
+        return {'ts': self.ts, 'tickers': self.tickers}
+
+
+def fetch_snapshot(inst_types=INST_TYPES):
+    """
+    从OKX拉取全市场行情（每个产品类型一次请求）
+    
+    Returns:
+        TickerSnapshot
+    
+    Raises:
+        RuntimeError: 接口返回错误
+    """
+    tickers = {}
+    for inst_type in inst_types:
+        data = okx_client.get('/api/v5/market/tickers', {'instType': inst_type})
+        if data.get('code') != '0' or not data.get('data'):
+            raise RuntimeError(f"获取{inst_type}行情失败: {data.get('msg', 'Unknown error')}")
+        for item in data['data']:
+            tickers[item['instId']] = _normalize(item)
+    return TickerSnapshot(time.time(), tickers)
+
+
+def _read_shared(max_age):
+    """读取共享快照文件，不存在、损坏或过期时返回None"""
+    try:
+        with open(SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        snapshot = TickerSnapshot(data['ts'], data['tickers'])
+    except (OSError, ValueError, KeyError):
+        return None
+    return snapshot if snapshot.age <= max_age else None
+
+
+def _write_shared(snapshot):
+    """原子写入共享快照文件"""
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix='.latest.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot.to_dict(), f, separators=(',', ':'))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, SNAPSHOT_FILE)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_snapshot(max_age=SNAPSHOT_MAX_AGE):
+    """
+    获取不超过 max_age 秒的行情快照
+    
+    依次使用进程内缓存、共享文件，都过期时拉取新快照并写入共享文件。
+    拉取时持有文件锁，同时到期的多个采集器进程只有一个实际请求接口。
+    
+    Returns:
+        TickerSnapshot
+    
+    Raises:
+        RuntimeError / requests.RequestException: 拉取失败
+    """
+    global _current
+    with _lock:
+        if _current is not None and _current.age <= max_age:
+            return _current
+        
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                snapshot = _read_shared(max_age)
+                if snapshot is None:
+                    snapshot = fetch_snapshot()
+                    try:
+                        _write_shared(snapshot)
+                    except OSError as e:
+                        print(f"[警告] 写入共享行情快照失败: {e}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        
+        _current = snapshot
+        return snapshot
+
+
+def main():
+    """命令行：拉取一次快照并打印指定币种的价格"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='全市场行情快照')
+    parser.add_argument('symbols', nargs='*', default=['BTC', 'ETH'], help='币种或instId')
+    parser.add_argument('--max-age', type=float, default=SNAPSHOT_MAX_AGE, help='快照有效期（秒）')
+    
+    args = parser.parse_args()
+    
+    snapshot = get_snapshot(args.max_age)
+    print(f"[快照] {len(snapshot.tickers)} 个交易对, {snapshot.age:.1f}秒前")
+    for symbol, price in snapshot.prices(args.symbols).items():
+        print(f"  {symbol}: {price}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,26 @@
 C点可以作为下一个波峰的B点复用
 """
 
+import copy
 import json
 import os
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 from enum import Enum
 
+from jsonl_read_cache import read_jsonl
+
+# 采集器每轮写入的增量检测检查点（数据目录下）
+CHECKPOINT_FILE = '.wave_peak_state.json'
+
+# 进程内缓存的增量检测状态（最近几天）
+MAX_CACHED_DAYS = 7
+_streams = OrderedDict()
+_streams_lock = threading.Lock()
+
 class DetectionState(Enum):
     """波峰检测状态"""
     LOOKING_FOR_B = 1  # 寻找B点
@@ -20,19 +34,292 @@ class DetectionState(Enum):
     CONFIRMING_A = 4   # 确认A点（等待15分钟）
     LOOKING_FOR_C = 5  # 寻找C点
 
+class WavePeakStream:
+    """
+    增量波峰检测（可恢复的状态机）
+    
+    每次 feed 一个数据点，返回本次产生的状态机事件；当前状态、B/A候选点、确认起点、
+    继承的B点和已完成的波峰都可以用 to_dict/from_dict 保存和恢复，
+    采集器每轮写入数据后更新一次，接口直接读取结果，不再每次重放全天数据。
+    
+    C点需要下一个点确认是否止跌反弹，所以每个点在下一个点到达后才推进状态机；
+    snapshot 时最后一个点在状态副本上推进（没有下一个点，不能成为C点），
+    结果与 detect_wave_peaks 整段重放完全一致。
+    """
+    
+    def __init__(self, min_amplitude: float = 35.0, window_minutes: int = 15,
+                 date: Optional[str] = None, verbose: bool = False):
+        self.min_amplitude = min_amplitude
+        self.window_minutes = window_minutes
+        self.date = date
+        self.verbose = verbose
+        
+        self.count = 0  # 已接收的数据点数（下一个点的index）
+        self.state = DetectionState.LOOKING_FOR_B
+        self.b_candidate = None
+        self.b_confirm_start_index = None
+        self.a_candidate = None
+        self.a_confirm_start_index = None
+        self.inherited_b = None  # 从C点继承的B点
+        self.prev_value = None  # 上一个已推进的点的涨跌幅
+        self.pending = None  # 等待下一个点到达的最新数据点
+        self.peaks = []
+        self._events = []
+    
+    def _emit(self, event_type: str, message: str, **data):
+        self._events.append({'type': event_type, **data})
+        if self.verbose:
+            print(message)
+    
+    def feed(self, record: Dict) -> List[Dict]:
+        """
+        加入一个数据点
+        
+        Args:
+            record: 数据记录（需要 timestamp、beijing_time、total_change）
+        
+        Returns:
+            本次推进产生的事件列表，例如 {'type': 'peak', 'peak': {...}}
+        """
+        point = {
+            'index': self.count,
+            'timestamp': record['timestamp'],
+            'beijing_time': record['beijing_time'],
+            'value': record['total_change']
+        }
+        self.count += 1
+        self._events = []
+        if self.pending is not None:
+            self._advance(self.pending, point['value'])
+        self.pending = point
+        return self._events
+    
+    def _advance(self, point: Dict, next_value: Optional[float]):
+        """用一个数据点推进状态机（next_value 为下一个点的涨跌幅，用于判断C点反弹）"""
+        i = point['index']
+        current_value = point['value']
+        
+        while True:
+            # ==================== 状态1: 寻找B点 ====================
+            if self.state == DetectionState.LOOKING_FOR_B:
+                # 如果有从上一个波峰的C点继承的B点，直接使用
+                if self.inherited_b is not None:
+                    self.b_candidate = self.inherited_b
+                    self.b_confirm_start_index = i
+                    self.state = DetectionState.CONFIRMING_B
+                    self.inherited_b = None  # 清除继承
+                    self._emit('b_candidate', f"📍 使用继承的B点: {self.b_candidate['beijing_time']} = {self.b_candidate['value']:.2f}%",
+                               point=self.b_candidate, inherited=True)
+                # 否则寻找新的局部最低点
+                elif i > 0 and current_value < self.prev_value:
+                    # 发现下降趋势，可能是B点候选
+                    self.b_candidate = dict(point)
+                    self.b_confirm_start_index = i
+                    self.state = DetectionState.CONFIRMING_B
+                    self._emit('b_candidate', f"🔍 发现B点候选: {point['beijing_time']} = {current_value:.2f}%",
+                               point=self.b_candidate, inherited=False)
+            
+            # ==================== 状态2: 确认B点 ====================
+            elif self.state == DetectionState.CONFIRMING_B:
+                # 检查是否出现了更低点
+                if current_value < self.b_candidate['value']:
+                    # 重新设置B点候选
+                    self.b_candidate = dict(point)
+                    self.b_confirm_start_index = i
+                    self._emit('b_candidate', f"⚠️  B点被推翻，发现更低点: {point['beijing_time']} = {current_value:.2f}%",
+                               point=self.b_candidate, inherited=False)
+                
+                # 检查是否已经过了确认窗口
+                if i - self.b_confirm_start_index >= self.window_minutes:
+                    # B点确认成功
+                    self.a_candidate = None  # 重置A点候选
+                    self.state = DetectionState.LOOKING_FOR_A
+                    self._emit('b_confirmed', f"✅ B点确认: {self.b_candidate['beijing_time']} = {self.b_candidate['value']:.2f}%",
+                               point=self.b_candidate)
+            
+            # ==================== 状态3: 寻找A点 ====================
+            elif self.state == DetectionState.LOOKING_FOR_A:
+                # 确保A点在B点之后
+                if i > self.b_candidate['index']:
+                    # ⚠️ 出现比B点更低的点：放弃当前B点，用这个点重新寻找B点
+                    if current_value < self.b_candidate['value']:
+                        self._emit('reset', f"⚠️  在寻找A点期间，发现比B点更低的点: {point['beijing_time']} = {current_value:.2f}%，重新寻找B点",
+                                   point=dict(point))
+                        self.state = DetectionState.LOOKING_FOR_B
+                        self.b_candidate = None
+                        self.a_candidate = None
+                        continue
+                    
+                    # 检查振幅是否满足要求
+                    amplitude = current_value - self.b_candidate['value']
+                    
+                    # 如果还没有A候选，或者当前值更高且振幅满足要求
+                    if self.a_candidate is None:
+                        if amplitude >= self.min_amplitude:
+                            self.a_candidate = dict(point)
+                            self.a_confirm_start_index = i
+                            self.state = DetectionState.CONFIRMING_A
+                            self._emit('a_candidate', f"🔍 发现A点候选: {point['beijing_time']} = {current_value:.2f}%, 振幅={amplitude:.2f}%",
+                                       point=self.a_candidate)
+                    elif current_value > self.a_candidate['value'] and amplitude >= self.min_amplitude:
+                        # 更新A候选
+                        self.a_candidate = dict(point)
+                        self.a_confirm_start_index = i
+                        self._emit('a_candidate', f"🔄 更新A点候选: {point['beijing_time']} = {current_value:.2f}%, 振幅={amplitude:.2f}%",
+                                   point=self.a_candidate)
+            
+            # ==================== 状态4: 确认A点 ====================
+            elif self.state == DetectionState.CONFIRMING_A:
+                # ⚠️ 出现比B点更低的点：放弃当前B点和A点，重新开始
+                if current_value < self.b_candidate['value']:
+                    self._emit('reset', f"⚠️  在确认A点期间，发现比B点更低的点: {point['beijing_time']} = {current_value:.2f}%，重新开始",
+                               point=dict(point))
+                    self.state = DetectionState.LOOKING_FOR_B
+                    self.b_candidate = None
+                    self.a_candidate = None
+                    continue
+                
+                # 检查是否出现了更高点（振幅仍然满足时替换A点候选）
+                if current_value > self.a_candidate['value']:
+                    new_amplitude = current_value - self.b_candidate['value']
+                    if new_amplitude >= self.min_amplitude:
+                        self.a_candidate = dict(point)
+                        self.a_confirm_start_index = i
+                        self._emit('a_candidate', f"⚠️  A点被推翻，新的A点候选: {point['beijing_time']} = {current_value:.2f}%, 振幅={new_amplitude:.2f}%",
+                                   point=self.a_candidate)
+                
+                # 检查是否已经过了确认窗口
+                if i - self.a_confirm_start_index >= self.window_minutes:
+                    # A点确认成功
+                    amplitude = self.a_candidate['value'] - self.b_candidate['value']
+                    self.state = DetectionState.LOOKING_FOR_C
+                    self._emit('a_confirmed', f"✅ A点确认: {self.a_candidate['beijing_time']} = {self.a_candidate['value']:.2f}%, 振幅={amplitude:.2f}%",
+                               point=self.a_candidate)
+            
+            # ==================== 状态5: 寻找C点 ====================
+            elif self.state == DetectionState.LOOKING_FOR_C and i > self.a_candidate['index']:
+                # ⚠️ 关键逻辑：即使在寻找C点期间，如果出现更高点，A点也要更新！
+                if current_value > self.a_candidate['value'] and \
+                        current_value - self.b_candidate['value'] >= self.min_amplitude:
+                    self.a_candidate = dict(point)
+                    self._emit('a_updated', f"⚠️  在寻找C点期间，发现更高点！A点更新: {point['beijing_time']} = {current_value:.2f}%, "
+                               f"新振幅: {current_value - self.b_candidate['value']:.2f}%", point=self.a_candidate)
+                    break  # 继续寻找C点，但使用新的A点
+                
+                # 计算目标回落值（振幅的一半）
+                amplitude = self.a_candidate['value'] - self.b_candidate['value']
+                target_decline = self.a_candidate['value'] - amplitude / 2
+                
+                # 已经回落超过一半且止跌反弹：找到C点，记录完整波峰
+                if current_value <= target_decline and next_value is not None and next_value > current_value:
+                    c_point = dict(point)
+                    decline = self.a_candidate['value'] - c_point['value']
+                    wave_peak = {
+                        'b_point': self.b_candidate,
+                        'a_point': self.a_candidate,
+                        'c_point': c_point,
+                        'amplitude': amplitude,
+                        'decline': decline,
+                        'decline_ratio': (decline / amplitude) * 100
+                    }
+                    self.peaks.append(wave_peak)
+                    self._emit('peak', f"✅ 完整波峰记录: B({self.b_candidate['value']:.2f}%) → A({self.a_candidate['value']:.2f}%) → "
+                               f"C({c_point['value']:.2f}%)，振幅={amplitude:.2f}%, 回调={decline:.2f}% ({wave_peak['decline_ratio']:.1f}%)",
+                               peak=wave_peak)
+                    
+                    # C点作为下一个波峰的B点候选，重置状态开始寻找下一个波峰
+                    self.inherited_b = c_point
+                    self.state = DetectionState.LOOKING_FOR_B
+                    self.b_candidate = None
+                    self.a_candidate = None
+            break
+        
+        self.prev_value = current_value
+    
+    def snapshot(self) -> Tuple[List[Dict], Dict]:
+        """
+        当前结果（与 detect_wave_peaks 的返回值相同）
+        
+        Returns:
+            (波峰列表, 当前状态信息)；数据点少于 3 个确认窗口时波峰列表为空
+        """
+        preview = self
+        if self.pending is not None:
+            # 最后一个点在状态副本上推进（推进不会修改已有的候选点和波峰对象）
+            preview = copy.copy(self)
+            preview.verbose = False
+            preview._events = []
+            preview.peaks = list(self.peaks)
+            preview._advance(self.pending, None)
+        
+        state = preview.state
+        b_candidate = preview.b_candidate
+        a_candidate = preview.a_candidate
+        current_state = {
+            'state': state.value if state else 'COMPLETED',
+            'b_candidate': b_candidate if b_candidate else None,
+            'a_candidate': a_candidate if a_candidate else None,
+            'has_incomplete_peak': (b_candidate is not None or a_candidate is not None)
+        }
+        
+        # 如果有B-A但没有C，说明有一个进行中的波峰
+        if b_candidate and a_candidate and state == DetectionState.LOOKING_FOR_C:
+            current_state['incomplete_peak'] = {
+                'b_point': b_candidate,
+                'a_point': a_candidate,
+                'amplitude': a_candidate['value'] - b_candidate['value'],
+                'status': '等待C点形成'
+            }
+        
+        if self.count < self.window_minutes * 3:
+            return [], current_state
+        return preview.peaks, current_state
+    
+    def to_dict(self) -> Dict:
+        """可JSON序列化的状态"""
+        return {
+            'date': self.date,
+            'min_amplitude': self.min_amplitude,
+            'window_minutes': self.window_minutes,
+            'count': self.count,
+            'state': self.state.value,
+            'b_candidate': self.b_candidate,
+            'b_confirm_start_index': self.b_confirm_start_index,
+            'a_candidate': self.a_candidate,
+            'a_confirm_start_index': self.a_confirm_start_index,
+            'inherited_b': self.inherited_b,
+            'prev_value': self.prev_value,
+            'pending': self.pending,
+            'peaks': self.peaks
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict, verbose: bool = False) -> 'WavePeakStream':
+        stream = cls(data['min_amplitude'], data['window_minutes'], data.get('date'), verbose)
+        stream.count = data['count']
+        stream.state = DetectionState(data['state'])
+        for key in ('b_candidate', 'b_confirm_start_index', 'a_candidate', 'a_confirm_start_index',
+                    'inherited_b', 'prev_value', 'pending'):
+            setattr(stream, key, data.get(key))
+        stream.peaks = data.get('peaks', [])
+        return stream
+
+
 class WavePeakDetector:
     """波峰检测器（状态机版）"""
     
-    def __init__(self, min_amplitude: float = 35.0, window_minutes: int = 15):
+    def __init__(self, min_amplitude: float = 35.0, window_minutes: int = 15, verbose: bool = False):
         """
         初始化波峰检测器
         
         Args:
             min_amplitude: 最小振幅（B到A的涨跌幅差值），默认35%
             window_minutes: 确认窗口（分钟），点位需要在此窗口内保持极值才算确认，默认15分钟
+            verbose: 是否打印每次状态转换（命令行调试用）
         """
         self.min_amplitude = min_amplitude
         self.window_minutes = window_minutes
+        self.verbose = verbose
         self.data_dir = '/home/user/webapp/data/coin_change_tracker'
     
     def load_data(self, file_path: str) -> List[Dict]:
@@ -45,34 +332,64 @@ class WavePeakDetector:
         Returns:
             数据列表
         """
+        # 已结束的日期优先读取列式冷存储
+        records = self._load_columnar(file_path)
+        if records is not None:
+            return records
+        
         if not os.path.exists(file_path):
             print(f"❌ 数据文件不存在: {file_path}")
             return []
         
         data = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    record = json.loads(line)
-                    
-                    # 兼容旧格式：如果没有beijing_time字段，从timestamp字段生成
-                    if 'beijing_time' not in record and 'timestamp' in record:
-                        # timestamp格式：2026-02-01T09:12:25.698836+08:00
-                        # 提取日期和时间部分
-                        timestamp_str = record['timestamp']
-                        # 去掉时区信息
-                        if '+' in timestamp_str:
-                            timestamp_str = timestamp_str.split('+')[0]
-                        # 转换为beijing_time格式：2026-02-01 09:12:25
-                        record['beijing_time'] = timestamp_str.replace('T', ' ').split('.')[0]
-                    
-                    data.append(record)
+        # 进程内缓存：文件只追加时只解析新增部分（缓存中的记录不能修改）
+        for record in read_jsonl(file_path):
+            # 兼容旧格式：如果没有beijing_time字段，从timestamp字段生成
+            if 'beijing_time' not in record and 'timestamp' in record:
+                # timestamp格式：2026-02-01T09:12:25.698836+08:00
+                # 提取日期和时间部分
+                timestamp_str = record['timestamp']
+                # 去掉时区信息
+                if '+' in timestamp_str:
+                    timestamp_str = timestamp_str.split('+')[0]
+                # 转换为beijing_time格式：2026-02-01 09:12:25
+                record = dict(record)
+                record['beijing_time'] = timestamp_str.replace('T', ' ').split('.')[0]
+            
+            data.append(record)
         
         return data
     
+    def _load_columnar(self, file_path: str) -> Optional[List[Dict]]:
+        """
+        从列式冷存储文件加载数据（coin_change_YYYYMMDD.jsonl → coin_change_YYYYMMDD.npz）
+        
+        Args:
+            file_path: 原JSONL文件路径
+            
+        Returns:
+            数据列表，列式文件不存在时返回None
+        """
+        from coin_change_columnar import columnar_path, load_day_records
+        
+        name = os.path.basename(file_path)
+        if not (name.startswith('coin_change_') and name.endswith('.jsonl')):
+            return None
+        
+        date_str = name[len('coin_change_'):-len('.jsonl')]
+        data_dir = os.path.dirname(file_path)
+        if not columnar_path(date_str, data_dir).exists():
+            return None
+        
+        return load_day_records(date_str, data_dir)
+    
+    def stream(self, date: Optional[str] = None) -> WavePeakStream:
+        """创建一个使用本检测器参数的增量检测状态"""
+        return WavePeakStream(self.min_amplitude, self.window_minutes, date, self.verbose)
+    
     def detect_wave_peaks(self, data: List[Dict]) -> tuple[List[Dict], Dict]:
         """
-        检测波峰（B-A-C结构）- 状态机版本
+        检测波峰（B-A-C结构）- 状态机版本，整段数据重放
         
         状态转换流程：
         1. LOOKING_FOR_B: 找到局部最低点 → CONFIRMING_B
@@ -86,6 +403,8 @@ class WavePeakDetector:
         5. LOOKING_FOR_C: 找到回落>50%后反弹的点 → 记录波峰
            - C点成为下一个波峰的B点候选
         
+        状态机实现见 WavePeakStream；需要持续更新的场景用 sync_day 增量处理新数据点。
+        
         Args:
             data: 数据列表
             
@@ -94,241 +413,86 @@ class WavePeakDetector:
             - 波峰列表：已完成的波峰（有B、A、C三个点）
             - 当前状态：包含进行中的波峰信息（可能只有B，或只有B-A）
         """
-        if len(data) < self.window_minutes * 3:
-            return []
-        
-        wave_peaks = []
-        state = DetectionState.LOOKING_FOR_B
-        
-        # 当前候选点
-        b_candidate = None
-        b_confirm_start_index = None
-        
-        a_candidate = None
-        a_confirm_start_index = None
+        stream = self.stream()
+        for record in data:
+            stream.feed(record)
+        return stream.snapshot()
+    
+    def data_file(self, date_str: str) -> str:
+        return os.path.join(self.data_dir, f'coin_change_{date_str}.jsonl')
+    
+    def load_checkpoint(self, date_str: str, path: Optional[str] = None) -> Optional[WavePeakStream]:
+        """读取检查点，日期或参数不一致时返回 None"""
+        path = path or os.path.join(self.data_dir, CHECKPOINT_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if (data.get('date') != date_str or data.get('min_amplitude') != self.min_amplitude
+                or data.get('window_minutes') != self.window_minutes):
+            return None
+        return WavePeakStream.from_dict(data, self.verbose)
+    
+    def save_checkpoint(self, stream: WavePeakStream, path: Optional[str] = None):
+        """原子写入检查点"""
+        path = path or os.path.join(self.data_dir, CHECKPOINT_FILE)
+        # 缓存中的状态可能正被其他线程的 sync_day 推进，在锁内序列化
+        with _streams_lock:
+            data = stream.to_dict()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.wave_peak_state.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    def sync_day(self, date_str: str) -> Tuple[WavePeakStream, List[Dict]]:
+        """
+        某一天的增量检测状态：进程内缓存，只处理上次之后新增的数据点
         
-        # 从C点继承的B点（如果有）
-        inherited_b = None
+        进程内没有缓存时先读取检查点（采集器每轮写入），再从数据文件补齐检查点之后的数据点。
         
-        i = 0
-        while i < len(data):
-            current_value = data[i]['total_change']
-            
-            # ==================== 状态1: 寻找B点 ====================
-            if state == DetectionState.LOOKING_FOR_B:
-                # 如果有从上一个波峰的C点继承的B点，直接使用
-                if inherited_b is not None:
-                    b_candidate = inherited_b
-                    b_confirm_start_index = i
-                    state = DetectionState.CONFIRMING_B
-                    inherited_b = None  # 清除继承
-                    print(f"📍 使用继承的B点: {b_candidate['beijing_time']} = {b_candidate['value']:.2f}%")
-                # 否则寻找新的局部最低点
-                elif i > 0 and current_value < data[i-1]['total_change']:
-                    # 发现下降趋势，可能是B点候选
-                    b_candidate = {
-                        'index': i,
-                        'timestamp': data[i]['timestamp'],
-                        'beijing_time': data[i]['beijing_time'],
-                        'value': current_value
-                    }
-                    b_confirm_start_index = i
-                    state = DetectionState.CONFIRMING_B
-                    print(f"🔍 发现B点候选: {b_candidate['beijing_time']} = {b_candidate['value']:.2f}%")
-                
-                i += 1
-            
-            # ==================== 状态2: 确认B点 ====================
-            elif state == DetectionState.CONFIRMING_B:
-                # 检查是否出现了更低点
-                if current_value < b_candidate['value']:
-                    print(f"⚠️  B点被推翻，发现更低点: {data[i]['beijing_time']} = {current_value:.2f}%")
-                    # 重新设置B点候选
-                    b_candidate = {
-                        'index': i,
-                        'timestamp': data[i]['timestamp'],
-                        'beijing_time': data[i]['beijing_time'],
-                        'value': current_value
-                    }
-                    b_confirm_start_index = i
-                    print(f"🔍 新的B点候选: {b_candidate['beijing_time']} = {b_candidate['value']:.2f}%")
-                
-                # 检查是否已经过了确认窗口
-                if i - b_confirm_start_index >= self.window_minutes:
-                    # B点确认成功
-                    print(f"✅ B点确认: {b_candidate['beijing_time']} = {b_candidate['value']:.2f}%")
-                    a_candidate = None  # 重置A点候选
-                    state = DetectionState.LOOKING_FOR_A
-                
-                i += 1
-            
-            # ==================== 状态3: 寻找A点 ====================
-            elif state == DetectionState.LOOKING_FOR_A:
-                # 确保A点在B点之后
-                if i <= b_candidate['index']:
-                    i += 1
-                    continue
-                
-                # ⚠️ 检查是否出现了比B点更低的点，如果是，则放弃当前B点，重新寻找
-                if current_value < b_candidate['value']:
-                    print(f"⚠️  在寻找A点期间，发现比B点更低的点: {data[i]['beijing_time']} = {current_value:.2f}%")
-                    print(f"   放弃当前B点，重新开始寻找B点")
-                    state = DetectionState.LOOKING_FOR_B
-                    b_candidate = None
-                    a_candidate = None
-                    # 不增加i，让下一轮循环处理这个新的低点
-                    continue
-                
-                # 检查振幅是否满足要求
-                amplitude = current_value - b_candidate['value']
-                
-                # 如果还没有A候选，或者当前值更高且振幅满足要求
-                if a_candidate is None:
-                    if amplitude >= self.min_amplitude:
-                        a_candidate = {
-                            'index': i,
-                            'timestamp': data[i]['timestamp'],
-                            'beijing_time': data[i]['beijing_time'],
-                            'value': current_value
-                        }
-                        a_confirm_start_index = i
-                        state = DetectionState.CONFIRMING_A
-                        print(f"🔍 发现A点候选: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%, 振幅={amplitude:.2f}%")
-                elif current_value > a_candidate['value'] and amplitude >= self.min_amplitude:
-                    # 更新A候选
-                    a_candidate = {
-                        'index': i,
-                        'timestamp': data[i]['timestamp'],
-                        'beijing_time': data[i]['beijing_time'],
-                        'value': current_value
-                    }
-                    a_confirm_start_index = i
-                    print(f"🔄 更新A点候选: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%, 振幅={amplitude:.2f}%")
-                
-                i += 1
-            
-            # ==================== 状态4: 确认A点 ====================
-            elif state == DetectionState.CONFIRMING_A:
-                # ⚠️ 检查是否出现了比B点更低的点
-                if current_value < b_candidate['value']:
-                    print(f"⚠️  在确认A点期间，发现比B点更低的点: {data[i]['beijing_time']} = {current_value:.2f}%")
-                    print(f"   放弃当前B点和A点，重新开始")
-                    state = DetectionState.LOOKING_FOR_B
-                    b_candidate = None
-                    a_candidate = None
-                    continue
-                
-                # 检查是否出现了更高点
-                if current_value > a_candidate['value']:
-                    # 检查新的高点振幅是否仍然满足
-                    new_amplitude = current_value - b_candidate['value']
-                    if new_amplitude >= self.min_amplitude:
-                        print(f"⚠️  A点被推翻，发现更高点: {data[i]['beijing_time']} = {current_value:.2f}%")
-                        a_candidate = {
-                            'index': i,
-                            'timestamp': data[i]['timestamp'],
-                            'beijing_time': data[i]['beijing_time'],
-                            'value': current_value
-                        }
-                        a_confirm_start_index = i
-                        print(f"🔍 新的A点候选: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%, 振幅={new_amplitude:.2f}%")
-                
-                # 检查是否已经过了确认窗口
-                if i - a_confirm_start_index >= self.window_minutes:
-                    # A点确认成功
-                    amplitude = a_candidate['value'] - b_candidate['value']
-                    print(f"✅ A点确认: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%, 振幅={amplitude:.2f}%")
-                    state = DetectionState.LOOKING_FOR_C
-                
-                i += 1
-            
-            # ==================== 状态5: 寻找C点 ====================
-            elif state == DetectionState.LOOKING_FOR_C:
-                # 确保C点在A点之后
-                if i <= a_candidate['index']:
-                    i += 1
-                    continue
-                
-                # ⚠️ 关键逻辑：即使在寻找C点期间，如果出现更高点，A点也要更新！
-                if current_value > a_candidate['value']:
-                    new_amplitude = current_value - b_candidate['value']
-                    if new_amplitude >= self.min_amplitude:
-                        print(f"⚠️  在寻找C点期间，发现更高点！A点更新")
-                        print(f"   旧A点: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%")
-                        a_candidate = {
-                            'index': i,
-                            'timestamp': data[i]['timestamp'],
-                            'beijing_time': data[i]['beijing_time'],
-                            'value': current_value
-                        }
-                        print(f"   新A点: {a_candidate['beijing_time']} = {a_candidate['value']:.2f}%")
-                        print(f"   新振幅: {new_amplitude:.2f}%")
-                        i += 1
-                        continue  # 继续寻找C点，但使用新的A点
-                
-                # 计算目标回落值（振幅的一半）
-                amplitude = a_candidate['value'] - b_candidate['value']
-                half_amplitude = amplitude / 2
-                target_decline = a_candidate['value'] - half_amplitude
-                
-                # 检查是否已经回落超过一半
-                if current_value <= target_decline:
-                    # 检查是否止跌反弹
-                    if i + 1 < len(data) and data[i + 1]['total_change'] > current_value:
-                        # 找到C点，记录完整波峰
-                        c_point = {
-                            'index': i,
-                            'timestamp': data[i]['timestamp'],
-                            'beijing_time': data[i]['beijing_time'],
-                            'value': current_value
-                        }
-                        
-                        decline = a_candidate['value'] - c_point['value']
-                        decline_ratio = (decline / amplitude) * 100
-                        
-                        wave_peak = {
-                            'b_point': b_candidate,
-                            'a_point': a_candidate,
-                            'c_point': c_point,
-                            'amplitude': amplitude,
-                            'decline': decline,
-                            'decline_ratio': decline_ratio
-                        }
-                        wave_peaks.append(wave_peak)
-                        
-                        print(f"✅ 完整波峰记录: B({b_candidate['value']:.2f}%) → A({a_candidate['value']:.2f}%) → C({c_point['value']:.2f}%)")
-                        print(f"   振幅={amplitude:.2f}%, 回调={decline:.2f}% ({decline_ratio:.1f}%)")
-                        
-                        # C点作为下一个波峰的B点候选
-                        inherited_b = c_point
-                        print(f"♻️  C点将作为下一个波峰的B点候选")
-                        
-                        # 重置状态，开始寻找下一个波峰
-                        state = DetectionState.LOOKING_FOR_B
-                        b_candidate = None
-                        a_candidate = None
-                
-                i += 1
-        
-        # 构建当前状态信息
-        current_state = {
-            'state': state.value if state else 'COMPLETED',
-            'b_candidate': b_candidate if b_candidate else None,
-            'a_candidate': a_candidate if a_candidate else None,
-            'has_incomplete_peak': (b_candidate is not None or a_candidate is not None)
-        }
+        Args:
+            date_str: 日期 YYYYMMDD
         
-        # 如果有B-A但没有C，说明有一个进行中的波峰
-        if b_candidate and a_candidate and state == DetectionState.LOOKING_FOR_C:
-            amplitude = a_candidate['value'] - b_candidate['value']
-            current_state['incomplete_peak'] = {
-                'b_point': b_candidate,
-                'a_point': a_candidate,
-                'amplitude': amplitude,
-                'status': '等待C点形成'
-            }
+        Returns:
+            (WavePeakStream, 本次新产生的事件列表)
+        """
+        records = self.load_data(self.data_file(date_str))
+        with _streams_lock:
+            return self._sync_locked(date_str, records)
+    
+    def snapshot_day(self, date_str: str) -> Tuple[List[Dict], Dict]:
+        """
+        增量同步某一天并返回当前结果（与 detect_wave_peaks 的返回值相同）
         
-        return wave_peaks, current_state
+        同步和 snapshot 在同一次加锁内完成，不会读到其他线程推进到一半的状态。
+        """
+        records = self.load_data(self.data_file(date_str))
+        with _streams_lock:
+            stream, _ = self._sync_locked(date_str, records)
+            return stream.snapshot()
+    
+    def _sync_locked(self, date_str: str, records: List[Dict]) -> Tuple[WavePeakStream, List[Dict]]:
+        """sync_day 的实现（调用方持有 _streams_lock）"""
+        key = (date_str, self.min_amplitude, self.window_minutes)
+        stream = _streams.get(key)
+        if stream is None:
+            stream = self.load_checkpoint(date_str) or self.stream(date_str)
+        if len(records) < stream.count:
+            # 数据文件被重写（例如修复历史数据）：从头重放
+            stream = self.stream(date_str)
+        events = []
+        for record in records[stream.count:]:
+            events.extend(stream.feed(record))
+        _streams[key] = stream
+        _streams.move_to_end(key)
+        while len(_streams) > MAX_CACHED_DAYS:
+            _streams.popitem(last=False)
+        return stream, events
     
     def detect_crash_warning(self, wave_peaks: List[Dict]) -> Optional[Dict]:
         """
@@ -565,10 +729,9 @@ class WavePeakDetector:
 
 def main():
     """主函数 - 测试指定日期的数据"""
-    from datetime import datetime
     import sys
     
-    detector = WavePeakDetector(min_amplitude=35.0, window_minutes=15)
+    detector = WavePeakDetector(min_amplitude=35.0, window_minutes=15, verbose=True)
     
     # 从命令行参数获取日期，如果没有则使用今天
     if len(sys.argv) > 1:
@@ -0,0 +1,5 @@
+"""测试公共配置：模块位于 source_code/ 下，与采集器的运行方式一致按顶层模块导入"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source_code'))
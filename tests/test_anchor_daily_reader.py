@@ -0,0 +1,80 @@
+"""锚点每日数据读取器按UTC日期切分文件的边界测试"""
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from anchor_daily_reader import AnchorDailyReader
+from gzip_frame_archive import build_archive
+
+DAYS = ['2026-10-16', '2026-10-17', '2026-10-18']
+
+
+def write_day_files(data_dir, frame_size=256):
+    """每30分钟一条记录，按UTC日期写入 anchor_data_YYYY-MM-DD.jsonl.gz 并生成帧索引"""
+    records = []
+    for day in DAYS:
+        start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        day_records = [{
+            'timestamp': (start + timedelta(minutes=30 * i)).isoformat(),
+            'symbol': 'BTC-USDT-SWAP' if i % 2 else 'ETH-USDT-SWAP',
+            '_data_type': 'profit_stats' if i % 3 == 0 else 'monitors',
+        } for i in range(48)]
+        path = data_dir / f'anchor_data_{day}.jsonl.gz'
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for record in day_records:
+                f.write(json.dumps(record) + '\n')
+        build_archive(path, frame_size=frame_size)
+        records.extend(day_records)
+    return records
+
+
+def utc(value):
+    return datetime.fromisoformat(value)
+
+
+def test_range_across_utc_midnight(tmp_path):
+    records = write_day_files(tmp_path)
+    reader = AnchorDailyReader(tmp_path)
+    
+    # 北京时间 10-18 07:00 ~ 09:00 = UTC 10-17 23:00 ~ 10-18 01:00，跨两个UTC日文件
+    result = reader.get_range('2026-10-18 07:00:00', '2026-10-18 09:00:00')
+    t0 = datetime(2026, 10, 17, 23, 0, tzinfo=timezone.utc)
+    t1 = datetime(2026, 10, 18, 1, 0, tzinfo=timezone.utc)
+    assert result == [r for r in records if t0 <= utc(r['timestamp']) <= t1]
+    assert len(result) == 5
+    
+    # 北京时间 10-18 00:00 ~ 06:00 全部落在UTC日期 10-17 的文件中
+    result = reader.get_range('2026-10-18 00:00:00', '2026-10-18 06:00:00')
+    assert {utc(r['timestamp']).date().isoformat() for r in result} == {'2026-10-17'}
+    assert len(result) == 13
+
+
+def test_range_filters_and_open_ends(tmp_path):
+    records = write_day_files(tmp_path)
+    reader = AnchorDailyReader(tmp_path)
+    
+    start = '2026-10-17 00:00:00'
+    result = reader.get_range(start, '2026-10-19 08:00:00', symbol='BTC-USDT-SWAP', data_type='monitors')
+    t0 = datetime(2026, 10, 16, 16, 0, tzinfo=timezone.utc)
+    assert result == [r for r in records if utc(r['timestamp']) >= t0
+                      and r['symbol'] == 'BTC-USDT-SWAP' and r['_data_type'] == 'monitors']
+    # 不限起点时读取所有文件
+    assert reader.get_range(None, '2026-10-19 08:00:00') == records
+
+
+def test_date_queries_use_utc_days(tmp_path):
+    records = write_day_files(tmp_path)
+    reader = AnchorDailyReader(tmp_path)
+    
+    day = [r for r in records if r['timestamp'].startswith('2026-10-17')]
+    assert reader.get_date_data('2026-10-17') == day
+    assert reader.get_date_data('2026-10-17', data_type='profit_stats') == \
+        [r for r in day if r['_data_type'] == 'profit_stats']
+    assert reader.get_date_data('2026-10-20') == []
+    
+    stats = reader.get_date_statistics('2026-10-17')
+    assert stats['total'] == 48
+    assert stats['by_type'] == {'profit_stats': 16, 'monitors': 32}
+    # 首末时间按北京时间显示：UTC 00:00 为北京时间 08:00
+    assert stats['first_time'] == '2026-10-17 08:00:00'
+    assert stats['last_time'] == '2026-10-18 07:30:00'
@@ -0,0 +1,129 @@
+"""JSONL 尾部读取、时间索引和分帧压缩归档的回归测试"""
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+import gzip_frame_archive
+import jsonl_time_index
+from jsonl_tail_reader import (iter_lines_reversed, read_last_record, read_last_records,
+                               read_records_since, replace_first_line)
+
+START = 1_700_000_000  # 秒级时间戳
+
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def make_records(n):
+    # 不同长度的行，块边界会落在行中间；包含多字节字符
+    return [{'timestamp': (START + i * 60) * 1000, 'i': i, 'note': '数据' * (i % 7)} for i in range(n)]
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 64 * 1024])
+def test_tail_reader_across_block_boundaries(tmp_path, block_size):
+    path = tmp_path / 'data.jsonl'
+    records = make_records(50)
+    write_jsonl(path, records)
+    
+    lines = list(iter_lines_reversed(path, block_size))
+    assert [json.loads(line) for line in lines] == records[::-1]
+    assert read_last_records(path, 5, block_size) == records[-5:]
+    assert read_last_records(path, 500, block_size) == records
+    assert read_records_since(path, records[39]['timestamp'], block_size=block_size) == records[40:]
+    # limit 时返回最新的几条
+    assert read_records_since(path, 0, limit=3, block_size=block_size) == records[-3:]
+
+
+def test_tail_reader_skips_partial_last_line(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    records = make_records(3)
+    write_jsonl(path, records)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"timestamp": 1')  # 写入中途的最后一行
+    assert read_last_record(path) == records[-1]
+    assert read_last_records(tmp_path / 'missing.jsonl', 3) == []
+    assert read_last_record(tmp_path / 'missing.jsonl') is None
+
+
+def test_replace_first_line(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    write_jsonl(path, [{'header': 1}] + make_records(3))
+    replace_first_line(path, json.dumps({'header': 2}))
+    assert json.loads(path.read_text(encoding='utf-8').splitlines()[0]) == {'header': 2}
+    assert read_last_records(path, 3) == make_records(3)
+
+
+def test_time_index_range_reads(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    records = make_records(200)
+    for record in records:
+        jsonl_time_index.append_record(path, record)
+    assert jsonl_time_index.index_path(path).exists()
+    
+    t0 = START + 50 * 60
+    t1 = START + 80 * 60
+    # 两端都包含；毫秒时间戳、秒级时间戳和北京时间字符串的查询结果一致
+    assert jsonl_time_index.read_range(path, t0, t1) == records[50:81]
+    assert jsonl_time_index.read_range(path, t0 * 1000, t1 * 1000) == records[50:81]
+    beijing = datetime.fromtimestamp(t0, jsonl_time_index.BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    assert jsonl_time_index.read_range(path, beijing, t1) == records[50:81]
+    assert jsonl_time_index.read_range(path, t0, t1, limit=4) == records[50:54]
+    assert jsonl_time_index.read_range(path, None, START + 60) == records[:2]
+    assert jsonl_time_index.read_range(path, START + 10 ** 6) == []
+    assert jsonl_time_index.read_range(tmp_path / 'missing.jsonl', t0, t1) == []
+
+
+def test_time_index_unindexed_tail_and_stale_index(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    records = make_records(100)
+    write_jsonl(path, records[:60])
+    assert jsonl_time_index.rebuild_index(path) == 60
+    # 建索引之后直接追加的记录从最后一个索引条目处顺序扫描
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records[60:]:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    assert jsonl_time_index.read_range(path, START + 70 * 60, START + 75 * 60) == records[70:76]
+    
+    # 数据文件被重写（更短），索引失效后退化为从头扫描
+    write_jsonl(path, records[:10])
+    assert jsonl_time_index.read_range(path, START + 5 * 60) == records[5:10]
+    
+    # 索引偏移不在行首时同样退化为从头扫描
+    write_jsonl(path, [dict(r, pad='x' * 10) for r in records])
+    assert jsonl_time_index.read_range(path, START + 30 * 60, START + 31 * 60) == \
+        [dict(r, pad='x' * 10) for r in records[30:32]]
+
+
+def test_frame_archive_range_reads(tmp_path):
+    src = tmp_path / 'data.jsonl'
+    records = make_records(300)
+    write_jsonl(src, records)
+    dst = tmp_path / 'data.jsonl.gz'
+    frames = gzip_frame_archive.build_archive(src, dst_path=dst, frame_size=512)
+    assert frames > 10
+    # 每帧是独立的 gzip 成员，整个文件仍可按普通 gzip 读取
+    with gzip.open(dst, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == records
+    
+    cache = gzip_frame_archive.FrameCache(max_frames=4)
+    t0 = START + 100 * 60
+    t1 = START + 140 * 60
+    assert gzip_frame_archive.read_range(dst, t0, t1, cache=cache) == records[100:141]
+    assert gzip_frame_archive.read_range(dst, t0, t1, cache=cache) == records[100:141]
+    assert gzip_frame_archive.read_range(dst, t0, t1, limit=3, cache=cache) == records[100:103]
+    assert gzip_frame_archive.read_range(dst, cache=cache) == records
+    # 返回的是副本，修改不影响缓存
+    gzip_frame_archive.read_range(dst, t0, t0, cache=cache)[0]['i'] = -1
+    assert gzip_frame_archive.read_range(dst, t0, t0, cache=cache) == [records[100]]
+    
+    # 没有帧索引的普通 gzip 文件整体解压后过滤
+    plain = tmp_path / 'plain.jsonl.gz'
+    with gzip.open(plain, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    assert gzip_frame_archive.read_range(plain, t0, t1, cache=cache) == records[100:141]
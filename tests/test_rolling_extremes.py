@@ -0,0 +1,92 @@
+"""单调队列滚动高低点与逐窗口暴力计算的一致性测试"""
+import numpy as np
+
+from rolling_extremes import RollingExtremes, position_in_range
+
+MINUTE_MS = 60_000
+WINDOWS = {'10m': 10 * MINUTE_MS, '1h': 60 * MINUTE_MS}
+
+
+def brute_force(points, span):
+    """窗口 (ts - span, ts] 内的最高/最低价"""
+    ts = points[-1][0]
+    inside = [p for p in points if p[0] > ts - span]
+    return max(p[1] for p in inside), min(p[2] for p in inside)
+
+
+def random_bars(n, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    spread = rng.uniform(0.1, 2, n)
+    start = 1_700_000_000_000
+    return [(start + i * MINUTE_MS, float(c + s), float(c - s)) for i, (c, s) in enumerate(zip(close, spread))]
+
+
+def test_extremes_match_brute_force():
+    bars = random_bars(500)
+    tracker = RollingExtremes(windows=WINDOWS)
+    for k, (ts, high, low) in enumerate(bars):
+        tracker.push('BTC', ts, high, low, emit=False)
+        for name, span in WINDOWS.items():
+            assert tracker.extremes('BTC')[name] == brute_force(bars[:k + 1], span)
+    # 单调队列中最高价递减、最低价递增
+    entry = tracker._load()['BTC']
+    for name in WINDOWS:
+        highs = [p[1] for p in entry['max'][name]]
+        lows = [p[1] for p in entry['min'][name]]
+        assert highs == sorted(highs, reverse=True)
+        assert lows == sorted(lows)
+
+
+def test_events_only_after_window_is_covered():
+    tracker = RollingExtremes(windows={'10m': 10 * MINUTE_MS})
+    start = 1_700_000_000_000
+    for i in range(10):
+        # 数据未覆盖整个窗口时不产生事件
+        assert tracker.push('ETH', start + i * MINUTE_MS, 100 + i) == []
+    assert not tracker.covered('ETH', '10m')
+    events = tracker.push('ETH', start + 10 * MINUTE_MS, 200)
+    assert tracker.covered('ETH', '10m')
+    assert [(e['event_type'], e['previous']) for e in events] == [('new_high', 109.0)]
+    events = tracker.push('ETH', start + 11 * MINUTE_MS, 50)
+    assert [(e['event_type'], e['previous']) for e in events] == [('new_low', 102.0)]
+
+
+def test_push_bars_skips_old_bars_and_time_never_goes_back():
+    bars = random_bars(120)
+    tracker = RollingExtremes(windows=WINDOWS)
+    tracker.push_bars('SOL', bars[:80])
+    # 重复推送的K线不会再次计入
+    tracker.push_bars('SOL', bars[:100])
+    assert tracker.extremes('SOL')['1h'] == brute_force(bars[:100], WINDOWS['1h'])
+    # 实时价格的时间早于上次数据点时按上次时间计入
+    tracker.push('SOL', bars[99][0] - MINUTE_MS, 1000.0)
+    assert tracker.last_ts('SOL') == bars[99][0]
+    assert tracker.extremes('SOL')['10m'][0] == 1000.0
+
+
+def test_state_round_trip(tmp_path):
+    bars = random_bars(300)
+    state_file = tmp_path / 'extremes.json'
+    tracker = RollingExtremes(state_file=state_file, windows=WINDOWS)
+    tracker.push_bars('BTC', bars[:200])
+    tracker.save()
+    
+    restored = RollingExtremes(state_file=state_file, windows=WINDOWS)
+    assert restored.extremes('BTC') == tracker.extremes('BTC')
+    restored.push_bars('BTC', bars[150:])
+    assert restored.extremes('BTC')['1h'] == brute_force(bars, WINDOWS['1h'])
+    
+    # 窗口配置不同的状态不能继续使用
+    other = RollingExtremes(state_file=state_file, windows={'10m': 10 * MINUTE_MS})
+    assert other.extremes('BTC') == {}
+    
+    restored.reset('BTC')
+    assert restored.last_ts('BTC') is None
+
+
+def test_position_in_range():
+    positions = RollingExtremes(windows={'10m': 10 * MINUTE_MS})
+    positions.push_bars('BTC', [(0, 110.0, 90.0)])
+    assert positions.positions('BTC', 105.0) == {'10m': 75.0}
+    assert position_in_range(100.0, 100.0, 100.0) == 50.0
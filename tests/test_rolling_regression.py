@@ -0,0 +1,90 @@
+"""滑动窗口线性回归与 np.polyfit 的一致性测试"""
+import numpy as np
+import pytest
+
+from rolling_regression import RESUM_INTERVAL, RollingRegression, linear_regression, rolling_regression
+
+
+def polyfit_r2(y):
+    x = np.arange(len(y))
+    slope, intercept = np.polyfit(x, y, 1)
+    ss_tot = np.sum((y - y.mean()) ** 2)
+    ss_res = np.sum((y - (slope * x + intercept)) ** 2)
+    r2 = 1.0 - ss_res / ss_tot if ss_tot > 0 else 1.0
+    return slope, intercept, r2
+
+
+def btc_series(n, seed=11):
+    """BTC 量级的价格（约 60000），相邻点差值很小，容易暴露累加和的精度问题"""
+    rng = np.random.default_rng(seed)
+    return 60000 + np.cumsum(rng.normal(0, 2, n))
+
+
+def test_linear_regression_matches_polyfit():
+    y = btc_series(50)
+    for window in (2, 5, 10, 50):
+        slope, intercept, r2 = linear_regression(y[-window:])
+        expected = polyfit_r2(y[-window:])
+        assert slope == pytest.approx(expected[0], rel=1e-7, abs=1e-9)
+        assert intercept == pytest.approx(expected[1], rel=1e-12)
+        assert r2 == pytest.approx(expected[2], abs=1e-7)
+    assert linear_regression([5.0]) == (0.0, 5.0, 0.0)
+    assert linear_regression([7.0, 7.0, 7.0]) == (0.0, 7.0, 1.0)
+
+
+def test_vectorized_matches_polyfit_at_btc_scale():
+    window = 5
+    y = btc_series(20_000)
+    slopes, intercepts, r2 = rolling_regression(y, window)
+    assert np.isnan(slopes[:window - 1]).all()
+    
+    expected = np.array([np.polyfit(np.arange(window), y[t - window + 1:t + 1], 1)
+                         for t in range(window - 1, len(y))])
+    np.testing.assert_allclose(slopes[window - 1:], expected[:, 0], rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(intercepts[window - 1:], expected[:, 1], rtol=1e-12)
+    # R² 抽样与 polyfit 残差比较
+    for t in range(window - 1, len(y), 997):
+        assert r2[t] == pytest.approx(polyfit_r2(y[t - window + 1:t + 1])[2], abs=1e-6)
+
+
+def test_vectorized_matrix_and_nan_windows():
+    matrix = np.vstack([btc_series(40, seed=1), btc_series(40, seed=2) / 20])
+    matrix[1, 20] = np.nan
+    slopes, _, r2 = rolling_regression(matrix, 5)
+    assert slopes.shape == matrix.shape
+    # 包含 NaN 的窗口结果为 NaN，其余窗口不受影响
+    assert np.isnan(slopes[1, 20:25]).all() and np.isnan(r2[1, 20:25]).all()
+    assert not np.isnan(slopes[1, 25:]).any()
+    assert not np.isnan(slopes[0, 4:]).any()
+    single, _, _ = rolling_regression(matrix[0], 5)
+    np.testing.assert_array_equal(single, slopes[0])
+
+
+def test_rolling_class_matches_linear_regression():
+    window = 5
+    y = btc_series(RESUM_INTERVAL * 3 + 17)
+    reg = RollingRegression(window)
+    for t, value in enumerate(y):
+        reg.push(value)
+        if t < 1:
+            assert reg.result() is None
+            continue
+        expected = linear_regression(y[max(0, t - window + 1):t + 1])
+        slope, intercept, r2 = reg.result()
+        assert slope == pytest.approx(expected[0], rel=1e-6, abs=1e-8)
+        assert intercept == pytest.approx(expected[1], rel=1e-12)
+        assert r2 == pytest.approx(expected[2], abs=1e-6)
+
+
+def test_preview_does_not_change_state():
+    y = btc_series(20)
+    reg = RollingRegression(5)
+    for value in y[:15]:
+        reg.push(value)
+    before = reg.result()
+    preview = reg.preview(y[15:17])
+    assert reg.result() == before
+    expected = linear_regression(y[12:17])
+    assert preview[0] == pytest.approx(expected[0], rel=1e-6, abs=1e-8)
+    with pytest.raises(ValueError):
+        RollingRegression(1)
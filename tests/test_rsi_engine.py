@@ -0,0 +1,85 @@
+"""Wilder RSI 与增量引擎的回归测试"""
+import numpy as np
+import pytest
+
+from rsi_engine import WARMUP_BARS, RSIEngine, rsi_value, wilder_rsi
+
+BAR_MS = 5 * 60_000
+
+
+def reference_rsi(closes, period=14):
+    """Wilder 平滑的逐根参考实现"""
+    gains = []
+    losses = []
+    for prev, close in zip(closes, closes[1:]):
+        change = close - prev
+        gains.append(max(change, 0.0))
+        losses.append(max(-change, 0.0))
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    if avg_loss == 0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def random_closes(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return 3000 + np.cumsum(rng.normal(0, 5, n))
+
+
+def test_wilder_rsi_matches_reference():
+    closes = random_closes(500)
+    avg_gain, avg_loss = wilder_rsi(closes)
+    assert float(rsi_value(avg_gain, avg_loss)) == pytest.approx(reference_rsi(list(closes)), abs=1e-9)
+
+
+def test_wilder_rsi_edge_cases():
+    # K线不足 period+1 根
+    assert wilder_rsi([1.0] * 14) is None
+    # 只涨不跌时为 100，只跌不涨时为 0
+    up = np.arange(30, dtype=float)
+    assert float(rsi_value(*wilder_rsi(up))) == 100.0
+    assert float(rsi_value(*wilder_rsi(up[::-1]))) == 0.0
+    # 全部不变时没有下跌，与原先的计算一致为 100
+    assert float(rsi_value(*wilder_rsi([5.0] * 30))) == 100.0
+
+
+def test_engine_incremental_matches_warmup_window(tmp_path):
+    closes = {'BTC': random_closes(400, seed=1), 'ETH': random_closes(400, seed=2)}
+    ts = 1_700_000_000_000 + np.arange(400, dtype=np.int64) * BAR_MS
+    
+    state_file = tmp_path / 'rsi_state.json'
+    engine = RSIEngine(state_file=state_file)
+    start = WARMUP_BARS
+    engine.update('5m', {s: (ts[:start], c[:start]) for s, c in closes.items()})
+    # 币种推进的K线数不同（ETH 每次多一根），向量化推进时按各自的数量计算
+    btc_end = eth_end = start
+    while eth_end < 400:
+        btc_end = min(btc_end + 1, 400)
+        eth_end = min(eth_end + 2, 400)
+        result = engine.update('5m', {
+            'BTC': (ts[btc_end - 100:btc_end], closes['BTC'][btc_end - 100:btc_end]),
+            'ETH': (ts[eth_end - 100:eth_end], closes['ETH'][eth_end - 100:eth_end]),
+        })
+        if eth_end == 250:
+            engine.save()
+            engine = RSIEngine(state_file=state_file)
+    
+    # 增量结果等于从预热窗口起点开始整段平滑的结果
+    for symbol, end in (('BTC', btc_end), ('ETH', eth_end)):
+        expected = reference_rsi(list(closes[symbol][:end]))
+        assert result[symbol] == round(expected, 2)
+    assert engine.stats['warmups'] == 0
+
+
+def test_engine_rewarms_after_gap():
+    closes = random_closes(400)
+    ts = 1_700_000_000_000 + np.arange(400, dtype=np.int64) * BAR_MS
+    engine = RSIEngine()
+    engine.update('5m', {'SOL': (ts[:100], closes[:100])})
+    result = engine.update('5m', {'SOL': (ts[300:], closes[300:])})
+    assert engine.stats['warmups'] == 2
+    assert result['SOL'] == round(reference_rsi(list(closes[300:])), 2)
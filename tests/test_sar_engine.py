@@ -0,0 +1,116 @@
+"""SAR 计算与增量引擎的回归测试"""
+import numpy as np
+
+from sar_engine import SAREngine, calculate_sar, calculate_sar_batch
+
+BAR_MS = 60_000
+
+
+def reference_sar(high, low, af_start=0.02, af_increment=0.02, af_max=0.2):
+    """逐根计算的参考实现（原采集器中的循环写法）"""
+    sar = [low[0]]
+    trend = [1]
+    ep = high[0]
+    af = af_start
+    for i in range(1, len(high)):
+        value = sar[-1] + af * (ep - sar[-1])
+        if trend[-1] == 1:
+            if low[i] < value:
+                trend.append(-1)
+                value = ep
+                ep = low[i]
+                af = af_start
+            else:
+                trend.append(1)
+                if high[i] > ep:
+                    ep = high[i]
+                    af = min(af + af_increment, af_max)
+                value = min(value, low[i - 1], *low[max(i - 2, 0):i - 1])
+        else:
+            if high[i] > value:
+                trend.append(1)
+                value = ep
+                ep = high[i]
+                af = af_start
+            else:
+                trend.append(-1)
+                if low[i] < ep:
+                    ep = low[i]
+                    af = min(af + af_increment, af_max)
+                value = max(value, high[i - 1], *high[max(i - 2, 0):i - 1])
+        sar.append(value)
+    return np.array(sar), np.array(trend)
+
+
+def random_bars(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 30, n))
+    spread = rng.uniform(5, 40, n)
+    return close + spread, close - spread, close
+
+
+def to_klines(high, low, close, start_ts=1_700_000_000_000):
+    return [{'timestamp': start_ts + i * BAR_MS, 'high': float(h), 'low': float(lo), 'close': float(c)}
+            for i, (h, lo, c) in enumerate(zip(high, low, close))]
+
+
+def test_calculate_sar_matches_reference():
+    high, low, _ = random_bars(2000)
+    sar, trend, _, _ = calculate_sar(high, low)
+    ref_sar, ref_trend = reference_sar(list(high), list(low))
+    np.testing.assert_allclose(sar, ref_sar, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(trend, ref_trend)
+    # 第一根：SAR 取最低价，假设上升趋势
+    assert sar[0] == low[0] and trend[0] == 1
+    # 随机游走中必然出现多次反转
+    assert np.count_nonzero(np.diff(trend)) > 10
+
+
+def test_batch_matches_single():
+    series = {f'S{k}': random_bars(300 + k * 50, seed=k)[:2] for k in range(4)}
+    result = calculate_sar_batch(series)
+    for name, (high, low) in series.items():
+        sar, trend, _ = result[name]
+        expected_sar, expected_trend, _, _ = calculate_sar(high, low)
+        np.testing.assert_array_equal(sar, expected_sar)
+        np.testing.assert_array_equal(trend, expected_trend)
+
+
+def test_engine_incremental_matches_full_series(tmp_path):
+    high, low, close = random_bars(600)
+    klines = to_klines(high, low, close)
+    sar, trend, _, _ = calculate_sar(high, low)
+    
+    state_file = tmp_path / 'sar_state.json'
+    engine = SAREngine(state_file=state_file)
+    # 每次传入最近100根K线（最后一根正在形成），与采集器的调用方式一致
+    for end in range(100, len(klines) + 1, 7):
+        window = klines[max(0, end - 100):end]
+        now_ms = window[-1]['timestamp'] + BAR_MS // 2
+        result = engine.update('BTC', window, now_ms=now_ms)
+        
+        if end == 100:
+            assert result['warmup']
+        else:
+            assert not result['warmup']
+        # 已收盘部分来自持久状态，正在形成的K线只在副本上计算
+        assert result['sar'] == sar[end - 1]
+        assert result['trend'] == trend[end - 1]
+        assert result['sar_values'] == sar[end - 5:end].tolist()
+        # 状态中途保存并重新加载后继续增量计算
+        if end == 303:
+            engine.save()
+            engine = SAREngine(state_file=state_file)
+
+
+def test_engine_rewarms_after_gap():
+    high, low, close = random_bars(300)
+    klines = to_klines(high, low, close)
+    engine = SAREngine()
+    engine.update('ETH', klines[:100], now_ms=klines[100]['timestamp'])
+    # 跳过100根K线后，状态与新K线之间有缺口，需要用新K线重新预热
+    later = klines[200:300]
+    result = engine.update('ETH', later, now_ms=later[-1]['timestamp'] + BAR_MS)
+    assert result['warmup']
+    expected, _, _, _ = calculate_sar([k['high'] for k in later], [k['low'] for k in later])
+    assert result['sar'] == expected[-1]